@@ -0,0 +1,200 @@
+"""
+Admin operations handler.
+
+Provides endpoints for:
+- POST /admin/profiles/import - Bulk import profiles (NDJSON, CSV or a JSON record list)
+- DELETE /admin/users/{user_id} - Purge a user's profile, conversations and charts
+"""
+
+import io
+import json
+import logging
+import os
+from typing import Any, Dict
+
+from common.api_wrapper import ApiResponse, api_handler
+from common.profile_store import DEFAULT_WRITE_CONCURRENCY, import_profiles, read_records
+from common.purge import request_account_purge
+from common.request import Request
+
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Cognito group whose members may call admin endpoints
+ADMIN_GROUP = os.environ.get("ADMIN_GROUP", "admin")
+
+# Upper bound for concurrent BatchWriteItem calls from one invocation
+MAX_WRITE_CONCURRENCY = 8
+
+
+def is_admin(event: Request) -> bool:
+    """Whether the caller's JWT places them in ADMIN_GROUP."""
+    return ADMIN_GROUP in event.groups
+
+
+@api_handler
+def import_profiles_handler(event: Request, context: Any) -> Dict[str, Any]:
+    """
+    Bulk import profiles.
+
+    POST /admin/profiles/import
+
+    Request body (one of):
+        {"records": [{"user_id": "...", "first_name": "...", ...}], "dry_run": false}
+        {"format": "ndjson" | "csv", "content": "<file contents>", "dry_run": false}
+
+    Records are validated like POST /profile and written with BatchWriteItem.
+    Validation runs in-process (Lambda has no multiprocessing support); use
+    `python -m common.profile_store import` for very large files.
+
+    Returns:
+        Import report:
+        {
+            "read": 1000,
+            "imported": 998,
+            "invalid": 2,
+            "failed": 0,
+            "errors": [{"line": 17, "user_id": null, "error": "..."}],
+            "seconds": 1.9,
+            "records_per_second": 526.3
+        }
+
+    Raises:
+        ValueError: If the body has neither records nor content
+    """
+    if not is_admin(event):
+        return ApiResponse(403, {"error": "Forbidden", "message": f"Requires the {ADMIN_GROUP} group"})
+
+    body = event.body or {}
+    if isinstance(body.get("records"), list):
+        records = enumerate(body["records"], start=1)
+    elif isinstance(body.get("content"), str):
+        records = read_records(io.StringIO(body["content"], newline=""), body.get("format", "ndjson"))
+    else:
+        raise ValueError("Body must contain a records list or file content")
+
+    concurrency = int(body.get("concurrency", DEFAULT_WRITE_CONCURRENCY))
+    report = import_profiles(
+        records,
+        write_concurrency=max(1, min(concurrency, MAX_WRITE_CONCURRENCY)),
+        dry_run=bool(body.get("dry_run", False)),
+    )
+    return report
+
+
+@api_handler
+def purge_user_handler(event: Request, context: Any) -> Dict[str, Any]:
+    """
+    Delete everything stored for a user.
+
+    DELETE /admin/users/{user_id}
+
+    Starts a background purge (profile, conversations partition, chart
+    SVGs) that resumes across invocations from its state record. Calling
+    again while it runs reports progress without restarting it.
+
+    Returns:
+        Purge state:
+        {
+            "user_id": "...",
+            "phase": "profile" | "conversations" | "charts" | "done",
+            "items_deleted": 0,
+            "objects_deleted": 0,
+            "requested_at": "2025-11-26T12:00:00.000000Z",
+            "completed_at": null,
+            "enqueued": true
+        }
+
+    Raises:
+        ValueError: If user_id is missing
+    """
+    if not is_admin(event):
+        return ApiResponse(403, {"error": "Forbidden", "message": f"Requires the {ADMIN_GROUP} group"})
+
+    user_id = event.path_params.get("user_id")
+    if not user_id:
+        raise ValueError("user_id is required")
+
+    state = request_account_purge(user_id, requested_by=event.claims.get("sub", "unknown"))
+    return {
+        "user_id": user_id,
+        "phase": state["phase"],
+        "items_deleted": int(state.get("items_deleted", 0)),
+        "objects_deleted": int(state.get("objects_deleted", 0)),
+        "requested_at": state.get("requested_at"),
+        "completed_at": state.get("completed_at"),
+        "enqueued": state["enqueued"],
+    }
+
+
+# Local testing
+if __name__ == "__main__":
+    print("Testing Admin Import Lambda\n")
+    print("=" * 60)
+
+    class MockContext:
+        aws_request_id = "test-admin-import"
+
+    def call(body, groups="[admin]"):
+        claims = {"sub": "admin-user", "cognito:groups": groups} if groups else {"sub": "user"}
+        event = {
+            "rawPath": "/admin/profiles/import",
+            "body": json.dumps(body),
+            "requestContext": {"authorizer": {"jwt": {"claims": claims}}},
+        }
+        response = import_profiles_handler(event, MockContext())
+        return response["statusCode"], json.loads(response["body"])
+
+    record = {
+        "user_id": "user-1",
+        "first_name": "Ada",
+        "last_name": "Lovelace",
+        "birth_date": "1990-01-15",
+        "birth_time": "14:30",
+        "birth_location": "London",
+        "birth_country": "United Kingdom",
+    }
+
+    # Test 1: Non-admins are rejected
+    print("\n[Test 1] Admin group required")
+    print("-" * 60)
+    status, body = call({"records": [record], "dry_run": True}, groups=None)
+    assert status == 403 and body["error"] == "Forbidden"
+    status, _ = call({"records": [record], "dry_run": True}, groups="[support]")
+    assert status == 403
+    print("Test 1 passed")
+
+    # Test 2: Dry run of a record list and of CSV content
+    print("\n[Test 2] Dry-run imports")
+    print("-" * 60)
+    status, body = call({"records": [record, {**record, "birth_date": "1990-13-01"}], "dry_run": True})
+    print(body)
+    assert status == 200 and body["imported"] == 1 and body["invalid"] == 1 and body["errors"][0]["line"] == 2
+    csv_content = ",".join(record) + "\n" + ",".join(record.values()) + "\n"
+    status, body = call({"format": "csv", "content": csv_content, "dry_run": True}, groups="[support admin]")
+    assert status == 200 and body["imported"] == 1
+    print("Test 2 passed")
+
+    # Test 3: Bad request
+    print("\n[Test 3] Missing records")
+    print("-" * 60)
+    status, body = call({"dry_run": True})
+    assert status == 400
+    print(f"Correctly rejected: {body['message']}")
+    print("Test 3 passed")
+
+    # Test 4: User purge requires the admin group and a user id
+    print("\n[Test 4] Purge user guards")
+    print("-" * 60)
+    event = {"rawPath": "/admin/users/user-1", "requestContext": {"authorizer": {"jwt": {"claims": {"sub": "u"}}}}}
+    response = purge_user_handler({**event, "pathParameters": {"user_id": "user-1"}}, MockContext())
+    assert response["statusCode"] == 403
+    event["requestContext"]["authorizer"]["jwt"]["claims"]["cognito:groups"] = "[admin]"
+    response = purge_user_handler({**event, "pathParameters": {}}, MockContext())
+    assert response["statusCode"] == 400
+    print(f"Correctly rejected: {json.loads(response['body'])['message']}")
+    print("Test 4 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
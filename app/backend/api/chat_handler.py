@@ -7,27 +7,43 @@ import json
 import logging
 import os
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import boto3
-from botocore.exceptions import ClientError
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
 # Import common utilities
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
-from common.api_wrapper import api_handler  # noqa: E402
-from common.astrology_client import AstrologyClient, AstrologyAPIError  # noqa: E402
+from common.api_wrapper import ApiResponse, api_handler  # noqa: E402
+from common.astrology_client import AstrologyClient  # noqa: E402
 from common.bedrock_client import BedrockClient, BedrockError  # noqa: E402
+from common.chart_providers import (  # noqa: E402
+    ChartProviderError,
+    CircuitBreakerProvider,
+    FallbackChartProvider,
+    StaleChartCacheProvider,
+)
+from common.deadline import Deadline, DeadlineExceeded  # noqa: E402
+from common.ephemeris import LocalEphemerisProvider  # noqa: E402
+from common.request import Request  # noqa: E402
+from common.secrets import prefetch_secrets  # noqa: E402
 
 # Setup logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # AWS clients
-dynamodb = boto3.resource("dynamodb")
-s3_client = boto3.client("s3")
+# DynamoDB calls are small single-item reads/writes, so tight timeouts keep a
+# stalled connection from eating the request deadline
+dynamodb = boto3.resource(
+    "dynamodb",
+    config=Config(connect_timeout=1, read_timeout=2, retries={"max_attempts": 3, "mode": "standard"}),
+)
+s3_client = boto3.client("s3", config=Config(connect_timeout=1, read_timeout=5))
 
 # Table and bucket names from environment
 PROFILES_TABLE = os.environ.get("DYNAMODB_PROFILES_TABLE", "mira-user-profiles-dev")
@@ -37,35 +53,43 @@ CHARTS_BUCKET = os.environ.get("S3_CHARTS_BUCKET", "mira-dev-artifacts")
 # Cache TTL (30 days in seconds)
 CHART_CACHE_TTL = 30 * 24 * 60 * 60
 
-# Initialize clients
-astrology_client = AstrologyClient()
-bedrock_client = BedrockClient()
+# Chart providers to try, in order (comma-separated provider names)
+CHART_PROVIDER_ORDER = os.environ.get("CHART_PROVIDER_ORDER", "local_ephemeris,astrologer,stale_cache")
 
+# Request budget kept back for later steps (seconds)
+BEDROCK_RESERVE_SECONDS = 12  # chart generation must leave this much for the AI response
+PERSISTENCE_RESERVE_SECONDS = 2  # Bedrock must leave this much for saving the conversation
 
-def extract_user_id_from_event(event: Dict[str, Any]) -> str:
-    """Extract user_id from JWT claims."""
-    try:
-        if "raw_event" in event:
-            event = event["raw_event"]
+# Per-attempt timeouts for DynamoDB and S3 calls, shortest first. Each call gets as
+# many attempts (up to PERSISTENCE_MAX_ATTEMPTS) and the longest timeout that fit
+# the remaining budget together with retry backoff, so retries never outlast the deadline.
+PERSISTENCE_ATTEMPT_TIMEOUTS = (0.25, 0.5, 1.0, 2.0)
+PERSISTENCE_MAX_ATTEMPTS = 3
 
-        authorizer = event["requestContext"]["authorizer"]
+# DynamoDB resources and S3 clients per (service, attempt timeout, attempts), created on first use
+_persistence_resources: Dict[Tuple[str, float, int], Any] = {}
 
-        if "jwt" in authorizer:
-            claims = authorizer["jwt"]["claims"]
-        else:
-            claims = authorizer["claims"]
-
-        user_id = claims["sub"]
-        logger.info(f"Extracted user_id: {user_id}")
-        return user_id
+# Initialize clients; configured secrets (the Astrologer API key) load in parallel during init
+prefetch_secrets()
+astrology_client = AstrologyClient()
+bedrock_client = BedrockClient()
 
-    except (KeyError, TypeError) as e:
-        logger.error(f"Failed to extract user_id: {e}")
-        raise ValueError("Unable to extract user identity from request")
+# Chart sources in fallback order. The local ephemeris answers in-process
+# whenever the profile has resolved coordinates. The Astrologer API sits behind
+# a circuit breaker shared by all warm invocations, so once it opens the chain
+# moves on to the next provider instantly instead of after a full retry cycle.
+CHART_PROVIDERS = {
+    "local_ephemeris": LocalEphemerisProvider(),
+    "astrologer": CircuitBreakerProvider(astrology_client),
+    "stale_cache": StaleChartCacheProvider(),
+}
+chart_provider = FallbackChartProvider(
+    [CHART_PROVIDERS[name.strip()] for name in CHART_PROVIDER_ORDER.split(",") if name.strip()]
+)
 
 
 @api_handler
-def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def lambda_handler(event: Request, context: Any) -> Dict[str, Any]:
     """
     Lambda handler for POST /chat endpoint.
 
@@ -83,109 +107,111 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     logger.info("Chat request received")
 
+    # Time budget for the whole request (API Gateway gives up after 29 seconds)
+    deadline = Deadline.from_context(context)
+
     # Extract user_id
     try:
-        user_id = extract_user_id_from_event(event)
+        user_id = event.user_id
     except ValueError as e:
-        return {
-            "statusCode": 401,
-            "body": json.dumps({"error": {"code": "UNAUTHORIZED", "message": str(e)}}),
-        }
+        return ApiResponse(401, {"error": {"code": "UNAUTHORIZED", "message": str(e)}})
 
     # Parse request body
-    body = event.get("body_json", {})
-    if not body:
-        body = event.get("parsed_body", {})
+    body = event.body
 
     user_message = body.get("message", "").strip()
     conversation_id = body.get("conversation_id")
 
     if not user_message:
-        return {
-            "statusCode": 400,
-            "body": json.dumps(
-                {
-                    "error": {
-                        "code": "MISSING_MESSAGE",
-                        "message": "Message field is required",
-                    }
+        return ApiResponse(
+            400,
+            {
+                "error": {
+                    "code": "MISSING_MESSAGE",
+                    "message": "Message field is required",
                 }
-            ),
-        }
+            },
+        )
 
     logger.info(f"User message: {user_message[:100]}...")
 
     # Step 1: Get user profile
     try:
-        user_profile = get_user_profile(user_id)
+        user_profile = get_user_profile(user_id, deadline)
         if not user_profile:
-            return {
-                "statusCode": 404,
-                "body": json.dumps(
-                    {
-                        "error": {
-                            "code": "PROFILE_NOT_FOUND",
-                            "message": "User profile not found. Please create a profile first.",
-                        }
+            return ApiResponse(
+                404,
+                {
+                    "error": {
+                        "code": "PROFILE_NOT_FOUND",
+                        "message": "User profile not found. Please create a profile first.",
                     }
-                ),
-            }
+                },
+            )
 
         logger.info(f"User profile loaded: {user_profile.get('zodiac_sign')}")
+    except DeadlineExceeded as e:
+        logger.warning(f"Profile lookup cancelled: {e}")
+        return _deadline_exceeded_response()
     except Exception as e:
         logger.error(f"Failed to get user profile: {e}")
-        return {
-            "statusCode": 500,
-            "body": json.dumps(
-                {
-                    "error": {
-                        "code": "PROFILE_ERROR",
-                        "message": "Failed to retrieve user profile",
-                    }
+        return ApiResponse(
+            500,
+            {
+                "error": {
+                    "code": "PROFILE_ERROR",
+                    "message": "Failed to retrieve user profile",
                 }
-            ),
-        }
+            },
+        )
 
     # Step 2: Check for cached chart
-    chart_data, chart_url, is_cache_hit = get_or_generate_chart(user_id, user_profile)
+    try:
+        chart_data, chart_url, is_cache_hit = get_or_generate_chart(user_id, user_profile, deadline)
+    except DeadlineExceeded as e:
+        logger.warning(f"Chart step cancelled: {e}")
+        return _deadline_exceeded_response()
 
     if not chart_data:
-        return {
-            "statusCode": 500,
-            "body": json.dumps(
-                {
-                    "error": {
-                        "code": "CHART_ERROR",
-                        "message": "Failed to generate or retrieve chart",
-                    }
+        return ApiResponse(
+            500,
+            {
+                "error": {
+                    "code": "CHART_ERROR",
+                    "message": "Failed to generate or retrieve chart",
                 }
-            ),
-        }
+            },
+        )
 
     logger.info(f"Chart {'retrieved from cache' if is_cache_hit else 'generated'}")
 
     # Step 3: Generate AI response
     try:
         ai_result = bedrock_client.generate_response(
-            user_profile=user_profile, chart_data=chart_data, user_question=user_message
+            user_profile=user_profile,
+            chart_data=chart_data,
+            user_question=user_message,
+            deadline=deadline.reserve(PERSISTENCE_RESERVE_SECONDS),
         )
 
         ai_response = ai_result["response"]
         logger.info(f"AI response generated ({len(ai_response)} chars)")
 
+    except DeadlineExceeded as e:
+        logger.warning(f"AI step cancelled: {e}")
+        return _deadline_exceeded_response()
+
     except BedrockError as e:
         logger.error(f"Bedrock error: {e}")
-        return {
-            "statusCode": 500,
-            "body": json.dumps(
-                {
-                    "error": {
-                        "code": "AI_ERROR",
-                        "message": "Failed to generate AI response",
-                    }
+        return ApiResponse(
+            500,
+            {
+                "error": {
+                    "code": "AI_ERROR",
+                    "message": "Failed to generate AI response",
                 }
-            ),
-        }
+            },
+        )
 
     # Step 4: Save conversation
     try:
@@ -195,6 +221,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             user_message=user_message,
             ai_response=ai_response,
             chart_url=chart_url,
+            deadline=deadline,
         )
         logger.info(f"Conversation saved: {result_conversation_id}")
     except Exception as e:
@@ -204,20 +231,28 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
     # Success response
     return {
-        "statusCode": 200,
-        "body": json.dumps(
-            {
-                "conversation_id": result_conversation_id,
-                "message": ai_response,
-                "chart_url": chart_url,
-            }
-        ),
+        "conversation_id": result_conversation_id,
+        "message": ai_response,
+        "chart_url": chart_url,
     }
 
 
-def get_user_profile(user_id: str) -> Optional[Dict[str, Any]]:
-    """Retrieve user profile from DynamoDB."""
-    table = dynamodb.Table(PROFILES_TABLE)
+def _deadline_exceeded_response() -> ApiResponse:
+    """Error returned when the remaining request budget cannot cover the next step."""
+    return ApiResponse(
+        504,
+        {
+            "error": {
+                "code": "DEADLINE_EXCEEDED",
+                "message": "The request could not be completed in time. Please try again.",
+            }
+        },
+    )
+
+
+def get_user_profile(user_id: str, deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
+    """Retrieve user profile from DynamoDB, with timeouts that fit the request deadline."""
+    table = _table(PROFILES_TABLE, deadline, "profile lookup")
 
     try:
         response = table.get_item(Key={"user_id": user_id})
@@ -227,12 +262,22 @@ def get_user_profile(user_id: str) -> Optional[Dict[str, Any]]:
         raise
 
 
-def get_or_generate_chart(user_id: str, user_profile: Dict[str, Any]) -> tuple[Optional[Dict], Optional[str], bool]:
+def get_or_generate_chart(
+    user_id: str, user_profile: Dict[str, Any], deadline: Optional[Deadline] = None
+) -> tuple[Optional[Dict], Optional[str], bool]:
     """
     Get cached chart or generate new one.
 
+    Chart generation is bounded so that BEDROCK_RESERVE_SECONDS of the request
+    deadline are still left for the AI response. Caching a new chart (S3
+    upload and profile update) is optional and shares that bound: when it
+    fails or the budget runs out, the chart is returned without a URL.
+
     Returns:
         (chart_data, chart_url, is_cache_hit)
+
+    Raises:
+        DeadlineExceeded: If the remaining budget cannot cover chart generation
     """
     # Check cache
     chart_s3_path = user_profile.get("chart_s3_path")
@@ -267,31 +312,31 @@ def get_or_generate_chart(user_id: str, user_profile: Dict[str, Any]) -> tuple[O
     logger.info("Cache miss - generating new chart")
 
     try:
-        # Generate chart
-        chart_result = astrology_client.get_birth_chart(user_profile)
+        # Generate chart through the provider chain
+        chart_deadline = deadline.reserve(BEDROCK_RESERVE_SECONDS) if deadline else None
+        chart_result = chart_provider.get_birth_chart(user_profile, deadline=chart_deadline)
         chart_data = chart_result["chart_data"]
         svg_content = chart_result["svg_content"]
 
-        # Save to S3
-        timestamp = current_time
-        s3_key = f"charts/{user_id}/{timestamp}.svg"
+        # Stale cache fallback: keep the existing chart and cache timestamp so
+        # the next request tries the upstream provider again
+        if chart_result["metadata"].get("stale"):
+            chart_url = generate_presigned_chart_url(CHARTS_BUCKET, chart_s3_path) if chart_s3_path else None
+            logger.info("Serving stale cached chart from fallback provider")
+            return chart_data, chart_url, True
 
-        s3_client.put_object(
-            Bucket=CHARTS_BUCKET,
-            Key=s3_key,
-            Body=svg_content,
-            ContentType="image/svg+xml",
-        )
-
-        chart_url = generate_presigned_chart_url(CHARTS_BUCKET, s3_key)
-        logger.info(f"Chart saved to S3: {s3_key}")
-
-        # Update user profile with chart metadata
-        update_profile_with_chart(user_id, s3_key, timestamp, chart_data)
+        # Locally computed charts have no SVG and are cheaper to recompute than
+        # to cache, so skip the S3 upload and profile update
+        if not svg_content:
+            logger.info(f"Chart computed by {chart_result['metadata'].get('api_provider')}, no SVG to store")
+            return chart_data, None, False
 
+        chart_url = cache_chart(user_id, chart_data, svg_content, current_time, chart_deadline)
         return chart_data, chart_url, False
 
-    except AstrologyAPIError as e:
+    except DeadlineExceeded:
+        raise
+    except ChartProviderError as e:
         logger.error(f"Failed to generate chart: {e}")
         return None, None, False
     except Exception as e:
@@ -299,9 +344,46 @@ def get_or_generate_chart(user_id: str, user_profile: Dict[str, Any]) -> tuple[O
         return None, None, False
 
 
-def update_profile_with_chart(user_id: str, s3_path: str, timestamp: int, chart_data: Dict[str, Any]) -> None:
+def cache_chart(
+    user_id: str, chart_data: Dict[str, Any], svg_content: str, timestamp: int, deadline: Optional[Deadline] = None
+) -> Optional[str]:
+    """
+    Save a new chart SVG to S3 and cache the chart on the profile.
+
+    Both calls get timeouts that fit the deadline. The cache only saves the
+    next request a chart generation, so it is skipped rather than letting it
+    fail the chat.
+
+    Returns:
+        Presigned chart URL, or None if the SVG was not saved
+    """
+    s3_key = f"charts/{user_id}/{timestamp}.svg"
+    try:
+        _s3(deadline, "chart upload").put_object(
+            Bucket=CHARTS_BUCKET,
+            Key=s3_key,
+            Body=svg_content,
+            ContentType="image/svg+xml",
+        )
+        logger.info(f"Chart saved to S3: {s3_key}")
+    except (DeadlineExceeded, ClientError, BotoCoreError) as e:
+        logger.warning(f"Skipped chart cache: {e}")
+        return None
+
+    chart_url = generate_presigned_chart_url(CHARTS_BUCKET, s3_key)
+    try:
+        update_profile_with_chart(user_id, s3_key, timestamp, chart_data, deadline)
+    except (DeadlineExceeded, ClientError, BotoCoreError) as e:
+        # The next request generates the chart again
+        logger.warning(f"Chart saved but not cached on the profile: {e}")
+    return chart_url
+
+
+def update_profile_with_chart(
+    user_id: str, s3_path: str, timestamp: int, chart_data: Dict[str, Any], deadline: Optional[Deadline] = None
+) -> None:
     """Update user profile with chart metadata."""
-    table = dynamodb.Table(PROFILES_TABLE)
+    table = _table(PROFILES_TABLE, deadline, "chart profile update")
 
     chart_data_str = json.dumps(chart_data)
 
@@ -310,13 +392,14 @@ def update_profile_with_chart(user_id: str, s3_path: str, timestamp: int, chart_
             Key={"user_id": user_id},
             UpdateExpression=(
                 "SET chart_s3_path = :path, chart_generated_at = :ts, "
-                "chart_data_cached = :data, updated_at = :updated"
+                "chart_data_cached = :data, updated_at = :updated ADD version :one"
             ),
             ExpressionAttributeValues={
                 ":path": s3_path,
                 ":ts": timestamp,
                 ":data": chart_data_str,
                 ":updated": timestamp,
+                ":one": 1,  # Profile ETags come from the version (see profile_store.save_profile)
             },
         )
         logger.info(f"Profile updated with chart metadata for user: {user_id}")
@@ -338,12 +421,105 @@ def generate_presigned_chart_url(bucket: str, s3_key: str, expiration: int = 864
         return f"https://{bucket}.s3.amazonaws.com/{s3_key}"
 
 
+def _attempt_plan(deadline: Deadline, operation: str, follow_up: bool = False) -> Tuple[int, float]:
+    """
+    Attempts and per-attempt timeout for a call under the remaining budget.
+
+    The attempts, their timeouts (connect plus read) and the retry backoff
+    between them never add up to more than is left, so a stalled call fails
+    before the gateway cuts the response off instead of after it.
+
+    Args:
+        deadline: Request deadline
+        operation: Operation name for logs and errors
+        follow_up: A write that makes an already saved message readable and
+            listed. It is never skipped: with too little budget it gets one
+            shortest attempt, which the deadline's response margin absorbs.
+
+    Returns:
+        (attempts, attempt timeout in seconds)
+
+    Raises:
+        DeadlineExceeded: If the budget cannot cover even the shortest attempt (never for follow-ups)
+    """
+    try:
+        budget = deadline.timeout(
+            _attempts_duration(PERSISTENCE_ATTEMPT_TIMEOUTS[-1], PERSISTENCE_MAX_ATTEMPTS),
+            operation=operation,
+            minimum=PERSISTENCE_ATTEMPT_TIMEOUTS[0],
+        )
+    except DeadlineExceeded:
+        if not follow_up:
+            raise
+        budget = PERSISTENCE_ATTEMPT_TIMEOUTS[0]
+    # Most attempts that fit, then the longest timeout
+    plan = max(
+        (
+            (attempts, timeout)
+            for attempts in range(1, PERSISTENCE_MAX_ATTEMPTS + 1)
+            for timeout in PERSISTENCE_ATTEMPT_TIMEOUTS
+            if _attempts_duration(timeout, attempts) <= budget
+        ),
+        default=None,
+    )
+    if plan is None:
+        # The budget slipped below the shortest attempt between the check and the read of remaining()
+        if not follow_up:
+            raise DeadlineExceeded(operation, budget, PERSISTENCE_ATTEMPT_TIMEOUTS[0])
+        plan = (1, PERSISTENCE_ATTEMPT_TIMEOUTS[0])
+    return plan
+
+
+def _persistence_resource(service: str, deadline: Deadline, operation: str, follow_up: bool = False):
+    """DynamoDB resource or S3 client configured by `_attempt_plan`, cached per plan."""
+    attempts, attempt_timeout = _attempt_plan(deadline, operation, follow_up)
+    key = (service, attempt_timeout, attempts)
+    resource = _persistence_resources.get(key)
+    if resource is None:
+        config = Config(
+            connect_timeout=attempt_timeout / 2,
+            read_timeout=attempt_timeout / 2,
+            retries={"total_max_attempts": attempts, "mode": "standard"},
+        )
+        if service == "dynamodb":
+            resource = boto3.resource("dynamodb", config=config)
+        else:
+            resource = boto3.client(service, config=config)
+        _persistence_resources[key] = resource
+    return resource
+
+
+def _table(table_name: str, deadline: Optional[Deadline], operation: str, follow_up: bool = False):
+    """
+    DynamoDB table on a client whose timeouts fit the remaining budget.
+
+    Raises:
+        DeadlineExceeded: If the budget cannot cover even the shortest attempt (never for follow-ups)
+    """
+    if deadline is None:
+        return dynamodb.Table(table_name)
+    return _persistence_resource("dynamodb", deadline, operation, follow_up).Table(table_name)
+
+
+def _s3(deadline: Optional[Deadline], operation: str):
+    """
+    S3 client whose timeouts fit the remaining budget.
+
+    Raises:
+        DeadlineExceeded: If the budget cannot cover even the shortest attempt
+    """
+    if deadline is None:
+        return s3_client
+    return _persistence_resource("s3", deadline, operation)
+
+
 def save_conversation(
     user_id: str,
     conversation_id: Optional[str],
     user_message: str,
     ai_response: str,
     chart_url: Optional[str],
+    deadline: Optional[Deadline] = None,
 ) -> str:
     """
     Save conversation message to DynamoDB using thread-based schema.
@@ -357,18 +533,30 @@ def save_conversation(
         - Creates new conversation with AI-generated title
         - Saves first message
 
+    The AI title call is bounded by the request deadline and falls back to a
+    truncated title when the budget is short. Each DynamoDB call checks the
+    deadline first and gets timeouts that fit what is left. The save is
+    cancelled if the budget runs out before the conversation or message is
+    written. After that, the list version bump and the metadata update always
+    run. The metadata update records `message_page` and clears `pages_only`,
+    and reads depend on it to find the message.
+
     Returns:
         conversation_id (existing or newly created)
+
+    Raises:
+        DeadlineExceeded: If the budget runs out before the message is saved
     """
     from common.conversation_utils import (
+        MESSAGE_STORAGE_FORMAT,
+        bump_conversations_version,
         generate_conversation_id,
         generate_conversation_title,
         build_conversation_metadata_item,
         build_message_item,
         update_conversation_metadata,
     )
-
-    table = dynamodb.Table(CONVERSATIONS_TABLE)
+    from common.message_store import append_turn, build_turn_record
 
     # Case 1: No conversation_id - create new conversation
     if not conversation_id:
@@ -378,7 +566,8 @@ def save_conversation(
 
         # Generate title using Bedrock
         try:
-            title = generate_conversation_title(user_message, bedrock_client)
+            title_deadline = deadline.reserve(PERSISTENCE_RESERVE_SECONDS) if deadline else None
+            title = generate_conversation_title(user_message, bedrock_client, deadline=title_deadline)
         except Exception as e:
             logger.warning(f"Failed to generate AI title: {e}")
             title = generate_conversation_title(user_message, None)
@@ -387,7 +576,10 @@ def save_conversation(
         metadata_item = build_conversation_metadata_item(user_id=user_id, conversation_id=conversation_id, title=title)
 
         try:
-            table.put_item(Item=metadata_item)
+            _table(CONVERSATIONS_TABLE, deadline, "conversation create").put_item(Item=metadata_item)
+            bump_conversations_version(
+                _table(CONVERSATIONS_TABLE, deadline, "conversation list version bump", follow_up=True), user_id
+            )
             logger.info(f"Created conversation: {conversation_id} with title: {title}")
         except ClientError as e:
             logger.error(f"Failed to create conversation metadata: {e}")
@@ -398,39 +590,58 @@ def save_conversation(
         logger.info(f"Adding message to existing conversation: {conversation_id}")
 
         try:
-            metadata_response = table.get_item(Key={"user_id": user_id, "sk": f"CONV#{conversation_id}"})
+            metadata_response = _table(CONVERSATIONS_TABLE, deadline, "conversation lookup").get_item(
+                Key={"user_id": user_id, "sk": f"CONV#{conversation_id}"}
+            )
 
             if "Item" not in metadata_response:
                 raise ValueError(f"Conversation not found: {conversation_id}")
 
-            if metadata_response["Item"].get("deleted", False):
+            metadata_item = metadata_response["Item"]
+            if metadata_item.get("deleted", False):
                 raise ValueError("Cannot add message to deleted conversation")
 
         except ClientError as e:
             logger.error(f"Failed to verify conversation: {e}")
             raise
 
-    # Build and save message item
-    message_item = build_message_item(
-        user_id=user_id,
-        conversation_id=conversation_id,
-        user_message=user_message,
-        ai_response=ai_response,
-        chart_url=chart_url,
-        ttl_days=30,
-    )
-
     try:
-        table.put_item(Item=message_item)
+        message_page = None
+        if MESSAGE_STORAGE_FORMAT == "page":
+            # Append the turn to the conversation's current page item
+            message_page = append_turn(
+                _table(CONVERSATIONS_TABLE, deadline, "message page write"),
+                user_id,
+                conversation_id,
+                build_turn_record(user_message, ai_response, chart_url),
+                current_page=metadata_item.get("message_page"),
+                ttl_days=30,
+                deadline=deadline,
+            )
+        else:
+            # Build and save message item
+            message_item = build_message_item(
+                user_id=user_id,
+                conversation_id=conversation_id,
+                user_message=user_message,
+                ai_response=ai_response,
+                chart_url=chart_url,
+                ttl_days=30,
+            )
+            # Message keys are unique; never let a write replace an existing message
+            _table(CONVERSATIONS_TABLE, deadline, "message write").put_item(
+                Item=message_item, ConditionExpression="attribute_not_exists(sk)"
+            )
         logger.info(f"Saved message to conversation: {conversation_id}")
 
         # Update conversation metadata
         update_conversation_metadata(
-            table=table,
+            table=_table(CONVERSATIONS_TABLE, deadline, "conversation metadata update", follow_up=True),
             user_id=user_id,
             conversation_id=conversation_id,
             increment_message_count=True,
             new_message_preview=user_message,
+            message_page=message_page,
         )
 
         return conversation_id
@@ -440,6 +651,11 @@ def save_conversation(
         raise
 
 
+def _attempts_duration(attempt_timeout: float, attempts: int) -> float:
+    """Worst case for a call: every attempt times out, plus standard-mode backoff of up to 1 s, 2 s, ..."""
+    return attempts * attempt_timeout + 2 ** (attempts - 1) - 1
+
+
 # Local testing
 if __name__ == "__main__":
     print("Chat Handler - Local Test Not Recommended")
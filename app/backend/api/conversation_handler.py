@@ -10,7 +10,6 @@ Provides endpoints for:
 """
 
 import os
-import json
 import logging
 from typing import Dict, Any
 from datetime import datetime
@@ -18,13 +17,21 @@ from datetime import datetime
 import boto3
 from botocore.exceptions import ClientError
 
-from common.api_wrapper import api_handler
+from common.api_wrapper import ApiResponse, api_handler, set_etag
 from common.conversation_utils import (
+    CONVERSATION_LIST_INDEX,
+    bump_conversations_version,
+    get_conversations_version,
     generate_conversation_id,
     build_conversation_metadata_item,
     format_conversation_for_response,
     format_message_for_response,
+    message_id_from_key,
 )
+from common.cursors import decode_cursor, encode_cursor
+from common.message_store import read_messages
+from common.purge import PURGE_PENDING, enqueue_purge
+from common.request import Request
 
 # Setup logging
 logger = logging.getLogger()
@@ -41,31 +48,8 @@ DEFAULT_MESSAGE_LIMIT = 50
 MAX_MESSAGE_LIMIT = 200
 
 
-def extract_user_id_from_event(event: Dict[str, Any]) -> str:
-    """Extract user_id from JWT claims."""
-    try:
-        # Check if event was wrapped by api_handler
-        if "raw_event" in event:
-            event = event["raw_event"]
-
-        authorizer = event["requestContext"]["authorizer"]
-
-        if "jwt" in authorizer:
-            claims = authorizer["jwt"]["claims"]
-        else:
-            claims = authorizer["claims"]
-
-        user_id = claims["sub"]
-        logger.info(f"Extracted user_id: {user_id}")
-        return user_id
-
-    except (KeyError, TypeError) as e:
-        logger.error(f"Failed to extract user_id: {e}")
-        raise ValueError("Unable to extract user identity from request")
-
-
 @api_handler
-def create_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def create_conversation(event: Request, context: Any) -> Dict[str, Any]:
     """
     Create a new conversation thread.
 
@@ -83,12 +67,10 @@ def create_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     """
     # Extract user ID from JWT
-    user_id = extract_user_id_from_event(event)
+    user_id = event.user_id
 
     # Parse request body
-    body = event.get("body_json", {})
-    if not body:
-        body = event.get("parsed_body", {})
+    body = event.body
 
     custom_title = body.get("title", "").strip()
 
@@ -106,6 +88,7 @@ def create_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
     try:
         table.put_item(Item=metadata_item)
+        bump_conversations_version(table, user_id)
         logger.info(f"Created conversation: {conversation_id} for user: {user_id}")
 
         # Return formatted response
@@ -123,15 +106,22 @@ def create_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
 
 @api_handler
-def list_conversations(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def list_conversations(event: Request, context: Any) -> Dict[str, Any]:
     """
     List all conversations for authenticated user.
 
     GET /conversations?limit=20
 
+    Reads CONVERSATION_LIST_INDEX, which holds only live metadata items
+    sorted by updated_at, so one bounded query returns the page and message
+    items are never read.
+
     Query parameters:
     - limit: Number of conversations to return (default 20, max 100)
-    - next_token: Pagination token from previous response
+    - next_token: Opaque cursor from the previous response
+
+    Conditional GET: the ETag comes from the user's conversation list
+    version, so a matching If-None-Match returns 304 without the query.
 
     Returns:
         {
@@ -145,73 +135,66 @@ def list_conversations(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     "last_message_preview": "..."
                 }
             ],
-            "next_token": "base64_token",
+            "next_token": "opaque_cursor",
             "has_more": false
         }
     """
     # Extract user ID from JWT
-    user_id = extract_user_id_from_event(event)
+    user_id = event.user_id
+    cursor_scope = f"conversations:{user_id}"
 
     # Parse query parameters
-    query_params = event.get("query_params", {})
+    query_params = event.query_params
     limit = int(query_params.get("limit", DEFAULT_CONVERSATION_LIMIT))
-    limit = min(limit, MAX_CONVERSATION_LIMIT)  # Cap at maximum
+    limit = max(1, min(limit, MAX_CONVERSATION_LIMIT))  # Cap at maximum
 
     next_token = query_params.get("next_token")
 
-    # Query DynamoDB for all conversation metadata items
+    # Query the sparse list index: only live metadata items, newest first
     table = dynamodb.Table(CONVERSATIONS_TABLE)
 
     try:
-        # Build query parameters
+        # The list version stands in for the index query when the client's copy is current
+        set_etag(event, user_id, get_conversations_version(table, user_id))
+
+        # One extra item tells whether another page exists
         query_kwargs = {
-            "KeyConditionExpression": "user_id = :uid AND begins_with(sk, :prefix)",
-            "ExpressionAttributeValues": {
-                ":uid": user_id,
-                ":prefix": "CONV#",
-                ":metadata": "METADATA",
-                ":deleted_false": False,
-            },
-            "FilterExpression": "item_type = :metadata AND (attribute_not_exists(deleted) OR deleted = :deleted_false)",
-            # Note: No Limit here, we need to fetch all conversations to sort by updated_at
-            "ScanIndexForward": True,  # Fetch all items (sk order doesn't matter, we'll sort in Python)
+            "IndexName": CONVERSATION_LIST_INDEX,
+            "KeyConditionExpression": "user_id = :uid",
+            "ExpressionAttributeValues": {":uid": user_id},
+            "ScanIndexForward": False,  # Most recently updated first
+            "Limit": limit + 1,
         }
 
-        # Add pagination token if provided
+        # Resume after the last conversation of the previous page
         if next_token:
-            try:
-                import base64
-
-                decoded_token = json.loads(base64.b64decode(next_token).decode("utf-8"))
-                query_kwargs["ExclusiveStartKey"] = decoded_token
-            except Exception as e:
-                logger.warning(f"Invalid next_token: {e}")
-                # Continue without pagination token
+            conversation_id, active_updated_at = decode_cursor(next_token, cursor_scope, fields=2)
+            query_kwargs["ExclusiveStartKey"] = {
+                "user_id": user_id,
+                "sk": f"CONV#{conversation_id}",
+                "active_updated_at": active_updated_at,
+            }
 
         # Execute query
         response = table.query(**query_kwargs)
+        items = response.get("Items", [])
+        has_more = len(items) > limit
+        items = items[:limit]
 
         # Format conversations for response
-        conversations = [format_conversation_for_response(item) for item in response.get("Items", [])]
-
-        # Sort by updated_at (most recent first)
-        conversations.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
-
-        # Apply limit after sorting
-        conversations = conversations[:limit]
+        conversations = [format_conversation_for_response(item) for item in items]
 
         # Build response
         result = {
             "conversations": conversations,
-            "has_more": "LastEvaluatedKey" in response,
+            "has_more": has_more,
         }
 
-        # Add next_token if more results available
-        if "LastEvaluatedKey" in response:
-            import base64
-
-            token = base64.b64encode(json.dumps(response["LastEvaluatedKey"]).encode("utf-8")).decode("utf-8")
-            result["next_token"] = token
+        # Cursor: index key of the last conversation returned
+        if has_more:
+            last = items[-1]
+            cursor_values = [last["sk"][len("CONV#") :], last["active_updated_at"]]
+            result["next_token"] = encode_cursor(cursor_values, cursor_scope)
 
         logger.info(f"Listed {len(conversations)} conversations for user: {user_id}")
         return result
@@ -222,24 +205,39 @@ def list_conversations(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
 
 @api_handler
-def get_conversation_messages(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def get_conversation_messages(event: Request, context: Any) -> Dict[str, Any]:
     """
-    Get all messages in a specific conversation.
+    Get messages in a specific conversation.
+
+    GET /conversations/{conversation_id}/messages?limit=50&order=desc
 
-    GET /conversations/{conversation_id}/messages?limit=50
+    Message IDs are time-ordered, so any window is a bounded query:
+    `order=desc&limit=N` returns the latest N messages, `before` pages back
+    from there and `after` fetches messages newer than the ones on screen.
+    Single message items and bucketed pages are read alike.
 
     Path parameters:
     - conversation_id: ID of the conversation
 
     Query parameters:
     - limit: Number of messages to return (default 50, max 200)
-    - next_token: Pagination token
+    - order: "asc" (oldest first, default) or "desc" (newest first)
+    - before: Cursor; only messages older than it
+    - after: Cursor; only messages newer than it
+    - next_token: Cursor continuing in `order` (same as `after` for asc, `before` for desc)
+      (crossed cursors, `after` at or past `before`, return an empty page)
+
+    Conditional GET: the ETag comes from the metadata item's updated_at and
+    message_count, so a matching If-None-Match returns 304 without reading
+    any messages.
 
     Returns:
         {
             "conversation_id": "uuid",
+            "order": "desc",
             "messages": [
                 {
+                    "message_id": "U01JD8X3Q4W5E6R7T8Y9Z0A1B2C",
                     "timestamp": 1732622400,
                     "created_at": "...",
                     "user_message": "...",
@@ -247,26 +245,38 @@ def get_conversation_messages(event: Dict[str, Any], context: Any) -> Dict[str,
                     "chart_url": "..."
                 }
             ],
+            "before": "cursor of the oldest message returned",
+            "after": "cursor of the newest message returned",
             "next_token": "...",
             "has_more": false
         }
     """
     # Extract user ID from JWT
-    user_id = extract_user_id_from_event(event)
+    user_id = event.user_id
 
     # Extract conversation_id from path
-    path_params = event.get("path_params", {})
+    path_params = event.path_params
     conversation_id = path_params.get("conversation_id")
 
     if not conversation_id:
         raise ValueError("conversation_id is required in path")
 
     # Parse query parameters
-    query_params = event.get("query_params", {})
+    query_params = event.query_params
     limit = int(query_params.get("limit", DEFAULT_MESSAGE_LIMIT))
-    limit = min(limit, MAX_MESSAGE_LIMIT)
+    limit = max(1, min(limit, MAX_MESSAGE_LIMIT))
 
-    next_token = query_params.get("next_token")
+    order = (query_params.get("order") or "asc").lower()
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be 'asc' or 'desc'")
+
+    # Cursors carry a message ID, signed for this user and conversation
+    cursor_scope = f"messages:{user_id}:{conversation_id}"
+    cursors = {name: query_params.get(name) for name in ("before", "after")}
+    continue_from = "after" if order == "asc" else "before"
+    if query_params.get("next_token") and not cursors[continue_from]:
+        cursors[continue_from] = query_params["next_token"]
+    bounds = {name: decode_cursor(cursor, cursor_scope)[0] for name, cursor in cursors.items() if cursor}
 
     # First, verify user owns this conversation
     table = dynamodb.Table(CONVERSATIONS_TABLE)
@@ -282,46 +292,40 @@ def get_conversation_messages(event: Dict[str, Any], context: Any) -> Dict[str,
         if metadata_response["Item"].get("deleted", False):
             raise ValueError(f"Conversation has been deleted: {conversation_id}")
 
-        # Query messages
-        query_kwargs = {
-            "KeyConditionExpression": "user_id = :uid AND begins_with(sk, :prefix)",
-            "ExpressionAttributeValues": {
-                ":uid": user_id,
-                ":prefix": f"CONV#{conversation_id}#MSG#",
-            },
-            "Limit": limit,
-            "ScanIndexForward": True,  # Chronological order (oldest first)
-        }
-
-        # Add pagination token
-        if next_token:
-            try:
-                import base64
-
-                decoded_token = json.loads(base64.b64decode(next_token).decode("utf-8"))
-                query_kwargs["ExclusiveStartKey"] = decoded_token
-            except Exception as e:
-                logger.warning(f"Invalid next_token: {e}")
-
-        # Execute query
-        response = table.query(**query_kwargs)
+        # Every new message bumps updated_at and message_count
+        metadata = metadata_response["Item"]
+        set_etag(event, user_id, metadata.get("updated_at"), metadata.get("message_count", 0))
+
+        # Messages strictly between the cursors
+        items, has_more = read_messages(
+            table,
+            user_id,
+            conversation_id,
+            metadata_response["Item"],
+            limit,
+            order,
+            after=bounds.get("after"),
+            before=bounds.get("before"),
+        )
 
         # Format messages
-        messages = [format_message_for_response(item) for item in response.get("Items", [])]
+        messages = [format_message_for_response(item) for item in items]
 
         # Build response
         result = {
             "conversation_id": conversation_id,
+            "order": order,
             "messages": messages,
-            "has_more": "LastEvaluatedKey" in response,
+            "has_more": has_more,
         }
 
-        # Add next_token
-        if "LastEvaluatedKey" in response:
-            import base64
-
-            token = base64.b64encode(json.dumps(response["LastEvaluatedKey"]).encode("utf-8")).decode("utf-8")
-            result["next_token"] = token
+        # Cursors for both ends of the page, plus one to continue in this order
+        if items:
+            newest, oldest = (items[-1], items[0]) if order == "asc" else (items[0], items[-1])
+            result["before"] = encode_cursor([message_id_from_key(oldest["sk"])], cursor_scope)
+            result["after"] = encode_cursor([message_id_from_key(newest["sk"])], cursor_scope)
+            if has_more:
+                result["next_token"] = result[continue_from]
 
         logger.info(f"Retrieved {len(messages)} messages for conversation: {conversation_id}")
         return result
@@ -329,7 +333,7 @@ def get_conversation_messages(event: Dict[str, Any], context: Any) -> Dict[str,
     except ValueError as e:
         # Return 404 for not found or deleted conversations
         logger.warning(f"Conversation access error: {e}")
-        return {"statusCode": 404, "body": json.dumps({"error": str(e)})}
+        return ApiResponse(404, {"error": str(e)})
 
     except ClientError as e:
         logger.error(f"Failed to get messages: {e}")
@@ -337,14 +341,14 @@ def get_conversation_messages(event: Dict[str, Any], context: Any) -> Dict[str,
 
 
 @api_handler
-def delete_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def delete_conversation(event: Request, context: Any) -> Dict[str, Any]:
     """
     Soft delete a conversation.
 
     DELETE /conversations/{conversation_id}
 
-    Marks conversation as deleted without actually removing data.
-    Deleted conversations are filtered out from list queries.
+    Marks conversation as deleted and drops it from the list index, then
+    starts a background purge that hard-deletes its messages and metadata.
 
     Returns:
         {
@@ -353,10 +357,10 @@ def delete_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     """
     # Extract user ID from JWT
-    user_id = extract_user_id_from_event(event)
+    user_id = event.user_id
 
     # Extract conversation_id from path
-    path_params = event.get("path_params", {})
+    path_params = event.path_params
     conversation_id = path_params.get("conversation_id")
 
     if not conversation_id:
@@ -370,15 +374,23 @@ def delete_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
         table.update_item(
             Key={"user_id": user_id, "sk": f"CONV#{conversation_id}"},
-            UpdateExpression="SET deleted = :true, deleted_at = :now, updated_at = :now",
+            # Removing the list index sort key drops the conversation from listings;
+            # purge_pending puts it on the purge index until the purge deletes it
+            UpdateExpression=(
+                "SET deleted = :true, deleted_at = :now, updated_at = :now, purge_pending = :pending "
+                "REMOVE active_updated_at"
+            ),
             ExpressionAttributeValues={
                 ":true": True,
                 ":now": now,
+                ":pending": PURGE_PENDING,
             },
             ConditionExpression="attribute_exists(user_id)",  # Ensure conversation exists
         )
 
+        bump_conversations_version(table, user_id)
         logger.info(f"Soft deleted conversation: {conversation_id}")
+        enqueue_purge({"task": "conversation", "user_id": user_id, "conversation_id": conversation_id})
 
         return {
             "message": "Conversation deleted successfully",
@@ -388,17 +400,14 @@ def delete_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     except ClientError as e:
         if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
             logger.warning(f"Conversation not found: {conversation_id}")
-            return {
-                "statusCode": 404,
-                "body": json.dumps({"error": f"Conversation not found: {conversation_id}"}),
-            }
+            return ApiResponse(404, {"error": f"Conversation not found: {conversation_id}"})
 
         logger.error(f"Failed to delete conversation: {e}")
         raise Exception(f"Database error: {str(e)}")
 
 
 @api_handler
-def update_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def update_conversation(event: Request, context: Any) -> Dict[str, Any]:
     """
     Update conversation metadata (currently only title).
 
@@ -415,19 +424,17 @@ def update_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     """
     # Extract user ID from JWT
-    user_id = extract_user_id_from_event(event)
+    user_id = event.user_id
 
     # Extract conversation_id from path
-    path_params = event.get("path_params", {})
+    path_params = event.path_params
     conversation_id = path_params.get("conversation_id")
 
     if not conversation_id:
         raise ValueError("conversation_id is required in path")
 
     # Parse request body
-    body = event.get("body_json", {})
-    if not body:
-        body = event.get("parsed_body", {})
+    body = event.body
 
     new_title = body.get("title", "").strip()
 
@@ -445,7 +452,7 @@ def update_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
         response = table.update_item(
             Key={"user_id": user_id, "sk": f"CONV#{conversation_id}"},
-            UpdateExpression="SET title = :title, updated_at = :now",
+            UpdateExpression="SET title = :title, updated_at = :now, active_updated_at = :now",
             ExpressionAttributeValues={
                 ":title": new_title,
                 ":now": now,
@@ -456,6 +463,7 @@ def update_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         )
 
         updated_item = response.get("Attributes", {})
+        bump_conversations_version(table, user_id)
 
         logger.info(f"Updated conversation title: {conversation_id}")
 
@@ -468,10 +476,7 @@ def update_conversation(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     except ClientError as e:
         if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
             logger.warning(f"Conversation not found or deleted: {conversation_id}")
-            return {
-                "statusCode": 404,
-                "body": json.dumps({"error": "Conversation not found or has been deleted"}),
-            }
+            return ApiResponse(404, {"error": "Conversation not found or has been deleted"})
 
         logger.error(f"Failed to update conversation: {e}")
         raise Exception(f"Database error: {str(e)}")
@@ -19,7 +19,7 @@ logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
-@api_handler
+@api_handler(compress=False)
 def lambda_handler(event, context):
     """
     Health check endpoint.
@@ -34,6 +34,8 @@ def lambda_handler(event, context):
     - Uptime monitoring
     - Load balancer health checks
 
+    Never compressed, so plain HTTP probes can read it.
+
     Args:
         event: Parsed API Gateway event (from wrapper)
         context: Lambda context
@@ -0,0 +1,184 @@
+"""
+Location autocomplete handler.
+
+Provides endpoints for:
+- GET /locations/suggest?q=&country=&limit= - Suggest birth cities as the user types
+"""
+
+import json
+import logging
+from typing import Any, Dict
+
+from common.api_wrapper import ApiResponse, api_handler
+from common.countries import resolve_country
+from common.gazetteer import get_gazetteer, normalize_place_name
+from common.request import Request
+
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Suggestion limits
+MIN_QUERY_LENGTH = 2
+DEFAULT_SUGGESTION_LIMIT = 10
+MAX_SUGGESTION_LIMIT = 20
+
+
+def format_suggestion(city: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a gazetteer city for the autocomplete response."""
+    label_parts = [city["name"], city["admin1_name"], city["country_code"]]
+    return {
+        "id": city["geoname_id"],
+        "name": city["name"],
+        "admin1": city["admin1_name"] or city["admin1"],
+        "country_code": city["country_code"],
+        "label": ", ".join(part for part in label_parts if part),
+        "lat": city["lat"],
+        "lng": city["lng"],
+        "tz": city["tz"],
+        "population": city["population"],
+    }
+
+
+@api_handler
+def suggest_locations(event: Request, context: Any) -> Dict[str, Any]:
+    """
+    Suggest cities matching a typed prefix.
+
+    GET /locations/suggest?q=spring&country=US&limit=10
+
+    Matches city names and alternate names (e.g., "Pek" -> Beijing), most
+    populous first. Served from the packed gazetteer mapped into the warm
+    container, so no upstream geocoding call is made.
+
+    Query params:
+        q: Typed prefix (at least MIN_QUERY_LENGTH letters or digits)
+        country: Optional country name or code to filter by
+        limit: Number of suggestions (default 10, max 20)
+
+    Returns:
+        {
+            "query": "spring",
+            "suggestions": [
+                {
+                    "id": 4409896,
+                    "name": "Springfield",
+                    "admin1": "Missouri",
+                    "country_code": "US",
+                    "label": "Springfield, Missouri, US",
+                    "lat": 37.2153,
+                    "lng": -93.2982,
+                    "tz": "America/Chicago",
+                    "population": 169176
+                }
+            ]
+        }
+
+    Raises:
+        ValueError: If the query is too short or the country is unknown
+    """
+    query_params = event.query_params
+    query = (query_params.get("q") or "").strip()
+    if len(normalize_place_name(query).replace(" ", "")) < MIN_QUERY_LENGTH:
+        raise ValueError(f"Query must contain at least {MIN_QUERY_LENGTH} letters")
+
+    limit = int(query_params.get("limit", DEFAULT_SUGGESTION_LIMIT))
+    limit = max(1, min(limit, MAX_SUGGESTION_LIMIT))
+
+    country_code = None
+    if query_params.get("country"):
+        country_code = resolve_country(query_params["country"])
+        if not country_code:
+            raise ValueError(f"Unknown country: {query_params['country']}")
+
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return ApiResponse(503, {"error": "Location suggestions are unavailable"})
+
+    suggestions = [format_suggestion(city) for city in gazetteer.suggest(query, country_code, limit)]
+    logger.info(f"Location suggestions for {query!r}: {len(suggestions)}")
+    return {"query": query, "suggestions": suggestions}
+
+
+# Local testing
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+
+    from common import gazetteer as gazetteer_module
+
+    print("Testing Location Suggest Lambda\n")
+    print("=" * 60)
+
+    class MockContext:
+        aws_request_id = "test-location-suggest"
+
+    def suggest(params):
+        event = {"rawPath": "/locations/suggest", "queryStringParameters": params, "body": None}
+        response = suggest_locations(event, MockContext())
+        return response["statusCode"], json.loads(response["body"])
+
+    # Build the sample gazetteer
+    workdir = tempfile.mkdtemp()
+    cities_path = os.path.join(workdir, "cities.txt")
+    admin1_path = os.path.join(workdir, "admin1.txt")
+    with open(cities_path, "w", encoding="utf-8") as sample:
+        for row in gazetteer_module._SAMPLE_CITIES:
+            geoname_id, name, ascii_name, alternates, lat, lng, country, admin1, population, tz = row
+            fields = [geoname_id, name, ascii_name, alternates, str(lat), str(lng), "P", "PPL", country, ""]
+            fields += [admin1, "", "", "", str(population), "", "", tz, "2024-01-01"]
+            sample.write("\t".join(fields) + "\n")
+    with open(admin1_path, "w", encoding="utf-8") as sample:
+        for code, name in gazetteer_module._SAMPLE_ADMIN1:
+            sample.write(f"{code}\t{name}\t{name}\t0\n")
+    gazetteer_module.GAZETTEER_PATH = os.path.join(workdir, "cities.bin")
+    gazetteer_module.build_gazetteer(cities_path, gazetteer_module.GAZETTEER_PATH, admin1_path)
+
+    # Test 1: Ranked suggestions
+    print("\n[Test 1] GET /locations/suggest?q=spring")
+    print("-" * 60)
+    status, body = suggest({"q": "spring"})
+    for suggestion in body["suggestions"]:
+        print(f"  {suggestion['id']:>8}  {suggestion['label']}")
+    assert status == 200
+    assert [s["label"] for s in body["suggestions"]] == [
+        "Springfield, US",
+        "Springfield, Massachusetts, US",
+        "Springfield, Illinois, US",
+    ]
+    assert body["suggestions"][0]["admin1"] == "MO"
+    print("Test 1 passed")
+
+    # Test 2: Country filter, aliases and limit
+    print("\n[Test 2] Country filter, aliases and limit")
+    print("-" * 60)
+    assert [s["country_code"] for s in suggest({"q": "lon"})[1]["suggestions"]] == ["GB", "CA"]
+    assert [s["country_code"] for s in suggest({"q": "lon", "country": "Canada"})[1]["suggestions"]] == ["CA"]
+    assert suggest({"q": "Peki"})[1]["suggestions"][0]["name"] == "Beijing"
+    assert len(suggest({"q": "spring", "limit": "1"})[1]["suggestions"]) == 1
+    assert suggest({"q": "xyz"})[1]["suggestions"] == []
+    print("Test 2 passed")
+
+    # Test 3: Validation
+    print("\n[Test 3] Invalid queries")
+    print("-" * 60)
+    for params in (None, {"q": "s"}, {"q": "!!"}, {"q": "lon", "country": "Atlantis"}):
+        status, body = suggest(params)
+        print(f"  {params} -> {status} {body['message']}")
+        assert status == 400
+    print("Test 3 passed")
+
+    # Test 4: Warm-container latency
+    print("\n[Test 4] Suggest latency")
+    print("-" * 60)
+    logger.setLevel(logging.WARNING)
+    runs = 5000
+    start = time.perf_counter()
+    for _ in range(runs):
+        suggest({"q": "spring", "country": "US"})
+    print(f"Handler round trip: {(time.perf_counter() - start) / runs * 1e6:.1f} µs")
+    print("Test 4 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
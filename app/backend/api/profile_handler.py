@@ -6,8 +6,7 @@ Handles POST /profile endpoint for creating/updating user profiles.
 import json
 import logging
 import os
-import time
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 
 import boto3
 from botocore.exceptions import ClientError
@@ -17,9 +16,10 @@ import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))  # noqa: E402
 
-from common.api_wrapper import api_handler  # noqa: E402
+from common.api_wrapper import ApiResponse, NotModified, api_handler, if_none_match, set_etag  # noqa: E402
+from common.profile_store import build_profile_item, save_profile  # noqa: E402
+from common.request import Request  # noqa: E402
 from common.validators import validate_user_profile  # noqa: E402
-from common.zodiac import calculate_zodiac_sign  # noqa: E402
 
 # Setup logging
 logger = logging.getLogger()
@@ -31,73 +31,8 @@ TABLE_NAME = os.environ.get("USER_PROFILES_TABLE", "mira-user-profiles-dev")
 table = dynamodb.Table(TABLE_NAME)
 
 
-def extract_user_id_from_event(event: Dict[str, Any]) -> str:
-    """
-    Extract user_id from JWT claims in API Gateway event.
-
-    Args:
-        event: API Gateway event with JWT authorizer
-
-    Returns:
-        User ID (Cognito sub)
-
-    Raises:
-        ValueError: If user_id cannot be extracted
-    """
-    try:
-        # Check if event is wrapped by api_handler
-        if "raw_event" in event:
-            event = event["raw_event"]
-
-        # HTTP API v2.0 with JWT authorizer
-        authorizer = event["requestContext"]["authorizer"]
-
-        # HTTP API JWT authorizer format (has extra "jwt" layer)
-        if "jwt" in authorizer:
-            claims = authorizer["jwt"]["claims"]
-        else:
-            # Lambda authorizer format
-            claims = authorizer["claims"]
-
-        user_id = claims["sub"]
-        logger.info(f"Extracted user_id: {user_id}")
-        return user_id
-
-    except (KeyError, TypeError) as e:
-        logger.error(f"Failed to extract user_id from event: {e}")
-        logger.error(f"Event structure: {json.dumps(event, default=str)}")
-        raise ValueError("Unable to extract user identity from request")
-
-
-def extract_email_from_event(event: Dict[str, Any]) -> str:
-    """
-    Extract email from JWT claims (optional).
-
-    Args:
-        event: API Gateway event with JWT authorizer
-
-    Returns:
-        Email address or empty string if not available
-    """
-    try:
-        # Check if event is wrapped by api_handler
-        if "raw_event" in event:
-            event = event["raw_event"]
-
-        authorizer = event["requestContext"]["authorizer"]
-
-        if "jwt" in authorizer:
-            claims = authorizer["jwt"]["claims"]
-        else:
-            claims = authorizer["claims"]
-
-        return claims.get("email", "")
-    except (KeyError, TypeError):
-        return ""
-
-
 @api_handler
-def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def lambda_handler(event: Request, context: Any) -> Dict[str, Any]:
     """
     Lambda handler for /profile endpoint.
     Supports both GET and POST methods.
@@ -106,9 +41,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     POST /profile - Create/update user profile
     """
     # Extract HTTP method
-    http_method = event.get("httpMethod", "")
-    if not http_method and "raw_event" in event:
-        http_method = event["raw_event"].get("requestContext", {}).get("http", {}).get("method", "")
+    http_method = event.method
 
     logger.info(f"Profile request - Method: {http_method}")
 
@@ -118,13 +51,10 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     elif http_method == "POST":
         return create_profile(event, context)
     else:
-        return {
-            "statusCode": 405,
-            "body": json.dumps({"error": "Method not allowed. Use GET or POST."}),
-        }
+        return ApiResponse(405, {"error": "Method not allowed. Use GET or POST."})
 
 
-def create_profile(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def create_profile(event: Request, context: Any) -> Dict[str, Any]:
     """
     Create or update user profile (POST logic).
     """
@@ -132,36 +62,26 @@ def create_profile(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
     # Extract user_id from JWT
     try:
-        user_id = extract_user_id_from_event(event)
-        email = extract_email_from_event(event)
+        user_id = event.user_id
+        email = event.email
     except ValueError as e:
-        return {
-            "statusCode": 401,
-            "body": json.dumps({"error": {"code": "UNAUTHORIZED", "message": str(e)}}),
-        }
+        return ApiResponse(401, {"error": {"code": "UNAUTHORIZED", "message": str(e)}})
 
     # Parse request body
     try:
-        # api_wrapper already parsed the body
-        if "parsed_body" in event:
-            body = event["parsed_body"]
-        else:
-            # Fallback for direct Lambda invocation
-            body = json.loads(event.get("body", "{}"))
+        body = event.body
 
         logger.info(f"Request body: {body}")
-    except json.JSONDecodeError:
-        return {
-            "statusCode": 400,
-            "body": json.dumps(
-                {
-                    "error": {
-                        "code": "INVALID_JSON",
-                        "message": "Request body must be valid JSON",
-                    }
+    except ValueError:
+        return ApiResponse(
+            400,
+            {
+                "error": {
+                    "code": "INVALID_JSON",
+                    "message": "Request body must be valid JSON",
                 }
-            ),
-        }
+            },
+        )
 
     # Validate input
     try:
@@ -182,52 +102,28 @@ def create_profile(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
         logger.warning(f"Validation failed: {error_message}")
 
-        return {
-            "statusCode": 400,
-            "body": json.dumps(
-                {
-                    "error": {
-                        "code": "VALIDATION_ERROR",
-                        "message": "Invalid input data",
-                        "details": {"field": field_part, "reason": reason},
-                    }
+        return ApiResponse(
+            400,
+            {
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": "Invalid input data",
+                    "details": {"field": field_part, "reason": reason},
                 }
-            ),
-        }
-
-    # Calculate zodiac sign
-    try:
-        zodiac_sign = calculate_zodiac_sign(validated_data["birth_date"])
-        logger.info(f"Calculated zodiac sign: {zodiac_sign}")
-    except Exception as e:
-        logger.error(f"Failed to calculate zodiac sign: {e}")
-        zodiac_sign = "Unknown"
-
-    # Prepare item for DynamoDB
-    current_timestamp = int(time.time())
-
-    profile_item = {
-        "user_id": user_id,
-        "first_name": validated_data["first_name"],
-        "last_name": validated_data["last_name"],
-        "birth_date": validated_data["birth_date"],
-        "birth_time": validated_data["birth_time"],
-        "birth_location": validated_data["birth_location"],
-        "birth_country": validated_data["birth_country"],
-        "zodiac_sign": zodiac_sign,
-        "created_at": current_timestamp,
-        "updated_at": current_timestamp,
-    }
+            },
+        )
 
-    # Add email if available
-    if email:
-        profile_item["email"] = email
+    # Build the item: offline location resolution and zodiac sign at the birth instant
+    profile_item = build_profile_item(user_id, validated_data, email)
+    logger.info(f"Calculated zodiac sign: {profile_item['zodiac_sign']}")
+    if "birth_tz" in profile_item:
+        logger.info(f"Birth location resolved: {profile_item['birth_geoname_id']} ({profile_item['birth_tz']})")
 
     # Save to DynamoDB
     try:
         logger.info(f"Saving profile to DynamoDB table: {TABLE_NAME}")
 
-        table.put_item(Item=profile_item)
+        save_profile(table, profile_item)
 
         logger.info(f"Profile saved successfully for user: {user_id}")
 
@@ -237,33 +133,29 @@ def create_profile(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
         logger.error(f"DynamoDB error: {error_code} - {error_message}")
 
-        return {
-            "statusCode": 500,
-            "body": json.dumps(
-                {
-                    "error": {
-                        "code": "DATABASE_ERROR",
-                        "message": "Failed to save profile",
-                        "details": {"reason": error_message},
-                    }
+        return ApiResponse(
+            500,
+            {
+                "error": {
+                    "code": "DATABASE_ERROR",
+                    "message": "Failed to save profile",
+                    "details": {"reason": error_message},
                 }
-            ),
-        }
+            },
+        )
 
     except Exception as e:
         logger.error(f"Unexpected error saving to DynamoDB: {e}", exc_info=True)
 
-        return {
-            "statusCode": 500,
-            "body": json.dumps(
-                {
-                    "error": {
-                        "code": "INTERNAL_ERROR",
-                        "message": "An unexpected error occurred",
-                    }
+        return ApiResponse(
+            500,
+            {
+                "error": {
+                    "code": "INTERNAL_ERROR",
+                    "message": "An unexpected error occurred",
                 }
-            ),
-        }
+            },
+        )
 
     # Success response
     # Remove sensitive/internal fields from response
@@ -282,13 +174,15 @@ def create_profile(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     if email:
         response_profile["email"] = email
 
-    return {
-        "statusCode": 200,
-        "body": json.dumps({"message": "Profile created successfully", "profile": response_profile}),
-    }
+    return {"message": "Profile created successfully", "profile": response_profile}
+
 
+def _etag_parts(profile: Dict[str, Any]) -> Tuple[Any, Any, Any]:
+    """Profile ETag inputs; the timestamps cover items written before versions (and bulk imports)."""
+    return profile.get("version", 0), profile.get("updated_at"), profile.get("created_at")
 
-def get_profile(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+
+def get_profile(event: Request, context: Any) -> Dict[str, Any]:
     """
     Get user profile (GET logic).
 
@@ -308,6 +202,13 @@ def get_profile(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             }
         }
 
+    Conditional GET: the ETag comes from the profile's version, which every
+    profile write increments (updated_at has one-second resolution, so it
+    cannot tell apart two writes in the same second). When the request
+    carries If-None-Match, a projected read of that marker comes
+    first and a current copy gets 304 without fetching the full item (which
+    holds the cached chart data).
+
     Error responses:
     - 401: Unauthorized
     - 404: Profile not found
@@ -317,35 +218,38 @@ def get_profile(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
     # Extract user_id from JWT
     try:
-        user_id = extract_user_id_from_event(event)
+        user_id = event.user_id
     except ValueError as e:
-        return {
-            "statusCode": 401,
-            "body": json.dumps({"error": {"code": "UNAUTHORIZED", "message": str(e)}}),
-        }
+        return ApiResponse(401, {"error": {"code": "UNAUTHORIZED", "message": str(e)}})
 
     # Query DynamoDB
     try:
+        if if_none_match(event):
+            marker = table.get_item(
+                Key={"user_id": user_id}, ProjectionExpression="version, updated_at, created_at"
+            ).get("Item")
+            if marker:
+                set_etag(event, user_id, *_etag_parts(marker))
+
         logger.info(f"Querying profile for user: {user_id}")
 
         response = table.get_item(Key={"user_id": user_id})
 
         if "Item" not in response:
             logger.warning(f"Profile not found for user: {user_id}")
-            return {
-                "statusCode": 404,
-                "body": json.dumps(
-                    {
-                        "error": {
-                            "code": "PROFILE_NOT_FOUND",
-                            "message": "User profile does not exist. Please create a profile first.",
-                        }
+            return ApiResponse(
+                404,
+                {
+                    "error": {
+                        "code": "PROFILE_NOT_FOUND",
+                        "message": "User profile does not exist. Please create a profile first.",
                     }
-                ),
-            }
+                },
+            )
 
         profile = response["Item"]
         logger.info(f"Profile retrieved for user: {user_id}")
+        set_etag(event, user_id, *_etag_parts(profile))
 
         # Format response (remove internal fields)
         response_profile = {
@@ -366,7 +270,10 @@ def get_profile(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if "timezone" in profile and profile["timezone"]:
             response_profile["timezone"] = profile["timezone"]
 
-        return {"statusCode": 200, "body": json.dumps({"profile": response_profile})}
+        return {"profile": response_profile}
+
+    except NotModified:
+        raise
 
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
@@ -374,33 +281,29 @@ def get_profile(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
         logger.error(f"DynamoDB error: {error_code} - {error_message}")
 
-        return {
-            "statusCode": 500,
-            "body": json.dumps(
-                {
-                    "error": {
-                        "code": "DATABASE_ERROR",
-                        "message": "Failed to retrieve profile",
-                        "details": {"reason": error_message},
-                    }
+        return ApiResponse(
+            500,
+            {
+                "error": {
+                    "code": "DATABASE_ERROR",
+                    "message": "Failed to retrieve profile",
+                    "details": {"reason": error_message},
                 }
-            ),
-        }
+            },
+        )
 
     except Exception as e:
         logger.error(f"Unexpected error retrieving profile: {e}", exc_info=True)
 
-        return {
-            "statusCode": 500,
-            "body": json.dumps(
-                {
-                    "error": {
-                        "code": "INTERNAL_ERROR",
-                        "message": "An unexpected error occurred",
-                    }
+        return ApiResponse(
+            500,
+            {
+                "error": {
+                    "code": "INTERNAL_ERROR",
+                    "message": "An unexpected error occurred",
                 }
-            ),
-        }
+            },
+        )
 
 
 # Local testing
@@ -0,0 +1,58 @@
+"""
+Background purge handler.
+
+Handles purge events (not HTTP routes):
+- {"source": "mira.purge", "task": "conversation", "user_id": ..., "conversation_id": ...}
+  - Hard-delete one soft-deleted conversation (sent by DELETE /conversations/{id})
+- {"source": "mira.purge", "task": "account", "user_id": ...}
+  - Delete a user's profile, conversations and charts (sent by DELETE /admin/users/{user_id})
+- {"source": "mira.purge", "task": "sweep"} - Purge soft-deleted conversations, resume account purges (daily)
+"""
+
+import logging
+from typing import Any, Dict
+
+from common.deadline import Deadline
+from common.purge import enqueue_purge, purge_account, purge_conversation, sweep_deleted_conversations
+
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Follow-up invocations one purge task may chain before leaving the rest to the sweep
+MAX_CONTINUATIONS = 20
+
+
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Run a purge task within this invocation's time budget.
+
+    A task that runs out of time stops at its checkpoint and re-invokes the
+    function asynchronously with the same event to continue. Tasks that
+    failed (e.g., persistent throttling) are left to the next sweep.
+
+    Returns:
+        Purge report, e.g. {"status": "done", "deleted": 1203, "failed": 0, "seconds": 2.4}
+    """
+    deadline = Deadline.from_context(context, gateway_timeout=float("inf"), margin=0)
+    task = event.get("task")
+
+    if task == "conversation":
+        report = purge_conversation(event["user_id"], event["conversation_id"], deadline)
+    elif task == "account":
+        report = purge_account(event["user_id"], deadline)
+    elif task == "sweep":
+        report = sweep_deleted_conversations(deadline)
+    else:
+        logger.error(f"Unknown purge task: {task}")
+        return {"status": "ignored", "task": task}
+
+    if report["status"] == "partial":
+        continuation = int(event.get("continuation", 0)) + 1
+        if continuation <= MAX_CONTINUATIONS:
+            fields = {key: value for key, value in event.items() if key != "source"}
+            enqueue_purge({**fields, "continuation": continuation})
+        else:
+            logger.warning(f"Purge task {task} still partial after {MAX_CONTINUATIONS} continuations")
+
+    return report
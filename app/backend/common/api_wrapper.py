@@ -3,109 +3,243 @@ API Gateway event handler wrapper.
 Simplifies Lambda function development by handling event parsing and response formatting.
 """
 
+import base64
+import gzip
+import hashlib
 import json
 import logging
+import os
 from functools import wraps
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+from common.request import Request
+from common.serialization import to_json
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Response bodies smaller than this (bytes) are sent uncompressed
+COMPRESSION_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Higher qualities cost far more CPU per request for little gain
+
+# Content codings in order of preference when the client weights them equally
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+# Part of every ETag; bump when a response format changes so cached copies are refetched
+ETAG_FORMAT_VERSION = "1"
+
+# Sent with ETag-tagged responses: browsers may cache them but must revalidate first
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
 
-def api_handler(func: Callable) -> Callable:
+class ApiResponse:
+    """
+    Response with its own status code or headers.
+
+    Handlers return a plain dict for a 200 JSON response and an ApiResponse
+    for anything else. Either way the wrapper encodes the body exactly once.
+    """
+
+    def __init__(
+        self,
+        status_code: int = 200,
+        body: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        stream: Optional[Iterable[str]] = None,
+    ):
+        """
+        Initialize response.
+
+        Args:
+            status_code: HTTP status code
+            body: Body object, JSON encoded by the wrapper
+            headers: Headers added to (or overriding) the standard ones
+            stream: Already-encoded body text chunks, used instead of body.
+                Lambda responses through API Gateway are buffered, so the
+                chunks are joined once, when the response is built.
+        """
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.stream = stream
+
+    @classmethod
+    def from_legacy(cls, result: Dict[str, Any]) -> "ApiResponse":
+        """Adopt a legacy {"statusCode", "body": "<json>"} dict; its body text is passed through, not re-encoded."""
+        return cls(result["statusCode"], headers=result.get("headers"), stream=[result["body"]])
+
+    def render(self) -> Dict[str, Any]:
+        """API Gateway response dictionary."""
+        text = "".join(self.stream) if self.stream is not None else None
+        response = _build_response(self.status_code, self.body, encoded_body=text)
+        response["headers"].update(self.headers)
+        return response
+
+
+def is_legacy_response(result: Any) -> bool:
+    """Whether a handler returned a pre-encoded {"statusCode": int, "body": str} dict."""
+    return (
+        isinstance(result, dict) and isinstance(result.get("statusCode"), int) and isinstance(result.get("body"), str)
+    )
+
+
+class NotModified(Exception):
+    """Raised (by set_etag) when the client's cached copy is current; answered with 304."""
+
+    def __init__(self, etag: str):
+        super().__init__(etag)
+        self.etag = etag
+
+
+def get_header(event: Request, name: str) -> Optional[str]:
+    """Request header value, case-insensitive (HTTP API v2 lowercases names, REST v1 does not)."""
+    return Request.of(event).header(name)
+
+
+def if_none_match(event: Request) -> Optional[str]:
+    """The request's If-None-Match header, if any."""
+    return get_header(event, "If-None-Match")
+
+
+def set_etag(event: Request, *version_parts: Any) -> str:
+    """
+    Tag the response with an ETag built from cheap version markers.
+
+    The tag also covers the path and query string, so every page or window
+    of a resource gets its own. Version parts must include the caller's
+    identity: a browser shared by two accounts sends one account's tag
+    with the other's request.
+
+    Args:
+        event: Request passed to the handler
+        *version_parts: Values that change whenever the response would (e.g. user_id, updated_at)
+
+    Returns:
+        The ETag (weak: encoded representations may differ)
+
+    Raises:
+        NotModified: If the request's If-None-Match already holds this tag
+    """
+    request = Request.of(event)
+    parts = [ETAG_FORMAT_VERSION, request.path, request.raw_query, *(str(part) for part in version_parts)]
+    etag = 'W/"' + hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:24] + '"'
+
+    request.etag = etag
+    header = request.header("If-None-Match")
+    if header and (header.strip() == "*" or _strip_weak(etag) in {_strip_weak(tag) for tag in header.split(",")}):
+        raise NotModified(etag)
+    return etag
+
+
+def _strip_weak(etag: str) -> str:
+    """Opaque tag for weak comparison (RFC 9110 8.8.3.2)."""
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def api_handler(func: Optional[Callable] = None, *, compress: bool = True) -> Callable:
     """
     Decorator for API Gateway Lambda handlers.
 
     Automatically handles:
-    - Parsing API Gateway event (body, headers, query params, path params)
+    - Wrapping the event in a Request: body, identity, headers, query and
+      path params are parsed on first use (HTTP API v2 and REST API v1)
     - Building standard API Gateway response
     - Error handling with proper status codes
     - CORS headers
     - Request/response logging
+    - Conditional GET: handlers call set_etag(event, ...) to tag the response;
+      a matching If-None-Match short-circuits to 304 with no body
+    - Response compression: gzip or brotli per Accept-Encoding for HTTP API
+      (v2) events, on bodies of at least COMPRESSION_MIN_BYTES
+    - Status codes and headers from an ApiResponse; legacy dicts with a
+      pre-encoded body keep their status and are not encoded twice
 
     Usage:
         @api_handler
-        def my_handler(event, context):
-            body = event['parsed_body']
-            return {'message': 'success', 'data': body}
+        def my_handler(event: Request, context):
+            return {'message': 'success', 'user_id': event.user_id, 'data': event.body}
+
+        @api_handler(compress=False)
+        def health(event, context):
+            ...
 
     Args:
         func: Lambda handler function that returns a dict
+        compress: Whether responses of this route may be compressed
 
     Returns:
         Wrapped function that returns API Gateway response format
     """
+    if func is None:
+        return lambda handler: api_handler(handler, compress=compress)
 
     @wraps(func)
     def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         request_id = context.aws_request_id if context else "local-test"
 
         try:
+            # Nothing is parsed until the handler asks for it
+            request = Request(event)
+
             # Log incoming request
             logger.info(f"Request ID: {request_id}")
-            logger.info(f"HTTP Method: {event.get('httpMethod', 'UNKNOWN')}")
-            logger.info(f"Path: {event.get('path', 'UNKNOWN')}")
-
-            # Parse event data
-            parsed_event = _parse_event(event)
+            logger.info(f"HTTP Method: {request.method or 'UNKNOWN'}")
+            logger.info(f"Path: {request.path or 'UNKNOWN'}")
 
             # Call actual handler
-            result = func(parsed_event, context)
-
-            # Build success response
-            response = _build_response(200, result)
+            result = func(request, context)
+
+            # Build response, encoding the body once
+            if is_legacy_response(result):
+                result = ApiResponse.from_legacy(result)
+            if isinstance(result, ApiResponse):
+                response = result.render()
+            else:
+                response = _build_response(200, result)
+            if request.etag and response["statusCode"] == 200:
+                response["headers"]["ETag"] = request.etag
+                response["headers"]["Cache-Control"] = CONDITIONAL_CACHE_CONTROL
 
             logger.info(f"Request {request_id} completed successfully")
-            return response
+
+        except NotModified as e:
+            logger.info(f"Request {request_id} not modified")
+            response = _build_response(304, None, encoded_body="")
+            response["headers"]["ETag"] = e.etag
+            response["headers"]["Cache-Control"] = CONDITIONAL_CACHE_CONTROL
 
         except ValueError as e:
             # Client error (bad request)
             logger.warning(f"Request {request_id} failed - Bad request: {str(e)}")
-            return _build_response(400, {"error": "Bad request", "message": str(e)})
+            response = _build_response(400, {"error": "Bad request", "message": str(e)})
 
         except Exception as e:
             # Server error
             logger.error(f"Request {request_id} failed - Internal error: {str(e)}", exc_info=True)
-            return _build_response(500, {"error": "Internal server error", "message": str(e)})
+            response = _build_response(500, {"error": "Internal server error", "message": str(e)})
 
-    return wrapper
+        if compress:
+            response = _compress_response(response, event)
+        return response
 
-
-def _parse_event(event: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Parse API Gateway event into a clean dictionary.
-
-    Args:
-        event: Raw API Gateway event
-
-    Returns:
-        Dict with parsed body, headers, query params, and path params
-    """
-    # Parse JSON body
-    body_str = event.get("body", "{}")
-    try:
-        parsed_body = json.loads(body_str) if body_str else {}
-    except json.JSONDecodeError:
-        raise ValueError(f"Invalid JSON in request body: {body_str}")
-
-    return {
-        "parsed_body": parsed_body,
-        "headers": event.get("headers", {}),
-        "query_params": event.get("queryStringParameters", {}),
-        "path_params": event.get("pathParameters", {}),
-        "http_method": event.get("httpMethod", ""),
-        "path": event.get("path", ""),
-        "raw_event": event,
-    }
+    return wrapper
 
 
-def _build_response(status_code: int, body: Any) -> Dict[str, Any]:
+def _build_response(status_code: int, body: Any, encoded_body: Optional[str] = None) -> Dict[str, Any]:
     """
     Build API Gateway response with standard format.
 
     Args:
         status_code: HTTP status code
-        body: Response body (will be JSON encoded)
+        body: Response body (JSON encoded by to_json; Decimal and datetime values are fine)
+        encoded_body: Body text that is already encoded; used as is instead of body
 
     Returns:
         API Gateway response dictionary
@@ -118,10 +252,74 @@ def _build_response(status_code: int, body: Any) -> Dict[str, Any]:
             "Access-Control-Allow-Headers": "Content-Type,Authorization",
             "Access-Control-Allow-Methods": "GET,POST,PUT,DELETE,OPTIONS",
         },
-        "body": json.dumps(body),
+        "body": encoded_body if encoded_body is not None else to_json(body),
     }
 
 
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header.
+
+    Honours q-values (q=0 refuses a coding) and "*"; on equal weights the
+    order of SUPPORTED_ENCODINGS decides.
+
+    Returns:
+        "br", "gzip", or None for an uncompressed response
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for entry in accept_encoding.split(","):
+        coding, _, params = entry.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def _compress_response(response: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compress the response body for the client's Accept-Encoding.
+
+    Only HTTP API (v2) events are handled: API Gateway decodes
+    isBase64Encoded bodies back to binary there, while a REST API would
+    need binary media types configured.
+    """
+    if event.get("version") != "2.0":
+        return response
+    response["headers"]["Vary"] = "Accept-Encoding"
+    data = response["body"].encode("utf-8")
+    if len(data) < COMPRESSION_MIN_BYTES:
+        return response
+    encoding = negotiate_encoding(get_header(event, "Accept-Encoding"))
+    if encoding is None:
+        return response
+
+    if encoding == "br":
+        compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if len(compressed) >= len(data):
+        return response
+
+    response["headers"]["Content-Encoding"] = encoding
+    response["body"] = base64.b64encode(compressed).decode("ascii")
+    response["isBase64Encoded"] = True
+    return response
+
+
 # Local testing
 if __name__ == "__main__":
     print("Testing API Gateway Event Handler Wrapper\n")
@@ -138,8 +336,7 @@ if __name__ == "__main__":
     @api_handler
     def test_success_handler(event, context):
         """Test handler that returns parsed body"""
-        body = event["parsed_body"]
-        return {"message": "Success", "received": body, "method": event["http_method"]}
+        return {"message": "Success", "received": event.body, "method": event.method}
 
     test_event_1 = {
         "httpMethod": "POST",
@@ -163,8 +360,7 @@ if __name__ == "__main__":
     @api_handler
     def test_query_handler(event, context):
         """Test handler that uses query params"""
-        query = event["query_params"]
-        return {"message": "Query params received", "params": query}
+        return {"message": "Query params received", "params": event.query_params}
 
     test_event_2 = {
         "httpMethod": "GET",
@@ -187,8 +383,8 @@ if __name__ == "__main__":
 
     @api_handler
     def test_invalid_json_handler(event, context):
-        """Test handler - should not be called"""
-        return {"message": "This should not execute"}
+        """Test handler - reading the body raises"""
+        return {"message": "This should not execute", "body": event.body}
 
     test_event_3 = {
         "httpMethod": "POST",
@@ -236,7 +432,7 @@ if __name__ == "__main__":
     @api_handler
     def test_path_handler(event, context):
         """Test handler that uses path params"""
-        path_params = event["path_params"]
+        path_params = event.path_params
         return {
             "message": "Path params received",
             "userId": path_params.get("userId"),
@@ -258,6 +454,179 @@ if __name__ == "__main__":
     assert result_5["statusCode"] == 200
     print("Test 5 passed")
 
+    # Test 6: Conditional GET with ETags
+    print("\n[Test 6] ETag and If-None-Match")
+    print("-" * 60)
+
+    reads = []
+
+    @api_handler
+    def test_etag_handler(event, context):
+        """Test handler: version marker first, full read only when the client's copy is stale"""
+        set_etag(event, "user-1", "2025-11-26T12:00:00Z", 5)
+        reads.append("full")
+        return {"message": "fresh"}
+
+    test_event_6 = {
+        "rawPath": "/conversations",
+        "rawQueryString": "limit=20",
+        "headers": {},
+        "requestContext": {"http": {"method": "GET"}},
+    }
+
+    first = test_etag_handler(test_event_6, MockContext())
+    etag = first["headers"]["ETag"]
+    print(f"First response: {first['statusCode']}, ETag {etag}")
+    assert first["statusCode"] == 200 and etag.startswith('W/"') and reads == ["full"]
+    assert first["headers"]["Cache-Control"] == CONDITIONAL_CACHE_CONTROL
+
+    revalidated = test_etag_handler({**test_event_6, "headers": {"if-none-match": etag}}, MockContext())
+    print(f"Revalidation: {revalidated['statusCode']}, body {revalidated['body']!r}")
+    assert revalidated["statusCode"] == 304 and revalidated["body"] == "" and reads == ["full"]
+    assert revalidated["headers"]["ETag"] == etag
+
+    strong = etag[2:]
+    listed = test_etag_handler({**test_event_6, "headers": {"If-None-Match": f'"other", {strong}'}}, MockContext())
+    assert listed["statusCode"] == 304
+    other_page = test_etag_handler(
+        {**test_event_6, "rawQueryString": "limit=50", "headers": {"if-none-match": etag}}, MockContext()
+    )
+    assert other_page["statusCode"] == 200 and other_page["headers"]["ETag"] != etag
+    assert "ETag" not in test_path_handler(test_event_5, MockContext())["headers"]
+    print("Test 6 passed")
+
+    # Test 7: Accept-Encoding negotiation and compressed HTTP API responses
+    print("\n[Test 7] Response compression")
+    print("-" * 60)
+    import random
+    import time
+
+    assert negotiate_encoding("gzip, deflate, br") == SUPPORTED_ENCODINGS[0]
+    assert negotiate_encoding("br;q=0.5, gzip") == "gzip"
+    assert negotiate_encoding("gzip;q=0, *;q=0.1") == ("br" if brotli else None)
+    assert negotiate_encoding("identity") is None and negotiate_encoding(None) is None
+
+    random.seed(7)
+    vocabulary = (
+        "your Sun in Leo Moon Scorpio rising Venus Mars Saturn transit house chart energy relationships career "
+        "this week brings focus on balance intuition growth communication emotional depth the and of to with "
+        "you may feel a strong pull toward new beginnings while old patterns ask for release"
+    ).split()
+
+    def sentences(words):
+        return " ".join(random.choice(vocabulary) for _ in range(words)).capitalize() + "."
+
+    page = {
+        "conversation_id": "6b1d2e3f-0000-4000-8000-000000000000",
+        "order": "desc",
+        "messages": [
+            {
+                "message_id": f"U01JD8X3Q4W5E6R7T8Y9Z0A{index:03d}",
+                "timestamp": 1732622400 + index,
+                "created_at": "2025-11-26T12:00:00.000000Z",
+                "user_message": sentences(random.randint(5, 40)),
+                "ai_response": sentences(random.choice([150, 300, 600])),
+            }
+            for index in range(200)
+        ],
+        "has_more": True,
+    }
+
+    @api_handler
+    def test_page_handler(event, context):
+        """Test handler returning a 200-message history page"""
+        return page
+
+    @api_handler(compress=False)
+    def test_uncompressed_handler(event, context):
+        """Test handler that opts out of compression"""
+        return page
+
+    test_event_7 = {"version": "2.0", "rawPath": "/conversations/c1/messages", "requestContext": {}}
+    plain = test_page_handler({**test_event_7, "headers": {}}, MockContext())
+    assert "isBase64Encoded" not in plain and plain["headers"]["Vary"] == "Accept-Encoding"
+    for accept in ("gzip", "br"):
+        if accept == "br" and not brotli:
+            continue
+        response = test_page_handler({**test_event_7, "headers": {"accept-encoding": accept}}, MockContext())
+        assert response["isBase64Encoded"] and response["headers"]["Content-Encoding"] == accept
+        raw = base64.b64decode(response["body"])
+        decoded = brotli.decompress(raw) if accept == "br" else gzip.decompress(raw)
+        assert json.loads(decoded) == page
+    opted_out = test_uncompressed_handler({**test_event_7, "headers": {"accept-encoding": "gzip"}}, MockContext())
+    assert "Content-Encoding" not in opted_out["headers"] and json.loads(opted_out["body"]) == page
+    small = test_path_handler({**test_event_5, "version": "2.0", "headers": {"accept-encoding": "gzip"}}, MockContext())
+    assert "Content-Encoding" not in small["headers"]
+    rest_v1 = test_page_handler({**test_event_2, "headers": {"Accept-Encoding": "gzip"}}, MockContext())
+    assert "Content-Encoding" not in rest_v1["headers"]
+    print("Test 7 passed")
+
+    # Test 8: Benchmark a 200-message page end to end
+    print("\n[Test 8] Benchmark: 200-message page")
+    print("-" * 60)
+    logger.setLevel(logging.WARNING)
+    link_mbps = 10  # Typical mobile downlink
+    print(f"{'encoding':<10}{'bytes':>10}{'server ms':>11}{'transfer ms':>13}{'client ms':>11}{'total ms':>10}")
+    totals = {}
+    decoders = {"identity": bytes, "gzip": gzip.decompress, "br": brotli.decompress if brotli else None}
+    for accept in ("identity", "gzip", "br"):
+        if accept == "br" and not brotli:
+            continue
+        event_7 = {**test_event_7, "headers": {"accept-encoding": accept}}
+        runs = 20
+        start = time.perf_counter()
+        for _ in range(runs):
+            response = test_page_handler(event_7, MockContext())
+        server_ms = (time.perf_counter() - start) / runs * 1000
+        wire = base64.b64decode(response["body"]) if response.get("isBase64Encoded") else response["body"].encode()
+        start = time.perf_counter()
+        for _ in range(runs):
+            json.loads(decoders[accept](wire))
+        client_ms = (time.perf_counter() - start) / runs * 1000
+        transfer_ms = len(wire) * 8 / (link_mbps * 1e6) * 1000
+        total_ms = totals[accept] = server_ms + transfer_ms + client_ms
+        print(f"{accept:<10}{len(wire):>10}{server_ms:>11.1f}{transfer_ms:>13.1f}{client_ms:>11.1f}{total_ms:>10.1f}")
+    logger.setLevel(logging.INFO)
+    print(f"(transfer at {link_mbps} Mbit/s)")
+    assert totals["gzip"] < totals["identity"]
+    print("Test 8 passed")
+
+    # Test 9: Typed responses, legacy dicts and single encoding
+    print("\n[Test 9] ApiResponse and legacy shim")
+    print("-" * 60)
+    encoded = []
+    serialize = to_json
+
+    def to_json(value):
+        encoded.append(value)
+        return serialize(value)
+
+    @api_handler
+    def test_typed_handler(event, context):
+        """Test handler returning a status and header of its own"""
+        return ApiResponse(404, {"error": {"code": "PROFILE_NOT_FOUND"}}, headers={"X-Reason": "missing"})
+
+    @api_handler
+    def test_legacy_handler(event, context):
+        """Test handler in the old shape: status plus pre-encoded body"""
+        return {"statusCode": 201, "body": serialize({"message": "Created"})}
+
+    @api_handler
+    def test_stream_handler(event, context):
+        """Test handler passing pre-encoded chunks"""
+        return ApiResponse(200, stream=['{"messages":[', '"a","b"', "]}"])
+
+    typed = test_typed_handler(test_event_5, MockContext())
+    assert typed["statusCode"] == 404 and typed["headers"]["X-Reason"] == "missing"
+    assert json.loads(typed["body"]) == {"error": {"code": "PROFILE_NOT_FOUND"}} and len(encoded) == 1
+    legacy = test_legacy_handler(test_event_5, MockContext())
+    print(f"Legacy: {legacy['statusCode']} {legacy['body']}")
+    assert legacy["statusCode"] == 201 and json.loads(legacy["body"]) == {"message": "Created"} and len(encoded) == 1
+    streamed = test_stream_handler(test_event_5, MockContext())
+    assert json.loads(streamed["body"]) == {"messages": ["a", "b"]} and len(encoded) == 1
+    to_json = serialize
+    print("Test 9 passed")
+
     print("\n" + "=" * 60)
     print("All tests passed!")
     print("\nWrapper is ready to use in your Lambda handlers.")
@@ -0,0 +1,284 @@
+"""
+Vectorized aspect engine.
+Finds aspects between chart points with NumPy, for one chart or a batch of thousands.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Aspect table: name -> (exact angle, default orb, major aspect)
+# Orbs follow the Astrologer (Kerykeion) defaults
+ASPECTS = {
+    "conjunction": (0, 10.0, True),
+    "semi-sextile": (30, 1.0, False),
+    "semi-square": (45, 1.0, False),
+    "sextile": (60, 6.0, True),
+    "quintile": (72, 1.0, False),
+    "square": (90, 5.0, True),
+    "trine": (120, 8.0, True),
+    "sesquiquadrate": (135, 1.0, False),
+    "biquintile": (144, 1.0, False),
+    "quincunx": (150, 1.0, False),
+    "opposition": (180, 10.0, True),
+}
+MAJOR_ASPECTS = [name for name, (_, _, major) in ASPECTS.items() if major]
+
+# Chart points considered for aspects, as keys of the Astrologer `data` dict
+DEFAULT_ASPECT_POINTS = [
+    "sun",
+    "moon",
+    "mercury",
+    "venus",
+    "mars",
+    "jupiter",
+    "saturn",
+    "uranus",
+    "neptune",
+    "pluto",
+    "mean_node",
+    "chiron",
+    "ascendant",
+    "medium_coeli",
+]
+
+# Charts processed per NumPy pass in batch mode (bounds peak memory)
+BATCH_CHUNK_SIZE = 4096
+
+
+def orb_table(orbs: Optional[Dict[str, float]] = None, include_minor: bool = False):
+    """
+    Build the angle/orb arrays used for matching.
+
+    Args:
+        orbs: Orb overrides by aspect name; an aspect listed here is always
+            included, even if it is minor (orb 0 disables an aspect)
+        include_minor: Whether to include minor aspects with their default orbs
+
+    Returns:
+        (names, angles, orbs) with one entry per active aspect
+
+    Raises:
+        ValueError: If an override names an unknown aspect
+    """
+    orbs = orbs or {}
+    unknown = set(orbs) - set(ASPECTS)
+    if unknown:
+        raise ValueError(f"Unknown aspects in orb table: {sorted(unknown)}")
+
+    names, angles, orb_values = [], [], []
+    for name, (angle, default_orb, major) in ASPECTS.items():
+        orb = orbs.get(name, default_orb if (major or include_minor) else 0)
+        if orb > 0:
+            names.append(name)
+            angles.append(angle)
+            orb_values.append(orb)
+    return names, np.array(angles, dtype=float), np.array(orb_values, dtype=float)
+
+
+def find_aspects_batch(
+    longitudes: np.ndarray,
+    orbs: Optional[Dict[str, float]] = None,
+    include_minor: bool = False,
+    chunk_size: int = BATCH_CHUNK_SIZE,
+) -> Dict[str, np.ndarray]:
+    """
+    Find aspects for a batch of charts in one vectorized pass per chunk.
+
+    Every pair of points in every chart is compared with every active aspect
+    at once. Results are sorted by chart, then by exactness (smallest orb first).
+
+    Args:
+        longitudes: Ecliptic longitudes in degrees, shape (charts, points);
+            NaN marks a point missing from a chart
+        orbs: Orb overrides by aspect name (see `orb_table`)
+        include_minor: Whether to include minor aspects
+        chunk_size: Charts per NumPy pass
+
+    Returns:
+        Dict of equal-length arrays: `chart`, `p1`, `p2` (point indices),
+        `aspect` (index into `names`), `orbit`, `diff`, plus `names`
+    """
+    longitudes = np.atleast_2d(np.asarray(longitudes, dtype=float))
+    names, angles, orb_values = orb_table(orbs, include_minor)
+    p1_index, p2_index = np.triu_indices(longitudes.shape[1], 1)
+
+    results = {key: [] for key in ("chart", "p1", "p2", "aspect", "orbit", "diff")}
+    for start in range(0, len(longitudes), chunk_size):
+        chunk = longitudes[start : start + chunk_size]
+        diff = np.abs(chunk[:, p1_index] - chunk[:, p2_index])
+        separation = np.minimum(diff, 360 - diff)
+        deviation = np.abs(separation[..., None] - angles)
+        chart, pair, aspect = np.nonzero(deviation <= orb_values)
+
+        results["chart"].append(chart + start)
+        results["p1"].append(p1_index[pair])
+        results["p2"].append(p2_index[pair])
+        results["aspect"].append(aspect)
+        results["orbit"].append(deviation[chart, pair, aspect])
+        results["diff"].append(diff[chart, pair])
+
+    merged = {key: np.concatenate(values) if values else np.empty(0) for key, values in results.items()}
+    order = np.lexsort((merged["orbit"], merged["chart"]))
+    merged = {key: values[order] for key, values in merged.items()}
+    merged["names"] = names
+    merged["angles"] = angles
+    return merged
+
+
+def find_aspects(
+    longitudes: Sequence[float],
+    point_names: Sequence[str],
+    orbs: Optional[Dict[str, float]] = None,
+    include_minor: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Find the aspects of a single chart, most exact first.
+
+    Args:
+        longitudes: Ecliptic longitude of each point in degrees
+        point_names: Display name of each point (e.g., "Sun")
+        orbs: Orb overrides by aspect name (see `orb_table`)
+        include_minor: Whether to include minor aspects
+
+    Returns:
+        Aspects in Astrologer format (p1_name, p2_name, aspect, orbit, ...)
+
+    Example:
+        >>> find_aspects([295.4, 171.4], ["Sun", "Moon"])[0]["aspect"]
+        'trine'
+    """
+    batch = find_aspects_batch(np.asarray(longitudes, dtype=float)[None, :], orbs, include_minor)
+    return [
+        {
+            "p1_name": point_names[p1],
+            "p1_abs_pos": float(longitudes[p1]),
+            "p2_name": point_names[p2],
+            "p2_abs_pos": float(longitudes[p2]),
+            "aspect": batch["names"][aspect],
+            "orbit": float(orbit),
+            "aspect_degrees": int(batch["angles"][aspect]),
+            "diff": float(diff),
+            "p1": int(p1),
+            "p2": int(p2),
+        }
+        for p1, p2, aspect, orbit, diff in zip(
+            batch["p1"].tolist(),
+            batch["p2"].tolist(),
+            batch["aspect"].tolist(),
+            batch["orbit"],
+            batch["diff"],
+        )
+    ]
+
+
+def chart_aspects(
+    chart_data: Dict[str, Any],
+    points: Sequence[str] = DEFAULT_ASPECT_POINTS,
+    orbs: Optional[Dict[str, float]] = None,
+    include_minor: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Compute aspects from the points of an Astrologer-shaped chart.
+
+    Args:
+        chart_data: Chart with a `data` dict of points carrying `abs_pos`
+        points: Keys of the points to consider; missing points are skipped
+        orbs: Orb overrides by aspect name (see `orb_table`)
+        include_minor: Whether to include minor aspects
+
+    Returns:
+        Aspects in Astrologer format, most exact first
+    """
+    data = chart_data.get("data", {})
+    present = [data[key] for key in points if isinstance(data.get(key), dict) and "abs_pos" in data[key]]
+    return find_aspects(
+        [float(point["abs_pos"]) for point in present],
+        [point.get("name", "") for point in present],
+        orbs,
+        include_minor,
+    )
+
+
+# Local testing
+if __name__ == "__main__":
+    import time
+
+    print("Testing Aspect Engine\n")
+    print("=" * 60)
+
+    # Reference chart: 1990-01-15 14:30 New York (values from the Astrologer chart)
+    names = ["Sun", "Moon", "Mercury", "Venus", "Mars", "Jupiter", "Saturn", "Uranus", "Neptune", "Pluto"]
+    chart = [295.40, 171.39, 281.13, 300.50, 260.13, 93.33, 287.35, 276.63, 282.58, 227.43]
+
+    # Test 1: Single chart, sorted by exactness
+    print("\n[Test 1] Single chart aspects")
+    print("-" * 60)
+    aspects = find_aspects(chart, names)
+    for aspect in aspects[:5]:
+        print(f"  {aspect['p1_name']} {aspect['aspect']} {aspect['p2_name']} (orb: {aspect['orbit']:.2f}°)")
+    orbits = [aspect["orbit"] for aspect in aspects]
+    assert orbits == sorted(orbits)
+    assert any(a["p1_name"] == "Sun" and a["p2_name"] == "Moon" and a["aspect"] == "trine" for a in aspects)
+    assert all(a["aspect"] in MAJOR_ASPECTS for a in aspects)
+    print(f"{len(aspects)} major aspects")
+    print("Test 1 passed")
+
+    # Test 2: Separation wraps around 0°
+    print("\n[Test 2] Wrap-around at 0° Aries")
+    print("-" * 60)
+    aspects = find_aspects([358.0, 2.0], ["A", "B"])
+    assert aspects[0]["aspect"] == "conjunction" and abs(aspects[0]["orbit"] - 4.0) < 1e-9
+    print("Test 2 passed")
+
+    # Test 3: Configurable orbs and minor aspects
+    print("\n[Test 3] Orb table")
+    print("-" * 60)
+    assert find_aspects([0.0, 7.0], ["A", "B"], orbs={"conjunction": 6}) == []
+    assert find_aspects([0.0, 150.5], ["A", "B"])[0:1] == []
+    assert find_aspects([0.0, 150.5], ["A", "B"], include_minor=True)[0]["aspect"] == "quincunx"
+    try:
+        orb_table({"unknown": 1})
+        raise AssertionError("Should have raised ValueError")
+    except ValueError as e:
+        print(f"Correctly raised: {e}")
+    print("Test 3 passed")
+
+    # Test 4: Batch results match single-chart results
+    print("\n[Test 4] Batch API")
+    print("-" * 60)
+    rng = np.random.default_rng(42)
+    batch_longitudes = rng.uniform(0, 360, size=(100, 12))
+    batch = find_aspects_batch(batch_longitudes, include_minor=True, chunk_size=32)
+    for index in (0, 57, 99):
+        single = find_aspects(batch_longitudes[index], [str(k) for k in range(12)], include_minor=True)
+        mask = batch["chart"] == index
+        assert len(single) == mask.sum()
+        assert np.allclose([a["orbit"] for a in single], batch["orbit"][mask])
+    print(f"{len(batch['chart'])} aspects across 100 charts")
+    print("Test 4 passed")
+
+    # Test 5: Throughput
+    print("\n[Test 5] Benchmarks (12 points, major + minor aspects)")
+    print("-" * 60)
+    runs = 2000
+    single_chart = batch_longitudes[0]
+    labels = [str(k) for k in range(12)]
+    start = time.perf_counter()
+    for _ in range(runs):
+        find_aspects(single_chart, labels, include_minor=True)
+    elapsed = (time.perf_counter() - start) / runs
+    print(f"Single chart: {elapsed * 1e6:.1f} µs per chart")
+
+    many = rng.uniform(0, 360, size=(10_000, 12))
+    start = time.perf_counter()
+    batch = find_aspects_batch(many, include_minor=True)
+    elapsed = time.perf_counter() - start
+    print(
+        f"10k charts: {elapsed * 1000:.1f} ms total, {elapsed / len(many) * 1e6:.2f} µs per chart, "
+        f"{len(batch['chart'])} aspects"
+    )
+    print("Test 5 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
@@ -7,13 +7,19 @@ import json
 import logging
 import os
 import time
-from typing import Any, Dict
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
 
-import boto3
-import pycountry
 import requests
 from botocore.exceptions import ClientError
 
+from common.chart_providers import ChartProvider, ChartProviderError
+from common.countries import resolve_country
+from common.deadline import Deadline, DeadlineExceeded
+from common.rate_limit import RateLimitExceeded, astrologer_rate_limiter
+from common.retry_policy import RetryExhausted, RetryPolicy
+from common.secrets import get_astrology_api_key
+
 # Setup logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -23,11 +29,17 @@ RAPIDAPI_HOST = "astrologer.p.rapidapi.com"
 RAPIDAPI_BASE_URL = f"https://{RAPIDAPI_HOST}"
 BIRTH_CHART_ENDPOINT = "/api/v4/birth-chart"
 REQUEST_TIMEOUT = 4  # seconds
+MIN_REQUEST_TIMEOUT = 1  # seconds; attempts with less budget than this are not started
 MAX_RETRIES = 3
-RETRY_BACKOFF = [1, 2, 4]  # Exponential backoff in seconds
+RETRY_BASE_DELAY = 0.5  # Full-jitter backoff window starts at 0-0.5s
+RETRY_MAX_DELAY = 2  # and is capped at 0-2s
+# Longest a request queues for Astrologer quota before it is shed to the next chart provider
+ASTROLOGER_MAX_QUEUE_SECONDS = float(os.environ.get("ASTROLOGER_MAX_QUEUE_SECONDS", "2"))
+# Block applied on a 429 without a usable Retry-After header
+DEFAULT_RETRY_AFTER = 1.0  # seconds
 
 
-class AstrologyAPIError(Exception):
+class AstrologyAPIError(ChartProviderError):
     """Custom exception for Astrology API errors."""
 
     def __init__(
@@ -36,11 +48,13 @@ class AstrologyAPIError(Exception):
         status_code: int = None,
         retry_count: int = 0,
         original_error: str = None,
+        client_error: bool = False,
     ):
         self.message = message
         self.status_code = status_code
         self.retry_count = retry_count
         self.original_error = original_error
+        self.client_error = client_error
         super().__init__(self.message)
 
     def __str__(self):
@@ -54,18 +68,54 @@ class AstrologyAPIError(Exception):
         return " | ".join(error_parts)
 
 
-class AstrologyClient:
+class AstrologyRateLimited(AstrologyAPIError):
+    """Shed before calling the API: the shared request quota is exhausted for longer than the caller can wait."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            message="Astrologer request quota exhausted",
+            status_code=429,
+            original_error=f"Retry after {retry_after:.2f}s",
+            # Our own limit, not an upstream failure: keep the circuit breaker closed
+            client_error=True,
+        )
+        self.retry_after = retry_after
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Retry transport failures, throttling and upstream 5xx; never client errors or shed requests."""
+    if isinstance(error, AstrologyRateLimited):
+        return False
+    if isinstance(error, AstrologyAPIError):
+        return error.status_code == 429 or (error.status_code or 0) >= 500
+    return isinstance(error, requests.exceptions.RequestException)
+
+
+# Shared by every AstrologyClient in the container, so the latency window used
+# for hedging and the retry budget survive across warm invocations
+ASTROLOGER_RETRY_POLICY = RetryPolicy(
+    name="astrologer",
+    max_attempts=MAX_RETRIES,
+    base_delay=RETRY_BASE_DELAY,
+    max_delay=RETRY_MAX_DELAY,
+    retryable=_is_retryable,
+)
+
+
+class AstrologyClient(ChartProvider):
     """
     Client for interacting with Astrologer API.
     Handles birth chart generation with retry logic and timeout enforcement.
     """
 
+    name = "astrologer"
+
     def __init__(self):
         """
         Initialize Astrology API client.
-        Retrieves API key from Secrets Manager and Geonames username from environment.
+        Reads the Geonames username from environment; the API key comes from
+        the shared secret cache on each request, so rotations are picked up.
         """
-        self.api_key = self._get_api_key()
         self.geonames_username = os.environ.get("GEONAMES_USERNAME", "")
 
         if not self.geonames_username:
@@ -73,9 +123,17 @@ class AstrologyClient:
 
         logger.info("AstrologyClient initialized")
 
-    def _get_api_key(self) -> str:
+    @property
+    def api_key(self) -> str:
+        """Current Astrologer API key (a cache lookup once prefetched)."""
+        return self._get_api_key()
+
+    def _get_api_key(self, force_refresh: bool = False) -> str:
         """
-        Retrieve Astrologer API key from AWS Secrets Manager.
+        Retrieve Astrologer API key from the shared secret cache.
+
+        Args:
+            force_refresh: Refetch from Secrets Manager, e.g. after a 401
 
         Returns:
             API key string
@@ -83,21 +141,8 @@ class AstrologyClient:
         Raises:
             AstrologyAPIError: If secret cannot be retrieved
         """
-        secret_name = os.environ.get("ASTROLOGY_SECRET_NAME", "/mira/astrology/api_key")
-
         try:
-            client = boto3.client("secretsmanager")
-            response = client.get_secret_value(SecretId=secret_name)
-
-            secret_data = json.loads(response["SecretString"])
-            api_key = secret_data.get("api_key")
-
-            if not api_key:
-                raise ValueError("API key not found in secret")
-
-            logger.info(f"Successfully retrieved API key from {secret_name}")
-            return api_key
-
+            return get_astrology_api_key(force_refresh=force_refresh)
         except ClientError as e:
             error_code = e.response["Error"]["Code"]
             logger.error(f"Failed to retrieve secret: {error_code}")
@@ -108,11 +153,11 @@ class AstrologyClient:
         except Exception as e:
             logger.error(f"Unexpected error retrieving API key: {e}")
             raise AstrologyAPIError(
-                message="Failed to initialize Astrology API client",
+                message="Failed to retrieve Astrology API key",
                 original_error=str(e),
             )
 
-    def get_birth_chart(self, user_profile: Dict[str, Any]) -> Dict[str, Any]:
+    def get_birth_chart(self, user_profile: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Generate birth chart for a user.
 
@@ -122,6 +167,7 @@ class AstrologyClient:
                 - birth_time: "14:30"
                 - birth_location: "New York, NY"
                 - birth_country: "United States"
+            deadline: Optional request deadline; per-attempt timeouts shrink to fit it
 
         Returns:
             Dict containing:
@@ -131,6 +177,7 @@ class AstrologyClient:
 
         Raises:
             AstrologyAPIError: If API call fails after retries
+            DeadlineExceeded: If the deadline leaves no time for an attempt
         """
         logger.info(f"Generating birth chart for user profile: {user_profile.get('birth_location')}")
 
@@ -140,50 +187,71 @@ class AstrologyClient:
             logger.info(f"Request payload built: {json.dumps(payload, default=str)}")
         except Exception as e:
             logger.error(f"Failed to build request payload: {e}")
-            raise AstrologyAPIError(message="Invalid user profile data", original_error=str(e))
+            raise AstrologyAPIError(message="Invalid user profile data", original_error=str(e), client_error=True)
 
-        # Make API call with retry logic
-        for attempt in range(MAX_RETRIES):
-            try:
-                logger.info(f"Attempt {attempt + 1}/{MAX_RETRIES} to call Astrologer API")
-
-                response = self._make_api_request(payload, timeout=REQUEST_TIMEOUT)
-
-                logger.info("Birth chart generated successfully")
-                return self._parse_response(response)
-
-            except requests.exceptions.Timeout:
-                logger.warning(f"Request timeout on attempt {attempt + 1}")
-                if attempt < MAX_RETRIES - 1:
-                    time.sleep(RETRY_BACKOFF[attempt])
-                else:
-                    raise AstrologyAPIError(
-                        message="Request timeout after retries",
-                        retry_count=MAX_RETRIES,
-                        original_error="Timeout exceeded",
-                    )
-
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Request failed on attempt {attempt + 1}: {e}")
-                if attempt < MAX_RETRIES - 1:
-                    time.sleep(RETRY_BACKOFF[attempt])
-                else:
-                    raise AstrologyAPIError(
-                        message="API request failed after retries",
-                        retry_count=MAX_RETRIES,
-                        original_error=str(e),
-                    )
-
-            except AstrologyAPIError:
-                # Already an AstrologyAPIError, re-raise
-                raise
-
-            except Exception as e:
-                logger.error(f"Unexpected error during API call: {e}", exc_info=True)
+        # Make API call under the shared retry policy (hedging, jittered backoff, retry budget)
+        try:
+            response = ASTROLOGER_RETRY_POLICY.call(
+                lambda: self._make_api_request(payload, deadline),
+                deadline=deadline,
+                min_attempt_seconds=MIN_REQUEST_TIMEOUT,
+            )
+
+            logger.info("Birth chart generated successfully")
+            return self._parse_response(response)
+
+        except RetryExhausted as e:
+            last_error = e.last_error
+            if isinstance(last_error, requests.exceptions.Timeout):
                 raise AstrologyAPIError(
-                    message="Unexpected error calling Astrology API",
-                    original_error=str(e),
+                    message="Request timeout after retries",
+                    retry_count=e.attempts,
+                    original_error="Timeout exceeded",
                 )
+            raise AstrologyAPIError(
+                message="API request failed after retries",
+                status_code=getattr(last_error, "status_code", None),
+                retry_count=e.attempts,
+                original_error=str(last_error),
+            )
+
+        except (AstrologyAPIError, DeadlineExceeded):
+            # Non-retryable API error (e.g. 4xx) or no budget left, re-raise
+            raise
+
+        except Exception as e:
+            logger.error(f"Unexpected error during API call: {e}", exc_info=True)
+            raise AstrologyAPIError(
+                message="Unexpected error calling Astrology API",
+                original_error=str(e),
+            )
+
+    def _attempt_timeout(self, deadline: Optional[Deadline]) -> float:
+        """Timeout for one attempt: REQUEST_TIMEOUT, shortened to fit the request deadline."""
+        if deadline is None:
+            return REQUEST_TIMEOUT
+        return deadline.timeout(REQUEST_TIMEOUT, operation="Astrologer request", minimum=MIN_REQUEST_TIMEOUT)
+
+    def _acquire_quota(self, deadline: Optional[Deadline]) -> None:
+        """
+        Take one request from the Astrologer quota shared by every container.
+
+        Waits up to ASTROLOGER_MAX_QUEUE_SECONDS, less when the deadline would
+        not leave time for the request itself.
+
+        Raises:
+            AstrologyRateLimited: If no quota frees up in time
+        """
+        max_wait = ASTROLOGER_MAX_QUEUE_SECONDS
+        if deadline is not None:
+            max_wait = max(0.0, min(max_wait, deadline.remaining() - MIN_REQUEST_TIMEOUT))
+        try:
+            waited = astrologer_rate_limiter.acquire(max_wait=max_wait)
+        except RateLimitExceeded as e:
+            logger.warning(f"Shedding Astrologer request: {e}")
+            raise AstrologyRateLimited(e.retry_after)
+        if waited:
+            logger.info(f"Queued {waited:.2f}s for Astrologer quota")
 
     def _build_request_payload(self, user_profile: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -224,8 +292,14 @@ class AstrologyClient:
             "zodiac_type": "Tropic",  # Western astrology
         }
 
+        # Coordinates resolved at profile creation (offline gazetteer) skip the
+        # upstream GeoNames lookup entirely
+        if user_profile.get("birth_lat") is not None and user_profile.get("birth_tz"):
+            subject["latitude"] = float(user_profile["birth_lat"])
+            subject["longitude"] = float(user_profile["birth_lng"])
+            subject["timezone"] = user_profile["birth_tz"]
         # Add geonames username if available (for automatic coordinates)
-        if self.geonames_username:
+        elif self.geonames_username:
             subject["geonames_username"] = self.geonames_username
         else:
             logger.warning("Geonames username not configured, API may require manual coordinates")
@@ -248,7 +322,8 @@ class AstrologyClient:
         """
         Convert country name to ISO 3166-1 alpha-2 code.
 
-        Uses pycountry for fuzzy matching.
+        Uses the precomputed country index (see common.countries), with
+        fuzzy matching only as a last resort.
 
         Examples:
             "United States" → "US"
@@ -264,39 +339,44 @@ class AstrologyClient:
         Raises:
             ValueError: If country cannot be found
         """
-        try:
-            country = pycountry.countries.search_fuzzy(country_name)[0]
-            return country.alpha_2
-        except LookupError:
+        code = resolve_country(country_name)
+        if code is None:
             logger.error(f"Could not find country code for: {country_name}")
             raise ValueError(f"Unknown country: {country_name}")
+        return code
 
-    def _make_api_request(self, payload: Dict[str, Any], timeout: int) -> Dict[str, Any]:
+    def _make_api_request(self, payload: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
-        Make HTTP request to Astrologer API.
+        Make HTTP request to Astrologer API within the shared request quota.
 
         Args:
             payload: Request body
-            timeout: Request timeout in seconds
+            deadline: Optional request deadline; bounds queueing and the request timeout
 
         Returns:
             API response as dict
 
         Raises:
+            AstrologyRateLimited: If the shared quota is exhausted
             AstrologyAPIError: If API returns error
             requests.exceptions.RequestException: If request fails
         """
         url = f"{RAPIDAPI_BASE_URL}{BIRTH_CHART_ENDPOINT}"
+        api_key = self.api_key
 
-        headers = {
-            "X-RapidAPI-Host": RAPIDAPI_HOST,
-            "X-RapidAPI-Key": self.api_key,
-            "Content-Type": "application/json",
-        }
-
+        self._acquire_quota(deadline)
+        timeout = self._attempt_timeout(deadline)
         logger.info(f"Calling Astrologer API: {url}")
 
-        response = requests.post(url, json=payload, headers=headers, timeout=timeout)
+        response = requests.post(url, json=payload, headers=self._headers(api_key), timeout=timeout)
+
+        # A rotated key is rejected until the cache catches up: refresh it and retry once
+        if response.status_code == 401:
+            refreshed_key = self._get_api_key(force_refresh=True)
+            if refreshed_key != api_key:
+                logger.info("Astrologer API key was rotated, retrying with the refreshed key")
+                self._acquire_quota(deadline)
+                response = requests.post(url, json=payload, headers=self._headers(refreshed_key), timeout=timeout)
 
         # Check for HTTP errors
         if response.status_code != 200:
@@ -308,14 +388,40 @@ class AstrologyClient:
                 error_message += f": {response.text}"
 
             logger.error(error_message)
+            if response.status_code == 429:
+                # The upstream quota is the real one: hold every container off until it resets
+                retry_after = self._retry_after(response)
+                logger.warning(f"Astrologer API throttled us, blocking requests for {retry_after:.1f}s")
+                astrologer_rate_limiter.block_until(time.time() + retry_after)
             raise AstrologyAPIError(
                 message="Astrologer API error",
                 status_code=response.status_code,
                 original_error=error_message,
+                client_error=400 <= response.status_code < 500 and response.status_code != 429,
             )
 
         return response.json()
 
+    def _retry_after(self, response: requests.Response) -> float:
+        """Seconds from a Retry-After header (delay or HTTP date), else DEFAULT_RETRY_AFTER."""
+        value = (response.headers.get("Retry-After") or "").strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return DEFAULT_RETRY_AFTER
+
+    def _headers(self, api_key: str) -> Dict[str, str]:
+        """Request headers for the Astrologer API."""
+        return {
+            "X-RapidAPI-Host": RAPIDAPI_HOST,
+            "X-RapidAPI-Key": api_key,
+            "Content-Type": "application/json",
+        }
+
     def _parse_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
         """
         Parse and structure API response.
@@ -0,0 +1,68 @@
+"""
+BatchWriteItem helpers.
+Sends put/delete batches and retries unprocessed requests with full-jitter backoff.
+"""
+
+import logging
+import random
+import time
+from typing import Any, Dict, List
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# BatchWriteItem accepts at most 25 requests
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_MAX_ATTEMPTS = 8
+BATCH_WRITE_BASE_DELAY = 0.05  # Seconds, doubled per attempt with full jitter
+BATCH_WRITE_MAX_DELAY = 5.0
+RETRYABLE_ERROR_CODES = {"ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded"}
+
+
+def batch_write(dynamodb, table_name: str, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Send up to 25 write requests with BatchWriteItem, retrying unprocessed ones.
+
+    Unprocessed requests and throttling errors are retried with full-jitter
+    exponential backoff, up to BATCH_WRITE_MAX_ATTEMPTS calls. Other errors,
+    including connection errors the client has already retried, fail the
+    remaining requests.
+
+    Args:
+        dynamodb: DynamoDB resource
+        table_name: Target table
+        requests: PutRequest/DeleteRequest entries with distinct keys
+
+    Returns:
+        Requests that could not be written (empty on success)
+    """
+    for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(random.uniform(0, min(BATCH_WRITE_MAX_DELAY, BATCH_WRITE_BASE_DELAY * 2**attempt)))
+        try:
+            response = dynamodb.batch_write_item(RequestItems={table_name: requests})
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in RETRYABLE_ERROR_CODES:
+                logger.error(f"BatchWriteItem failed: {e}")
+                break
+            continue
+        except BotoCoreError as e:
+            logger.error(f"BatchWriteItem failed: {e}")
+            break
+        requests = response.get("UnprocessedItems", {}).get(table_name, [])
+        if not requests:
+            return []
+    return requests
+
+
+def delete_keys(dynamodb, table_name: str, keys: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Delete up to 25 items by key with BatchWriteItem.
+
+    Returns:
+        Keys that could not be deleted (empty on success)
+    """
+    failed = batch_write(dynamodb, table_name, [{"DeleteRequest": {"Key": key}} for key in keys])
+    return [request["DeleteRequest"]["Key"] for request in failed]
@@ -6,11 +6,15 @@ Uses OpenAI GPT model via Amazon Bedrock with VPC PrivateLink.
 import json
 import logging
 import time
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+from common.aspects import MAJOR_ASPECTS, chart_aspects
+from common.deadline import Deadline, DeadlineExceeded
+
 # Setup logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -20,6 +24,11 @@ MODEL_ID = "openai.gpt-oss-20b-1:0"
 DEFAULT_MAX_TOKENS = 1000
 DEFAULT_TEMPERATURE = 0.7
 
+# Deadline-bound calls use the largest read timeout tier that fits the remaining
+# budget. Tiers keep the number of cached boto3 clients small.
+READ_TIMEOUT_TIERS = [3, 5, 8, 12, 18, 25]  # seconds
+MIN_INVOKE_SECONDS = READ_TIMEOUT_TIERS[0]
+
 
 class BedrockError(Exception):
     """Custom exception for Bedrock API errors."""
@@ -53,8 +62,10 @@ class BedrockClient:
             region_name: AWS region (default: us-east-1)
         """
         try:
+            self.region_name = region_name
             self.client = boto3.client("bedrock-runtime", region_name=region_name)
             self.model_id = MODEL_ID
+            self._deadline_clients: Dict[int, Any] = {}
             logger.info(f"BedrockClient initialized with model: {self.model_id}")
         except Exception as e:
             logger.error(f"Failed to initialize Bedrock client: {e}")
@@ -67,6 +78,7 @@ class BedrockClient:
         user_question: str,
         max_tokens: int = DEFAULT_MAX_TOKENS,
         temperature: float = DEFAULT_TEMPERATURE,
+        deadline: Optional[Deadline] = None,
     ) -> Dict[str, Any]:
         """
         Generate AI response based on user profile, chart data, and question.
@@ -77,6 +89,7 @@ class BedrockClient:
             user_question: User's question or prompt
             max_tokens: Maximum tokens for response (default: 1000)
             temperature: Response randomness 0-1 (default: 0.7)
+            deadline: Optional request deadline; the read timeout shrinks to fit it
 
         Returns:
             Dict containing:
@@ -86,6 +99,7 @@ class BedrockClient:
 
         Raises:
             BedrockError: If Bedrock API call fails
+            DeadlineExceeded: If the deadline leaves less than MIN_INVOKE_SECONDS
         """
         logger.info(f"Generating AI response for question: {user_question[:100]}...")
 
@@ -107,6 +121,9 @@ class BedrockClient:
         messages_str = json.dumps(messages)
         logger.info(f"Prompt size: {len(messages_str)} chars")
 
+        # Pick a client whose read timeout fits the remaining request budget
+        client = self._client_for_deadline(deadline)
+
         # Call Bedrock
         try:
             logger.info("=" * 60)
@@ -119,7 +136,7 @@ class BedrockClient:
             start_time = time.time()
             logger.info(f"Calling invoke_model at {start_time}")
 
-            response = self.client.invoke_model(
+            response = client.invoke_model(
                 modelId=self.model_id,
                 body=json.dumps(request_body),
                 contentType="application/json",
@@ -174,6 +191,41 @@ class BedrockClient:
             logger.error("Full traceback:", exc_info=True)
             raise BedrockError(message="Unexpected error during AI generation", original_error=str(e))
 
+    def _client_for_deadline(self, deadline: Optional[Deadline]) -> Any:
+        """
+        Return a bedrock-runtime client whose read timeout fits the deadline.
+
+        botocore timeouts are per client, so one client is cached per timeout
+        tier. Deadline-bound clients do not retry internally, since a retry
+        could not finish inside the same budget.
+
+        Args:
+            deadline: Request deadline, or None for the default client
+
+        Returns:
+            boto3 bedrock-runtime client
+
+        Raises:
+            DeadlineExceeded: If less than MIN_INVOKE_SECONDS remain
+        """
+        if deadline is None:
+            return self.client
+
+        remaining = deadline.remaining()
+        if remaining < MIN_INVOKE_SECONDS:
+            raise DeadlineExceeded("Bedrock invoke_model", remaining, MIN_INVOKE_SECONDS)
+        tier = max(t for t in READ_TIMEOUT_TIERS if t <= remaining)
+
+        if tier not in self._deadline_clients:
+            self._deadline_clients[tier] = boto3.client(
+                "bedrock-runtime",
+                region_name=self.region_name,
+                config=Config(connect_timeout=2, read_timeout=tier, retries={"max_attempts": 0}),
+            )
+
+        logger.info(f"Using Bedrock read timeout {tier}s ({remaining:.1f}s left in request budget)")
+        return self._deadline_clients[tier]
+
     def _build_messages(
         self,
         user_profile: Dict[str, Any],
@@ -261,15 +313,12 @@ When analyzing charts, consider planetary positions, aspects, and houses to prov
 
                 planets_summary.append(f"  {name}: {sign} {position:.1f}°{retrograde}")
 
-        # Extract MAJOR aspects only
-        all_aspects = chart_data.get("aspects", [])
-        important_aspect_types = [
-            "conjunction",
-            "opposition",
-            "trine",
-            "square",
-            "sextile",
-        ]
+        # Extract MAJOR aspects only, most exact first. Aspects are recomputed
+        # from the chart points so every pair is considered, not just the first
+        # entries of the provider's list.
+        all_aspects = chart_aspects(chart_data) or sorted(
+            chart_data.get("aspects", []), key=lambda aspect: aspect.get("orbit", 0)
+        )
         key_planets_for_aspects = [
             "Sun",
             "Moon",
@@ -280,12 +329,12 @@ When analyzing charts, consider planetary positions, aspects, and houses to prov
         ]
 
         major_aspects = []
-        for aspect in all_aspects[:20]:
+        for aspect in all_aspects:
             aspect_type = aspect.get("aspect", "").lower()
             planet1 = aspect.get("p1_name", "")
             planet2 = aspect.get("p2_name", "")
 
-            if aspect_type in important_aspect_types:
+            if aspect_type in MAJOR_ASPECTS:
                 if planet1 in key_planets_for_aspects or planet2 in key_planets_for_aspects:
                     orb = aspect.get("orbit", 0)
                     major_aspects.append(f"  {planet1} {aspect_type} {planet2} (orb: {orb:.1f}°)")
@@ -0,0 +1,388 @@
+"""
+Birth chart provider abstraction.
+Wraps chart sources with a circuit breaker and chains them in fallback order.
+"""
+
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from common.deadline import Deadline, DeadlineExceeded
+from common.metrics import emit_metric
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Circuit breaker defaults
+BREAKER_WINDOW_SIZE = 20  # Most recent calls considered
+BREAKER_MIN_CALLS = 5  # Calls required before the breaker can open
+BREAKER_FAILURE_RATE = 0.5  # Open when half of the window failed
+BREAKER_SLOW_CALL_SECONDS = 8.0  # Calls slower than this count as slow
+BREAKER_SLOW_CALL_RATE = 0.5  # Open when half of the window was slow
+BREAKER_OPEN_SECONDS = 30.0  # Time spent open before probing
+BREAKER_HALF_OPEN_SUCCESSES = 2  # Successful probes required to close
+
+
+class ChartProviderError(Exception):
+    """
+    Base exception for chart provider failures.
+
+    Attributes:
+        client_error: True when the request itself was bad (e.g. unknown city).
+            Client errors still fall through to the next provider, but they do
+            not count against the provider's circuit breaker.
+    """
+
+    client_error = False
+
+
+class CircuitOpenError(ChartProviderError):
+    """Raised instantly when a provider's circuit breaker is open."""
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        super().__init__(f"Circuit breaker open for chart provider: {provider}")
+
+
+class ChartProvider(ABC):
+    """
+    Interface for birth chart sources.
+
+    Implementations return the same shape as the Astrologer API client:
+        - svg_content: SVG string of the chart ("" if the provider cannot render one)
+        - chart_data: Chart data with `data` (points) and `aspects`
+        - metadata: Generation metadata including `api_provider`
+    """
+
+    name = "provider"
+
+    @abstractmethod
+    def get_birth_chart(self, user_profile: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Generate a birth chart for a user profile.
+
+        Raises:
+            ChartProviderError: If the chart cannot be produced
+            DeadlineExceeded: If the request deadline leaves no time to try
+        """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker with error-rate and latency thresholds.
+
+    States:
+    - CLOSED: calls pass; outcomes are recorded in a rolling window
+    - OPEN: calls are rejected instantly until BREAKER_OPEN_SECONDS pass
+    - HALF_OPEN: one probe at a time; enough successes close the breaker,
+      any failure opens it again
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = BREAKER_WINDOW_SIZE,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate: float = BREAKER_SLOW_CALL_RATE,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        half_open_successes: int = BREAKER_HALF_OPEN_SUCCESSES,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_successes = half_open_successes
+
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window_size)  # (failed, slow) tuples
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        Whether a call may go through right now.
+
+        In HALF_OPEN state only one probe is let through at a time.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self._transition(self.HALF_OPEN)
+
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+
+            return True
+
+    def record_success(self, duration: float) -> None:
+        """Record a successful call and its duration in seconds."""
+        self._record(failed=False, slow=duration >= self.slow_call_seconds)
+
+    def record_failure(self, duration: float) -> None:
+        """Record a failed call and its duration in seconds."""
+        self._record(failed=True, slow=duration >= self.slow_call_seconds)
+
+    def release(self) -> None:
+        """Release a half-open probe slot without recording an outcome (e.g. deadline hit)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _record(self, failed: bool, slow: bool) -> None:
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                if failed or slow:
+                    self._open()
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_successes:
+                    self._outcomes.clear()
+                    self._transition(self.CLOSED)
+                return
+
+            self._outcomes.append((failed, slow))
+            if self.state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+                calls = len(self._outcomes)
+                failures = sum(1 for f, _ in self._outcomes if f)
+                slow_calls = sum(1 for _, s in self._outcomes if s)
+                if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                    logger.warning(
+                        f"Circuit breaker {self.name} tripped: {failures}/{calls} failed, {slow_calls}/{calls} slow"
+                    )
+                    self._open()
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._transition(self.OPEN)
+
+    def _transition(self, new_state: str) -> None:
+        """Change state (caller holds the lock) and emit the transition metric."""
+        if new_state == self.state:
+            return
+        logger.info(f"Circuit breaker {self.name}: {self.state} -> {new_state}")
+        emit_metric("CircuitBreakerTransition", breaker=self.name, from_state=self.state, to_state=new_state)
+        self.state = new_state
+        self._probe_in_flight = False
+        self._probe_successes = 0
+
+
+# Breakers live at module level so their state is shared by every warm
+# invocation in the container, whatever provider instance they guard
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """
+    Return the container-wide circuit breaker for a provider, creating it on first use.
+
+    Args:
+        name: Provider name
+        **kwargs: CircuitBreaker settings (only used on first creation)
+
+    Returns:
+        Shared CircuitBreaker instance
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **kwargs)
+        return _breakers[name]
+
+
+class CircuitBreakerProvider(ChartProvider):
+    """Chart provider guarded by a circuit breaker."""
+
+    def __init__(self, provider: ChartProvider, breaker: Optional[CircuitBreaker] = None):
+        self.provider = provider
+        self.breaker = breaker or get_breaker(provider.name)
+        self.name = provider.name
+
+    def get_birth_chart(self, user_profile: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(self.name)
+
+        start = time.monotonic()
+        try:
+            result = self.provider.get_birth_chart(user_profile, deadline=deadline)
+        except DeadlineExceeded:
+            self.breaker.release()
+            raise
+        except ChartProviderError as e:
+            if e.client_error:
+                self.breaker.release()
+            else:
+                self.breaker.record_failure(time.monotonic() - start)
+            raise
+        except Exception:
+            self.breaker.record_failure(time.monotonic() - start)
+            raise
+
+        self.breaker.record_success(time.monotonic() - start)
+        return result
+
+
+class StaleChartCacheProvider(ChartProvider):
+    """
+    Serves the chart cached on the profile even after its TTL has expired.
+
+    A natal chart only depends on birth data, so an expired cache entry is
+    still correct; it is a better answer than failing the chat.
+    """
+
+    name = "stale_cache"
+
+    def get_birth_chart(self, user_profile: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        cached_chart_data = user_profile.get("chart_data_cached")
+        if not cached_chart_data:
+            raise ChartProviderError("No cached chart available")
+
+        if isinstance(cached_chart_data, str):
+            cached_chart_data = json.loads(cached_chart_data)
+
+        return {
+            "svg_content": "",
+            "chart_data": cached_chart_data,
+            "metadata": {
+                "generated_at": int(user_profile.get("chart_generated_at", 0)),
+                "api_provider": self.name,
+                "stale": True,
+            },
+        }
+
+
+class FallbackChartProvider(ChartProvider):
+    """
+    Ordered chain of chart providers.
+
+    Providers are tried in order and the first success wins. An open circuit
+    breaker fails instantly, so the chain moves on without waiting for retries.
+    """
+
+    name = "fallback_chain"
+
+    def __init__(self, providers: List[ChartProvider]):
+        self.providers = providers
+
+    def get_birth_chart(self, user_profile: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        errors = []
+
+        for index, provider in enumerate(self.providers):
+            try:
+                result = provider.get_birth_chart(user_profile, deadline=deadline)
+            except ChartProviderError as e:
+                logger.warning(f"Chart provider {provider.name} failed: {e}")
+                errors.append(f"{provider.name}: {e}")
+                continue
+
+            if index > 0:
+                logger.info(f"Chart served by fallback provider: {provider.name}")
+                emit_metric("ChartProviderFallback", provider=provider.name)
+            return result
+
+        raise ChartProviderError("All chart providers failed | " + " | ".join(errors))
+
+
+# Local testing
+if __name__ == "__main__":
+    print("Testing Chart Providers\n")
+    print("=" * 60)
+
+    class FlakyProvider(ChartProvider):
+        name = "flaky"
+
+        def __init__(self):
+            self.calls = 0
+            self.fail = True
+
+        def get_birth_chart(self, user_profile, deadline=None):
+            self.calls += 1
+            if self.fail:
+                raise ChartProviderError("upstream 503")
+            return {"svg_content": "<svg/>", "chart_data": {"data": {}, "aspects": []}, "metadata": {}}
+
+    # Test 1: Breaker opens after the failure-rate threshold
+    print("\n[Test 1] Breaker opens on error rate")
+    print("-" * 60)
+    flaky = FlakyProvider()
+    breaker = CircuitBreaker("flaky", min_calls=4, open_seconds=0.2)
+    guarded = CircuitBreakerProvider(flaky, breaker)
+    for _ in range(4):
+        try:
+            guarded.get_birth_chart({})
+        except ChartProviderError:
+            pass
+    assert breaker.state == CircuitBreaker.OPEN
+    print("Test 1 passed")
+
+    # Test 2: Open breaker fails instantly without calling the provider
+    print("\n[Test 2] Open breaker rejects instantly")
+    print("-" * 60)
+    calls_before = flaky.calls
+    try:
+        guarded.get_birth_chart({})
+        raise AssertionError("Should have raised CircuitOpenError")
+    except CircuitOpenError as e:
+        assert flaky.calls == calls_before
+        print(f"Correctly rejected: {e}")
+    print("Test 2 passed")
+
+    # Test 3: Half-open probes close the breaker after recovery
+    print("\n[Test 3] Half-open probing")
+    print("-" * 60)
+    time.sleep(0.25)
+    flaky.fail = False
+    guarded.get_birth_chart({})
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    guarded.get_birth_chart({})
+    assert breaker.state == CircuitBreaker.CLOSED
+    print("Test 3 passed")
+
+    # Test 4: Slow calls trip the latency threshold
+    print("\n[Test 4] Breaker opens on slow calls")
+    print("-" * 60)
+    slow_breaker = CircuitBreaker("slow", min_calls=3, slow_call_seconds=1.0)
+    for _ in range(3):
+        slow_breaker.record_success(2.0)
+    assert slow_breaker.state == CircuitBreaker.OPEN
+    print("Test 4 passed")
+
+    # Test 5: Fallback chain serves a stale cached chart
+    print("\n[Test 5] Fallback to stale cache")
+    print("-" * 60)
+    flaky.fail = True
+    chain = FallbackChartProvider([CircuitBreakerProvider(flaky, CircuitBreaker("chain")), StaleChartCacheProvider()])
+    profile = {"chart_data_cached": json.dumps({"data": {"sun": {}}, "aspects": []}), "chart_generated_at": 1}
+    result = chain.get_birth_chart(profile)
+    assert result["metadata"]["stale"] is True
+    assert "sun" in result["chart_data"]["data"]
+    print("Test 5 passed")
+
+    # Test 6: Chain raises when every provider fails
+    print("\n[Test 6] All providers fail")
+    print("-" * 60)
+    try:
+        chain.get_birth_chart({})
+        raise AssertionError("Should have raised ChartProviderError")
+    except ChartProviderError as e:
+        print(f"Correctly raised: {e}")
+    print("Test 6 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
@@ -7,16 +7,94 @@ Provides helpers for:
 - Formatting conversation data for API responses
 """
 
+import os
 import time
 import uuid
 import logging
 import re
+import threading
 from datetime import datetime
 from typing import Dict, Any, Optional
 from decimal import Decimal
 
+from common.message_codec import BODY_CODEC_FIELD, MESSAGE_BODY_FIELDS, decompress_body, encode_fields
+
 logger = logging.getLogger(__name__)
 
+# Sparse GSI over live conversation metadata: user_id + active_updated_at
+CONVERSATION_LIST_INDEX = os.environ.get("CONVERSATION_LIST_INDEX", "user-updated-index")
+
+# Per-user counter bumped whenever the conversation list changes; versions GET /conversations
+CONVERSATIONS_VERSION_SK = "VERSION#CONVERSATIONS"
+
+# How new chat turns are stored: "item" (one item per turn) or "page" (turns
+# appended to shared page items, see common/message_store.py)
+MESSAGE_STORAGE_FORMAT = os.environ.get("MESSAGE_STORAGE_FORMAT", "item")
+
+# Message sort keys end in "U" + a ULID. Legacy keys end in epoch seconds; digits
+# sort before "U", so legacy messages stay ahead of newer ones until they expire.
+MESSAGE_ID_MARKER = "U"
+
+# Crockford base32 alphabet used by ULIDs (no I, L, O, U)
+_ULID_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_ULID_RANDOM_BITS = 80
+
+# Last (milliseconds, randomness) issued in this container, for monotonic ULIDs
+_ulid_state = (0, 0)
+_ulid_lock = threading.Lock()
+
+
+def generate_ulid(now_ms: Optional[int] = None) -> str:
+    """
+    Generate a monotonic ULID.
+
+    48-bit millisecond timestamp + 80 random bits, as 26 Crockford base32
+    characters, so IDs sort by creation time. IDs minted in the same
+    millisecond (or after the clock steps back) increment the previous random
+    part instead of redrawing it, so a burst from one container stays strictly
+    ordered; IDs from different containers collide with negligible probability.
+
+    Args:
+        now_ms: Unix time in milliseconds (defaults to now)
+
+    Returns:
+        str: ULID (e.g., "01JD8X3Q4W5E6R7T8Y9Z0A1B2C")
+    """
+    global _ulid_state
+    timestamp_ms = int(time.time() * 1000) if now_ms is None else now_ms
+
+    with _ulid_lock:
+        last_ms, last_random = _ulid_state
+        if timestamp_ms <= last_ms:
+            timestamp_ms, randomness = last_ms, last_random + 1
+            if randomness >> _ULID_RANDOM_BITS:
+                # Random part exhausted within one millisecond: borrow the next one
+                timestamp_ms, randomness = last_ms + 1, 0
+        else:
+            randomness = int.from_bytes(os.urandom(_ULID_RANDOM_BITS // 8), "big")
+        _ulid_state = (timestamp_ms, randomness)
+
+    value = (timestamp_ms << _ULID_RANDOM_BITS) | randomness
+    return "".join(_ULID_ALPHABET[(value >> shift) & 31] for shift in range(125, -1, -5))
+
+
+def ulid_timestamp_ms(ulid: str) -> int:
+    """Unix time in milliseconds encoded in a ULID's first 10 characters."""
+    timestamp_ms = 0
+    for char in ulid[:10]:
+        timestamp_ms = timestamp_ms * 32 + _ULID_ALPHABET.index(char)
+    return timestamp_ms
+
+
+def message_key_prefix(conversation_id: str) -> str:
+    """Sort key prefix shared by all messages of a conversation."""
+    return f"CONV#{conversation_id}#MSG#"
+
+
+def message_id_from_key(sort_key: str) -> str:
+    """Message ID (the sort key suffix) of a message item."""
+    return sort_key.rsplit("#MSG#", 1)[1]
+
 
 def generate_conversation_id() -> str:
     """
@@ -28,18 +106,19 @@ def generate_conversation_id() -> str:
     return str(uuid.uuid4())
 
 
-def generate_conversation_title(first_message: str, bedrock_client=None) -> str:
+def generate_conversation_title(first_message: str, bedrock_client=None, deadline=None) -> str:
     """
     Generate a concise title for a conversation based on first message.
 
     Strategy:
     1. Try to use Bedrock to generate a 3-5 word summary
-    2. If Bedrock fails, truncate first message to 50 chars
+    2. If Bedrock fails (or the request deadline is too close), truncate first message to 50 chars
     3. Default to "New Conversation" if message is empty
 
     Args:
         first_message: User's first message in the conversation
         bedrock_client: Optional BedrockClient instance for AI title generation
+        deadline: Optional request Deadline bounding the Bedrock title call
 
     Returns:
         str: Generated title (max 100 chars)
@@ -61,6 +140,7 @@ def generate_conversation_title(first_message: str, bedrock_client=None) -> str:
                 chart_data={},
                 user_question=title_prompt,
                 max_tokens=500,
+                deadline=deadline,
             )
 
             # Extract response string from dict
@@ -112,6 +192,11 @@ def build_conversation_metadata_item(
     Item type: METADATA
     Sort key pattern: "CONV#{conversation_id}"
 
+    `active_updated_at` mirrors `updated_at` while the conversation is live and
+    is the sort key of CONVERSATION_LIST_INDEX; soft delete removes it, so the
+    index holds only live metadata items. `pages_only` marks conversations
+    created in page storage mode, whose reads can skip the single-item query.
+
     Args:
         user_id: User's ID
         conversation_id: Unique conversation ID
@@ -124,7 +209,7 @@ def build_conversation_metadata_item(
     """
     now = datetime.utcnow().isoformat() + "Z"
 
-    return {
+    item = {
         "user_id": user_id,
         "sk": f"CONV#{conversation_id}",
         "item_type": "METADATA",
@@ -133,9 +218,15 @@ def build_conversation_metadata_item(
         "message_count": 0,
         "created_at": created_at or now,
         "updated_at": updated_at or now,
+        "active_updated_at": updated_at or now,
         "last_message_preview": "",
     }
 
+    if MESSAGE_STORAGE_FORMAT == "page":
+        item["pages_only"] = True
+
+    return item
+
 
 def build_message_item(
     user_id: str,
@@ -149,7 +240,12 @@ def build_message_item(
     Build a message item for DynamoDB.
 
     Item type: MESSAGE
-    Sort key pattern: "CONV#{conversation_id}#MSG#{timestamp}"
+    Sort key pattern: "CONV#{conversation_id}#MSG#U{ulid}"
+
+    The ULID keeps keys unique and time-ordered even for several messages in
+    the same second; put the item with `attribute_not_exists(sk)` so a write
+    can never replace another message. Long bodies are stored compressed
+    (see common/message_codec.py).
 
     Args:
         user_id: User's ID
@@ -164,15 +260,17 @@ def build_message_item(
     """
     timestamp = int(time.time())
     created_at = datetime.utcnow().isoformat() + "Z"
+    message_id = MESSAGE_ID_MARKER + generate_ulid()
 
     # Calculate TTL (30 days from now)
     ttl_timestamp = int(time.time()) + (ttl_days * 24 * 60 * 60)
 
     item = {
         "user_id": user_id,
-        "sk": f"CONV#{conversation_id}#MSG#{timestamp}",
+        "sk": message_key_prefix(conversation_id) + message_id,
         "item_type": "MESSAGE",
         "conversation_id": conversation_id,
+        "message_id": message_id,
         "timestamp_epoch": timestamp,
         "created_at": created_at,
         "user_message": user_message,
@@ -184,14 +282,15 @@ def build_message_item(
     if chart_url:
         item["chart_url"] = chart_url
 
-    return item
+    return encode_fields(item, MESSAGE_BODY_FIELDS, BODY_CODEC_FIELD)
 
 
 def format_conversation_for_response(metadata_item: Dict[str, Any]) -> Dict[str, Any]:
     """
     Format conversation metadata item for API response.
 
-    Removes internal fields and formats timestamps.
+    Removes internal fields and formats timestamps. Numbers stay as read
+    (Decimal); the response serializer encodes them.
 
     Args:
         metadata_item: DynamoDB metadata item
@@ -199,16 +298,10 @@ def format_conversation_for_response(metadata_item: Dict[str, Any]) -> Dict[str,
     Returns:
         dict: Formatted conversation object for API response
     """
-
-    def decimal_to_int(value):
-        if isinstance(value, Decimal):
-            return int(value)
-        return value if value is not None else 0
-
     return {
         "conversation_id": metadata_item.get("conversation_id", ""),
         "title": metadata_item.get("title", "Untitled"),
-        "message_count": decimal_to_int(metadata_item.get("message_count", 0)),
+        "message_count": metadata_item.get("message_count") or 0,
         "created_at": metadata_item.get("created_at", ""),
         "updated_at": metadata_item.get("updated_at", ""),
         "last_message_preview": metadata_item.get("last_message_preview", ""),
@@ -219,23 +312,21 @@ def format_message_for_response(message_item: Dict[str, Any]) -> Dict[str, Any]:
     """
     Format message item for API response.
 
+    Compressed bodies are decoded; items written before compression hold plain strings.
+
     Args:
         message_item: DynamoDB message item
 
     Returns:
         dict: Formatted message object for API response
     """
-
-    def decimal_to_int(value):
-        if isinstance(value, Decimal):
-            return int(value)
-        return value if value is not None else 0
-
+    codec = message_item.get(BODY_CODEC_FIELD)
     formatted = {
-        "timestamp": decimal_to_int(message_item.get("timestamp_epoch", 0)),  # ← 改这里
+        "message_id": message_item.get("message_id") or message_id_from_key(message_item.get("sk", "#MSG#")),
+        "timestamp": message_item.get("timestamp_epoch") or 0,
         "created_at": message_item.get("created_at", ""),
-        "user_message": message_item.get("user_message", ""),
-        "ai_response": message_item.get("ai_response", ""),
+        "user_message": decompress_body(message_item.get("user_message", ""), codec),
+        "ai_response": decompress_body(message_item.get("ai_response", ""), codec),
     }
 
     if "chart_url" in message_item:
@@ -250,14 +341,17 @@ def update_conversation_metadata(
     conversation_id: str,
     increment_message_count: bool = False,
     new_message_preview: Optional[str] = None,
+    message_page: Optional[str] = None,
 ) -> None:
     """
     Update conversation metadata atomically.
 
     Updates:
-    - updated_at timestamp
+    - updated_at timestamp (and the list index sort key)
     - message_count (if increment_message_count=True)
     - last_message_preview (if provided)
+    - message_page: the page the message was appended to; when the message
+      was stored as its own item instead, `pages_only` is cleared
 
     Args:
         table: DynamoDB table resource
@@ -265,12 +359,13 @@ def update_conversation_metadata(
         conversation_id: Conversation ID
         increment_message_count: Whether to increment message count
         new_message_preview: New preview text (first 100 chars of message)
+        message_page: Sort key of the page holding the new message, if paged
     """
     now = datetime.utcnow().isoformat() + "Z"
 
     # Build update expression
-    update_parts = ["updated_at = :updated_at"]
-    expression_values = {":updated_at": now}
+    update_parts = ["updated_at = :updated_at", "active_updated_at = :updated_at"]
+    expression_values = {":updated_at": now, ":false": False}
 
     if increment_message_count:
         update_parts.append("message_count = message_count + :inc")
@@ -282,17 +377,129 @@ def update_conversation_metadata(
         update_parts.append("last_message_preview = :preview")
         expression_values[":preview"] = preview
 
+    if message_page:
+        update_parts.append("message_page = :page")
+        expression_values[":page"] = message_page
+
     update_expression = "SET " + ", ".join(update_parts)
+    if increment_message_count and not message_page:
+        update_expression += " REMOVE pages_only"
 
     try:
         table.update_item(
             Key={"user_id": user_id, "sk": f"CONV#{conversation_id}"},
             UpdateExpression=update_expression,
             ExpressionAttributeValues=expression_values,
-            ConditionExpression="attribute_exists(user_id)",  # Ensure conversation exists
+            # Ensure conversation exists and was not deleted meanwhile (would re-list it)
+            ConditionExpression="attribute_exists(user_id) AND (attribute_not_exists(deleted) OR deleted = :false)",
         )
         logger.info(f"Updated conversation metadata: {conversation_id}")
 
     except Exception as e:
         logger.error(f"Failed to update conversation metadata: {e}")
         raise
+
+    bump_conversations_version(table, user_id)
+
+
+def bump_conversations_version(table, user_id: str) -> None:
+    """
+    Record a change to the user's conversation list (create, message, rename, delete).
+
+    The list ETag is derived from this counter, so a missed bump could answer
+    a stale list with 304 until the next change. A failure is logged rather
+    than raised: the metadata write it follows has already succeeded.
+
+    Args:
+        table: DynamoDB table resource
+        user_id: User's ID
+    """
+    try:
+        table.update_item(
+            Key={"user_id": user_id, "sk": CONVERSATIONS_VERSION_SK},
+            UpdateExpression="ADD version :one",
+            ExpressionAttributeValues={":one": 1},
+        )
+    except Exception as e:
+        logger.error(f"Failed to bump conversations version for {user_id}: {e}")
+
+
+def get_conversations_version(table, user_id: str) -> int:
+    """Current conversation list version (0 before the first change); a strongly consistent read of one tiny item."""
+    item = table.get_item(Key={"user_id": user_id, "sk": CONVERSATIONS_VERSION_SK}, ConsistentRead=True).get("Item")
+    return int(item["version"]) if item else 0
+
+
+# Local testing
+if __name__ == "__main__":
+    print("Testing Conversation Utils\n")
+    print("=" * 60)
+
+    # Test 1: ULIDs encode the timestamp and sort by it
+    print("\n[Test 1] ULID format")
+    print("-" * 60)
+    ulid = generate_ulid(now_ms=1732622400000)
+    print(f"ULID: {ulid}")
+    assert len(ulid) == 26 and set(ulid) <= set(_ULID_ALPHABET)
+    assert ulid[:10] == generate_ulid(now_ms=1732622400000)[:10]
+    assert generate_ulid() > ulid
+    print("Test 1 passed")
+
+    # Test 2: Bursts within one millisecond stay unique and ordered, even across threads
+    print("\n[Test 2] Monotonic bursts")
+    print("-" * 60)
+    burst = [generate_ulid(now_ms=1900000000000) for _ in range(1000)]
+    assert burst == sorted(burst) and len(set(burst)) == len(burst)
+    assert generate_ulid(now_ms=1800000000000) > burst[-1]  # clock stepped back
+    issued = []
+
+    def mint():
+        issued.extend(generate_ulid() for _ in range(2000))
+
+    threads = [threading.Thread(target=mint) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(issued)) == len(issued) == 8000
+    print("Test 2 passed")
+
+    # Test 3: Message keys are unique per burst and sort after legacy epoch keys
+    print("\n[Test 3] Message items")
+    print("-" * 60)
+    items = [build_message_item("user-1", "conv-1", f"question {i}", "answer") for i in range(5)]
+    keys = [item["sk"] for item in items]
+    print(keys[0])
+    assert len(set(keys)) == 5 and keys == sorted(keys)
+    assert all(key.startswith(message_key_prefix("conv-1") + MESSAGE_ID_MARKER) for key in keys)
+    assert message_key_prefix("conv-1") + "1732622400" < keys[0]
+    assert format_message_for_response(items[0])["message_id"] == items[0]["message_id"]
+    assert format_message_for_response({"sk": "CONV#conv-1#MSG#1732622400"})["message_id"] == "1732622400"
+    print("Test 3 passed")
+
+    # Test 4: Every metadata update bumps the list version
+    print("\n[Test 4] Conversation list version")
+    print("-" * 60)
+
+    class FakeVersionTable:
+        def __init__(self):
+            self.items = {}
+
+        def get_item(self, Key, ConsistentRead=False):
+            item = self.items.get((Key["user_id"], Key["sk"]))
+            return {"Item": dict(item)} if item else {}
+
+        def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, **kwargs):
+            item = self.items.setdefault((Key["user_id"], Key["sk"]), dict(Key))
+            if UpdateExpression.startswith("ADD version"):
+                item["version"] = item.get("version", Decimal(0)) + ExpressionAttributeValues[":one"]
+
+    table = FakeVersionTable()
+    assert get_conversations_version(table, "user-1") == 0
+    update_conversation_metadata(table, "user-1", "conv-1", increment_message_count=True)
+    bump_conversations_version(table, "user-1")
+    assert get_conversations_version(table, "user-1") == 2 and get_conversations_version(table, "user-2") == 0
+    print("Test 4 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
@@ -0,0 +1,315 @@
+"""
+Country name resolution.
+Maps free-typed country names, aliases and ISO codes to ISO 3166-1 alpha-2 codes from a precomputed index.
+"""
+
+import bisect
+import functools
+import logging
+import os
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Packed index: one "normalized key<TAB>alpha-2" line per entry, sorted by key
+COUNTRY_INDEX_PATH = os.path.join(os.path.dirname(__file__), "data", "countries.tsv")
+
+# Shortest prefix accepted for prefix matching (e.g., "switz" -> CH)
+MIN_PREFIX_LENGTH = 4
+
+# Common names and aliases missing from ISO 3166 / pycountry
+COUNTRY_ALIASES = {
+    "US": ["usa", "u s a", "u s", "america", "united states of america", "the states"],
+    "GB": ["uk", "u k", "britain", "great britain", "england", "scotland", "wales", "northern ireland"],
+    "RU": ["russia"],
+    "KR": ["south korea", "korea", "republic of korea"],
+    "KP": ["north korea", "dprk"],
+    "VN": ["vietnam"],
+    "IR": ["iran"],
+    "SY": ["syria"],
+    "LA": ["laos"],
+    "BO": ["bolivia"],
+    "VE": ["venezuela"],
+    "TZ": ["tanzania"],
+    "MD": ["moldova"],
+    "CZ": ["czech republic", "czechia"],
+    "CI": ["ivory coast", "cote divoire"],
+    "MM": ["burma"],
+    "MK": ["macedonia"],
+    "SZ": ["swaziland"],
+    "CV": ["cape verde"],
+    "TW": ["taiwan", "republic of china"],
+    "PS": ["palestine"],
+    "VA": ["vatican", "vatican city", "holy see"],
+    "AE": ["uae", "emirates"],
+    "TR": ["turkey", "turkiye"],
+    "BN": ["brunei"],
+    "FM": ["micronesia"],
+    "CD": ["drc", "dr congo", "congo kinshasa", "democratic republic of congo"],
+    "CG": ["congo", "congo brazzaville", "republic of congo"],
+    "HK": ["hong kong"],
+    "MO": ["macau", "macao"],
+    "CN": ["mainland china", "prc", "peoples republic of china", "zhongguo"],
+    # Endonyms users commonly type
+    "DE": ["deutschland"],
+    "ES": ["espana"],
+    "IT": ["italia"],
+    "BR": ["brasil"],
+    "JP": ["nippon", "nihon"],
+    "CH": ["schweiz", "suisse", "svizzera"],
+    "AT": ["osterreich"],
+    "NL": ["holland", "the netherlands", "nederland"],
+    "GR": ["hellas"],
+    "IN": ["bharat"],
+    "PL": ["polska"],
+    "SE": ["sverige"],
+    "NO": ["norge"],
+    "DK": ["danmark"],
+    "FI": ["suomi"],
+}
+
+_STRIP_PATTERN = re.compile(r"[^a-z0-9 ]+")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+# Lazily loaded index: (sorted keys, codes aligned with keys, key -> code)
+_index: Optional[Tuple[List[str], List[str], Dict[str, str]]] = None
+
+
+def normalize_country_name(name: str) -> str:
+    """
+    Normalize a country name for lookup.
+
+    Strips accents and punctuation, lowercases, turns "&" into "and",
+    collapses whitespace and drops a leading "the".
+
+    Examples:
+        "  Côte d'Ivoire " → "cote divoire"
+        "The Bahamas" → "bahamas"
+    """
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    text = text.lower().replace("&", " and ").replace("'", "")
+    text = _SPACE_PATTERN.sub(" ", _STRIP_PATTERN.sub(" ", text)).strip()
+    if text.startswith("the "):
+        text = text[4:]
+    return text
+
+
+def _load_index() -> Tuple[List[str], List[str], Dict[str, str]]:
+    """Load the packed index once per container."""
+    global _index
+    if _index is None:
+        keys, codes = [], []
+        with open(COUNTRY_INDEX_PATH, encoding="utf-8") as index_file:
+            for line in index_file:
+                key, code = line.rstrip("\n").split("\t")
+                keys.append(key)
+                codes.append(code)
+        _index = (keys, codes, dict(zip(keys, codes)))
+        logger.info(f"Country index loaded: {len(keys)} keys")
+    return _index
+
+
+def resolve_country(name: str) -> Optional[str]:
+    """
+    Resolve a country name, alias or ISO code to an alpha-2 code.
+
+    Lookup order:
+        1. Exact match on the normalized name (names, official and common
+           names, aliases, alpha-2 and alpha-3 codes)
+        2. Unambiguous prefix of at least MIN_PREFIX_LENGTH characters
+        3. pycountry fuzzy search (cached, loaded only when needed)
+
+    Args:
+        name: Country as typed by the user (e.g., "United States", "usa", "Deutschland")
+
+    Returns:
+        Two-letter country code, or None if the country cannot be resolved
+
+    Example:
+        >>> resolve_country("United Kingdom")
+        'GB'
+    """
+    key = normalize_country_name(name or "")
+    if not key:
+        return None
+
+    keys, codes, exact = _load_index()
+    code = exact.get(key)
+    if code:
+        return code
+
+    if len(key) >= MIN_PREFIX_LENGTH:
+        start = bisect.bisect_left(keys, key)
+        end = bisect.bisect_left(keys, key + "\x7f", start)
+        matches = set(codes[start:end])
+        if len(matches) == 1:
+            return matches.pop()
+
+    return _fuzzy_resolve(key)
+
+
+@functools.lru_cache(maxsize=512)
+def _fuzzy_resolve(key: str) -> Optional[str]:
+    """
+    Last-resort fuzzy lookup through pycountry.
+
+    pycountry's databases are imported here, so containers that only see
+    well-formed country names never pay their load time or memory.
+    """
+    import pycountry
+
+    try:
+        code = pycountry.countries.search_fuzzy(key)[0].alpha_2
+        logger.info(f"Country resolved by fuzzy search: {key!r} -> {code}")
+        return code
+    except LookupError:
+        return None
+
+
+def build_index(output_path: str = COUNTRY_INDEX_PATH) -> int:
+    """
+    Build the packed country index from pycountry plus COUNTRY_ALIASES.
+
+    Run after upgrading pycountry: `python -m common.countries build`
+
+    Args:
+        output_path: Where to write the index
+
+    Returns:
+        Number of keys written
+
+    Raises:
+        ValueError: If one key would map to two different countries
+    """
+    import pycountry
+
+    entries: Dict[str, str] = {}
+
+    def add(key: str, code: str) -> None:
+        key = normalize_country_name(key)
+        if not key:
+            return
+        if entries.get(key, code) != code:
+            raise ValueError(f"Ambiguous country key {key!r}: {entries[key]} / {code}")
+        entries[key] = code
+
+    short_names: Dict[str, set] = {}
+    for country in pycountry.countries:
+        code = country.alpha_2
+        for attribute in ("alpha_2", "alpha_3", "name", "official_name", "common_name"):
+            value = getattr(country, attribute, None)
+            if value:
+                add(value, code)
+        # Short form of names like "Bolivia, Plurinational State of"
+        if "," in country.name:
+            short_names.setdefault(normalize_country_name(country.name.split(",")[0]), set()).add(code)
+
+    # Short forms shared by several countries ("Korea", "Congo") are left to the aliases
+    for key, codes in short_names.items():
+        if len(codes) == 1 and key not in entries:
+            entries[key] = codes.pop()
+
+    for code, aliases in COUNTRY_ALIASES.items():
+        for alias in aliases:
+            entries[normalize_country_name(alias)] = code
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as index_file:
+        for key in sorted(entries):
+            index_file.write(f"{key}\t{entries[key]}\n")
+    return len(entries)
+
+
+# Local testing
+if __name__ == "__main__":
+    import subprocess
+    import sys
+    import time
+
+    if sys.argv[1:] == ["build"]:
+        count = build_index()
+        print(f"Wrote {count} keys to {COUNTRY_INDEX_PATH}")
+        sys.exit(0)
+
+    print("Testing Country Resolution\n")
+    print("=" * 60)
+
+    # Test 1: Names, codes and aliases
+    print("\n[Test 1] Exact names, codes and aliases")
+    print("-" * 60)
+    cases = {
+        "United States": "US",
+        "usa": "US",
+        "U.S.A.": "US",
+        "United Kingdom": "GB",
+        "England": "GB",
+        "China": "CN",
+        "CHN": "CN",
+        "de": "DE",
+        "Côte d'Ivoire": "CI",
+        "South Korea": "KR",
+        "Bolivia": "BO",
+        "The Netherlands": "NL",
+        "Bosnia & Herzegovina": "BA",
+    }
+    for name, expected in cases.items():
+        code = resolve_country(name)
+        print(f"  {name!r:24s} -> {code}")
+        assert code == expected, f"{name}: expected {expected}, got {code}"
+    print("Test 1 passed")
+
+    # Test 2: Prefix and fuzzy fallback
+    print("\n[Test 2] Prefix and fuzzy fallback")
+    print("-" * 60)
+    assert resolve_country("Switz") == "CH"
+    assert resolve_country("Deutschland") == "DE"
+    assert resolve_country("Atlantis") is None
+    assert resolve_country("") is None
+    print("Test 2 passed")
+
+    # Test 3: Lookup time vs pycountry.search_fuzzy
+    print("\n[Test 3] Lookup benchmark")
+    print("-" * 60)
+    names = ["United States", "Germany", "Brazil", "usa", "Japan", "South Korea", "france", "Nigeria"]
+    runs = 20_000
+    start = time.perf_counter()
+    for i in range(runs):
+        resolve_country(names[i % len(names)])
+    index_us = (time.perf_counter() - start) / runs * 1e6
+
+    import pycountry
+
+    fuzzy_runs = 200
+    start = time.perf_counter()
+    for i in range(fuzzy_runs):
+        pycountry.countries.search_fuzzy(names[i % len(names)])
+    fuzzy_us = (time.perf_counter() - start) / fuzzy_runs * 1e6
+    print(f"Index lookup:        {index_us:8.2f} µs")
+    print(f"pycountry fuzzy:     {fuzzy_us:8.2f} µs")
+    print("Test 3 passed")
+
+    # Test 4: Import cost, each measured in a fresh interpreter
+    print("\n[Test 4] Import time and RSS")
+    print("-" * 60)
+    probe = (
+        "import time; start = time.perf_counter(); {stmt}; elapsed = time.perf_counter() - start; "
+        "rss = [line for line in open('/proc/self/status') if line.startswith('VmRSS')][0].split()[1]; "
+        "print(f'{{elapsed * 1000:.1f}} ms, {{int(rss) / 1024:.1f}} MB RSS')"
+    )
+    statements = {
+        "baseline": "pass",
+        "country index": "from common.countries import resolve_country; resolve_country('France')",
+        "pycountry fuzzy": "import pycountry; pycountry.countries.search_fuzzy('France')",
+    }
+    for label, stmt in statements.items():
+        output = subprocess.run(
+            [sys.executable, "-c", probe.format(stmt=stmt)], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        print(f"  {label:16s} {output}")
+    print("Test 4 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
@@ -0,0 +1,184 @@
+"""
+Opaque pagination cursors.
+Compact, HMAC-signed tokens bound to the caller and the listing they page through.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
+import os
+from typing import List
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Signing key shared by all containers (set by Terraform); cursors minted with one key fail under another
+CURSOR_SIGNING_KEY = os.environ.get("CURSOR_SIGNING_KEY", "")
+
+# Set to "1" to sign with a fixed development key when CURSOR_SIGNING_KEY is unset (local runs only).
+# Anywhere else a missing key is an error: cursors signed with a public key could be forged.
+CURSOR_DEV_MODE = os.environ.get("CURSOR_DEV_MODE") == "1"
+_DEV_SIGNING_KEY = "mira-dev-cursor-key"
+
+# Truncated HMAC-SHA256 length; 96 bits is plenty to stop forged cursors
+SIGNATURE_BYTES = 12
+
+# Separates cursor values (never appears in sort keys or ISO timestamps)
+FIELD_SEPARATOR = "\x1f"
+
+_signing_key = None
+
+
+def _get_signing_key() -> bytes:
+    """
+    Signing key, loaded on first use.
+
+    Raises:
+        RuntimeError: If CURSOR_SIGNING_KEY is unset and CURSOR_DEV_MODE is off
+    """
+    global _signing_key
+    if _signing_key is None:
+        if CURSOR_SIGNING_KEY:
+            _signing_key = CURSOR_SIGNING_KEY.encode("utf-8")
+        elif CURSOR_DEV_MODE:
+            logger.warning("CURSOR_SIGNING_KEY not set, using the development cursor key")
+            _signing_key = _DEV_SIGNING_KEY.encode("utf-8")
+        else:
+            logger.error("CURSOR_SIGNING_KEY not set, refusing to sign or verify cursors")
+            raise RuntimeError("CURSOR_SIGNING_KEY is not configured")
+    return _signing_key
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(scope: str, payload: bytes) -> bytes:
+    message = scope.encode("utf-8") + b"\x00" + payload
+    return hmac.new(_get_signing_key(), message, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def encode_cursor(values: List[str], scope: str) -> str:
+    """
+    Encode key values as an opaque, URL-safe cursor.
+
+    The scope (e.g., "messages:{user_id}:{conversation_id}") is signed but
+    not embedded, so a cursor only decodes for the listing that issued it.
+
+    Args:
+        values: Key values identifying the position (strings)
+        scope: Listing the cursor belongs to
+
+    Returns:
+        Cursor like "MDFKOFg...TjJR.q0V3Y2ZkT0dLcmNv"
+    """
+    payload = FIELD_SEPARATOR.join(values).encode("utf-8")
+    return f"{_b64encode(payload)}.{_b64encode(_sign(scope, payload))}"
+
+
+def decode_cursor(cursor: str, scope: str, fields: int = 1) -> List[str]:
+    """
+    Decode and verify a cursor issued by encode_cursor.
+
+    Args:
+        cursor: Cursor from a previous response
+        scope: Listing the request is paging through
+        fields: Number of values the cursor must hold
+
+    Returns:
+        The encoded values
+
+    Raises:
+        ValueError: If the cursor is malformed, tampered with or from another scope
+    """
+    try:
+        payload_text, signature_text = cursor.split(".")
+        payload = _b64decode(payload_text)
+        signature = _b64decode(signature_text)
+        values = payload.decode("utf-8").split(FIELD_SEPARATOR)
+    except (AttributeError, ValueError, binascii.Error):
+        raise ValueError("Invalid cursor")
+
+    if not hmac.compare_digest(signature, _sign(scope, payload)) or len(values) != fields:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+# Local testing
+if __name__ == "__main__":
+    import time
+
+    print("Testing Cursors\n")
+    print("=" * 60)
+
+    # Self-tests sign with the development key unless a real one is set
+    CURSOR_DEV_MODE = True
+
+    scope = "messages:user-123:conv-1"
+
+    # Test 1: Round trip
+    print("\n[Test 1] Round trip")
+    print("-" * 60)
+    cursor = encode_cursor(["U01JD8X3Q4W5E6R7T8Y9U0I1O2"], scope)
+    print(f"Cursor ({len(cursor)} chars): {cursor}")
+    assert decode_cursor(cursor, scope) == ["U01JD8X3Q4W5E6R7T8Y9U0I1O2"]
+    pair = encode_cursor(["conv-1", "2025-01-02T03:04:05Z"], "conversations:user-123")
+    assert decode_cursor(pair, "conversations:user-123", fields=2) == ["conv-1", "2025-01-02T03:04:05Z"]
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    print("Test 1 passed")
+
+    # Test 2: Tampered, foreign and malformed cursors are rejected
+    print("\n[Test 2] Rejections")
+    print("-" * 60)
+    payload_text, signature_text = cursor.split(".")
+    forged = _b64encode(b"U01JD8X3Q4W5E6R7T8Y9U0I1O3") + "." + signature_text
+    bad_cursors = [
+        (forged, scope, 1),
+        (cursor, "messages:user-456:conv-1", 1),
+        (cursor, "messages:user-123:conv-2", 1),
+        (cursor, scope, 2),
+        ("not-a-cursor", scope, 1),
+        ("a.b.c", scope, 1),
+        ("%%%.***", scope, 1),
+        ("", scope, 1),
+    ]
+    for bad, bad_scope, fields in bad_cursors:
+        try:
+            decode_cursor(bad, bad_scope, fields)
+        except ValueError as e:
+            print(f"  {bad[:24]!r:28} -> {e}")
+        else:
+            raise AssertionError(f"Accepted bad cursor: {bad}")
+    print("Test 2 passed")
+
+    # Test 3: Cost per cursor
+    print("\n[Test 3] Encode/decode cost")
+    print("-" * 60)
+    runs = 20000
+    start = time.perf_counter()
+    for _ in range(runs):
+        decode_cursor(encode_cursor(["U01JD8X3Q4W5E6R7T8Y9U0I1O2"], scope), scope)
+    print(f"Round trip: {(time.perf_counter() - start) / runs * 1e6:.1f} µs")
+    print("Test 3 passed")
+
+    # Test 4: Without a key, and outside dev mode, cursors fail closed
+    print("\n[Test 4] Missing signing key")
+    print("-" * 60)
+    CURSOR_SIGNING_KEY, CURSOR_DEV_MODE, _signing_key = "", False, None
+    for operation in (lambda: encode_cursor(["x"], scope), lambda: decode_cursor(cursor, scope)):
+        try:
+            operation()
+        except RuntimeError as e:
+            print(f"Correctly refused: {e}")
+        else:
+            raise AssertionError("Cursor handled without a configured key")
+    print("Test 4 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
@@ -0,0 +1,198 @@
+"""
+Request-scoped deadline.
+Tracks how much of the API Gateway / Lambda time budget is left for downstream calls.
+"""
+
+import logging
+import os
+import time
+from typing import Any
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# API Gateway HTTP API integration timeout (hard limit)
+GATEWAY_TIMEOUT_SECONDS = float(os.environ.get("API_GATEWAY_TIMEOUT_SECONDS", "29"))
+
+# Time kept back to build and return the response after the last downstream call
+RESPONSE_MARGIN_SECONDS = 1.0
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the remaining time budget cannot cover an operation."""
+
+    def __init__(self, operation: str, remaining: float, required: float = 0):
+        self.operation = operation
+        self.remaining = remaining
+        self.required = required
+        super().__init__(f"Deadline exceeded before {operation}")
+
+    def __str__(self):
+        return (
+            f"Deadline exceeded before {self.operation} | "
+            f"Remaining: {self.remaining:.2f}s | Required: {self.required:.2f}s"
+        )
+
+
+class Deadline:
+    """
+    Absolute deadline for the current request.
+
+    Create it once at the start of a handler with `Deadline.from_context(context)`
+    and pass it to every downstream call. Each call derives its own timeout from
+    `timeout()`, so a slow step shrinks the budget of every step after it.
+    """
+
+    def __init__(self, expires_at: float):
+        """
+        Initialize deadline.
+
+        Args:
+            expires_at: Expiry as a time.monotonic() timestamp
+        """
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        """Deadline that expires `seconds` from now."""
+        return cls(time.monotonic() + seconds)
+
+    @classmethod
+    def from_context(
+        cls,
+        context: Any,
+        gateway_timeout: float = GATEWAY_TIMEOUT_SECONDS,
+        margin: float = RESPONSE_MARGIN_SECONDS,
+    ) -> "Deadline":
+        """
+        Build the deadline for an API Gateway request.
+
+        Uses whichever is shorter: the gateway timeout or the Lambda's remaining
+        execution time, minus a margin for returning the response.
+
+        Args:
+            context: Lambda context (may be None or a mock without timing info)
+            gateway_timeout: API Gateway integration timeout in seconds
+            margin: Seconds reserved for building the response
+
+        Returns:
+            Deadline for the current request
+        """
+        budget = gateway_timeout
+        get_remaining = getattr(context, "get_remaining_time_in_millis", None)
+        if callable(get_remaining):
+            budget = min(budget, get_remaining() / 1000)
+
+        deadline = cls.after(max(0.0, budget - margin))
+        logger.info(f"Request deadline set: {deadline.remaining():.2f}s budget")
+        return deadline
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        return self.remaining() <= 0
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """
+        Deadline that expires `seconds` earlier than this one.
+
+        Use it to leave room for later steps, e.g. chart generation must
+        finish early enough for the Bedrock call that follows it.
+        """
+        return Deadline(self.expires_at - seconds)
+
+    def check(self, operation: str, required: float = 0) -> None:
+        """
+        Fail fast if the remaining budget cannot cover an operation.
+
+        Args:
+            operation: Operation name for logs and errors
+            required: Minimum seconds the operation needs
+
+        Raises:
+            DeadlineExceeded: If fewer than `required` seconds remain (or the deadline passed)
+        """
+        remaining = self.remaining()
+        if remaining <= 0 or remaining < required:
+            logger.warning(f"Deadline check failed for {operation}: {remaining:.2f}s left, {required:.2f}s required")
+            raise DeadlineExceeded(operation, remaining, required)
+
+    def timeout(self, cap: float, operation: str = "downstream call", minimum: float = 0.1) -> float:
+        """
+        Per-call timeout derived from the remaining budget.
+
+        Args:
+            cap: Timeout the call would use without a deadline
+            operation: Operation name for logs and errors
+            minimum: Smallest timeout worth attempting the call with
+
+        Returns:
+            min(cap, remaining) in seconds
+
+        Raises:
+            DeadlineExceeded: If less than `minimum` seconds remain
+        """
+        self.check(operation, minimum)
+        return min(cap, self.remaining())
+
+
+# Local testing
+if __name__ == "__main__":
+    print("Testing Request Deadline\n")
+    print("=" * 60)
+
+    # Test 1: Gateway limit wins over a long Lambda timeout
+    print("\n[Test 1] Deadline from Lambda context")
+    print("-" * 60)
+
+    class MockContext:
+        aws_request_id = "test-deadline"
+
+        def get_remaining_time_in_millis(self):
+            return 90_000
+
+    deadline = Deadline.from_context(MockContext())
+    assert 27.5 < deadline.remaining() <= 28.0
+    print(f"Remaining: {deadline.remaining():.2f}s")
+    print("Test 1 passed")
+
+    # Test 2: Lambda remaining time wins when shorter
+    print("\n[Test 2] Short Lambda remaining time")
+    print("-" * 60)
+    MockContext.get_remaining_time_in_millis = lambda self: 5_000
+    deadline = Deadline.from_context(MockContext())
+    assert deadline.remaining() <= 4.0
+    print("Test 2 passed")
+
+    # Test 3: Contexts without timing info fall back to the gateway limit
+    print("\n[Test 3] Context without timing info")
+    print("-" * 60)
+    deadline = Deadline.from_context(None)
+    assert deadline.remaining() > 27
+    print("Test 3 passed")
+
+    # Test 4: Timeouts are capped by the remaining budget
+    print("\n[Test 4] Per-call timeouts")
+    print("-" * 60)
+    deadline = Deadline.after(2.0)
+    assert deadline.timeout(4) <= 2.0
+    assert deadline.timeout(0.5) == 0.5
+    assert deadline.reserve(1.5).remaining() <= 0.5
+    print("Test 4 passed")
+
+    # Test 5: Expired budgets fail fast
+    print("\n[Test 5] Fail fast when budget is exhausted")
+    print("-" * 60)
+    deadline = Deadline.after(0.2)
+    try:
+        deadline.check("bedrock invoke", required=3)
+        raise AssertionError("Should have raised DeadlineExceeded")
+    except DeadlineExceeded as e:
+        print(f"Correctly raised: {e}")
+    print("Test 5 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
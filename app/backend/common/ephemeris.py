@@ -0,0 +1,1181 @@
+"""
+Local ephemeris engine.
+Computes Astrologer-compatible natal chart data from truncated analytical series, with no network calls.
+
+Sources of the series:
+- Sun: VSOP87D, abridged (Meeus, Astronomical Algorithms ch. 32 and appendix III)
+- Moon: main periodic terms of the lunar longitude (Meeus ch. 47, ELP-2000/82 truncation)
+- Mercury-Neptune: osculating elements of date with the main Jupiter/Saturn/Uranus
+  perturbations (P. Schlyter, "Computing planetary positions")
+- Pluto: Fourier fit of date, valid 1800-2100 (P. Schlyter)
+- Mean node and mean apogee (Lilith): Meeus ch. 47, the apogee projected onto the ecliptic
+
+All angles are in degrees, tropical zodiac, apparent geocentric positions.
+"""
+
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+from common.aspects import chart_aspects
+from common.chart_providers import ChartProvider, ChartProviderError
+from common.deadline import Deadline
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Maximum error against the Astrologer API (Swiss Ephemeris) for 1900-2100,
+# checked against reference charts at both ends of the range (see `REFERENCE_CHARTS`)
+VALIDATION_TOLERANCE_ARCMIN = 5.0  # planets, nodes and Lilith
+ANGLES_TOLERANCE_ARCMIN = 2.0  # Ascendant, MC and house cusps
+
+# Placidus cusp iteration: convergence threshold (degrees) and iteration cap
+PLACIDUS_PRECISION = 1e-7
+PLACIDUS_MAX_ITERATIONS = 50
+
+# Zodiac metadata in Astrologer (Kerykeion) format
+SIGNS = ["Ari", "Tau", "Gem", "Can", "Leo", "Vir", "Lib", "Sco", "Sag", "Cap", "Aqu", "Pis"]
+SIGN_ELEMENTS = ["Fire", "Earth", "Air", "Water"] * 3
+SIGN_QUALITIES = ["Cardinal", "Fixed", "Mutable"] * 4
+SIGN_EMOJIS = ["♈️", "♉️", "♊️", "♋️", "♌️", "♍️", "♎️", "♏️", "♐️", "♑️", "♒️", "♓️"]
+
+HOUSE_NAMES = [
+    "First_House",
+    "Second_House",
+    "Third_House",
+    "Fourth_House",
+    "Fifth_House",
+    "Sixth_House",
+    "Seventh_House",
+    "Eighth_House",
+    "Ninth_House",
+    "Tenth_House",
+    "Eleventh_House",
+    "Twelfth_House",
+]
+HOUSE_KEYS = [name.lower() for name in HOUSE_NAMES]
+
+# Supported house systems (Swiss Ephemeris identifiers, as used by Astrologer)
+HOUSE_SYSTEMS = {
+    "P": "Placidus",
+    "O": "Porphyry",
+    "A": "Equal",
+    "W": "Whole Sign",
+}
+DEFAULT_HOUSE_SYSTEM = "P"
+
+# Bodies in output order: (data key, display name)
+BODIES = [
+    ("sun", "Sun"),
+    ("moon", "Moon"),
+    ("mercury", "Mercury"),
+    ("venus", "Venus"),
+    ("mars", "Mars"),
+    ("jupiter", "Jupiter"),
+    ("saturn", "Saturn"),
+    ("uranus", "Uranus"),
+    ("neptune", "Neptune"),
+    ("pluto", "Pluto"),
+    ("mean_node", "Mean_Node"),
+    ("mean_lilith", "Mean_Lilith"),
+]
+
+# Days from J2000.0 (2000 Jan 1.5 TT) and from Schlyter's epoch (2000 Jan 0.0)
+J2000 = 2451545.0
+SCHLYTER_EPOCH = 2451543.5
+
+# Light travel time per astronomical unit, in days
+LIGHT_TIME_DAYS_PER_AU = 0.0057755183
+
+# Mean inclination of the lunar orbit to the ecliptic (degrees)
+LUNAR_INCLINATION = 5.1453964
+
+# Delta T (TT - UT) in seconds at the start of each decade, 1900-2100; from 2040 as
+# predicted by Swiss Ephemeris
+_DELTA_T_YEARS = np.arange(1900, 2101, 10)
+_DELTA_T_SECONDS = np.array(
+    [-2.8, 10.4, 21.2, 24.0, 24.3, 29.1, 33.1, 40.2, 50.5, 56.9, 63.8, 66.1, 69.4, 71.0]
+    + [71.8, 74.6, 77.6, 81.0, 84.7, 88.8, 93.2]
+)
+
+# Earth's heliocentric longitude and radius vector, VSOP87D (ecliptic and equinox of date) as abridged
+# in Meeus appendix III. One array per power of time: (amplitude in 1e-8 rad or AU, phase in rad,
+# frequency in rad per Julian millennium)
+_EARTH_LONGITUDE = [
+    np.array(
+        [
+            (175347046, 0, 0),
+            (3341656, 4.6692568, 6283.07585),
+            (34894, 4.6261, 12566.1517),
+            (3497, 2.7441, 5753.3849),
+            (3418, 2.8289, 3.5231),
+            (3136, 3.6277, 77713.7715),
+            (2676, 4.4181, 7860.4194),
+            (2343, 6.1352, 3930.2097),
+            (1324, 0.7425, 11506.7698),
+            (1273, 2.0371, 529.691),
+            (1199, 1.1096, 1577.3435),
+            (990, 5.233, 5884.927),
+            (902, 2.045, 26.298),
+            (857, 3.508, 398.149),
+            (780, 1.179, 5223.694),
+            (753, 2.533, 5507.553),
+            (505, 4.583, 18849.228),
+            (492, 4.205, 775.523),
+            (357, 2.92, 0.067),
+            (317, 5.849, 11790.629),
+            (284, 1.899, 796.298),
+            (271, 0.315, 10977.079),
+            (243, 0.345, 5486.778),
+            (206, 4.806, 2544.314),
+            (205, 1.869, 5573.143),
+            (202, 2.458, 6069.777),
+            (156, 0.833, 213.299),
+            (132, 3.411, 2942.463),
+            (126, 1.083, 20.775),
+            (115, 0.645, 0.98),
+            (103, 0.636, 4694.003),
+            (102, 0.976, 15720.839),
+            (102, 4.267, 7.114),
+            (99, 6.21, 2146.17),
+            (98, 0.68, 155.42),
+            (86, 5.98, 161000.69),
+            (85, 1.3, 6275.96),
+            (85, 3.67, 71430.7),
+            (80, 1.81, 17260.15),
+            (79, 3.04, 12036.46),
+            (75, 1.76, 5088.63),
+            (74, 3.5, 3154.69),
+            (74, 4.68, 801.82),
+            (70, 0.83, 9437.76),
+            (62, 3.98, 8827.39),
+            (61, 1.82, 7084.9),
+            (57, 2.78, 6286.6),
+            (56, 4.39, 14143.5),
+            (56, 3.47, 6279.55),
+            (52, 0.19, 12139.55),
+            (52, 1.33, 1748.02),
+            (51, 0.28, 5856.48),
+            (49, 0.49, 1194.45),
+            (41, 5.37, 8429.24),
+            (41, 2.4, 19651.05),
+            (39, 6.17, 10447.39),
+            (37, 6.04, 10213.29),
+            (37, 2.57, 1059.38),
+            (36, 1.71, 2352.87),
+            (36, 1.78, 6812.77),
+            (33, 0.59, 17789.85),
+            (30, 0.44, 83996.85),
+            (30, 2.74, 1349.87),
+            (25, 3.16, 4690.48),
+        ],
+        dtype=float,
+    ),
+    np.array(
+        [
+            (628331966747, 0, 0),
+            (206059, 2.678235, 6283.07585),
+            (4303, 2.6351, 12566.1517),
+            (425, 1.59, 3.523),
+            (119, 5.796, 26.298),
+            (109, 2.966, 1577.344),
+            (93, 2.59, 18849.23),
+            (72, 1.14, 529.69),
+            (68, 1.87, 398.15),
+            (67, 4.41, 5507.55),
+            (59, 2.89, 5223.69),
+            (56, 2.17, 155.42),
+            (45, 0.4, 796.3),
+            (36, 0.47, 775.52),
+            (29, 2.65, 7.11),
+            (21, 5.34, 0.98),
+            (19, 1.85, 5486.78),
+            (19, 4.97, 213.3),
+            (17, 2.99, 6275.96),
+            (16, 0.03, 2544.31),
+            (16, 1.43, 2146.17),
+            (15, 1.21, 10977.08),
+            (12, 2.83, 1748.02),
+            (12, 3.26, 5088.63),
+            (12, 5.27, 1194.45),
+            (12, 2.08, 4694.0),
+            (11, 0.77, 553.57),
+            (10, 1.3, 6286.6),
+            (10, 4.24, 1349.87),
+            (9, 2.7, 242.73),
+            (9, 5.64, 951.72),
+            (8, 5.3, 2352.87),
+            (6, 2.65, 9437.76),
+            (6, 4.67, 4690.48),
+        ],
+        dtype=float,
+    ),
+    np.array(
+        [
+            (52919, 0, 0),
+            (8720, 1.0721, 6283.0758),
+            (309, 0.867, 12566.152),
+            (27, 0.05, 3.52),
+            (16, 5.19, 26.3),
+            (16, 3.68, 155.42),
+            (10, 0.76, 18849.23),
+            (9, 2.06, 77713.77),
+            (7, 0.83, 775.52),
+            (5, 4.66, 1577.34),
+            (4, 1.03, 7.11),
+            (4, 3.44, 5573.14),
+            (3, 5.14, 796.3),
+            (3, 6.05, 5507.55),
+            (3, 1.19, 242.73),
+            (3, 6.12, 529.69),
+            (3, 0.31, 398.15),
+            (3, 2.28, 553.57),
+            (2, 4.38, 5223.69),
+            (2, 3.75, 0.98),
+        ],
+        dtype=float,
+    ),
+    np.array(
+        [
+            (289, 5.844, 6283.076),
+            (35, 0, 0),
+            (17, 5.49, 12566.15),
+            (3, 5.2, 155.42),
+            (1, 4.72, 3.52),
+            (1, 5.3, 18849.23),
+            (1, 5.97, 242.73),
+        ],
+        dtype=float,
+    ),
+    np.array([(114, 3.142, 0), (8, 4.13, 6283.08), (1, 3.84, 12566.15)], dtype=float),
+    np.array([(1, 3.14, 0)], dtype=float),
+]
+_EARTH_RADIUS = [
+    np.array(
+        [
+            (100013989, 0, 0),
+            (1670700, 3.0984635, 6283.07585),
+            (13956, 3.05525, 12566.1517),
+            (3084, 5.1985, 77713.7715),
+            (1628, 1.1739, 5753.3849),
+            (1576, 2.8469, 7860.4194),
+            (925, 5.453, 11506.77),
+            (542, 4.564, 3930.21),
+            (472, 3.661, 5884.927),
+            (346, 0.964, 5507.553),
+            (329, 5.9, 5223.694),
+            (307, 0.299, 5573.143),
+            (243, 4.273, 11790.629),
+            (212, 5.847, 1577.344),
+            (186, 5.022, 10977.079),
+            (175, 3.012, 18849.228),
+            (110, 5.055, 5486.778),
+            (98, 0.89, 6069.78),
+            (86, 5.69, 15720.84),
+            (86, 1.27, 161000.69),
+            (65, 0.27, 17260.15),
+            (63, 0.92, 529.69),
+            (57, 2.01, 83996.85),
+            (56, 5.24, 71430.7),
+            (49, 3.25, 2544.31),
+            (47, 2.58, 775.52),
+            (45, 5.54, 9437.76),
+            (43, 6.01, 6275.96),
+            (39, 5.36, 4694.0),
+            (38, 2.39, 8827.39),
+            (37, 0.83, 19651.05),
+            (37, 4.9, 12139.55),
+            (36, 1.67, 12036.46),
+            (35, 1.84, 2942.46),
+            (33, 0.24, 7084.9),
+            (32, 0.18, 5088.63),
+            (32, 1.78, 398.15),
+            (28, 1.21, 6286.6),
+            (28, 1.9, 6279.55),
+            (26, 4.59, 10447.39),
+        ],
+        dtype=float,
+    ),
+    np.array(
+        [
+            (103019, 1.10749, 6283.07585),
+            (1721, 1.0644, 12566.1517),
+            (702, 3.142, 0),
+            (32, 1.02, 18849.23),
+            (31, 2.84, 5507.55),
+            (25, 1.32, 5223.69),
+            (18, 1.42, 1577.34),
+            (10, 5.91, 10977.08),
+            (9, 1.42, 6275.96),
+            (9, 0.27, 5486.78),
+        ],
+        dtype=float,
+    ),
+    np.array(
+        [
+            (4359, 5.7846, 6283.0758),
+            (124, 5.579, 12566.152),
+            (12, 3.14, 0),
+            (9, 3.63, 77713.77),
+            (6, 1.87, 5573.14),
+            (3, 5.47, 18849.23),
+        ],
+        dtype=float,
+    ),
+    np.array([(145, 4.273, 6283.076), (7, 3.92, 12566.15)], dtype=float),
+    np.array([(4, 2.56, 6283.08)], dtype=float),
+]
+
+# Moon longitude terms: multiples of D, M, M', F and sine coefficient in 1e-6 degrees
+_MOON_TERMS = np.array(
+    [
+        (0, 0, 1, 0, 6288774),
+        (2, 0, -1, 0, 1274027),
+        (2, 0, 0, 0, 658314),
+        (0, 0, 2, 0, 213618),
+        (0, 1, 0, 0, -185116),
+        (0, 0, 0, 2, -114332),
+        (2, 0, -2, 0, 58793),
+        (2, -1, -1, 0, 57066),
+        (2, 0, 1, 0, 53322),
+        (2, -1, 0, 0, 45758),
+        (0, 1, -1, 0, -40923),
+        (1, 0, 0, 0, -34720),
+        (0, 1, 1, 0, -30383),
+        (2, 0, 0, -2, 15327),
+        (0, 0, 1, 2, -12528),
+        (0, 0, 1, -2, 10980),
+        (4, 0, -1, 0, 10675),
+        (0, 0, 3, 0, 10034),
+        (4, 0, -2, 0, 8548),
+        (2, 1, -1, 0, -7888),
+        (2, 1, 0, 0, -6766),
+        (1, 0, -1, 0, -5163),
+        (1, 1, 0, 0, 4987),
+        (2, -1, 1, 0, 4036),
+        (2, 0, 2, 0, 3994),
+        (4, 0, 0, 0, 3861),
+        (2, 0, -3, 0, 3665),
+        (0, 1, -2, 0, -2689),
+        (2, 0, -1, 2, -2602),
+        (2, -1, -2, 0, 2390),
+        (1, 0, 1, 0, -2348),
+        (2, -2, 0, 0, 2236),
+        (0, 1, 2, 0, -2120),
+        (0, 2, 0, 0, -2069),
+        (2, -2, -1, 0, 2048),
+        (2, 0, 1, -2, -1773),
+        (2, 0, 0, 2, -1595),
+        (4, -1, -1, 0, 1215),
+        (0, 0, 2, 2, -1110),
+        (3, 0, -1, 0, -892),
+        (2, 1, 1, 0, -810),
+        (4, -1, -2, 0, 759),
+        (0, 2, -1, 0, -713),
+        (2, 2, -1, 0, -700),
+        (2, 1, -2, 0, 691),
+        (2, -1, 0, -2, 596),
+        (4, 0, 1, 0, 549),
+        (0, 0, 4, 0, 537),
+        (4, -1, 0, 0, 520),
+        (1, 0, -2, 0, -487),
+        (2, 1, 0, -2, -399),
+        (0, 0, 2, -2, -381),
+        (1, 1, 1, 0, 351),
+        (3, 0, -2, 0, -340),
+        (4, 0, -3, 0, 330),
+        (2, -1, 2, 0, 327),
+        (0, 2, 1, 0, -323),
+        (1, 1, -1, 0, 299),
+        (2, 0, 3, 0, 294),
+    ],
+    dtype=float,
+)
+
+_MOON_MULTIPLES = _MOON_TERMS[:, :4].T
+_MOON_COEFFS = np.array([np.where(np.abs(_MOON_TERMS[:, 1]) == power, _MOON_TERMS[:, 4], 0.0) for power in range(3)])
+
+# Orbital elements of date for Mercury..Neptune: value at epoch and rate per day
+# Columns: N (node), i (inclination), w (arg. of perihelion), a (AU), e, M (mean anomaly)
+_ELEMENTS = np.array(
+    [
+        [48.3313, 7.0047, 29.1241, 0.387098, 0.205635, 168.6562],
+        [76.6799, 3.3946, 54.8910, 0.723330, 0.006773, 48.0052],
+        [49.5574, 1.8497, 286.5016, 1.523688, 0.093405, 18.6021],
+        [100.4542, 1.3030, 273.8777, 5.20256, 0.048498, 19.8950],
+        [113.6634, 2.4886, 339.3939, 9.55475, 0.055546, 316.9670],
+        [74.0005, 0.7733, 96.6612, 19.18171, 0.047318, 142.5905],
+        [131.7806, 1.7700, 272.8461, 30.05826, 0.008606, 260.2471],
+    ]
+)
+_ELEMENT_RATES = np.array(
+    [
+        [3.24587e-5, 5.00e-8, 1.01444e-5, 0.0, 5.59e-10, 4.0923344368],
+        [2.46590e-5, 2.75e-8, 1.38374e-5, 0.0, -1.302e-9, 1.6021302244],
+        [2.11081e-5, -1.78e-8, 2.92961e-5, 0.0, 2.516e-9, 0.5240207766],
+        [2.76854e-5, -1.557e-7, 1.64505e-5, 0.0, 4.469e-9, 0.0830853001],
+        [2.38980e-5, -1.081e-7, 2.97661e-5, 0.0, -9.499e-9, 0.0334442282],
+        [1.3978e-5, 1.9e-8, 3.0565e-5, -1.55e-8, 7.45e-9, 0.011725806],
+        [3.0173e-5, -2.55e-7, -6.027e-6, 3.313e-8, 2.15e-9, 0.005995147],
+    ]
+)
+
+# Pluto Fourier series (ecliptic of date): cos/sin coefficients of k*P for k = 1..6
+_PLUTO_LON_SIN = np.array([-19.799, 0.897, 0.610, -0.341, 0.128, -0.038])
+_PLUTO_LON_COS = np.array([19.848, -4.956, 1.211, -0.190, -0.034, 0.031])
+_PLUTO_LAT_SIN = np.array([-5.453, 3.527, -1.051, 0.179, 0.019, -0.031])
+_PLUTO_LAT_COS = np.array([-14.975, 1.673, 0.328, -0.292, 0.100, -0.026])
+_PLUTO_R_SIN = np.array([6.68, -1.18, 0.15, 0.0, 0.0, 0.0])
+_PLUTO_R_COS = np.array([6.90, -0.03, -0.14, 0.0, 0.0, 0.0])
+
+# Jupiter/Saturn/Uranus perturbations: sine terms in multiples of their mean anomalies
+# Columns: body (3 Jupiter, 4 Saturn, 5 Uranus), coordinate (0 lon, 1 lat), coefficient (deg),
+# multiples of Mj, Ms, Mu, phase (deg); cosine terms are stored with +90 deg phase
+_PERTURBATIONS = np.array(
+    [
+        (3, 0, -0.332, 2, -5, 0, -67.6),
+        (3, 0, -0.056, 2, -2, 0, 21),
+        (3, 0, 0.042, 3, -5, 0, 21),
+        (3, 0, -0.036, 1, -2, 0, 0),
+        (3, 0, 0.022, 1, -1, 0, 90),
+        (3, 0, 0.023, 2, -3, 0, 52),
+        (3, 0, -0.016, 1, -5, 0, -69),
+        (4, 0, 0.812, 2, -5, 0, -67.6),
+        (4, 0, -0.229, 2, -4, 0, 88),
+        (4, 0, 0.119, 1, -2, 0, -3),
+        (4, 0, 0.046, 2, -6, 0, -69),
+        (4, 0, 0.014, 1, -3, 0, 32),
+        (4, 1, -0.020, 2, -4, 0, 88),
+        (4, 1, 0.018, 2, -6, 0, -49),
+        (5, 0, 0.040, 0, 1, -2, 6),
+        (5, 0, 0.035, 0, 1, -3, 33),
+        (5, 0, -0.015, 1, 0, -1, 20),
+    ]
+)
+_PERTURBATION_COEFFS = _PERTURBATIONS[:, 2]
+_PERTURBATION_MULTIPLES = _PERTURBATIONS[:, 3:6]
+_PERTURBATION_PHASES = _PERTURBATIONS[:, 6]
+_PERTURBATION_LON = np.zeros((len(_PERTURBATIONS), 7))
+_PERTURBATION_LAT = np.zeros((len(_PERTURBATIONS), 7))
+for _row, (_body, _coordinate) in enumerate(_PERTURBATIONS[:, :2].astype(int)):
+    (_PERTURBATION_LAT if _coordinate else _PERTURBATION_LON)[_row, _body] = 1.0
+
+_RAD = math.pi / 180
+
+
+def julian_day(moment: datetime) -> float:
+    """
+    Julian Day (UT) of a datetime.
+
+    Args:
+        moment: Timezone-aware datetime (naive datetimes are treated as UTC)
+
+    Returns:
+        Julian Day number
+    """
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp() / 86400.0 + 2440587.5
+
+
+def delta_t_days(jd_ut: np.ndarray) -> np.ndarray:
+    """TT - UT in days, interpolated from decade values (held flat outside 1900-2100)."""
+    year = 2000.0 + (np.asarray(jd_ut) - J2000) / 365.25
+    return np.interp(year, _DELTA_T_YEARS, _DELTA_T_SECONDS) / 86400.0
+
+
+def _nutation(T: np.ndarray):
+    """Nutation in longitude and obliquity (degrees), main terms only."""
+    omega = (125.04452 - 1934.136261 * T) * _RAD
+    sun_mean = (280.4665 + 36000.7698 * T) * _RAD
+    moon_mean = (218.3165 + 481267.8813 * T) * _RAD
+    dpsi = (
+        -17.20 * np.sin(omega) - 1.32 * np.sin(2 * sun_mean) - 0.23 * np.sin(2 * moon_mean) + 0.21 * np.sin(2 * omega)
+    ) / 3600
+    deps = (
+        9.20 * np.cos(omega) + 0.57 * np.cos(2 * sun_mean) + 0.10 * np.cos(2 * moon_mean) - 0.09 * np.cos(2 * omega)
+    ) / 3600
+    return dpsi, deps
+
+
+def _true_obliquity(T: np.ndarray, deps: np.ndarray) -> np.ndarray:
+    """True obliquity of the ecliptic (degrees)."""
+    mean = 23.43929111 - (46.8150 * T + 0.00059 * T**2 - 0.001813 * T**3) / 3600
+    return mean + deps
+
+
+def _vsop_series(series: List[np.ndarray], tau: np.ndarray) -> np.ndarray:
+    """Sum of a VSOP87 series, sum over n of tau^n * sum(A cos(B + C tau)) (rad or AU)."""
+    total = np.zeros_like(tau)
+    for power, terms in enumerate(series):
+        total += tau**power * (np.cos(terms[:, 1] + np.outer(tau, terms[:, 2])) @ terms[:, 0])
+    return total / 1e8
+
+
+def _sun(T: np.ndarray):
+    """
+    Geometric (true) geocentric longitude of the Sun and Earth-Sun distance.
+
+    Returns:
+        (true longitude in degrees, FK5 system, distance in AU)
+    """
+    tau = T / 10
+    longitude = np.degrees(_vsop_series(_EARTH_LONGITUDE, tau)) + 180
+    # VSOP87 to FK5 (Meeus eq. 32.3; the latitude-dependent part is below 0.001")
+    return (longitude - 0.09033 / 3600) % 360, _vsop_series(_EARTH_RADIUS, tau)
+
+
+def _moon(T: np.ndarray) -> np.ndarray:
+    """Geometric geocentric longitude of the Moon (degrees, mean equinox of date)."""
+    Lp = 218.3164477 + 481267.88123421 * T - 0.0015786 * T**2 + T**3 / 538841 - T**4 / 65194000
+    D = 297.8501921 + 445267.1114034 * T - 0.0018819 * T**2 + T**3 / 545868 - T**4 / 113065000
+    M = 357.5291092 + 35999.0502909 * T - 0.0001536 * T**2 + T**3 / 24490000
+    Mp = 134.9633964 + 477198.8675055 * T + 0.0087414 * T**2 + T**3 / 69699 - T**4 / 14712000
+    F = 93.2720950 + 483202.0175233 * T - 0.0036539 * T**2 - T**3 / 3526000 + T**4 / 863310000
+    E = 1 - 0.002516 * T - 0.0000074 * T**2
+
+    # All periodic terms at once; terms in M are scaled by E (|M| = 1) or E^2 (|M| = 2)
+    sines = np.sin((np.column_stack([D, M, Mp, F]) % 360 * _RAD) @ _MOON_MULTIPLES)
+    sigma = sines @ _MOON_COEFFS[0] + E * (sines @ _MOON_COEFFS[1]) + E**2 * (sines @ _MOON_COEFFS[2])
+
+    A1 = (119.75 + 131.849 * T) * _RAD
+    A2 = (53.09 + 479264.290 * T) * _RAD
+    sigma += 3958 * np.sin(A1) + 1962 * np.sin((Lp - F) * _RAD) + 318 * np.sin(A2)
+
+    return (Lp + sigma / 1e6) % 360
+
+
+def _mean_node(T: np.ndarray) -> np.ndarray:
+    """Longitude of the Moon's mean ascending node (degrees)."""
+    return (125.0445479 - 1934.1362891 * T + 0.0020754 * T**2 + T**3 / 467441 - T**4 / 60616000) % 360
+
+
+def _mean_lilith(T: np.ndarray) -> np.ndarray:
+    """
+    Longitude of the Moon's mean apogee, "Black Moon Lilith" (degrees).
+
+    The apogee lies in the plane of the lunar orbit. Like Swiss Ephemeris, it
+    is projected onto the ecliptic from the mean node, which moves it by up to
+    7' (tan^2(i/2) sin 2u, u the apogee's distance from the node).
+    """
+    perigee = 83.3532465 + 4069.0137287 * T - 0.0103200 * T**2 - T**3 / 80053 + T**4 / 18999000
+    node = _mean_node(T)
+    u = (perigee + 180 - node) * _RAD
+    return (node + np.degrees(np.arctan2(np.cos(LUNAR_INCLINATION * _RAD) * np.sin(u), np.cos(u)))) % 360
+
+
+def _kepler(M: np.ndarray, e: np.ndarray) -> np.ndarray:
+    """Solve Kepler's equation for the eccentric anomaly (radians), vectorized."""
+    E = M + e * np.sin(M) * (1 + e * np.cos(M))
+    for _ in range(5):
+        E = E - (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+    return E
+
+
+def _heliocentric_planets(d: np.ndarray):
+    """
+    Heliocentric ecliptic coordinates of Mercury..Neptune (equinox of date).
+
+    Args:
+        d: Days since 2000 Jan 0.0 TT, shape (n,)
+
+    Returns:
+        (x, y, z) arrays of shape (n, 7) in AU
+    """
+    N, i, w, a, e, M = _ELEMENTS.T[:, None, :] + _ELEMENT_RATES.T[:, None, :] * d[None, :, None]
+
+    E = _kepler((M % 360) * _RAD, e)
+    xv = a * (np.cos(E) - e)
+    yv = a * np.sqrt(1 - e**2) * np.sin(E)
+    v = np.arctan2(yv, xv)
+    r = np.hypot(xv, yv)
+
+    Nr, ir, u = N * _RAD, i * _RAD, v + w * _RAD
+    x = r * (np.cos(Nr) * np.cos(u) - np.sin(Nr) * np.sin(u) * np.cos(ir))
+    y = r * (np.sin(Nr) * np.cos(u) + np.cos(Nr) * np.sin(u) * np.cos(ir))
+    z = r * np.sin(u) * np.sin(ir)
+
+    lon = np.arctan2(y, x) / _RAD
+    lat = np.arctan2(z, np.hypot(x, y)) / _RAD
+
+    # Main mutual perturbations of Jupiter, Saturn and Uranus, all terms in one pass
+    arguments = (M[..., 3:6] @ _PERTURBATION_MULTIPLES.T + _PERTURBATION_PHASES) * _RAD
+    terms = _PERTURBATION_COEFFS * np.sin(arguments)
+    lon += terms @ _PERTURBATION_LON
+    lat += terms @ _PERTURBATION_LAT
+
+    lon_r, lat_r = lon * _RAD, lat * _RAD
+    return r * np.cos(lon_r) * np.cos(lat_r), r * np.sin(lon_r) * np.cos(lat_r), r * np.sin(lat_r)
+
+
+def _heliocentric_pluto(d: np.ndarray):
+    """Heliocentric ecliptic coordinates of Pluto (equinox of date), valid 1800-2100."""
+    S = (50.03 + 0.033459652 * d) * _RAD
+    P = (238.95 + 0.003968789 * d) * _RAD
+    kP = P[..., None] * np.arange(1, 7)
+    sin_kP, cos_kP = np.sin(kP), np.cos(kP)
+
+    lon = (
+        238.9508
+        + 0.00400703 * d
+        + sin_kP @ _PLUTO_LON_SIN
+        + cos_kP @ _PLUTO_LON_COS
+        + 0.020 * np.sin(S - P)
+        - 0.010 * np.cos(S - P)
+    )
+    lat = -3.9082 + sin_kP @ _PLUTO_LAT_SIN + cos_kP @ _PLUTO_LAT_COS + 0.011 * np.cos(S - P)
+    r = 40.72 + sin_kP @ _PLUTO_R_SIN + cos_kP @ _PLUTO_R_COS
+
+    lon_r, lat_r = lon * _RAD, lat * _RAD
+    return r * np.cos(lon_r) * np.cos(lat_r), r * np.sin(lon_r) * np.cos(lat_r), r * np.sin(lat_r)
+
+
+def _geocentric_planets(d: np.ndarray, sun_lon: np.ndarray, sun_dist: np.ndarray):
+    """
+    Geometric geocentric longitudes and distances of Mercury..Pluto.
+
+    Returns:
+        (longitudes in degrees, distances in AU), both of shape (n, 8)
+    """
+    x, y, z = _heliocentric_planets(d)
+    px, py, pz = _heliocentric_pluto(d)
+    sun_r = sun_lon * _RAD
+    x = np.column_stack([x, px]) + (sun_dist * np.cos(sun_r))[:, None]
+    y = np.column_stack([y, py]) + (sun_dist * np.sin(sun_r))[:, None]
+    z = np.column_stack([z, pz])
+    return np.arctan2(y, x) / _RAD % 360, np.sqrt(x**2 + y**2 + z**2)
+
+
+def body_positions(jd_ut, step: float = 0.5):
+    """
+    Apparent geocentric ecliptic longitudes and daily motion of every body in BODIES.
+
+    Positions are evaluated at jd - step, jd and jd + step in one vectorized
+    pass. The central difference gives the apparent daily motion (negative
+    means retrograde), which also yields light-time and aberration together:
+    a body is seen where it was `distance * LIGHT_TIME_DAYS_PER_AU` days ago.
+
+    Args:
+        jd_ut: Julian Day (UT), scalar or array of shape (n,)
+        step: Half-width of the motion estimate in days
+
+    Returns:
+        (longitudes, speeds): arrays of shape (n, len(BODIES)), in degrees [0, 360)
+        and degrees per day
+    """
+    jd_ut = np.atleast_1d(np.asarray(jd_ut, dtype=float))
+    count = len(jd_ut)
+    jd_ut = np.concatenate([jd_ut - step, jd_ut, jd_ut + step])
+    jd_tt = jd_ut + delta_t_days(jd_ut)
+    T = (jd_tt - J2000) / 36525
+
+    sun_lon, sun_dist = _sun(T)
+    planets, planet_dist = _geocentric_planets(jd_tt - SCHLYTER_EPOCH, sun_lon, sun_dist)
+    geometric = np.column_stack([sun_lon, _moon(T), planets, _mean_node(T), _mean_lilith(T)])
+
+    before, now, after = geometric[:count], geometric[count : 2 * count], geometric[2 * count :]
+    speeds = (((after - before) + 180) % 360 - 180) / (2 * step)
+
+    # Light-time and aberration for the Sun and planets (negligible for the Moon and lunar points)
+    distances = np.zeros_like(now)
+    distances[:, 0] = sun_dist[count : 2 * count]
+    distances[:, 2:10] = planet_dist[count : 2 * count]
+    dpsi, _ = _nutation(T[count : 2 * count])
+    longitudes = now - speeds * distances * LIGHT_TIME_DAYS_PER_AU + dpsi[:, None]
+    return longitudes % 360, speeds
+
+
+def body_longitudes(jd_ut) -> np.ndarray:
+    """
+    Apparent geocentric ecliptic longitudes of every body in BODIES.
+
+    Args:
+        jd_ut: Julian Day (UT), scalar or array of shape (n,)
+
+    Returns:
+        Array of shape (n, len(BODIES)) in degrees [0, 360)
+    """
+    return body_positions(jd_ut)[0]
+
+
+def sidereal_angles(jd_ut: float, latitude: float, longitude: float):
+    """
+    Local sidereal angle (RAMC), obliquity, Ascendant and Midheaven.
+
+    Args:
+        jd_ut: Julian Day (UT)
+        latitude: Geographic latitude in degrees (north positive)
+        longitude: Geographic longitude in degrees (east positive)
+
+    Returns:
+        (ramc, obliquity, ascendant, midheaven) in degrees
+    """
+    T_ut = (jd_ut - J2000) / 36525
+    T = (jd_ut + float(delta_t_days(jd_ut)) - J2000) / 36525
+    dpsi, deps = _nutation(np.asarray(T))
+    eps = float(_true_obliquity(np.asarray(T), deps))
+
+    gmst = 280.46061837 + 360.98564736629 * (jd_ut - J2000) + 0.000387933 * T_ut**2 - T_ut**3 / 38710000
+    ramc = (gmst + float(dpsi) * math.cos(eps * _RAD) + longitude) % 360
+
+    ramc_r, eps_r, lat_r = ramc * _RAD, eps * _RAD, latitude * _RAD
+    mc = math.atan2(math.sin(ramc_r), math.cos(ramc_r) * math.cos(eps_r)) / _RAD % 360
+    asc = (
+        math.atan2(
+            math.cos(ramc_r),
+            -(math.sin(ramc_r) * math.cos(eps_r) + math.tan(lat_r) * math.sin(eps_r)),
+        )
+        / _RAD
+        % 360
+    )
+    return ramc, eps, asc, mc
+
+
+def house_cusps(jd_ut: float, latitude: float, longitude: float, system: str = DEFAULT_HOUSE_SYSTEM):
+    """
+    Compute the 12 house cusps.
+
+    Placidus is undefined inside the polar circles; there it falls back to
+    Porphyry, like the Swiss Ephemeris does.
+
+    Args:
+        jd_ut: Julian Day (UT)
+        latitude: Geographic latitude in degrees
+        longitude: Geographic longitude in degrees (east positive)
+        system: House system identifier (see HOUSE_SYSTEMS)
+
+    Returns:
+        (cusps, ascendant, midheaven, system): cusps is a list of 12 longitudes,
+        system is the identifier actually used
+
+    Raises:
+        ValueError: If the house system is not supported
+    """
+    if system not in HOUSE_SYSTEMS:
+        raise ValueError(f"Unsupported house system: {system}")
+
+    ramc, eps, asc, mc = sidereal_angles(jd_ut, latitude, longitude)
+
+    if system == "P" and abs(latitude) >= 90 - eps:
+        system = "O"
+
+    if system == "A":
+        cusps = [(asc + 30 * k) % 360 for k in range(12)]
+    elif system == "W":
+        cusps = [(math.floor(asc / 30) * 30 + 30 * k) % 360 for k in range(12)]
+    elif system == "O":
+        cusps = _porphyry_cusps(asc, mc)
+    else:
+        cusps = _placidus_cusps(ramc, eps, latitude, asc, mc)
+
+    return cusps, asc, mc, system
+
+
+def _porphyry_cusps(asc: float, mc: float) -> List[float]:
+    """Trisect each quadrant along the ecliptic."""
+    lower = (mc + 180 - asc) % 360
+    upper = (asc - mc) % 360
+    c2, c3 = asc + lower / 3, asc + 2 * lower / 3
+    c11, c12 = mc + upper / 3, mc + 2 * upper / 3
+    return _cusps_from_quadrants(asc, mc, c11, c12, c2, c3)
+
+
+def _placidus_cusps(ramc: float, eps: float, latitude: float, asc: float, mc: float) -> List[float]:
+    """
+    Placidus cusps by semi-arc trisection, solved iteratively for cusps 11, 12, 2, 3.
+
+    Cusps 11/12 lie 1/3 and 2/3 of their diurnal semi-arc after the RAMC;
+    cusps 3/2 lie 1/3 and 2/3 of their nocturnal semi-arc before the RAIC.
+    """
+    sin_eps, cos_eps = math.sin(eps * _RAD), math.cos(eps * _RAD)
+    tan_lat = math.tan(latitude * _RAD)
+    cusps = []
+    for fraction, above in ((1 / 3, True), (2 / 3, True), (2 / 3, False), (1 / 3, False)):
+        lon = None
+        ra = ramc + 90 * fraction if above else ramc + 180 - 90 * fraction
+        for _ in range(PLACIDUS_MAX_ITERATIONS):
+            previous = lon
+            lon = math.atan2(math.sin(ra * _RAD), math.cos(ra * _RAD) * cos_eps) / _RAD
+            if previous is not None and abs(lon - previous) < PLACIDUS_PRECISION:
+                break
+            declination = math.asin(sin_eps * math.sin(lon * _RAD))
+            ascensional_difference = math.asin(max(-1.0, min(1.0, tan_lat * math.tan(declination)))) / _RAD
+            if above:
+                ra = ramc + fraction * (90 + ascensional_difference)
+            else:
+                ra = ramc + 180 - fraction * (90 - ascensional_difference)
+        cusps.append(lon)
+    c11, c12, c2, c3 = cusps
+    return _cusps_from_quadrants(asc, mc, c11, c12, c2, c3)
+
+
+def _cusps_from_quadrants(asc: float, mc: float, c11: float, c12: float, c2: float, c3: float) -> List[float]:
+    """All 12 cusps from the eastern cusps; the western ones are their opposites."""
+    eastern = [asc, c2, c3, mc + 180, c11 + 180, c12 + 180]
+    return [cusp % 360 for cusp in eastern] + [(cusp + 180) % 360 for cusp in eastern]
+
+
+def house_of(longitude: float, cusps: List[float]) -> int:
+    """Zero-based index of the house containing an ecliptic longitude."""
+    for index in range(12):
+        width = (cusps[(index + 1) % 12] - cusps[index]) % 360
+        if (longitude - cusps[index]) % 360 < width:
+            return index
+    return 0
+
+
+def _point(name: str, abs_pos: float, point_type: str, house: Optional[int] = None, retrograde: bool = False):
+    """Build one chart point in Astrologer (Kerykeion) format."""
+    sign_num = int(abs_pos // 30) % 12
+    point = {
+        "name": name,
+        "quality": SIGN_QUALITIES[sign_num],
+        "element": SIGN_ELEMENTS[sign_num],
+        "sign": SIGNS[sign_num],
+        "sign_num": sign_num,
+        "position": abs_pos - sign_num * 30,
+        "abs_pos": abs_pos,
+        "emoji": SIGN_EMOJIS[sign_num],
+        "point_type": point_type,
+    }
+    if house is not None:
+        point["house"] = HOUSE_NAMES[house]
+    if point_type == "Planet":
+        point["retrograde"] = retrograde
+    return point
+
+
+def _lunar_phase(sun_lon: float, moon_lon: float) -> Dict[str, Any]:
+    """Lunar phase day (1-28) and name from the Sun-Moon elongation."""
+    elongation = (moon_lon - sun_lon) % 360
+    names = [
+        "New Moon",
+        "Waxing Crescent",
+        "First Quarter",
+        "Waxing Gibbous",
+        "Full Moon",
+        "Waning Gibbous",
+        "Last Quarter",
+        "Waning Crescent",
+    ]
+    return {
+        "degrees_between_s_m": elongation,
+        "moon_phase": int(elongation // (360 / 28)) + 1,
+        "moon_phase_name": names[int(((elongation + 22.5) % 360) // 45)],
+    }
+
+
+def compute_chart(
+    birth_local: datetime,
+    latitude: float,
+    longitude: float,
+    tz_str: str,
+    house_system: str = DEFAULT_HOUSE_SYSTEM,
+    name: str = "User",
+    city: str = "",
+    nation: str = "",
+) -> Dict[str, Any]:
+    """
+    Compute a natal chart in the same shape as the Astrologer API response.
+
+    Args:
+        birth_local: Naive local birth datetime (wall-clock time at the birth place)
+        latitude: Birth latitude in degrees (north positive)
+        longitude: Birth longitude in degrees (east positive)
+        tz_str: IANA timezone of the birth place (e.g., "America/New_York")
+        house_system: House system identifier (default: "P", Placidus)
+        name: Subject name
+        city: Birth city (informational)
+        nation: ISO country code (informational)
+
+    Returns:
+        Dict with `status`, `data` (subject info, planets, houses, angles) and
+        `aspects`, matching the fields BedrockClient reads from Astrologer charts
+
+    Example:
+        >>> chart = compute_chart(datetime(1990, 1, 15, 14, 30), 40.71, -74.01, "America/New_York")
+        >>> chart["data"]["sun"]["sign"]
+        'Cap'
+    """
+    local = birth_local.replace(tzinfo=ZoneInfo(tz_str))
+    utc = local.astimezone(timezone.utc)
+    jd = julian_day(utc)
+
+    longitudes, speeds = body_positions(jd)
+    current, motion = longitudes[0].tolist(), speeds[0].tolist()
+
+    cusps, asc, mc, system = house_cusps(jd, latitude, longitude, house_system)
+
+    data = {
+        "name": name,
+        "year": birth_local.year,
+        "month": birth_local.month,
+        "day": birth_local.day,
+        "hour": birth_local.hour,
+        "minute": birth_local.minute,
+        "city": city,
+        "nation": nation,
+        "lng": longitude,
+        "lat": latitude,
+        "tz_str": tz_str,
+        "zodiac_type": "Tropic",
+        "houses_system_identifier": system,
+        "houses_system_name": HOUSE_SYSTEMS[system],
+        "perspective_type": "Apparent Geocentric",
+        "iso_formatted_local_datetime": local.isoformat(),
+        "iso_formatted_utc_datetime": utc.isoformat(),
+        "julian_day": jd,
+    }
+
+    for index, (key, display_name) in enumerate(BODIES):
+        abs_pos = current[index]
+        data[key] = _point(display_name, abs_pos, "Planet", house_of(abs_pos, cusps), motion[index] < 0)
+
+    for index, key in enumerate(HOUSE_KEYS):
+        data[key] = _point(HOUSE_NAMES[index], float(cusps[index]), "House")
+
+    data["ascendant"] = _point("Ascendant", asc, "AxialCusps", 0)
+    data["descendant"] = _point("Descendant", (asc + 180) % 360, "AxialCusps", 6)
+    data["medium_coeli"] = _point("Medium_Coeli", mc, "AxialCusps", house_of(mc, cusps))
+    data["imum_coeli"] = _point("Imum_Coeli", (mc + 180) % 360, "AxialCusps", house_of((mc + 180) % 360, cusps))
+
+    data["lunar_phase"] = _lunar_phase(current[0], current[1])
+
+    chart = {"status": "OK", "data": data}
+    chart["aspects"] = chart_aspects(chart)
+    return chart
+
+
+class LocalEphemerisProvider(ChartProvider):
+    """
+    Computes the chart in-process with the local ephemeris.
+
+    Needs the resolved birth coordinates and timezone on the profile
+    (`birth_lat`, `birth_lng`, `birth_tz`). Profiles without them raise
+    ChartProviderError so the fallback chain moves on to the next provider.
+    No SVG is rendered, so results carry an empty `svg_content`.
+    """
+
+    name = "local_ephemeris"
+
+    def __init__(self, house_system: str = DEFAULT_HOUSE_SYSTEM):
+        if house_system not in HOUSE_SYSTEMS:
+            raise ValueError(f"Unsupported house system: {house_system}")
+        self.house_system = house_system
+
+    def get_birth_chart(self, user_profile: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        latitude = user_profile.get("birth_lat")
+        longitude = user_profile.get("birth_lng")
+        tz_str = user_profile.get("birth_tz")
+        if latitude is None or longitude is None or not tz_str:
+            raise ChartProviderError("Birth coordinates not resolved for profile")
+
+        try:
+            year, month, day = map(int, user_profile["birth_date"].split("-"))
+            hour, minute = map(int, user_profile["birth_time"].split(":"))
+            full_name = f"{user_profile.get('first_name', '')} {user_profile.get('last_name', '')}".strip() or "User"
+            chart_data = compute_chart(
+                datetime(year, month, day, hour, minute),
+                float(latitude),
+                float(longitude),
+                tz_str,
+                house_system=self.house_system,
+                name=full_name,
+                city=user_profile.get("birth_location", ""),
+                nation=user_profile.get("birth_country", ""),
+            )
+        except (KeyError, ValueError, ZoneInfoNotFoundError) as e:
+            error = ChartProviderError(f"Invalid birth data for local ephemeris: {e}")
+            error.client_error = True
+            raise error
+
+        logger.info("Birth chart computed with local ephemeris")
+        return {
+            "svg_content": "",
+            "chart_data": chart_data,
+            "metadata": {
+                "generated_at": int(time.time()),
+                "api_provider": self.name,
+            },
+        }
+
+
+# Reference charts used for validation: (local time, lat, lng, tz, expected abs positions, retrograde bodies)
+# Sources, all Placidus and apparent geocentric:
+# - 1990: app/backend/test_chart.svg (Astrologer v4)
+# - 1901 and 2099, the ends of the validated range: Swiss Ephemeris 2.10 (Moshier ephemeris),
+#   the library behind Astrologer
+REFERENCE_CHARTS = [
+    (
+        datetime(1990, 1, 15, 14, 30),
+        40.7142,
+        -74.0058,
+        "America/New_York",
+        {
+            "sun": 270 + 25 + 23 / 60 + 47 / 3600,
+            "moon": 150 + 21 + 23 / 60 + 23 / 3600,
+            "mercury": 270 + 11 + 7 / 60 + 37 / 3600,
+            "venus": 300 + 0 + 29 / 60 + 57 / 3600,
+            "mars": 240 + 20 + 7 / 60 + 54 / 3600,
+            "jupiter": 90 + 3 + 19 / 60 + 46 / 3600,
+            "saturn": 270 + 17 + 21 / 60 + 5 / 3600,
+            "uranus": 270 + 6 + 37 / 60 + 53 / 3600,
+            "neptune": 270 + 12 + 34 / 60 + 39 / 3600,
+            "pluto": 210 + 17 + 26 / 60 + 4 / 3600,
+            "mean_node": 300 + 17 + 40 / 60 + 38 / 3600,
+            "ascendant": 60 + 25 + 41 / 60 + 58 / 3600,
+            "medium_coeli": 330 + 1 + 27 / 60 + 31 / 3600,
+            "second_house": 90 + 16 + 1 / 60 + 47 / 3600,
+            "third_house": 120 + 6 + 42 / 60 + 3 / 3600,
+            "eleventh_house": 0 + 4 + 19 / 60 + 52 / 3600,
+            "twelfth_house": 30 + 15 + 50 / 60 + 54 / 3600,
+        },
+        {"mercury", "venus", "jupiter", "mean_node"},
+    ),
+    (
+        datetime(1901, 6, 21, 5, 45),
+        51.5074,
+        -0.1278,
+        "Europe/London",
+        {
+            "sun": 60 + 29 + 8 / 60 + 13 / 3600,
+            "moon": 120 + 28 + 58 / 60 + 19 / 3600,
+            "mercury": 90 + 23 + 1 / 60 + 57 / 3600,
+            "venus": 90 + 12 + 52 / 60 + 53 / 3600,
+            "mars": 150 + 17 + 48 / 60 + 1 / 3600,
+            "jupiter": 270 + 9 + 22 / 60 + 21 / 3600,
+            "saturn": 270 + 14 + 9 / 60 + 3 / 3600,
+            "uranus": 240 + 14 + 18 / 60 + 6 / 3600,
+            "neptune": 60 + 28 + 57 / 60 + 33 / 3600,
+            "pluto": 60 + 17 + 27 / 60 + 40 / 3600,
+            "mean_node": 210 + 20 + 45 / 60 + 52 / 3600,
+            "mean_lilith": 210 + 4 + 11 / 60 + 29 / 3600,
+            "ascendant": 90 + 22 + 46 / 60 + 24 / 3600,
+            "medium_coeli": 330 + 24 + 23 / 60 + 32 / 3600,
+            "second_house": 120 + 8 + 37 / 60 + 7 / 3600,
+            "third_house": 120 + 27 + 55 / 60 + 54 / 3600,
+            "eleventh_house": 30 + 2 + 20 / 60 + 36 / 3600,
+            "twelfth_house": 60 + 17 + 16 / 60 + 42 / 3600,
+        },
+        {"jupiter", "saturn", "uranus", "mean_node"},
+    ),
+    (
+        datetime(2099, 11, 3, 23, 10),
+        35.6895,
+        139.6917,
+        "Asia/Tokyo",
+        {
+            "sun": 210 + 11 + 28 / 60 + 11 / 3600,
+            "moon": 90 + 13 + 50 / 60 + 11 / 3600,
+            "mercury": 180 + 25 + 27 / 60 + 17 / 3600,
+            "venus": 240 + 8 + 36 / 60 + 27 / 3600,
+            "mars": 0 + 20 + 50 / 60 + 29 / 3600,
+            "jupiter": 180 + 11 + 44 / 60 + 45 / 3600,
+            "saturn": 180 + 20 + 12 / 60 + 36 / 3600,
+            "uranus": 0 + 18 + 48 / 60 + 59 / 3600,
+            "neptune": 150 + 16 + 45 / 60 + 28 / 3600,
+            "pluto": 30 + 3 + 11 / 60 + 38 / 3600,
+            "mean_node": 330 + 24 + 1 / 60 + 47 / 3600,
+            "mean_lilith": 0 + 5 + 44 / 60 + 52 / 3600,
+            "ascendant": 120 + 15 + 2 / 60 + 9 / 3600,
+            "medium_coeli": 30 + 7 + 42 / 60 + 56 / 3600,
+            "second_house": 150 + 7 + 51 / 60 + 25 / 3600,
+            "third_house": 180 + 5 + 17 / 60 + 19 / 3600,
+            "eleventh_house": 60 + 12 + 31 / 60 + 40 / 3600,
+            "twelfth_house": 90 + 15 + 35 / 60 + 7 / 3600,
+        },
+        {"mars", "uranus", "pluto", "mean_node"},
+    ),
+]
+
+
+# Local testing
+if __name__ == "__main__":
+    print("Testing Local Ephemeris Engine\n")
+    print("=" * 70)
+
+    # Test 1: Validation against stored Astrologer responses
+    print("\n[Test 1] Positions vs stored Astrologer charts")
+    print("-" * 70)
+    for birth_local, lat, lng, tz, expected, retrograde in REFERENCE_CHARTS:
+        chart = compute_chart(birth_local, lat, lng, tz)
+        for key, reference in expected.items():
+            error = abs(((chart["data"][key]["abs_pos"] - reference + 180) % 360) - 180) * 60
+            is_angle = key in ("ascendant", "medium_coeli") or key.endswith("_house")
+            tolerance = ANGLES_TOLERANCE_ARCMIN if is_angle else VALIDATION_TOLERANCE_ARCMIN
+            status = "✓" if error <= tolerance else "✗"
+            print(f"{status} {key:15s} {chart['data'][key]['abs_pos']:9.4f}° error {error:5.2f}' (tol {tolerance}')")
+            assert error <= tolerance, f"{key} off by {error:.2f} arcmin"
+        for key, _ in BODIES[:11]:
+            assert chart["data"][key]["retrograde"] == (key in retrograde), f"{key} retrograde flag"
+    print("Test 1 passed")
+
+    # Test 2: Output shape matches what BedrockClient reads
+    print("\n[Test 2] Astrologer-compatible shape")
+    print("-" * 70)
+    chart = compute_chart(*REFERENCE_CHARTS[0][:4])
+    sun = chart["data"]["sun"]
+    assert sun["sign"] == "Cap" and sun["house"] == "Eighth_House"
+    assert {"p1_name", "p2_name", "aspect", "orbit"} <= set(chart["aspects"][0])
+    print(f"Sun: {sun['sign']} {sun['position']:.2f}° in {sun['house']}, {len(chart['aspects'])} aspects")
+    print("Test 2 passed")
+
+    # Test 3: Other house systems and polar fallback
+    print("\n[Test 3] House systems")
+    print("-" * 70)
+    jd = julian_day(datetime(1990, 1, 15, 19, 30, tzinfo=timezone.utc))
+    for system in HOUSE_SYSTEMS:
+        cusps, asc, mc, used = house_cusps(jd, 40.7142, -74.0058, system)
+        assert len(cusps) == 12
+        print(f"  {HOUSE_SYSTEMS[used]:10s} cusp 1 {cusps[0]:7.2f}  cusp 10 {cusps[9]:7.2f}")
+    _, _, _, used = house_cusps(jd, 78.2, 15.6, "P")
+    assert used == "O"
+    print("Test 3 passed")
+
+    # Test 4: Chart provider interface
+    print("\n[Test 4] LocalEphemerisProvider")
+    print("-" * 70)
+    provider = LocalEphemerisProvider()
+    profile = {
+        "birth_date": "1990-01-15",
+        "birth_time": "14:30",
+        "birth_location": "New York, NY",
+        "birth_country": "United States",
+        "birth_lat": 40.7142,
+        "birth_lng": -74.0058,
+        "birth_tz": "America/New_York",
+    }
+    result = provider.get_birth_chart(profile)
+    assert result["svg_content"] == "" and result["metadata"]["api_provider"] == "local_ephemeris"
+    assert result["chart_data"]["data"]["moon"]["sign"] == "Vir"
+    try:
+        provider.get_birth_chart({k: v for k, v in profile.items() if k != "birth_tz"})
+        raise AssertionError("Should have raised ChartProviderError")
+    except ChartProviderError as e:
+        print(f"Correctly raised: {e}")
+    print("Test 4 passed")
+
+    # Test 5: Throughput
+    print("\n[Test 5] Chart generation time")
+    print("-" * 70)
+    runs = 500
+    start = time.perf_counter()
+    for _ in range(runs):
+        compute_chart(datetime(1990, 1, 15, 14, 30), 40.7142, -74.0058, "America/New_York")
+    elapsed = (time.perf_counter() - start) / runs
+    print(f"Average per chart: {elapsed * 1000:.3f} ms")
+
+    dates = julian_day(datetime(1900, 1, 1, tzinfo=timezone.utc)) + np.arange(10_000) * 7.3
+    start = time.perf_counter()
+    body_positions(dates)
+    elapsed = time.perf_counter() - start
+    print(f"Batch of {len(dates)} dates: {elapsed * 1000:.1f} ms ({elapsed / len(dates) * 1e6:.2f} µs per date)")
+    print("Test 5 passed")
+
+    print("\n" + "=" * 70)
+    print("All tests passed!")
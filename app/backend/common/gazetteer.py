@@ -0,0 +1,455 @@
+"""
+Offline gazetteer.
+Resolves birth locations to coordinates and IANA timezone from a packed, memory-mapped GeoNames city table.
+"""
+
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from common.countries import normalize_country_name, resolve_country
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Packed city table, built by `python -m common.gazetteer build` (in CD, from the GeoNames dump)
+GAZETTEER_PATH = os.environ.get("GAZETTEER_PATH", os.path.join(os.path.dirname(__file__), "data", "cities.bin"))
+
+# Alternate names kept per city (GeoNames lists hundreds for large cities)
+MAX_ALTERNATE_NAMES = 40
+
+# File layout: header, then sections at the offsets stored in the header
+#   cities      CITY_DTYPE records, sorted by population (descending)
+#   key_offsets uint32[key_count + 1], start of each key in the key blob
+#   key_cities  uint32[key_count], city index for each key
+#   key_blob    normalized ASCII keys, sorted (ties ordered by population)
+#   names       UTF-8 display names, addressed by name_offset/name_length
+#   meta        JSON: timezone list and admin1 names per country
+MAGIC = b"MGZ1"
+HEADER = struct.Struct("<4sHHIIIIIIII")
+CITY_DTYPE = np.dtype(
+    [
+        ("geoname_id", "<u4"),
+        ("lat", "<f4"),
+        ("lng", "<f4"),
+        ("population", "<u4"),
+        ("name_offset", "<u4"),
+        ("name_length", "<u2"),
+        ("tz", "<u2"),
+        ("country", "S2"),
+        ("admin1", "S6"),
+    ]
+)
+
+# The same normalization rules apply to city names and country names
+normalize_place_name = normalize_country_name
+
+
+class _Keys:
+    """Sorted key array backed by the mapped file, indexable for `bisect`."""
+
+    def __init__(self, blob: memoryview, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> bytes:
+        return bytes(self.blob[self.offsets[index] : self.offsets[index + 1]])
+
+
+class Gazetteer:
+    """
+    Read-only view of a packed gazetteer file.
+
+    The file is memory-mapped, so opening it costs only a header read and
+    pages are loaded on demand and shared between warm invocations.
+    """
+
+    def __init__(self, path: str = GAZETTEER_PATH):
+        with open(path, "rb") as gazetteer_file:
+            self._mmap = mmap.mmap(gazetteer_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            version,
+            _,
+            city_count,
+            key_count,
+            cities_at,
+            key_offsets_at,
+            key_cities_at,
+            key_blob_at,
+            names_at,
+            meta_at,
+        ) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != 1:
+            raise ValueError(f"Not a gazetteer file (version 1): {path}")
+
+        view = memoryview(self._mmap)
+        self.cities = np.frombuffer(self._mmap, CITY_DTYPE, city_count, cities_at)
+        self.key_cities = np.frombuffer(self._mmap, "<u4", key_count, key_cities_at)
+        self.keys = _Keys(view[key_blob_at:names_at], np.frombuffer(self._mmap, "<u4", key_count + 1, key_offsets_at))
+        self._names = view[names_at:meta_at]
+
+        meta = json.loads(bytes(view[meta_at:]).decode("utf-8"))
+        self.timezones: List[str] = meta["timezones"]
+        self.admin1: Dict[str, Dict[str, str]] = meta["admin1"]
+        self._admin1_names: Optional[Dict[tuple, str]] = None
+        logger.info(f"Gazetteer opened: {city_count} cities, {key_count} keys")
+
+    def key_range(self, key: str, prefix: bool = False) -> range:
+        """Positions in the sorted key array equal to `key` (or starting with it)."""
+        encoded = key.encode("ascii", "ignore")
+        start = bisect.bisect_left(self.keys, encoded)
+        end = bisect.bisect_left(self.keys, encoded + (b"\x7f" if prefix else b"\x00"), start)
+        return range(start, end)
+
+    def lookup(self, name: str) -> List[int]:
+        """City indices whose name or alias equals `name`, most populous first."""
+        positions = self.key_range(normalize_place_name(name))
+        return list(dict.fromkeys(self.key_cities[positions.start : positions.stop].tolist()))
+
+    def city(self, index: int) -> Dict[str, Any]:
+        """City record as a plain dict."""
+        record = self.cities[index]
+        offset, length = int(record["name_offset"]), int(record["name_length"])
+        return {
+            "geoname_id": int(record["geoname_id"]),
+            "name": bytes(self._names[offset : offset + length]).decode("utf-8"),
+            "lat": round(float(record["lat"]), 4),
+            "lng": round(float(record["lng"]), 4),
+            "tz": self.timezones[int(record["tz"])],
+            "country_code": record["country"].decode("ascii"),
+            "admin1": record["admin1"].decode("ascii"),
+            "population": int(record["population"]),
+        }
+
+    def suggest(self, query: str, country_code: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Cities whose name or alias starts with `query`, most populous first.
+
+        Cities are stored in population order, so ranking is just taking the
+        smallest matching city indices.
+
+        Args:
+            query: Prefix as typed (normalized like stored keys)
+            country_code: Optional alpha-2 code to restrict results
+            limit: Maximum number of suggestions
+
+        Returns:
+            City dicts (see `city`) with an `admin1_name` for display
+        """
+        key = normalize_place_name(query)
+        if not key:
+            return []
+        positions = self.key_range(key, prefix=True)
+        matches = np.unique(self.key_cities[positions.start : positions.stop])
+        if country_code:
+            matches = matches[self.cities["country"][matches] == country_code.encode("ascii")]
+
+        suggestions = []
+        for index in matches[:limit].tolist():
+            city = self.city(index)
+            city["admin1_name"] = self.admin1_name(city["country_code"], city["admin1"])
+            suggestions.append(city)
+        return suggestions
+
+    def admin1_name(self, country_code: str, admin1: str) -> Optional[str]:
+        """Display name of an admin1 code (e.g., ("US", "IL") -> "Illinois")."""
+        if self._admin1_names is None:
+            self._admin1_names = {
+                (country, code): name for country, names in self.admin1.items() for name, code in names.items()
+            }
+        name = self._admin1_names.get((country_code, admin1))
+        return name.title() if name else None
+
+    def admin1_code(self, country_code: str, region: str) -> Optional[str]:
+        """Admin1 code for a region name or code within a country (e.g., "New York" -> "NY")."""
+        key = normalize_place_name(region)
+        names = self.admin1.get(country_code, {})
+        if key in names:
+            return names[key]
+        return key.upper() if key.upper() in names.values() else None
+
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_missing = False
+
+
+def get_gazetteer() -> Optional[Gazetteer]:
+    """
+    Gazetteer singleton, opened on first use.
+
+    Returns None when the packed file is not deployed, so callers can fall
+    back to upstream geocoding.
+    """
+    global _gazetteer, _gazetteer_missing
+    if _gazetteer is None and not _gazetteer_missing:
+        if os.path.exists(GAZETTEER_PATH):
+            _gazetteer = Gazetteer(GAZETTEER_PATH)
+        else:
+            _gazetteer_missing = True
+            logger.warning(f"Gazetteer file not found at {GAZETTEER_PATH}, location resolution disabled")
+    return _gazetteer
+
+
+def resolve_location(birth_location: str, birth_country: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Resolve a free-typed birth location to a city with coordinates and timezone.
+
+    The first comma-separated part is the city. A second part narrows the
+    match to a state/province when it names one ("Springfield, IL"). Among
+    the remaining candidates in the birth country, the most populous wins.
+
+    Args:
+        birth_location: Location as typed (e.g., "New York, NY", "Paris")
+        birth_country: Country as typed (e.g., "United States")
+
+    Returns:
+        City dict (geoname_id, name, lat, lng, tz, country_code, admin1,
+        population), or None if unresolved or the gazetteer is unavailable
+
+    Example:
+        >>> resolve_location("Springfield, IL", "United States")["tz"]
+        'America/Chicago'
+    """
+    gazetteer = get_gazetteer()
+    parts = [part.strip() for part in (birth_location or "").split(",") if part.strip()]
+    if gazetteer is None or not parts:
+        return None
+
+    candidates = gazetteer.lookup(parts[0])
+    country_code = resolve_country(birth_country) if birth_country else None
+    if country_code:
+        candidates = [index for index in candidates if gazetteer.cities[index]["country"].decode() == country_code]
+
+    if len(candidates) > 1 and len(parts) > 1 and country_code:
+        admin1 = gazetteer.admin1_code(country_code, parts[1])
+        in_region = [index for index in candidates if gazetteer.cities[index]["admin1"].decode() == admin1]
+        candidates = in_region or candidates
+
+    if not candidates:
+        logger.info(f"Location not found in gazetteer: {birth_location!r}, {birth_country!r}")
+        return None
+    return gazetteer.city(candidates[0])
+
+
+def build_gazetteer(cities_path: str, output_path: str = GAZETTEER_PATH, admin1_path: Optional[str] = None) -> int:
+    """
+    Build the packed gazetteer from a GeoNames cities dump.
+
+    Inputs come from https://download.geonames.org/export/dump/ (cities15000.zip
+    and admin1CodesASCII.txt); CD downloads them and builds the file on deploy.
+
+    Args:
+        cities_path: GeoNames cities file (e.g., cities15000.txt, tab-separated)
+        output_path: Where to write the packed file
+        admin1_path: Optional admin1CodesASCII.txt, for matching state/province names
+
+    Returns:
+        Number of cities written
+    """
+    rows = []
+    with open(cities_path, encoding="utf-8") as cities_file:
+        for line in cities_file:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 18 or not fields[17]:
+                continue
+            rows.append(fields)
+    rows.sort(key=lambda fields: -int(fields[14] or 0))
+
+    timezones = sorted({fields[17] for fields in rows})
+    tz_index = {tz: index for index, tz in enumerate(timezones)}
+
+    cities = np.zeros(len(rows), dtype=CITY_DTYPE)
+    names = bytearray()
+    entries = []
+    for index, fields in enumerate(rows):
+        name = fields[1].encode("utf-8")
+        cities[index] = (
+            int(fields[0]),
+            float(fields[4]),
+            float(fields[5]),
+            int(fields[14] or 0),
+            len(names),
+            len(name),
+            tz_index[fields[17]],
+            fields[8].encode("ascii"),
+            fields[10].encode("ascii")[:6],
+        )
+        names += name
+
+        aliases = [fields[1], fields[2]] + fields[3].split(",")[:MAX_ALTERNATE_NAMES]
+        for key in {normalize_place_name(alias) for alias in aliases}:
+            if len(key) >= 2:
+                entries.append((key.encode("ascii"), index))
+
+    # Cities are in population order, so ties on a key keep the largest city first
+    entries.sort()
+    key_blob = b"".join(key for key, _ in entries)
+    key_offsets = np.zeros(len(entries) + 1, dtype="<u4")
+    key_offsets[1:] = np.cumsum([len(key) for key, _ in entries])
+    key_cities = np.array([index for _, index in entries], dtype="<u4")
+
+    admin1: Dict[str, Dict[str, str]] = {}
+    if admin1_path:
+        with open(admin1_path, encoding="utf-8") as admin1_file:
+            for line in admin1_file:
+                code, name, ascii_name = line.rstrip("\n").split("\t")[:3]
+                country, _, region = code.partition(".")
+                admin1.setdefault(country, {})[normalize_place_name(ascii_name or name)] = region
+    meta = json.dumps({"timezones": timezones, "admin1": admin1}, separators=(",", ":")).encode("utf-8")
+
+    sections = [cities.tobytes(), key_offsets.tobytes(), key_cities.tobytes(), key_blob, bytes(names), meta]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "wb") as output_file:
+        output_file.write(HEADER.pack(MAGIC, 1, 0, len(cities), len(entries), *offsets))
+        for section in sections:
+            output_file.write(section)
+
+    logger.info(f"Gazetteer built: {len(cities)} cities, {len(entries)} keys, {position / 1e6:.1f} MB")
+    return len(cities)
+
+
+# Sample GeoNames rows for local testing (real coordinates, trimmed columns)
+_SAMPLE_CITIES = [
+    (
+        "5128581",
+        "New York City",
+        "New York City",
+        "NYC,New York,Nueva York",
+        40.71427,
+        -74.00597,
+        "US",
+        "NY",
+        8804190,
+        "America/New_York",
+    ),
+    ("4250542", "Springfield", "Springfield", "", 39.80172, -89.64371, "US", "IL", 114394, "America/Chicago"),
+    ("4951788", "Springfield", "Springfield", "", 42.10148, -72.58981, "US", "MA", 155929, "America/New_York"),
+    ("4409896", "Springfield", "Springfield", "", 37.21533, -93.29824, "US", "MO", 169176, "America/Chicago"),
+    ("2988507", "Paris", "Paris", "Lutece,Parigi", 48.85341, 2.3488, "FR", "11", 2138551, "Europe/Paris"),
+    ("4717560", "Paris", "Paris", "", 33.66094, -95.55551, "US", "TX", 24782, "America/Chicago"),
+    ("2643743", "London", "London", "Londres,Londra", 51.50853, -0.12574, "GB", "ENG", 8961989, "Europe/London"),
+    ("6058560", "London", "London", "", 42.98339, -81.23304, "CA", "08", 383822, "America/Toronto"),
+    ("1816670", "Beijing", "Beijing", "Peking,Pekin,北京", 39.9075, 116.39723, "CN", "22", 18960744, "Asia/Shanghai"),
+    ("2037013", "Qiqihar", "Qiqihar", "Tsitsihar", 47.34088, 123.96045, "CN", "08", 882364, "Asia/Harbin"),
+    ("3117735", "Madrid", "Madrid", "", 40.4165, -3.70256, "ES", "29", 3255944, "Europe/Madrid"),
+]
+_SAMPLE_ADMIN1 = [("US.NY", "New York"), ("US.IL", "Illinois"), ("US.MA", "Massachusetts"), ("US.TX", "Texas")]
+
+
+# Local testing
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    import time
+
+    if sys.argv[1:2] == ["build"]:
+        # python -m common.gazetteer build cities15000.txt [admin1CodesASCII.txt] [output]
+        arguments = sys.argv[2:]
+        count = build_gazetteer(
+            arguments[0],
+            arguments[2] if len(arguments) > 2 else GAZETTEER_PATH,
+            arguments[1] if len(arguments) > 1 else None,
+        )
+        print(f"Wrote {count} cities")
+        sys.exit(0)
+
+    print("Testing Offline Gazetteer\n")
+    print("=" * 60)
+
+    workdir = tempfile.mkdtemp()
+    cities_path = os.path.join(workdir, "cities.txt")
+    admin1_path = os.path.join(workdir, "admin1.txt")
+    with open(cities_path, "w", encoding="utf-8") as sample:
+        for geoname_id, name, ascii_name, alternates, lat, lng, country, admin1, population, tz in _SAMPLE_CITIES:
+            fields = [geoname_id, name, ascii_name, alternates, str(lat), str(lng), "P", "PPL", country, ""]
+            fields += [admin1, "", "", "", str(population), "", "", tz, "2024-01-01"]
+            sample.write("\t".join(fields) + "\n")
+    with open(admin1_path, "w", encoding="utf-8") as sample:
+        for code, name in _SAMPLE_ADMIN1:
+            sample.write(f"{code}\t{name}\t{name}\t0\n")
+
+    # Test 1: Build
+    print("\n[Test 1] Build packed file from GeoNames rows")
+    print("-" * 60)
+    GAZETTEER_PATH = os.path.join(workdir, "cities.bin")
+    assert build_gazetteer(cities_path, GAZETTEER_PATH, admin1_path) == len(_SAMPLE_CITIES)
+    print(f"Packed size: {os.path.getsize(GAZETTEER_PATH)} bytes")
+    print("Test 1 passed")
+
+    # Test 2: Resolution with country and region disambiguation
+    print("\n[Test 2] Resolve locations")
+    print("-" * 60)
+    cases = [
+        ("New York, NY", "United States", "New York City", "America/New_York"),
+        ("Springfield, IL", "United States", "Springfield", "America/Chicago"),
+        ("Springfield, Massachusetts", "USA", "Springfield", "America/New_York"),
+        ("Paris", "France", "Paris", "Europe/Paris"),
+        ("Paris, TX", "United States", "Paris", "America/Chicago"),
+        ("London", "Canada", "London", "America/Toronto"),
+        ("Peking", "China", "Beijing", "Asia/Shanghai"),
+        ("Qiqihar", "China", "Qiqihar", "Asia/Harbin"),
+    ]
+    for location, country, expected_name, expected_tz in cases:
+        city = resolve_location(location, country)
+        print(f"  {location + ', ' + country:34s} -> {city['name']} ({city['lat']}, {city['lng']}) {city['tz']}")
+        assert city["name"] == expected_name and city["tz"] == expected_tz
+    assert resolve_location("Springfield", "United States")["admin1"] == "MO"  # most populous
+    assert resolve_location("Atlantis", "Greece") is None
+    assert resolve_location("Madrid", "Mexico") is None
+    print("Test 2 passed")
+
+    # Test 3: Missing file falls back gracefully
+    print("\n[Test 3] Missing gazetteer file")
+    print("-" * 60)
+    _gazetteer, GAZETTEER_PATH = None, os.path.join(workdir, "missing.bin")
+    assert resolve_location("Paris", "France") is None
+    print("Test 3 passed")
+
+    # Test 4: Prefix suggestions
+    print("\n[Test 4] Prefix suggestions")
+    print("-" * 60)
+    gazetteer = Gazetteer(os.path.join(workdir, "cities.bin"))
+    names = [city["name"] for city in gazetteer.suggest("spr")]
+    assert names == ["Springfield"] * 3
+    assert [city["admin1"] for city in gazetteer.suggest("spr")] == ["MO", "MA", "IL"]  # by population
+    assert [city["country_code"] for city in gazetteer.suggest("lon")] == ["GB", "CA"]
+    assert [city["country_code"] for city in gazetteer.suggest("Lon", "CA")] == ["CA"]
+    assert gazetteer.suggest("Pek")[0]["name"] == "Beijing"
+    assert gazetteer.suggest("spr")[2]["admin1_name"] == "Illinois"
+    assert gazetteer.suggest("zzz") == [] and gazetteer.suggest("!") == []
+    print("Test 4 passed")
+
+    # Test 5: Lookup time
+    print("\n[Test 5] Lookup benchmark")
+    print("-" * 60)
+    _gazetteer, _gazetteer_missing = Gazetteer(os.path.join(workdir, "cities.bin")), False
+    runs = 10_000
+    start = time.perf_counter()
+    for _ in range(runs):
+        resolve_location("Springfield, IL", "United States")
+    print(f"resolve_location: {(time.perf_counter() - start) / runs * 1e6:.1f} µs")
+    start = time.perf_counter()
+    for _ in range(runs):
+        _gazetteer.suggest("spr")
+    print(f"suggest:          {(time.perf_counter() - start) / runs * 1e6:.1f} µs")
+    print("Test 5 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
@@ -1,14 +1,235 @@
 """
 JWT token validation and claims extraction.
-Extracts user information from Cognito JWT tokens in API Gateway events.
+Extracts user information from Cognito JWT tokens, verified by API Gateway or in process.
 """
 
 import logging
-from typing import Dict, Any
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import jwt
+import requests
+from jwt.algorithms import RSAAlgorithm
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# "gateway": trust claims from the API Gateway JWT authorizer.
+# "local": verify the Authorization bearer token in process (local server, containers).
+AUTH_MODE = os.environ.get("AUTH_MODE", "gateway")
+
+COGNITO_REGION = os.environ.get("COGNITO_REGION", os.environ.get("AWS_REGION", "us-east-1"))
+COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID", "")
+COGNITO_APP_CLIENT_ID = os.environ.get("COGNITO_APP_CLIENT_ID", "")
+
+# Cognito rotates signing keys rarely; an unknown kid triggers a refetch, at most this often (seconds)
+JWKS_MIN_REFRESH_INTERVAL = 60
+JWKS_FETCH_TIMEOUT = 5  # Seconds
+CLOCK_SKEW_LEEWAY = 30  # Seconds of exp/iat tolerance on first verification
+
+# Verified tokens kept per container; each entry lives until its token's exp
+VERIFIED_TOKEN_CACHE_SIZE = 4096
+
+
+class TokenError(ValueError):
+    """Raised when a bearer token is missing, malformed, expired or not signed by the user pool."""
+
+
+class JwtVerifier:
+    """
+    Verifies Cognito RS256 tokens against the user pool's JWKS.
+
+    The keyset is fetched once per container and refetched when a token
+    names an unknown kid (rate limited, so garbage tokens cannot hammer
+    Cognito). Verified tokens are memoized until their exp, so a repeat
+    token costs one dictionary lookup.
+    """
+
+    def __init__(
+        self,
+        issuer: str,
+        client_id: str,
+        fetch_jwks: Optional[Callable[[], Dict[str, Any]]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Initialize verifier.
+
+        Args:
+            issuer: Expected iss, https://cognito-idp.{region}.amazonaws.com/{user_pool_id}
+            client_id: App client ID; ID tokens carry it as aud, access tokens as client_id
+            fetch_jwks: Returns the JWKS document (defaults to GET {issuer}/.well-known/jwks.json)
+            clock: Time source in epoch seconds
+        """
+        self.issuer = issuer
+        self.client_id = client_id
+        self._fetch_jwks = fetch_jwks or self._fetch_jwks_over_http
+        self._clock = clock
+        self._keys: Dict[str, Any] = {}
+        self._last_refresh: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+        self._verified: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a token and return its claims.
+
+        Args:
+            token: Compact JWT (no "Bearer " prefix)
+
+        Returns:
+            Verified claims
+
+        Raises:
+            TokenError: If the token is not valid for this user pool and client
+        """
+        cached = self._verified.get(token)
+        if cached is not None and cached[0] > self._clock():
+            return cached[1]
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError as e:
+            raise TokenError(f"Malformed token: {e}")
+        if header.get("alg") != "RS256":
+            raise TokenError(f"Unsupported token algorithm: {header.get('alg')}")
+
+        key = self._signing_key(header.get("kid"))
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                issuer=self.issuer,
+                # Times are checked below against the verifier's clock, the same one the memo uses
+                options={
+                    "verify_aud": False,
+                    "verify_exp": False,
+                    "verify_iat": False,
+                    "require": ["exp", "iat", "iss", "sub", "token_use"],
+                },
+            )
+        except jwt.InvalidTokenError as e:
+            raise TokenError(f"Invalid token: {e}")
+
+        now = self._clock()
+        if int(claims["exp"]) + CLOCK_SKEW_LEEWAY <= now:
+            raise TokenError("Token has expired")
+        if int(claims["iat"]) - CLOCK_SKEW_LEEWAY > now:
+            raise TokenError("Token issued in the future")
+
+        token_use = claims["token_use"]
+        if token_use == "id":
+            audience_ok = claims.get("aud") == self.client_id
+        elif token_use == "access":
+            audience_ok = claims.get("client_id") == self.client_id
+        else:
+            raise TokenError(f"Unsupported token_use: {token_use}")
+        if not audience_ok:
+            raise TokenError("Token was not issued to this app client")
+
+        self._remember(token, int(claims["exp"]), claims)
+        return claims
+
+    def _signing_key(self, kid: Optional[str]) -> Any:
+        """Public key for a kid, refetching the JWKS once per interval on a miss."""
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        with self._refresh_lock:
+            key = self._keys.get(kid)
+            now = self._clock()
+            if key is None and (self._last_refresh is None or now - self._last_refresh >= JWKS_MIN_REFRESH_INTERVAL):
+                self._last_refresh = now
+                self._load_keys()
+                key = self._keys.get(kid)
+        if key is None:
+            raise TokenError(f"Unknown signing key: {kid}")
+        return key
+
+    def _load_keys(self) -> None:
+        """Replace the keyset with a fresh JWKS fetch (keeps the old one if the fetch fails)."""
+        try:
+            jwks = self._fetch_jwks()
+        except Exception as e:
+            logger.warning(f"JWKS fetch failed: {e}")
+            return
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            if jwk.get("kty") == "RSA" and jwk.get("kid"):
+                keys[jwk["kid"]] = RSAAlgorithm.from_jwk(jwk)
+        self._keys = keys
+        logger.info(f"Loaded {len(keys)} JWKS signing keys")
+
+    def _fetch_jwks_over_http(self) -> Dict[str, Any]:
+        """GET the user pool's JWKS document."""
+        response = requests.get(f"{self.issuer}/.well-known/jwks.json", timeout=JWKS_FETCH_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def _remember(self, token: str, expires_at: int, claims: Dict[str, Any]) -> None:
+        """Memoize verified claims, evicting expired and then oldest entries when full."""
+        if len(self._verified) >= VERIFIED_TOKEN_CACHE_SIZE:
+            now = self._clock()
+            self._verified = {t: entry for t, entry in self._verified.items() if entry[0] > now}
+            while len(self._verified) >= VERIFIED_TOKEN_CACHE_SIZE:
+                self._verified.pop(next(iter(self._verified)))
+        self._verified[token] = (expires_at, claims)
+
+
+_verifier: Optional[JwtVerifier] = None
+
+
+def get_verifier() -> JwtVerifier:
+    """
+    Container-wide verifier for the configured user pool.
+
+    Raises:
+        TokenError: If COGNITO_USER_POOL_ID or COGNITO_APP_CLIENT_ID is not set
+    """
+    global _verifier
+    if _verifier is None:
+        if not COGNITO_USER_POOL_ID or not COGNITO_APP_CLIENT_ID:
+            raise TokenError("Local JWT verification needs COGNITO_USER_POOL_ID and COGNITO_APP_CLIENT_ID")
+        issuer = f"https://cognito-idp.{COGNITO_REGION}.amazonaws.com/{COGNITO_USER_POOL_ID}"
+        _verifier = JwtVerifier(issuer, COGNITO_APP_CLIENT_ID)
+    return _verifier
+
+
+def verify_bearer_token(authorization: Optional[str]) -> Dict[str, Any]:
+    """
+    Verify an Authorization header value ("Bearer <jwt>").
+
+    Raises:
+        TokenError: If the header is missing or the token is invalid
+    """
+    scheme, _, token = (authorization or "").strip().partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise TokenError("Authentication required - no bearer token")
+    return get_verifier().verify(token.strip())
+
+
+def event_claims(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Caller's claims for an API Gateway event ({} when unauthenticated).
+
+    In "gateway" mode these are the authorizer's claims (authorizer.jwt.claims
+    for HTTP API, authorizer.claims for REST API). In "local" mode the
+    Authorization header is verified here and authorizer claims are ignored.
+    """
+    if AUTH_MODE == "local":
+        headers = {name.lower(): value for name, value in (event.get("headers") or {}).items()}
+        try:
+            return verify_bearer_token(headers.get("authorization"))
+        except TokenError as e:
+            logger.warning(f"Bearer token rejected: {e}")
+            return {}
+    authorizer = (event.get("requestContext") or {}).get("authorizer") or {}
+    claims = (authorizer.get("jwt") or {}).get("claims") or authorizer.get("claims")
+    return claims if isinstance(claims, dict) else {}
+
 
 def extract_user_from_event(event: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -16,6 +237,7 @@ def extract_user_from_event(event: Dict[str, Any]) -> Dict[str, Any]:
 
     For HTTP API v2.0 with JWT authorizer, claims are in:
     event['requestContext']['authorizer']['jwt']['claims']
+    With AUTH_MODE=local they come from the verified Authorization header.
 
     Args:
         event: API Gateway event (HTTP API v2.0 format)
@@ -38,11 +260,7 @@ def extract_user_from_event(event: Dict[str, Any]) -> Dict[str, Any]:
         >>> user_id = user_info['user_id']
     """
     try:
-        # Navigate to JWT claims in HTTP API v2.0 event structure
-        request_context = event.get("requestContext", {})
-        authorizer = request_context.get("authorizer", {})
-        jwt_data = authorizer.get("jwt", {})
-        claims = jwt_data.get("claims", {})
+        claims = event_claims(event)
 
         # Check if claims exist
         if not claims:
@@ -57,7 +275,7 @@ def extract_user_from_event(event: Dict[str, Any]) -> Dict[str, Any]:
 
         # Extract optional fields
         email = claims.get("email", "")
-        email_verified = claims.get("email_verified", "false").lower() == "true"
+        email_verified = str(claims.get("email_verified", "false")).lower() == "true"
 
         # Extract timestamps (as integers)
         iat = int(claims.get("iat", 0)) if claims.get("iat") else None
@@ -253,8 +471,149 @@ if __name__ == "__main__":
     print(f"require_auth works: {user['user_id']}")
     print("Test 7 passed")
 
+    # Tokens signed with locally generated keys, served through a fake JWKS endpoint
+    import json
+
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    issuer = "https://cognito-idp.us-east-1.amazonaws.com/us-east-1_TestPool"
+    now = [1700000000.0]
+    signing_keys = {kid: rsa.generate_private_key(public_exponent=65537, key_size=2048) for kid in ("k1", "k2")}
+    published = ["k1"]
+    jwks_fetches = []
+
+    def fake_jwks():
+        jwks_fetches.append(now[0])
+        return {
+            "keys": [
+                {**json.loads(RSAAlgorithm.to_jwk(signing_keys[kid].public_key())), "kid": kid, "alg": "RS256"}
+                for kid in published
+            ]
+        }
+
+    def make_token(kid="k1", **overrides):
+        claims = {
+            "sub": "user-123",
+            "iss": issuer,
+            "aud": "client-abc",
+            "token_use": "id",
+            "email": "ada@example.com",
+            "email_verified": True,
+            "iat": int(now[0]),
+            "exp": int(now[0]) + 3600,
+            **overrides,
+        }
+        return jwt.encode(claims, signing_keys[kid], algorithm="RS256", headers={"kid": kid})
+
+    verifier = JwtVerifier(issuer, "client-abc", fetch_jwks=fake_jwks, clock=lambda: now[0])
+
+    # Test 8: Valid tokens verify; repeats are memoized until exp
+    print("\n[Test 8] Local RS256 verification and memoization")
+    print("-" * 60)
+
+    token = make_token()
+    assert verifier.verify(token)["sub"] == "user-123" and len(jwks_fetches) == 1
+    access_token = make_token(token_use="access", aud=None, client_id="client-abc")
+    assert verifier.verify(access_token)["token_use"] == "access"
+
+    real_decode = jwt.decode
+    decodes = []
+    jwt.decode = lambda *args, **kwargs: decodes.append(1) or real_decode(*args, **kwargs)
+    try:
+        for _ in range(100):
+            assert verifier.verify(token)["sub"] == "user-123"
+        assert not decodes
+        now[0] += 3600 + CLOCK_SKEW_LEEWAY  # Past exp: the memo no longer answers and the token is rejected
+        try:
+            verifier.verify(token)
+            raise AssertionError("Expired token accepted")
+        except TokenError as e:
+            print(f"Correctly rejected expired token: {e}")
+        assert decodes == [1]
+    finally:
+        jwt.decode = real_decode
+    print(f"JWKS fetches: {len(jwks_fetches)}, signature checks for 100 repeats: 0")
+    print("Test 8 passed")
+
+    # Test 9: Tokens for another pool or client, forged or unsigned tokens are rejected
+    print("\n[Test 9] Rejected tokens")
+    print("-" * 60)
+
+    forger = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    bad_tokens = {
+        "wrong audience": make_token(aud="other-client"),
+        "wrong issuer": make_token(iss="https://cognito-idp.us-east-1.amazonaws.com/us-east-1_Other"),
+        "refresh token_use": make_token(token_use="refresh"),
+        "forged signature": jwt.encode(
+            {"sub": "attacker", "iss": issuer, "aud": "client-abc", "token_use": "id", "iat": 0, "exp": 2**31},
+            forger,
+            algorithm="RS256",
+            headers={"kid": "k1"},
+        ),
+        "alg none": jwt.encode({"sub": "attacker", "iss": issuer}, None, algorithm="none"),
+        "garbage": "not.a.jwt",
+    }
+    for name, bad_token in bad_tokens.items():
+        try:
+            verifier.verify(bad_token)
+            raise AssertionError(f"{name} accepted")
+        except TokenError as e:
+            print(f"{name:18}: {e}")
+    print("Test 9 passed")
+
+    # Test 10: Key rotation refetches the JWKS on a kid miss, at most once per interval
+    print("\n[Test 10] Kid-miss refresh with rate limit")
+    print("-" * 60)
+
+    fetches_before = len(jwks_fetches)
+    for _ in range(5):
+        try:
+            verifier.verify(make_token(kid="k2"))
+            raise AssertionError("Unpublished key accepted")
+        except TokenError:
+            pass
+    assert len(jwks_fetches) == fetches_before + 1
+    published.append("k2")
+    now[0] += JWKS_MIN_REFRESH_INTERVAL
+    assert verifier.verify(make_token(kid="k2"))["sub"] == "user-123"
+    assert len(jwks_fetches) == fetches_before + 2
+    print(f"JWKS fetches for 6 kid misses across two intervals: {len(jwks_fetches) - fetches_before}")
+    print("Test 10 passed")
+
+    # Test 11: AUTH_MODE=local reads the Authorization header instead of authorizer claims
+    print("\n[Test 11] Local auth mode")
+    print("-" * 60)
+
+    AUTH_MODE, _verifier = "local", verifier
+    fresh_token = make_token()
+    local_event = {"headers": {"Authorization": f"Bearer {fresh_token}"}, **valid_event}
+    assert get_user_id(local_event) == "user-123"
+    assert extract_user_from_event(local_event)["email_verified"] is True
+    assert event_claims({**valid_event, "headers": {"authorization": "Bearer forged"}}) == {}
+    print("Authorizer claims ignored, bearer token verified")
+    print("Test 11 passed")
+
+    # Test 12: Benchmark - first verification vs memoized repeat
+    print("\n[Test 12] Benchmark")
+    print("-" * 60)
+
+    tokens = [make_token(sub=f"user-{index}") for index in range(200)]
+    start = time.perf_counter()
+    for each in tokens:
+        verifier.verify(each)
+    first = (time.perf_counter() - start) / len(tokens) * 1e6
+    start = time.perf_counter()
+    for _ in range(50):
+        for each in tokens:
+            verifier.verify(each)
+    repeat = (time.perf_counter() - start) / (50 * len(tokens)) * 1e6
+    print(f"First verification: {first:8.1f} us/token")
+    print(f"Memoized repeat:    {repeat:8.2f} us/token ({first / repeat:.0f}x faster)")
+    assert repeat * 10 < first
+    print("Test 12 passed")
+
     print("\n" + "=" * 60)
-    print("All 7 tests passed!")
+    print("All 12 tests passed!")
     print("\nJWT utilities ready to use in Lambda handlers.")
     print("\nUsage example:")
     print("  from common.jwt_utils import get_user_id")
@@ -0,0 +1,207 @@
+"""
+Message body compression.
+Stores long chat bodies as zlib-compressed binary attributes tagged with a codec marker.
+"""
+
+import logging
+import math
+import os
+import zlib
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Codec marker written next to compressed bodies; bump when the encoding changes
+MESSAGE_CODEC = "zlib1"
+
+# Bodies shorter than this (UTF-8 bytes) are stored as plain strings
+COMPRESSION_THRESHOLD_BYTES = int(os.environ.get("MESSAGE_COMPRESSION_THRESHOLD", "512"))
+
+# Keep compressed bodies only when they save at least this fraction
+MIN_COMPRESSION_SAVING = 0.1
+
+ZLIB_LEVEL = 6
+
+# Attribute holding the codec marker on message items
+BODY_CODEC_FIELD = "body_codec"
+MESSAGE_BODY_FIELDS = ("user_message", "ai_response")
+
+
+def compress_body(text: str) -> Optional[bytes]:
+    """Compressed body, or None when it is too short or does not shrink enough."""
+    data = text.encode("utf-8")
+    if len(data) < COMPRESSION_THRESHOLD_BYTES:
+        return None
+    compressed = zlib.compress(data, ZLIB_LEVEL)
+    if len(compressed) > len(data) * (1 - MIN_COMPRESSION_SAVING):
+        return None
+    return compressed
+
+
+def decompress_body(value: Any, codec: Optional[str]) -> str:
+    """
+    Decode a stored body: plain strings pass through, binary values are decompressed.
+
+    Args:
+        value: Stored attribute (str, bytes or boto3 Binary)
+        codec: Codec marker stored with the item
+
+    Raises:
+        ValueError: If the codec is unknown
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if codec != MESSAGE_CODEC:
+        raise ValueError(f"Unknown message codec: {codec}")
+    return zlib.decompress(bytes(getattr(value, "value", value))).decode("utf-8")
+
+
+def encode_fields(record: Dict[str, Any], fields: Iterable[str], codec_field: str) -> Dict[str, Any]:
+    """
+    Compress the given string fields of a record in place.
+
+    Sets `codec_field` to MESSAGE_CODEC when at least one field was
+    compressed; records without the marker hold only plain strings.
+
+    Returns:
+        The record
+    """
+    for field in fields:
+        if isinstance(record.get(field), str):
+            compressed = compress_body(record[field])
+            if compressed is not None:
+                record[field] = compressed
+                record[codec_field] = MESSAGE_CODEC
+    return record
+
+
+def decode_fields(record: Dict[str, Any], fields: Iterable[str], codec_field: str) -> Dict[str, Any]:
+    """Copy of a record with compressed fields decoded to strings and the codec marker removed."""
+    decoded = dict(record)
+    codec = decoded.pop(codec_field, None)
+    for field in fields:
+        if field in decoded:
+            decoded[field] = decompress_body(decoded[field], codec)
+    return decoded
+
+
+def estimate_item_size(value: Any, name: str = "") -> int:
+    """
+    Approximate DynamoDB item size in bytes (attribute names + values).
+
+    Follows DynamoDB's sizing rules: strings and binary by length, numbers
+    by significant digits, 3 bytes per list/map plus 1 per element.
+    """
+    size = len(name.encode("utf-8"))
+    if isinstance(value, str):
+        return size + len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)) or hasattr(value, "value"):
+        return size + len(bytes(getattr(value, "value", value)))
+    if isinstance(value, bool) or value is None:
+        return size + 1
+    if isinstance(value, (int, float, Decimal)):
+        return size + math.ceil(len(str(value).lstrip("-").replace(".", "")) / 2) + 1
+    if isinstance(value, dict):
+        return size + 3 + sum(1 + estimate_item_size(element, key) for key, element in value.items())
+    return size + 3 + sum(1 + estimate_item_size(element) for element in value)
+
+
+def capacity_units(item_size: int) -> Dict[str, float]:
+    """Write units (1 KB each) and strongly consistent read units (4 KB each) for one item of this size."""
+    return {"wcu": math.ceil(item_size / 1024), "rcu": math.ceil(item_size / 4096)}
+
+
+# Local testing
+if __name__ == "__main__":
+    import random
+    import time
+
+    print("Testing Message Codec\n")
+    print("=" * 60)
+
+    random.seed(11)
+    vocabulary = (
+        "your Sun in Leo Moon Scorpio rising Venus Mars Saturn transit house chart energy relationships career "
+        "this week brings focus on balance intuition growth communication emotional depth the and of to with "
+        "you may feel a strong pull toward new beginnings while old patterns ask for release"
+    ).split()
+
+    def bedrock_like(words: int) -> str:
+        sentences = []
+        while sum(len(sentence.split()) for sentence in sentences) < words:
+            sentence = " ".join(random.choice(vocabulary) for _ in range(random.randint(8, 20)))
+            sentences.append(sentence.capitalize() + ".")
+        return " ".join(sentences)
+
+    # Test 1: Round trip and threshold
+    print("\n[Test 1] Round trip")
+    print("-" * 60)
+    short = "What does my Moon sign say?"
+    long = bedrock_like(600)
+    assert compress_body(short) is None
+    compressed = compress_body(long)
+    print(f"{len(long.encode())} bytes -> {len(compressed)} bytes")
+    assert compressed is not None and decompress_body(compressed, MESSAGE_CODEC) == long
+    assert decompress_body(short, None) == short
+    print("Test 1 passed")
+
+    # Test 2: Field encoding with codec marker; unknown codecs are rejected
+    print("\n[Test 2] Field encoding")
+    print("-" * 60)
+    item = encode_fields({"user_message": short, "ai_response": long}, MESSAGE_BODY_FIELDS, BODY_CODEC_FIELD)
+    assert item[BODY_CODEC_FIELD] == MESSAGE_CODEC and isinstance(item["ai_response"], bytes)
+    assert item["user_message"] == short
+    assert decode_fields(item, MESSAGE_BODY_FIELDS, BODY_CODEC_FIELD) == {"user_message": short, "ai_response": long}
+    legacy = {"user_message": short, "ai_response": "plain"}
+    assert decode_fields(legacy, MESSAGE_BODY_FIELDS, BODY_CODEC_FIELD) == legacy
+    try:
+        decompress_body(compressed, "zstd9")
+    except ValueError as e:
+        print(f"Correctly rejected: {e}")
+    else:
+        raise AssertionError("Unknown codec accepted")
+    print("Test 2 passed")
+
+    # Test 3: Savings on a sample shaped like production responses
+    print("\n[Test 3] Savings on 500 sample messages")
+    print("-" * 60)
+    before = {"bytes": 0, "wcu": 0, "rcu": 0}
+    after = {"bytes": 0, "wcu": 0, "rcu": 0}
+    encode_seconds = decode_seconds = 0.0
+    for index in range(500):
+        item = {
+            "user_id": "3f2c9a1e-0000-4000-8000-000000000000",
+            "sk": f"CONV#6b1d2e3f-0000-4000-8000-000000000000#MSG#U01JD8X3Q4W5E6R7T8Y9Z0A{index:03d}",
+            "item_type": "MESSAGE",
+            "conversation_id": "6b1d2e3f-0000-4000-8000-000000000000",
+            "timestamp_epoch": 1732622400 + index,
+            "created_at": "2025-11-26T12:00:00.000000Z",
+            "user_message": bedrock_like(random.randint(5, 40)),
+            "ai_response": bedrock_like(random.choice([80, 200, 400, 800])),
+            "ttl_epoch": 1735214400,
+        }
+        for totals, record in ((before, item), (after, None)):
+            if record is None:
+                start = time.perf_counter()
+                record = encode_fields(dict(item), MESSAGE_BODY_FIELDS, BODY_CODEC_FIELD)
+                encode_seconds += time.perf_counter() - start
+                start = time.perf_counter()
+                assert (
+                    decode_fields(record, MESSAGE_BODY_FIELDS, BODY_CODEC_FIELD)["ai_response"] == item["ai_response"]
+                )
+                decode_seconds += time.perf_counter() - start
+            size = estimate_item_size(record)
+            totals["bytes"] += size
+            for unit, value in capacity_units(size).items():
+                totals[unit] += value
+    for metric in ("bytes", "wcu", "rcu"):
+        saving = 1 - after[metric] / before[metric]
+        print(f"  {metric:5}: {before[metric]:>8} -> {after[metric]:>8}  ({saving:.0%} saved)")
+    print(f"  encode {encode_seconds / 500 * 1e6:.0f} µs, decode {decode_seconds / 500 * 1e6:.0f} µs per message")
+    assert after["bytes"] < before["bytes"] and after["wcu"] < before["wcu"]
+    print("Test 3 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
@@ -0,0 +1,471 @@
+"""
+Chat message storage.
+Reads and writes chat turns stored as single message items or packed into bucketed page items.
+"""
+
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from common.deadline import Deadline
+from common.message_codec import BODY_CODEC_FIELD, encode_fields, estimate_item_size
+from common.conversation_utils import (
+    MESSAGE_ID_MARKER,
+    generate_ulid,
+    message_id_from_key,
+    message_key_prefix,
+    ulid_timestamp_ms,
+)
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# A page stops accepting turns once its payload reaches this size (DynamoDB items cap at 400 KB)
+MESSAGE_PAGE_MAX_BYTES = 64 * 1024
+
+# Turn record fields holding chat bodies, and the turn's codec marker
+TURN_BODY_FIELDS = ("u", "a")
+TURN_CODEC_FIELD = "z"
+
+# Pages fetched by the first query of a read; later queries are sized from the turns per page seen so far
+PAGE_QUERY_BATCH = 2
+
+# Sorts after every message ID (ULIDs and legacy epoch seconds)
+MESSAGE_KEY_UPPER_BOUND = "~"
+
+
+def page_key_prefix(conversation_id: str) -> str:
+    """Sort key prefix shared by all message pages of a conversation."""
+    return f"CONV#{conversation_id}#PAGE#"
+
+
+def build_turn_record(
+    user_message: str,
+    ai_response: str,
+    chart_url: Optional[str] = None,
+    message_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Build the compact record of one chat turn stored inside a page.
+
+    Long bodies are compressed like single message items, with the codec
+    marker in "z".
+
+    Args:
+        user_message: User's message text
+        ai_response: AI's response text
+        chart_url: Optional URL to astrology chart
+        message_id: Message ID (defaults to a new "U" + ULID)
+
+    Returns:
+        {"i": message_id, "t": epoch_seconds, "u": user_message, "a": ai_response, "c": chart_url}
+    """
+    message_id = message_id or MESSAGE_ID_MARKER + generate_ulid()
+    turn = {
+        "i": message_id,
+        "t": ulid_timestamp_ms(message_id[len(MESSAGE_ID_MARKER) :]) // 1000,
+        "u": user_message,
+        "a": ai_response,
+    }
+    if chart_url:
+        turn["c"] = chart_url
+    return encode_fields(turn, TURN_BODY_FIELDS, TURN_CODEC_FIELD)
+
+
+def turn_size(turn: Dict[str, Any]) -> int:
+    """Approximate stored size of a turn record in bytes, including its list entry."""
+    return estimate_item_size(turn) + 1
+
+
+def append_turn(
+    table,
+    user_id: str,
+    conversation_id: str,
+    turn: Dict[str, Any],
+    current_page: Optional[str] = None,
+    ttl_days: int = 30,
+    deadline: Optional[Deadline] = None,
+) -> str:
+    """
+    Append a turn to the conversation's current page, starting a new page when full.
+
+    The append is a single `list_append` update conditioned on the page
+    having room, so concurrent writers never push a page past
+    MESSAGE_PAGE_MAX_BYTES. A new page is keyed by its first turn's message
+    ID, which keeps pages in message order alongside single message items.
+    Each append extends the page's TTL, so a page expires `ttl_days` after
+    its last turn.
+
+    Args:
+        table: DynamoDB table resource
+        user_id: User's ID
+        conversation_id: Conversation ID
+        turn: Record from build_turn_record
+        current_page: Sort key of the page to append to (metadata `message_page`)
+        ttl_days: Days until the page expires after this append
+        deadline: Optional request deadline, checked before each write
+
+    Returns:
+        str: Sort key of the page holding the turn
+
+    Raises:
+        DeadlineExceeded: If the budget runs out before the turn is written
+    """
+    size = turn_size(turn)
+    ttl_timestamp = int(time.time()) + ttl_days * 24 * 60 * 60
+
+    if current_page:
+        if deadline:
+            deadline.check("message page append")
+        try:
+            table.update_item(
+                Key={"user_id": user_id, "sk": current_page},
+                UpdateExpression="SET turns = list_append(turns, :turn), page_bytes = page_bytes + :size, "
+                "ttl_epoch = :ttl",
+                ConditionExpression="attribute_exists(sk) AND page_bytes <= :room",
+                ExpressionAttributeValues={
+                    ":turn": [turn],
+                    ":size": size,
+                    ":ttl": ttl_timestamp,
+                    ":room": MESSAGE_PAGE_MAX_BYTES - size,
+                },
+            )
+            return current_page
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            logger.info(f"Message page full or expired, starting a new one: {current_page}")
+
+    page_sk = page_key_prefix(conversation_id) + turn["i"]
+    if deadline:
+        deadline.check("message page create")
+    table.update_item(
+        Key={"user_id": user_id, "sk": page_sk},
+        UpdateExpression="SET item_type = :type, conversation_id = :cid, turns = :turns, page_bytes = :size, "
+        "ttl_epoch = :ttl",
+        ConditionExpression="attribute_not_exists(sk)",
+        ExpressionAttributeValues={
+            ":type": "MESSAGE_PAGE",
+            ":cid": conversation_id,
+            ":turns": [turn],
+            ":size": size,
+            ":ttl": ttl_timestamp,
+        },
+    )
+    logger.info(f"Started message page: {page_sk}")
+    return page_sk
+
+
+def expand_page(page_item: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Expand a page item into message items, oldest first.
+
+    The results have the shape of single message items (sk, message_id,
+    timestamp_epoch, created_at, ...), with bodies still encoded, so callers
+    format both alike.
+    """
+    prefix = message_key_prefix(page_item["conversation_id"])
+    messages = []
+    for turn in page_item.get("turns", []):
+        timestamp_ms = ulid_timestamp_ms(turn["i"][len(MESSAGE_ID_MARKER) :])
+        message = {
+            "sk": prefix + turn["i"],
+            "item_type": "MESSAGE",
+            "conversation_id": page_item["conversation_id"],
+            "message_id": turn["i"],
+            "timestamp_epoch": turn["t"],
+            "created_at": datetime.utcfromtimestamp(timestamp_ms / 1000).isoformat() + "Z",
+            "user_message": turn["u"],
+            "ai_response": turn["a"],
+        }
+        if "c" in turn:
+            message["chart_url"] = turn["c"]
+        if TURN_CODEC_FIELD in turn:
+            message[BODY_CODEC_FIELD] = turn[TURN_CODEC_FIELD]
+        messages.append(message)
+    return messages
+
+
+def _query_message_items(table, user_id, conversation_id, limit, ascending, after, before) -> List[Dict[str, Any]]:
+    """Single message items strictly between the bounds, in read order (at most limit + 1)."""
+    prefix = message_key_prefix(conversation_id)
+    lower = prefix + (after or "")
+    upper = prefix + (before or MESSAGE_KEY_UPPER_BOUND)
+    response = table.query(
+        KeyConditionExpression="user_id = :uid AND sk BETWEEN :lower AND :upper",
+        ExpressionAttributeValues={":uid": user_id, ":lower": lower, ":upper": upper},
+        ScanIndexForward=ascending,
+        # BETWEEN is inclusive: room for both bound messages plus one to tell whether more exist
+        Limit=limit + 3,
+    )
+    return [item for item in response.get("Items", []) if item["sk"] not in (lower, upper)][: limit + 1]
+
+
+def _query_page_turns(table, user_id, conversation_id, limit, ascending, after, before) -> List[Dict[str, Any]]:
+    """Paged messages strictly between the bounds, in read order (at most limit + 1)."""
+    prefix = page_key_prefix(conversation_id)
+    lower = prefix
+    if after:
+        # Pages are keyed by their first message, so the page holding `after` starts at or before it
+        response = table.query(
+            KeyConditionExpression="user_id = :uid AND sk BETWEEN :lower AND :upper",
+            ExpressionAttributeValues={":uid": user_id, ":lower": prefix, ":upper": prefix + after},
+            ScanIndexForward=False,
+            ProjectionExpression="sk",
+            Limit=1,
+        )
+        if response.get("Items"):
+            lower = response["Items"][0]["sk"]
+
+    query_kwargs = {
+        "KeyConditionExpression": "user_id = :uid AND sk BETWEEN :lower AND :upper",
+        "ExpressionAttributeValues": {
+            ":uid": user_id,
+            ":lower": lower,
+            ":upper": prefix + (before or MESSAGE_KEY_UPPER_BOUND),
+        },
+        "ScanIndexForward": ascending,
+        "Limit": PAGE_QUERY_BATCH,
+    }
+    messages = []
+    # The newest page is usually partly filled, so size follow-up queries from the fullest page seen
+    turns_per_page = 1
+    while True:
+        response = table.query(**query_kwargs)
+        for page_item in response.get("Items", []):
+            turns_per_page = max(turns_per_page, len(page_item.get("turns", [])))
+            page = [
+                message
+                for message in expand_page(page_item)
+                if (not after or message["message_id"] > after) and (not before or message["message_id"] < before)
+            ]
+            messages.extend(page if ascending else reversed(page))
+        if len(messages) > limit or "LastEvaluatedKey" not in response:
+            return messages[: limit + 1]
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        query_kwargs["Limit"] = math.ceil((limit + 1 - len(messages)) / turns_per_page)
+
+
+def read_messages(
+    table,
+    user_id: str,
+    conversation_id: str,
+    metadata: Dict[str, Any],
+    limit: int,
+    order: str = "asc",
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Read a window of a conversation's messages from single items and pages.
+
+    Message IDs order both formats on one timeline (legacy epoch IDs sort
+    before ULIDs). The conversation metadata says which formats to read:
+    `pages_only` skips the single-item query, so the latest messages of a
+    paged conversation take one query. Pages are queried whenever the
+    conversation has a `message_page` or is `pages_only`, so a page written
+    before its metadata update is never hidden.
+
+    Args:
+        table: DynamoDB table resource
+        user_id: User's ID
+        conversation_id: Conversation ID
+        metadata: Conversation metadata item
+        limit: Maximum messages to return
+        order: "asc" (oldest first) or "desc" (newest first)
+        after: Only messages with IDs greater than this
+        before: Only messages with IDs less than this
+
+    Returns:
+        (message items in `order`, whether more messages exist past the window).
+        Crossed bounds (after >= before) are an empty window, not a query.
+    """
+    # Nothing lies strictly between crossed cursors, and BETWEEN with lower > upper is a ValidationException
+    if after and before and after >= before:
+        return [], False
+
+    ascending = order == "asc"
+    args = (table, user_id, conversation_id, limit, ascending, after, before)
+
+    messages = []
+    if not metadata.get("pages_only"):
+        messages.extend(_query_message_items(*args))
+    if metadata.get("pages_only") or metadata.get("message_page"):
+        messages.extend(_query_page_turns(*args))
+        messages.sort(key=lambda message: message["sk"], reverse=not ascending)
+
+    return messages[:limit], len(messages) > limit
+
+
+# Local testing
+if __name__ == "__main__":
+    import random
+
+    from common.conversation_utils import build_message_item
+
+    print("Testing Message Store\n")
+    print("=" * 60)
+
+    class FakeTable:
+        """Query/update_item stand-in for the expressions used by this module."""
+
+        def __init__(self, items=()):
+            self.items = {item["sk"]: dict(item) for item in items}
+            self.queries = 0
+            self.read_units = 0.0
+
+        def query(self, KeyConditionExpression, ExpressionAttributeValues, ScanIndexForward, Limit, **kwargs):
+            self.queries += 1
+            values = ExpressionAttributeValues
+            if values[":lower"] > values[":upper"]:
+                raise ClientError({"Error": {"Code": "ValidationException"}}, "Query")
+            keys = sorted(sk for sk in self.items if values[":lower"] <= sk <= values[":upper"])
+            if not ScanIndexForward:
+                keys.reverse()
+            if "ExclusiveStartKey" in kwargs:
+                keys = keys[keys.index(kwargs["ExclusiveStartKey"]["sk"]) + 1 :]
+            page = [self.items[sk] for sk in keys[:Limit]]
+            if "ProjectionExpression" in kwargs:
+                page = [{"sk": item["sk"]} for item in page]
+            # Eventually consistent query: 0.5 RCU per 4 KB of summed item sizes
+            self.read_units += 0.5 * math.ceil(sum(estimate_item_size(item) - 3 for item in page) / 4096)
+            response = {"Items": page}
+            if len(keys) > Limit:
+                response["LastEvaluatedKey"] = {"user_id": values[":uid"], "sk": page[-1]["sk"]}
+            return response
+
+        def update_item(self, Key, UpdateExpression, ConditionExpression, ExpressionAttributeValues):
+            values = ExpressionAttributeValues
+            item = self.items.get(Key["sk"])
+            if ":turn" in values:
+                if item is None or item["page_bytes"] > values[":room"]:
+                    raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")
+                item["turns"] = item["turns"] + values[":turn"]
+                item["page_bytes"] += values[":size"]
+            else:
+                if item is not None:
+                    raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")
+                self.items[Key["sk"]] = {
+                    **Key,
+                    "item_type": values[":type"],
+                    "conversation_id": values[":cid"],
+                    "turns": values[":turns"],
+                    "page_bytes": values[":size"],
+                }
+            self.items[Key["sk"]]["ttl_epoch"] = values[":ttl"]
+
+    def chat(index, repeats=(20, 120)):
+        return f"Question {index}?", f"Answer {index}. " + "The stars say many things. " * random.randint(*repeats)
+
+    def read_all(table, metadata, order, limit):
+        seen, bounds = [], {}
+        while True:
+            page, has_more = read_messages(table, "user-1", "conv-1", metadata, limit, order, **bounds)
+            seen += [message["user_message"] for message in page]
+            if not has_more:
+                return seen
+            bounds = {"after" if order == "asc" else "before": message_id_from_key(page[-1]["sk"])}
+
+    random.seed(7)
+
+    # Test 1: Turns fill pages up to the size cap
+    print("\n[Test 1] Appending turns")
+    print("-" * 60)
+    table = FakeTable()
+    current_page = None
+    for index in range(200):
+        turn = build_turn_record(*chat(index))
+        current_page = append_turn(table, "user-1", "conv-1", turn, current_page)
+    pages = [item for item in table.items.values() if item["item_type"] == "MESSAGE_PAGE"]
+    print(f"200 turns -> {len(pages)} pages, {[len(page['turns']) for page in pages]}")
+    assert sum(len(page["turns"]) for page in pages) == 200
+    assert all(page["page_bytes"] <= MESSAGE_PAGE_MAX_BYTES for page in pages)
+    assert current_page == max(table.items)
+    print("Test 1 passed")
+
+    # Test 2: Windows over pages match the full history
+    print("\n[Test 2] Reading pages")
+    print("-" * 60)
+    metadata = {"pages_only": True, "message_page": current_page}
+    history = [f"Question {index}?" for index in range(200)]
+    assert read_all(table, metadata, "asc", 30) == history
+    assert read_all(table, metadata, "desc", 30) == history[::-1]
+    latest, has_more = read_messages(table, "user-1", "conv-1", metadata, 50, "desc")
+    assert [m["user_message"] for m in latest] == history[:-51:-1] and has_more
+    middle, _ = read_messages(
+        table, "user-1", "conv-1", metadata, 10, "asc", after=latest[-1]["message_id"], before=latest[5]["message_id"]
+    )
+    assert [m["user_message"] for m in middle] == history[151:161]
+    # A new paged conversation whose first metadata update has not landed yet
+    assert read_all(table, {"pages_only": True}, "asc", 30) == history
+    print("Test 2 passed")
+
+    # Test 3: Legacy single items and pages read as one timeline
+    print("\n[Test 3] Mixed storage")
+    print("-" * 60)
+    legacy = [build_message_item("user-1", "conv-1", f"Legacy {index}?", "Answer") for index in range(15)]
+    for index, item in enumerate(legacy):
+        item["sk"] = f"CONV#conv-1#MSG#{1732622400 + index}"
+    mixed = FakeTable(legacy + list(table.items.values()))
+    mixed_metadata = {"message_page": current_page}
+    expected = [f"Legacy {index}?" for index in range(15)] + history
+    assert read_all(mixed, mixed_metadata, "asc", 25) == expected
+    assert read_all(mixed, mixed_metadata, "desc", 25) == expected[::-1]
+    assert read_all(FakeTable(legacy), {}, "asc", 4) == expected[:15]
+    print("Test 3 passed")
+
+    # Test 4: Cost of opening a long conversation at its latest 200 messages
+    print("\n[Test 4] Items vs pages for the latest 200 messages")
+    print("-" * 60)
+    for label, repeats in (("short turns (~0.3 KB)", (5, 15)), ("long turns (~2 KB)", (20, 120))):
+        print(f"  {label}")
+        turns = [chat(index, repeats) for index in range(400)]
+        items_table = FakeTable(build_message_item("user-1", "conv-1", *turn) for turn in turns)
+        paged_table = FakeTable()
+        current_page = None
+        for turn in turns:
+            current_page = append_turn(paged_table, "user-1", "conv-1", build_turn_record(*turn), current_page)
+        for storage, store, meta in (
+            ("items", items_table, {}),
+            ("pages", paged_table, {"pages_only": True, "message_page": current_page}),
+        ):
+            messages, _ = read_messages(store, "user-1", "conv-1", meta, 200, "desc")
+            assert len(messages) == 200
+            stored_kb = sum(estimate_item_size(item) - 3 for item in store.items.values()) / 1024
+            print(f"    {storage}: {store.queries} queries, {store.read_units:5.1f} RCU, {stored_kb:4.0f} KB stored")
+    print("Test 4 passed")
+
+    # Test 5: Crossed cursors are an empty window, not a failed query
+    print("\n[Test 5] Crossed cursors")
+    print("-" * 60)
+    newer, older = latest[0]["message_id"], latest[-1]["message_id"]
+    for bounds in ({"after": newer, "before": older}, {"after": newer, "before": newer}):
+        for store, meta in ((table, metadata), (mixed, mixed_metadata)):
+            queries = store.queries
+            assert read_messages(store, "user-1", "conv-1", meta, 10, "asc", **bounds) == ([], False)
+            assert store.queries == queries
+    print("Test 5 passed")
+
+    # Test 6: A spent request budget stops the append before any write
+    print("\n[Test 6] Deadline")
+    print("-" * 60)
+    from common.deadline import DeadlineExceeded
+
+    appends = FakeTable()
+    for page in (None, "CONV#conv-1#PAGE#missing"):
+        try:
+            append_turn(appends, "user-1", "conv-1", build_turn_record(*chat(0)), page, deadline=Deadline.after(0))
+        except DeadlineExceeded as e:
+            print(f"Correctly cancelled: {e}")
+        else:
+            raise AssertionError("Turn written past the deadline")
+    assert not appends.items
+    assert append_turn(appends, "user-1", "conv-1", build_turn_record(*chat(0)), deadline=Deadline.after(5))
+    print("Test 6 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
@@ -0,0 +1,59 @@
+"""
+CloudWatch metrics helpers.
+Emits metrics in Embedded Metric Format (EMF) through AWS Lambda Powertools.
+"""
+
+import logging
+import os
+
+from aws_lambda_powertools.metrics import MetricUnit, single_metric
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Namespace shared by every Mira metric
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "Mira")
+
+
+def emit_metric(name: str, value: float = 1, unit: MetricUnit = MetricUnit.Count, **dimensions: str) -> None:
+    """
+    Emit a single CloudWatch metric immediately.
+
+    Each call writes one EMF log line, so no flush step is needed at the end
+    of the invocation. Metric failures are logged and never raised, because
+    observability must not break the request path.
+
+    Args:
+        name: Metric name (e.g., "AstrologerHedgeFired")
+        value: Metric value (default: 1)
+        unit: Powertools MetricUnit (default: Count)
+        **dimensions: Dimension name/value pairs (e.g., dependency="astrologer")
+
+    Example:
+        >>> emit_metric("AstrologerRetry", outcome="success", dependency="astrologer")
+    """
+    try:
+        with single_metric(name=name, unit=unit, value=value, namespace=METRICS_NAMESPACE) as metric:
+            for dimension_name, dimension_value in dimensions.items():
+                metric.add_dimension(name=dimension_name, value=str(dimension_value))
+    except Exception as e:
+        logger.warning(f"Failed to emit metric {name}: {e}")
+
+
+# Local testing
+if __name__ == "__main__":
+    print("Testing Metrics Helper\n")
+    print("=" * 60)
+
+    print("\n[Test 1] Emit metric with dimensions")
+    print("-" * 60)
+    emit_metric("TestMetric", dependency="astrologer", outcome="success")
+    print("Test 1 passed")
+
+    print("\n[Test 2] Emit timing metric")
+    print("-" * 60)
+    emit_metric("TestLatency", 12.5, MetricUnit.Milliseconds, dependency="astrologer")
+    print("Test 2 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
@@ -0,0 +1,731 @@
+"""
+Profile persistence helpers.
+Builds profile items and bulk imports/exports the profiles table with batched DynamoDB calls.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from decimal import Decimal
+from queue import Queue
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import boto3
+
+from common.batch_write import BATCH_WRITE_SIZE, batch_write
+from common.gazetteer import resolve_location
+from common.validators import compile_profile_validator
+from common.zodiac import calculate_zodiac_sign
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+TABLE_NAME = os.environ.get("USER_PROFILES_TABLE", "mira-user-profiles-dev")
+
+# Records handed to a validation worker at a time
+IMPORT_CHUNK_SIZE = 500
+DEFAULT_WRITE_CONCURRENCY = 4
+MAX_REPORTED_ERRORS = 100
+
+# Columns written by exports, in order; exports can be imported back as-is
+EXPORT_FIELDS = [
+    "user_id",
+    "email",
+    "first_name",
+    "last_name",
+    "birth_date",
+    "birth_time",
+    "birth_location",
+    "birth_country",
+    "zodiac_sign",
+    "birth_lat",
+    "birth_lng",
+    "birth_tz",
+    "birth_geoname_id",
+    "created_at",
+    "updated_at",
+]
+
+# Attributes a profile write replaces: those the new item lacks are removed, as put_item would,
+# so a stale location or chart from the previous birth data never survives
+REPLACED_ATTRIBUTES = [field for field in EXPORT_FIELDS if field != "user_id"] + [
+    "chart_s3_path",
+    "chart_generated_at",
+    "chart_data_cached",
+]
+
+_dynamodb = None
+_validate = None
+
+
+def _get_dynamodb():
+    """DynamoDB resource, created on first use."""
+    global _dynamodb
+    if _dynamodb is None:
+        _dynamodb = boto3.resource("dynamodb")
+    return _dynamodb
+
+
+def build_profile_item(
+    user_id: str, validated_data: Dict[str, Any], email: Optional[str] = None, timestamp: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Build the DynamoDB item for a validated profile.
+
+    Resolves the birth location offline and computes the zodiac sign at the
+    birth instant. Unresolved locations are still saved, without coordinates.
+
+    Args:
+        user_id: Cognito user ID (sub)
+        validated_data: Output of `validate_user_profile`
+        email: Optional email address
+        timestamp: created_at/updated_at (defaults to now)
+
+    Returns:
+        Profile item ready for put_item / BatchWriteItem
+    """
+    # Resolve coordinates and timezone offline, so chart providers need no
+    # upstream geocoding
+    try:
+        location = resolve_location(validated_data["birth_location"], validated_data["birth_country"])
+    except Exception as e:
+        logger.warning(f"Failed to resolve birth location: {e}")
+        location = None
+
+    # Zodiac sign at the birth instant (local time when the timezone is known)
+    try:
+        zodiac_sign = calculate_zodiac_sign(
+            validated_data["birth_date"], validated_data["birth_time"], location["tz"] if location else None
+        )
+    except Exception as e:
+        logger.error(f"Failed to calculate zodiac sign: {e}")
+        zodiac_sign = "Unknown"
+
+    timestamp = timestamp or int(time.time())
+    item = {
+        "user_id": user_id,
+        "first_name": validated_data["first_name"],
+        "last_name": validated_data["last_name"],
+        "birth_date": validated_data["birth_date"],
+        "birth_time": validated_data["birth_time"],
+        "birth_location": validated_data["birth_location"],
+        "birth_country": validated_data["birth_country"],
+        "zodiac_sign": zodiac_sign,
+        "created_at": timestamp,
+        "updated_at": timestamp,
+    }
+
+    if location:
+        item["birth_lat"] = Decimal(str(location["lat"]))
+        item["birth_lng"] = Decimal(str(location["lng"]))
+        item["birth_tz"] = location["tz"]
+        item["birth_geoname_id"] = location["geoname_id"]
+
+    if email:
+        item["email"] = email
+
+    return item
+
+
+def save_profile(table, item: Dict[str, Any]) -> int:
+    """
+    Write a profile item over the current one and bump its version.
+
+    An update rather than put_item, so the `version` counter survives:
+    profile ETags come from it, because two writes within one second share
+    an updated_at. Every profile write (see update_profile_with_chart) adds
+    to it. Bulk imports write whole items and start it over.
+
+    Args:
+        table: Profiles table resource
+        item: Item from build_profile_item
+
+    Returns:
+        The profile's new version
+    """
+    names, values = {}, {":one": 1}
+    assignments, removals = [], []
+    for index, attribute in enumerate(REPLACED_ATTRIBUTES):
+        names[f"#a{index}"] = attribute
+        if attribute in item:
+            assignments.append(f"#a{index} = :a{index}")
+            values[f":a{index}"] = item[attribute]
+        else:
+            removals.append(f"#a{index}")
+
+    expression = "SET " + ", ".join(assignments)
+    if removals:
+        expression += " REMOVE " + ", ".join(removals)
+    response = table.update_item(
+        Key={"user_id": item["user_id"]},
+        UpdateExpression=expression + " ADD version :one",
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+        ReturnValues="UPDATED_NEW",
+    )
+    return int(response["Attributes"]["version"])
+
+
+def read_records(stream: TextIO, fmt: str = "ndjson") -> Iterator[Tuple[int, Any]]:
+    """
+    Stream records from NDJSON or CSV input.
+
+    Args:
+        stream: Text stream (file, stdin, StringIO)
+        fmt: "ndjson" or "csv" (with a header row)
+
+    Yields:
+        (line number, record dict); unparseable NDJSON lines yield the
+        ValueError instead of a dict so they are reported, not skipped
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {key: value for key, value in record.items() if value not in ("", None)}
+    elif fmt == "ndjson":
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                yield line_number, record if isinstance(record, dict) else ValueError("Record is not an object")
+            except json.JSONDecodeError as e:
+                yield line_number, ValueError(f"Invalid JSON: {e.msg}")
+    else:
+        raise ValueError(f"Unknown format: {fmt} (expected ndjson or csv)")
+
+
+def prepare_record(record: Any, timestamp: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Validate one import record and build its profile item.
+
+    Args:
+        record: Dict with user_id, optional email/created_at and the profile fields
+        timestamp: updated_at for the item (defaults to now)
+
+    Returns:
+        Profile item
+
+    Raises:
+        ValueError: If the record is invalid
+    """
+    global _validate
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("Record is not an object")
+    if _validate is None:
+        _validate = compile_profile_validator()
+
+    user_id = record.get("user_id")
+    if not isinstance(user_id, str) or not user_id.strip():
+        raise ValueError("Missing user_id")
+
+    item = build_profile_item(user_id.strip(), _validate(record), record.get("email"), timestamp)
+    created_at = record.get("created_at")
+    if created_at is not None:
+        try:
+            item["created_at"] = int(created_at)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid created_at: {created_at}")
+    return item
+
+
+def _prepare_chunk(chunk: List[Tuple[int, Any]], timestamp: int) -> List[Tuple[int, Optional[Dict], Optional[str]]]:
+    """Prepare a chunk of records (runs in a worker process when parallel)."""
+    results = []
+    for line_number, record in chunk:
+        try:
+            results.append((line_number, prepare_record(record, timestamp), None))
+        except ValueError as e:
+            results.append((line_number, None, str(e)))
+    return results
+
+
+def _chunks(records: Iterable[Tuple[int, Any]], size: int) -> Iterator[List[Tuple[int, Any]]]:
+    chunk = []
+    for entry in records:
+        chunk.append(entry)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_batch(items: List[Dict[str, Any]], table_name: str = TABLE_NAME) -> List[Dict[str, Any]]:
+    """
+    Put up to 25 items with BatchWriteItem, retrying unprocessed items.
+
+    Unprocessed items and throttling errors are retried with full-jitter
+    backoff (see common/batch_write.py).
+
+    Args:
+        items: Items with distinct keys
+        table_name: Target table
+
+    Returns:
+        Items that could not be written (empty on success)
+    """
+    failed = batch_write(_get_dynamodb(), table_name, [{"PutRequest": {"Item": item}} for item in items])
+    return [request["PutRequest"]["Item"] for request in failed]
+
+
+def import_profiles(
+    records: Iterable[Tuple[int, Any]],
+    table_name: str = TABLE_NAME,
+    workers: int = 0,
+    write_concurrency: int = DEFAULT_WRITE_CONCURRENCY,
+    dry_run: bool = False,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """
+    Bulk import profiles from a record stream.
+
+    Records are validated and turned into items in chunks, by `workers`
+    processes (0 validates in-process, as Lambda has no multiprocessing
+    support). Items are written 25 at a time with BatchWriteItem by
+    `write_concurrency` threads; at most twice that many batches are in
+    flight, so memory stays bounded for any input size. Existing profiles
+    with the same user_id are replaced.
+
+    Args:
+        records: (line number, record) pairs, e.g. from `read_records`
+        table_name: Target table
+        workers: Validation processes
+        write_concurrency: Concurrent BatchWriteItem requests
+        dry_run: Validate only, write nothing
+        chunk_size: Records per validation chunk
+
+    Returns:
+        Report with counts, the first MAX_REPORTED_ERRORS errors and records_per_second
+    """
+    started = time.perf_counter()
+    timestamp = int(time.time())
+    report = {"read": 0, "imported": 0, "invalid": 0, "failed": 0, "errors": []}
+    lock = threading.Lock()
+
+    def record_error(line_number: Optional[int], user_id: Optional[str], message: str) -> None:
+        with lock:
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": line_number, "user_id": user_id, "error": message})
+
+    def write(batch: List[Dict[str, Any]]) -> None:
+        # Runs on the writer pool, where nothing reads the future: every error is counted here
+        try:
+            failed, message = write_batch(batch, table_name), "Write failed after retries"
+        except Exception as e:
+            logger.error(f"Batch write failed: {e}")
+            failed, message = batch, f"Write failed: {e}"
+        with lock:
+            report["imported"] += len(batch) - len(failed)
+            report["failed"] += len(failed)
+        for item in failed:
+            record_error(None, item["user_id"], message)
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    writer = ThreadPoolExecutor(max_workers=max(1, write_concurrency), thread_name_prefix="batch-write")
+    in_flight = threading.BoundedSemaphore(max(1, write_concurrency) * 2)
+    pending_chunks = deque()
+    batch: Dict[str, Dict[str, Any]] = {}
+
+    def flush() -> None:
+        nonlocal batch
+        if batch and not dry_run:
+            in_flight.acquire()
+            future = writer.submit(write, list(batch.values()))
+            future.add_done_callback(lambda _: in_flight.release())
+        elif batch:
+            report["imported"] += len(batch)
+        batch = {}
+
+    def consume(results: List[Tuple[int, Optional[Dict], Optional[str]]]) -> None:
+        for line_number, item, error in results:
+            report["read"] += 1
+            if error:
+                report["invalid"] += 1
+                record_error(line_number, None, error)
+                continue
+            # A batch may not contain the same key twice; the later record wins
+            if item["user_id"] in batch:
+                flush()
+            batch[item["user_id"]] = item
+            if len(batch) == BATCH_WRITE_SIZE:
+                flush()
+
+    try:
+        for chunk in _chunks(records, chunk_size):
+            if pool is None:
+                consume(_prepare_chunk(chunk, timestamp))
+                continue
+            pending_chunks.append(pool.submit(_prepare_chunk, chunk, timestamp))
+            if len(pending_chunks) >= workers * 2:
+                consume(pending_chunks.popleft().result())
+        while pending_chunks:
+            consume(pending_chunks.popleft().result())
+        flush()
+    finally:
+        writer.shutdown(wait=True)
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 3)
+    report["records_per_second"] = round(report["read"] / elapsed, 1) if elapsed else 0.0
+    logger.info(
+        f"Profile import: {report['imported']} imported, {report['invalid']} invalid, {report['failed']} failed "
+        f"({report['records_per_second']} records/sec)"
+    )
+    return report
+
+
+def _export_value(value: Any) -> Any:
+    """Convert DynamoDB values to plain JSON types."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def export_profiles(
+    output: TextIO, table_name: str = TABLE_NAME, fmt: str = "ndjson", segments: int = 4
+) -> Dict[str, Any]:
+    """
+    Stream every profile to NDJSON or CSV with a parallel scan.
+
+    Each segment is scanned by its own thread and pages are written as they
+    arrive, so only a few pages are held in memory. Row order is not defined.
+
+    Args:
+        output: Text stream to write to
+        table_name: Source table
+        fmt: "ndjson" or "csv"
+        segments: Parallel scan segments
+
+    Returns:
+        Report with the number of records exported and records_per_second
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if fmt not in ("ndjson", "csv"):
+        raise ValueError(f"Unknown format: {fmt} (expected ndjson or csv)")
+
+    started = time.perf_counter()
+    table = _get_dynamodb().Table(table_name)
+    pages: Queue = Queue(maxsize=segments * 2)
+
+    def scan_segment(segment: int) -> None:
+        try:
+            kwargs = {"Segment": segment, "TotalSegments": segments}
+            while True:
+                response = table.scan(**kwargs)
+                pages.put(response.get("Items", []))
+                if "LastEvaluatedKey" not in response:
+                    break
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        except Exception as e:
+            pages.put(e)
+        finally:
+            pages.put(None)
+
+    writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS, extrasaction="ignore") if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+
+    exported = 0
+    with ThreadPoolExecutor(max_workers=segments, thread_name_prefix="scan") as scanners:
+        for segment in range(segments):
+            scanners.submit(scan_segment, segment)
+        remaining = segments
+        while remaining:
+            page = pages.get()
+            if page is None:
+                remaining -= 1
+                continue
+            if isinstance(page, Exception):
+                raise page
+            for item in page:
+                row = {field: _export_value(item[field]) for field in EXPORT_FIELDS if field in item}
+                if writer:
+                    writer.writerow(row)
+                else:
+                    output.write(json.dumps(row, ensure_ascii=False) + "\n")
+            exported += len(page)
+
+    elapsed = time.perf_counter() - started
+    report = {
+        "exported": exported,
+        "seconds": round(elapsed, 3),
+        "records_per_second": round(exported / elapsed, 1) if elapsed else 0.0,
+    }
+    logger.info(f"Profile export: {exported} records ({report['records_per_second']} records/sec)")
+    return report
+
+
+# Local testing
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    if sys.argv[1:2] in (["import"], ["export"]):
+        # python -m common.profile_store import profiles.ndjson [--format csv] [--workers 4] [--dry-run]
+        # python -m common.profile_store export profiles.ndjson [--format csv] [--segments 4]
+        parser = argparse.ArgumentParser(prog="python -m common.profile_store")
+        parser.add_argument("command", choices=["import", "export"])
+        parser.add_argument("path", help="Input/output file, or - for stdin/stdout")
+        parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+        parser.add_argument("--table", default=TABLE_NAME)
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--concurrency", type=int, default=DEFAULT_WRITE_CONCURRENCY)
+        parser.add_argument("--segments", type=int, default=4)
+        parser.add_argument("--dry-run", action="store_true")
+        args = parser.parse_args()
+        logging.basicConfig(level=logging.INFO)
+
+        if args.command == "import":
+            stream = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8", newline="")
+            with stream:
+                result = import_profiles(
+                    read_records(stream, args.format), args.table, args.workers, args.concurrency, args.dry_run
+                )
+        else:
+            stream = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8", newline="")
+            with stream:
+                result = export_profiles(stream, args.table, args.format, args.segments)
+        print(json.dumps(result, indent=2), file=sys.stderr)
+        sys.exit(0)
+
+    from common.validators import validate_user_profile
+
+    print("Testing Profile Store\n")
+    print("=" * 60)
+
+    class FakeDynamoDB:
+        """BatchWriteItem/Scan stand-in that leaves every third request partly unprocessed."""
+
+        def __init__(self):
+            self.items = {}
+            self.requests = 0
+            self.lock = threading.Lock()
+
+        def batch_write_item(self, RequestItems):
+            ((table_name, requests),) = RequestItems.items()
+            assert len(requests) <= BATCH_WRITE_SIZE
+            keys = [request["PutRequest"]["Item"]["user_id"] for request in requests]
+            assert len(keys) == len(set(keys)), "duplicate keys in one batch"
+            with self.lock:
+                self.requests += 1
+                unprocessed = requests[len(requests) // 2 :] if self.requests % 3 == 0 else []
+                for request in requests[: len(requests) - len(unprocessed)]:
+                    self.items[request["PutRequest"]["Item"]["user_id"]] = request["PutRequest"]["Item"]
+            return {"UnprocessedItems": {table_name: unprocessed} if unprocessed else {}}
+
+        def Table(self, name):
+            store = self
+
+            class FakeTable:
+                def scan(self, Segment, TotalSegments, ExclusiveStartKey=None):
+                    keys = sorted(key for key in store.items if hash(key) % TotalSegments == Segment)
+                    start = keys.index(ExclusiveStartKey["user_id"]) + 1 if ExclusiveStartKey else 0
+                    page = keys[start : start + 100]
+                    response = {"Items": [store.items[key] for key in page]}
+                    if start + 100 < len(keys):
+                        response["LastEvaluatedKey"] = {"user_id": page[-1]}
+                    return response
+
+            return FakeTable()
+
+    from common import batch_write as batch_write_module
+
+    batch_write_module.BATCH_WRITE_BASE_DELAY = 0.001
+    sample = {
+        "first_name": "Ada",
+        "last_name": "Lovelace",
+        "birth_date": "1990-01-15",
+        "birth_time": "14:30",
+        "birth_location": "New York, NY",
+        "birth_country": "United States",
+    }
+
+    # Test 1: Fast validator matches the pydantic model
+    print("\n[Test 1] Fast-path validator")
+    print("-" * 60)
+    validate = compile_profile_validator()
+    variants = [
+        {},
+        {"first_name": "  Mary-Jane "},
+        {"last_name": "O'Brien"},
+        {"first_name": "R2D2"},
+        {"first_name": ""},
+        {"birth_date": "1990-1-5"},
+        {"birth_date": "1899-12-31"},
+        {"birth_date": "2999-01-01"},
+        {"birth_date": "1990-02-30"},
+        {"birth_time": "9:05"},
+        {"birth_time": "24:00"},
+        {"birth_location": " X "},
+        {"birth_country": " usa "},
+        {"birth_country": "Atlantis"},
+        {"birth_country": 7},
+    ]
+    for variant in variants:
+        record = {**sample, **variant}
+        try:
+            expected = validate_user_profile(record)
+        except ValueError as e:
+            expected = str(e)
+        try:
+            actual = validate(record)
+        except ValueError as e:
+            actual = str(e)
+        assert actual == expected, (variant, actual, expected)
+    runs = 20_000
+    start = time.perf_counter()
+    for _ in range(runs):
+        validate_user_profile(sample)
+    model_us = (time.perf_counter() - start) / runs * 1e6
+    start = time.perf_counter()
+    for _ in range(runs):
+        validate(sample)
+    fast_us = (time.perf_counter() - start) / runs * 1e6
+    print(f"validate_user_profile: {model_us:.1f} µs, fast path: {fast_us:.1f} µs")
+    print("Test 1 passed")
+
+    # Test 2: NDJSON and CSV parsing
+    print("\n[Test 2] Streaming readers")
+    print("-" * 60)
+    ndjson = '{"user_id": "u1", "first_name": "Ada"}\n\nnot json\n[1]\n'
+    parsed = list(read_records(io.StringIO(ndjson)))
+    assert parsed[0] == (1, {"user_id": "u1", "first_name": "Ada"})
+    assert [line for line, _ in parsed] == [1, 3, 4] and all(isinstance(r, ValueError) for _, r in parsed[1:])
+    csv_text = "user_id,first_name,email\nu1,Ada,\nu2,Grace,g@example.com\n"
+    assert list(read_records(io.StringIO(csv_text), "csv")) == [
+        (2, {"user_id": "u1", "first_name": "Ada"}),
+        (3, {"user_id": "u2", "first_name": "Grace", "email": "g@example.com"}),
+    ]
+    print("Test 2 passed")
+
+    # Test 3: Import with unprocessed-item retries, invalid records and duplicates
+    print("\n[Test 3] Batched import")
+    print("-" * 60)
+    _dynamodb = FakeDynamoDB()
+    lines = [json.dumps({**sample, "user_id": f"user-{i}", "created_at": 1600000000}) for i in range(1000)]
+    lines += [json.dumps({**sample, "user_id": "user-7", "first_name": "Latest"})]
+    lines += [json.dumps({**sample, "birth_time": "25:00", "user_id": "bad"}), json.dumps(sample), "oops"]
+    result = import_profiles(read_records(io.StringIO("\n".join(lines))), "profiles", write_concurrency=4)
+    print({key: value for key, value in result.items() if key != "errors"})
+    assert result["read"] == 1004 and result["imported"] == 1001 and result["invalid"] == 3
+    assert len(_dynamodb.items) == 1000 and _dynamodb.items["user-7"]["first_name"] == "Latest"
+    assert _dynamodb.items["user-1"]["created_at"] == 1600000000
+    assert _dynamodb.items["user-1"]["zodiac_sign"] == "Capricorn"
+    assert [error["line"] for error in result["errors"]] == [1002, 1003, 1004]
+    assert "Missing user_id" in result["errors"][1]["error"]
+    # A JSON records list (POST /admin/profiles/import) can hold anything
+    result = import_profiles(enumerate(["str", 5, None, {**sample, "user_id": "user-0"}], start=1), "profiles")
+    assert result["invalid"] == 3 and result["imported"] == 1
+    assert {error["error"] for error in result["errors"]} == {"Record is not an object"}
+    print("Test 3 passed")
+
+    # Test 4: Export round trip
+    print("\n[Test 4] Streaming export")
+    print("-" * 60)
+    for fmt in ("ndjson", "csv"):
+        output = io.StringIO()
+        result = export_profiles(output, "profiles", fmt, segments=3)
+        assert result["exported"] == 1000
+        round_trip = list(read_records(io.StringIO(output.getvalue()), fmt))
+        assert len(round_trip) == 1000
+        assert {record["user_id"] for _, record in round_trip} == set(_dynamodb.items)
+        print(f"{fmt}: {result}")
+    print("Test 4 passed")
+
+    # Test 5: Throughput, in-process and with worker processes
+    print("\n[Test 5] Import throughput (fake table, no network)")
+    print("-" * 60)
+    payload = "\n".join(json.dumps({**sample, "user_id": f"user-{i}"}) for i in range(20_000))
+    logger.setLevel(logging.WARNING)
+    for workers in (0, 4):
+        _dynamodb = FakeDynamoDB()
+        result = import_profiles(read_records(io.StringIO(payload)), "profiles", workers=workers)
+        assert result["imported"] == 20_000
+        print(f"workers={workers}: {result['records_per_second']:,.0f} records/sec")
+    print("Test 5 passed")
+
+    # Test 6: Profile writes replace the item but keep counting versions
+    print("\n[Test 6] Versioned profile writes")
+    print("-" * 60)
+
+    class FakeProfilesTable:
+        """update_item stand-in for the SET/REMOVE/ADD expressions of save_profile."""
+
+        def __init__(self):
+            self.items = {}
+
+        def update_item(self, Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues, **kwargs):
+            item = self.items.setdefault(Key["user_id"], dict(Key))
+            names, values = ExpressionAttributeNames, ExpressionAttributeValues
+            clauses = UpdateExpression.replace(" REMOVE ", "|REMOVE ").replace(" ADD ", "|ADD ").split("|")
+            for clause in clauses:
+                action, _, body = clause.partition(" ")
+                for part in body.split(", "):
+                    if action == "SET":
+                        name, value = part.split(" = ")
+                        item[names[name]] = values[value]
+                    elif action == "REMOVE":
+                        item.pop(names[part], None)
+                    else:
+                        name, value = part.split(" ")
+                        item[name] = item.get(name, 0) + values[value]
+            return {"Attributes": {"version": item["version"]}}
+
+    profiles = FakeProfilesTable()
+    first = build_profile_item("user-1", validate_user_profile(sample), "ada@example.com", timestamp=1700000000)
+    assert save_profile(profiles, first) == 1
+    profiles.items["user-1"].update(chart_data_cached="{}", chart_s3_path="charts/user-1.svg")
+    # Same second, new birth place: the version still moves and the stale chart and location are dropped
+    moved = {**sample, "birth_location": "Nowhere Special"}
+    second = build_profile_item("user-1", validate_user_profile(moved), timestamp=1700000000)
+    assert save_profile(profiles, second) == 2
+    stored = profiles.items["user-1"]
+    print(stored)
+    assert stored["updated_at"] == 1700000000 and stored["birth_location"] == "Nowhere Special"
+    assert not {"chart_data_cached", "chart_s3_path", "email"} & set(stored)
+    assert all(stored[field] == second[field] for field in second)
+    print("Test 6 passed")
+
+    # Test 7: Connection errors and unexpected exceptions fail their batch, not the report
+    print("\n[Test 7] Failed batch writes")
+    print("-" * 60)
+    from botocore.exceptions import EndpointConnectionError
+
+    class FailingDynamoDB(FakeDynamoDB):
+        """Raises a connection error on the second request and a bug on the fourth."""
+
+        def batch_write_item(self, RequestItems):
+            self.calls = getattr(self, "calls", 0) + 1
+            if self.calls == 2:
+                raise EndpointConnectionError(endpoint_url="https://dynamodb.us-east-1.amazonaws.com")
+            if self.calls == 4:
+                raise KeyError("boom")
+            return super().batch_write_item(RequestItems)
+
+    _dynamodb = FailingDynamoDB()
+    payload = "\n".join(json.dumps({**sample, "user_id": f"user-{i}"}) for i in range(200))
+    result = import_profiles(read_records(io.StringIO(payload)), "profiles", write_concurrency=1)
+    print({key: value for key, value in result.items() if key != "errors"})
+    assert result["imported"] + result["failed"] == 200 and result["failed"] == 2 * BATCH_WRITE_SIZE
+    assert result["imported"] == len(_dynamodb.items)
+    assert {error["error"] for error in result["errors"]} == {"Write failed after retries", "Write failed: 'boom'"}
+    print("Test 7 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
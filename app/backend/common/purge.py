@@ -0,0 +1,834 @@
+"""
+Background data purge.
+Hard-deletes soft-deleted conversations and whole accounts with rate-limited parallel batches and resumable checkpoints.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import boto3
+from botocore.exceptions import ClientError
+
+from common.batch_write import BATCH_WRITE_SIZE, delete_keys
+from common.deadline import Deadline
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+CONVERSATIONS_TABLE = os.environ.get("DYNAMODB_CONVERSATIONS_TABLE", "mira-conversations-dev")
+PROFILES_TABLE = os.environ.get("DYNAMODB_PROFILES_TABLE", "mira-user-profiles-dev")
+CHARTS_BUCKET = os.environ.get("S3_CHARTS_BUCKET", "mira-dev-artifacts")
+
+# Event source of purge tasks (async self-invocations and the sweep schedule)
+PURGE_EVENT_SOURCE = "mira.purge"
+
+# Keys fetched per query page; the checkpoint advances once per page
+PURGE_PAGE_SIZE = 500
+
+# Concurrent BatchWriteItem calls and the item deletes per second they may share
+PURGE_WRITE_CONCURRENCY = int(os.environ.get("PURGE_WRITE_CONCURRENCY", "4"))
+PURGE_DELETES_PER_SECOND = float(os.environ.get("PURGE_DELETES_PER_SECOND", "500"))
+
+# Time kept back to save the checkpoint and hand the rest to a new invocation
+PURGE_TIME_RESERVE_SECONDS = 10.0
+
+# Account purges are rare, one-off jobs and may take a larger share of write capacity
+ACCOUNT_PURGE_WRITE_CONCURRENCY = int(os.environ.get("ACCOUNT_PURGE_WRITE_CONCURRENCY", "8"))
+ACCOUNT_PURGE_DELETES_PER_SECOND = float(os.environ.get("ACCOUNT_PURGE_DELETES_PER_SECOND", "2000"))
+
+# Sparse index of purge work: deleted conversation metadata and unfinished account purges carry
+# purge_pending = PURGE_PENDING until purged, so the sweep reads only those items, never the whole table
+PURGE_PENDING_INDEX = os.environ.get("PURGE_PENDING_INDEX", "purge-pending-index")
+PURGE_PENDING = "PENDING"
+
+# Account purge state record, kept in its own partition of the conversations table
+ACCOUNT_PURGE_ITEM_TYPE = "ACCOUNT_PURGE"
+ACCOUNT_PURGE_PHASES = ("profile", "conversations", "charts", "done")
+
+# Finished state records stay this long as an audit trail
+ACCOUNT_PURGE_RECORD_TTL_DAYS = 90
+
+# DeleteObjects accepts at most 1000 keys
+S3_DELETE_BATCH_SIZE = 1000
+
+_dynamodb = None
+_s3 = None
+_lambda_client = None
+
+
+def _get_dynamodb():
+    """DynamoDB resource, created on first use."""
+    global _dynamodb
+    if _dynamodb is None:
+        _dynamodb = boto3.resource("dynamodb")
+    return _dynamodb
+
+
+def _get_s3():
+    """S3 client, created on first use."""
+    global _s3
+    if _s3 is None:
+        _s3 = boto3.client("s3")
+    return _s3
+
+
+class RateLimiter:
+    """
+    Blocking token bucket shared by the delete threads.
+
+    Keeps a purge from consuming the table's write capacity that live
+    traffic needs: each batch waits until enough tokens have accrued.
+    """
+
+    def __init__(self, rate_per_second: float, burst: Optional[float] = None):
+        """
+        Initialize rate limiter.
+
+        Args:
+            rate_per_second: Tokens added per second
+            burst: Maximum tokens held (defaults to one second of tokens)
+        """
+        self.rate = rate_per_second
+        self.capacity = burst if burst is not None else max(rate_per_second, BATCH_WRITE_SIZE)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Wait until `tokens` are available, then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def delete_in_batches(
+    dynamodb,
+    table_name: str,
+    keys: List[Dict[str, Any]],
+    executor: ThreadPoolExecutor,
+    limiter: Optional[RateLimiter] = None,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Delete keys in parallel BatchWriteItem batches of 25.
+
+    Args:
+        dynamodb: DynamoDB resource
+        table_name: Table holding the keys
+        keys: Item keys (distinct)
+        executor: Pool running the batches
+        limiter: Optional rate limiter, charged one token per key
+
+    Returns:
+        (number deleted, keys that could not be deleted)
+    """
+
+    futures = _submit_deletes(dynamodb, table_name, keys, executor, limiter)
+    failed = [key for future in futures for key in future.result()]
+    return len(keys) - len(failed), failed
+
+
+def _submit_deletes(
+    dynamodb,
+    table_name: str,
+    keys: List[Dict[str, Any]],
+    executor: ThreadPoolExecutor,
+    limiter: Optional[RateLimiter] = None,
+) -> List[Future]:
+    """Start BatchWriteItem deletes of 25 keys each; every future resolves to the keys it could not delete."""
+
+    def delete(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if limiter:
+            limiter.acquire(len(batch))
+        return delete_keys(dynamodb, table_name, batch)
+
+    return [
+        executor.submit(delete, keys[start : start + BATCH_WRITE_SIZE])
+        for start in range(0, len(keys), BATCH_WRITE_SIZE)
+    ]
+
+
+def purge_conversation(
+    user_id: str,
+    conversation_id: str,
+    deadline: Optional[Deadline] = None,
+    dynamodb=None,
+    limiter: Optional[RateLimiter] = None,
+) -> Dict[str, Any]:
+    """
+    Hard-delete a soft-deleted conversation: its messages and pages, then its metadata.
+
+    Message keys are read page by page and deleted with parallel batches.
+    After each fully deleted page the metadata item records the last key
+    (`purge_checkpoint`) and running count (`purge_deleted`), so a run cut
+    short by the deadline or by failed deletes resumes where it stopped.
+    The metadata item goes last, and only while still marked deleted.
+
+    Args:
+        user_id: Owner of the conversation
+        conversation_id: Conversation to purge
+        deadline: Stop with status "partial" when less than PURGE_TIME_RESERVE_SECONDS remain
+        dynamodb: DynamoDB resource (defaults to boto3)
+        limiter: Rate limiter for deletes (defaults to PURGE_DELETES_PER_SECOND)
+
+    Returns:
+        {"status": "done" | "partial" | "failed" | "skipped", "deleted": 1234, "failed": 0, "seconds": 1.2}
+    """
+    dynamodb = dynamodb or _get_dynamodb()
+    limiter = limiter or RateLimiter(PURGE_DELETES_PER_SECOND)
+    table = dynamodb.Table(CONVERSATIONS_TABLE)
+    metadata_key = {"user_id": user_id, "sk": f"CONV#{conversation_id}"}
+    started = time.perf_counter()
+
+    metadata = table.get_item(Key=metadata_key, ConsistentRead=True).get("Item")
+    if metadata is None:
+        return {"status": "done", "deleted": 0, "failed": 0, "seconds": 0.0}
+    if not metadata.get("deleted", False):
+        logger.warning(f"Refusing to purge live conversation: {conversation_id}")
+        return {"status": "skipped", "deleted": 0, "failed": 0, "seconds": 0.0}
+
+    report = {"status": "partial", "deleted": int(metadata.get("purge_deleted", 0)), "failed": 0}
+    query_kwargs = {
+        # Messages (CONV#{id}#MSG#...) and pages (CONV#{id}#PAGE#...); not the metadata item itself
+        "KeyConditionExpression": "user_id = :uid AND begins_with(sk, :prefix)",
+        "ExpressionAttributeValues": {":uid": user_id, ":prefix": f"CONV#{conversation_id}#"},
+        "ProjectionExpression": "user_id, sk",
+        "Limit": PURGE_PAGE_SIZE,
+    }
+    if metadata.get("purge_checkpoint"):
+        query_kwargs["ExclusiveStartKey"] = {"user_id": user_id, "sk": metadata["purge_checkpoint"]}
+
+    with ThreadPoolExecutor(max_workers=PURGE_WRITE_CONCURRENCY, thread_name_prefix="purge") as executor:
+        while True:
+            if deadline and deadline.remaining() < PURGE_TIME_RESERVE_SECONDS:
+                break
+            response = table.query(**query_kwargs)
+            keys = [{"user_id": item["user_id"], "sk": item["sk"]} for item in response.get("Items", [])]
+            deleted, failed = delete_in_batches(dynamodb, CONVERSATIONS_TABLE, keys, executor, limiter)
+            report["deleted"] += deleted
+            if failed:
+                # Keep the checkpoint before this page; the next run retries it
+                report["status"] = "failed"
+                report["failed"] = len(failed)
+                break
+            if keys:
+                table.update_item(
+                    Key=metadata_key,
+                    UpdateExpression="SET purge_checkpoint = :checkpoint, purge_deleted = :deleted",
+                    ConditionExpression="deleted = :true",
+                    ExpressionAttributeValues={
+                        ":checkpoint": keys[-1]["sk"],
+                        ":deleted": report["deleted"],
+                        ":true": True,
+                    },
+                )
+            if "LastEvaluatedKey" not in response:
+                table.delete_item(
+                    Key=metadata_key,
+                    ConditionExpression="deleted = :true",
+                    ExpressionAttributeValues={":true": True},
+                )
+                report["status"] = "done"
+                break
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Purge of conversation {conversation_id}: {report}")
+    return report
+
+
+def account_purge_key(user_id: str) -> Dict[str, str]:
+    """Key of a user's account purge state record (outside the user's own partition)."""
+    return {"user_id": f"PURGE#{user_id}", "sk": "ACCOUNT"}
+
+
+def request_account_purge(user_id: str, requested_by: str, dynamodb=None) -> Dict[str, Any]:
+    """
+    Create the state record for an account purge and start it in the background.
+
+    Requesting a purge that is already running leaves its progress alone;
+    requesting one that finished starts it over (e.g. the user came back).
+
+    Args:
+        user_id: Account to delete
+        requested_by: Who asked for it (kept for the audit trail)
+        dynamodb: DynamoDB resource (defaults to boto3)
+
+    Returns:
+        The state record, plus "enqueued": whether the background task was started
+    """
+    dynamodb = dynamodb or _get_dynamodb()
+    table = dynamodb.Table(CONVERSATIONS_TABLE)
+    now = datetime.utcnow().isoformat() + "Z"
+    try:
+        state = table.update_item(
+            Key=account_purge_key(user_id),
+            UpdateExpression=(
+                "SET item_type = :type, target_user_id = :uid, phase = :first, items_deleted = :zero, "
+                "objects_deleted = :zero, requested_at = :now, requested_by = :by, updated_at = :now, "
+                "purge_pending = :pending REMOVE purge_checkpoint, completed_at, ttl_epoch"
+            ),
+            ConditionExpression="attribute_not_exists(phase) OR phase = :done",
+            ExpressionAttributeValues={
+                ":type": ACCOUNT_PURGE_ITEM_TYPE,
+                ":uid": user_id,
+                ":first": ACCOUNT_PURGE_PHASES[0],
+                ":zero": 0,
+                ":now": now,
+                ":by": requested_by,
+                ":done": "done",
+                ":pending": PURGE_PENDING,
+            },
+            ReturnValues="ALL_NEW",
+        )["Attributes"]
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        state = table.get_item(Key=account_purge_key(user_id), ConsistentRead=True)["Item"]
+        logger.info(f"Account purge of {user_id} already running in phase {state['phase']}")
+
+    enqueued = enqueue_purge({"task": "account", "user_id": user_id})
+    return {**state, "enqueued": enqueued}
+
+
+def purge_account(user_id: str, deadline: Optional[Deadline] = None, dynamodb=None, s3=None) -> Dict[str, Any]:
+    """
+    Delete everything stored for a user: profile, conversations partition, chart SVGs.
+
+    Runs the phases in ACCOUNT_PURGE_PHASES order from a state record
+    created by request_account_purge. The profile goes first so the app
+    stops serving the user. The conversations partition is read page by
+    page while the previous page is still being deleted with parallel
+    BatchWriteItem calls; the record's `purge_checkpoint` advances after
+    each fully deleted page. Chart objects are listed 1000 at a time and
+    each listing is removed with one DeleteObjects call, in parallel. S3
+    needs no checkpoint: a resumed listing only returns what is left.
+
+    Args:
+        user_id: Account to delete
+        deadline: Stop with status "partial" when less than PURGE_TIME_RESERVE_SECONDS remain
+        dynamodb: DynamoDB resource (defaults to boto3)
+        s3: S3 client (defaults to boto3)
+
+    Returns:
+        {"status": "done" | "partial" | "failed" | "skipped", "phase": "charts", "items_deleted": 20412,
+         "objects_deleted": 37, "failed": 0, "seconds": 9.8, "items_per_second": 2086.7}
+    """
+    dynamodb = dynamodb or _get_dynamodb()
+    s3 = s3 or _get_s3()
+    state_table = dynamodb.Table(CONVERSATIONS_TABLE)
+    state_key = account_purge_key(user_id)
+    started = time.perf_counter()
+
+    state = state_table.get_item(Key=state_key, ConsistentRead=True).get("Item")
+    if state is None:
+        logger.warning(f"No account purge requested for {user_id}")
+        return {"status": "skipped", "phase": None, "items_deleted": 0, "objects_deleted": 0, "failed": 0}
+
+    report = {
+        "status": "partial",
+        "phase": state["phase"],
+        "items_deleted": int(state.get("items_deleted", 0)),
+        "objects_deleted": int(state.get("objects_deleted", 0)),
+        "failed": 0,
+    }
+    deleted_before = report["items_deleted"] + report["objects_deleted"]
+    limiter = RateLimiter(ACCOUNT_PURGE_DELETES_PER_SECOND)
+
+    def out_of_time() -> bool:
+        return bool(deadline) and deadline.remaining() < PURGE_TIME_RESERVE_SECONDS
+
+    def save() -> None:
+        values = {
+            ":phase": report["phase"],
+            ":items": report["items_deleted"],
+            ":objects": report["objects_deleted"],
+            ":now": datetime.utcnow().isoformat() + "Z",
+        }
+        assignments = ["phase = :phase", "items_deleted = :items", "objects_deleted = :objects", "updated_at = :now"]
+        removals = []
+        if report["phase"] == "done":
+            # Off the purge index: the sweep has nothing left to do for this account
+            assignments += ["completed_at = :now", "ttl_epoch = :ttl"]
+            values[":ttl"] = int(time.time()) + ACCOUNT_PURGE_RECORD_TTL_DAYS * 86400
+            removals.append("purge_pending")
+        if state.get("purge_checkpoint"):
+            assignments.append("purge_checkpoint = :checkpoint")
+            values[":checkpoint"] = state["purge_checkpoint"]
+        else:
+            removals.append("purge_checkpoint")
+        expression = "SET " + ", ".join(assignments)
+        if removals:
+            expression += " REMOVE " + ", ".join(removals)
+        state_table.update_item(Key=state_key, UpdateExpression=expression, ExpressionAttributeValues=values)
+
+    def delete_profile(executor: ThreadPoolExecutor) -> bool:
+        response = dynamodb.Table(PROFILES_TABLE).delete_item(Key={"user_id": user_id}, ReturnValues="ALL_OLD")
+        report["items_deleted"] += "Attributes" in response
+        return True
+
+    def delete_conversations(executor: ThreadPoolExecutor) -> bool:
+        table = dynamodb.Table(CONVERSATIONS_TABLE)
+        query_kwargs = {
+            "KeyConditionExpression": "user_id = :uid",
+            "ExpressionAttributeValues": {":uid": user_id},
+            "ProjectionExpression": "user_id, sk",
+            "Limit": PURGE_PAGE_SIZE,
+        }
+        if state.get("purge_checkpoint"):
+            query_kwargs["ExclusiveStartKey"] = {"user_id": user_id, "sk": state["purge_checkpoint"]}
+
+        def settle(page: Tuple[List[Future], int, Optional[str]]) -> bool:
+            futures, count, last_sort_key = page
+            failed = [key for future in futures for key in future.result()]
+            report["items_deleted"] += count - len(failed)
+            report["failed"] += len(failed)
+            # Never move the checkpoint past a page with failed keys
+            if last_sort_key and not report["failed"]:
+                state["purge_checkpoint"] = last_sort_key
+                save()
+            return not failed
+
+        # Page whose deletes are still running while the next page is read
+        pending = None
+        while True:
+            response = None
+            if not out_of_time():
+                response = table.query(**query_kwargs)
+                keys = [{"user_id": item["user_id"], "sk": item["sk"]} for item in response.get("Items", [])]
+                futures = _submit_deletes(dynamodb, CONVERSATIONS_TABLE, keys, executor, limiter)
+                submitted = (futures, len(keys), keys[-1]["sk"] if keys else None)
+            if pending and not settle(pending):
+                if response is not None:
+                    settle(submitted)
+                return False
+            if response is None:
+                return False
+            if "LastEvaluatedKey" not in response:
+                return settle(submitted)
+            pending = submitted
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def delete_charts(executor: ThreadPoolExecutor) -> bool:
+        def delete_objects(objects: List[Dict[str, str]]) -> int:
+            try:
+                response = s3.delete_objects(Bucket=CHARTS_BUCKET, Delete={"Objects": objects, "Quiet": True})
+            except ClientError as e:
+                logger.error(f"DeleteObjects failed for {user_id}: {e}")
+                return len(objects)
+            errors = response.get("Errors", [])
+            if errors:
+                logger.error(f"DeleteObjects left {len(errors)} objects, e.g. {errors[0]}")
+            return len(errors)
+
+        list_kwargs = {"Bucket": CHARTS_BUCKET, "Prefix": f"charts/{user_id}/", "MaxKeys": S3_DELETE_BATCH_SIZE}
+        batches = []
+        listed = False
+        while not out_of_time():
+            response = s3.list_objects_v2(**list_kwargs)
+            objects = [{"Key": entry["Key"]} for entry in response.get("Contents", [])]
+            if objects:
+                batches.append((len(objects), executor.submit(delete_objects, objects)))
+            if not response.get("IsTruncated"):
+                listed = True
+                break
+            list_kwargs["ContinuationToken"] = response["NextContinuationToken"]
+
+        for count, future in batches:
+            failed = future.result()
+            report["objects_deleted"] += count - failed
+            report["failed"] += failed
+        return listed and not report["failed"]
+
+    run_phase = {
+        "profile": delete_profile,
+        "conversations": delete_conversations,
+        "charts": delete_charts,
+    }
+    with ThreadPoolExecutor(
+        max_workers=ACCOUNT_PURGE_WRITE_CONCURRENCY, thread_name_prefix="account-purge"
+    ) as executor:
+        while report["phase"] != "done":
+            if out_of_time():
+                break
+            finished = run_phase[report["phase"]](executor)
+            if report["failed"]:
+                report["status"] = "failed"
+                break
+            if not finished:
+                break
+            report["phase"] = ACCOUNT_PURGE_PHASES[ACCOUNT_PURGE_PHASES.index(report["phase"]) + 1]
+            state.pop("purge_checkpoint", None)
+            save()
+    if report["phase"] == "done":
+        report["status"] = "done"
+    else:
+        save()
+
+    seconds = time.perf_counter() - started
+    deleted = report["items_deleted"] + report["objects_deleted"] - deleted_before
+    report["seconds"] = round(seconds, 3)
+    report["items_per_second"] = round(deleted / seconds, 1) if seconds else 0.0
+    logger.info(f"Purge of account {user_id}: {report}")
+    return report
+
+
+def sweep_deleted_conversations(deadline: Optional[Deadline] = None, dynamodb=None, s3=None) -> Dict[str, Any]:
+    """
+    Purge every soft-deleted conversation still in the table and resume unfinished account purges.
+
+    Safety net for purges whose async invocation was lost or that failed;
+    runs on a schedule and resumes each purge from its checkpoint. Work is
+    found through the sparse PURGE_PENDING_INDEX, so a run reads only the
+    items still waiting to be purged, however large the table is. A
+    conversation leaves the index when its metadata item is deleted, and
+    an account when its purge reaches "done". Anything a run leaves
+    unfinished is still indexed for the next one.
+
+    Returns:
+        {"status": "done" | "partial", "conversations": 3, "accounts": 1, "deleted": 4567, "seconds": 12.3}
+    """
+    dynamodb = dynamodb or _get_dynamodb()
+    limiter = RateLimiter(PURGE_DELETES_PER_SECOND)
+    table = dynamodb.Table(CONVERSATIONS_TABLE)
+    started = time.perf_counter()
+    report = {"status": "partial", "conversations": 0, "accounts": 0, "deleted": 0}
+
+    query_kwargs = {
+        "IndexName": PURGE_PENDING_INDEX,
+        "KeyConditionExpression": "purge_pending = :pending",
+        "ExpressionAttributeValues": {":pending": PURGE_PENDING},
+        "ProjectionExpression": "user_id, item_type, conversation_id, target_user_id",
+    }
+    while True:
+        response = table.query(**query_kwargs)
+        for item in response.get("Items", []):
+            if deadline and deadline.remaining() < PURGE_TIME_RESERVE_SECONDS:
+                break
+            if item["item_type"] == ACCOUNT_PURGE_ITEM_TYPE:
+                result = purge_account(item["target_user_id"], deadline, dynamodb, s3)
+                report["deleted"] += result["items_deleted"] + result["objects_deleted"]
+                report["accounts"] += result["status"] == "done"
+                continue
+            result = purge_conversation(item["user_id"], item["conversation_id"], deadline, dynamodb, limiter)
+            report["deleted"] += result["deleted"]
+            report["conversations"] += result["status"] == "done"
+        else:
+            if "LastEvaluatedKey" in response:
+                query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+                continue
+            report["status"] = "done"
+        break
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Purge sweep: {report}")
+    return report
+
+
+def enqueue_purge(task: Dict[str, Any]) -> bool:
+    """
+    Start a purge task asynchronously by invoking this Lambda with a purge event.
+
+    Failures are logged, not raised: the scheduled sweep picks up anything
+    left behind.
+
+    Args:
+        task: Purge event fields, e.g. {"task": "conversation", "user_id": ..., "conversation_id": ...}
+
+    Returns:
+        True if the invocation was accepted
+    """
+    global _lambda_client
+    function_name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+    if not function_name:
+        logger.info(f"Not running in Lambda, purge not enqueued: {task}")
+        return False
+    try:
+        if _lambda_client is None:
+            _lambda_client = boto3.client("lambda")
+        _lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType="Event",
+            Payload=json.dumps({"source": PURGE_EVENT_SOURCE, **task}).encode("utf-8"),
+        )
+        return True
+    except ClientError as e:
+        logger.warning(f"Failed to enqueue purge {task}: {e}")
+        return False
+
+
+# Local testing
+if __name__ == "__main__":
+    print("Testing Purge\n")
+    print("=" * 60)
+
+    class FakeDynamoDB:
+        """Conversations and profiles tables; BatchWriteItem throttles every 4th call."""
+
+        def __init__(self, items, latency=0.0, profiles=()):
+            self.items = {(item["user_id"], item["sk"]): dict(item) for item in items}
+            self.profiles = {user_id: {"user_id": user_id} for user_id in profiles}
+            self.latency = latency
+            self.batch_calls = 0
+            self.fail_keys = set()
+            self.index_reads = 0
+            self.lock = threading.Lock()
+
+        def batch_write_item(self, RequestItems):
+            ((table_name, requests),) = RequestItems.items()
+            assert len(requests) <= BATCH_WRITE_SIZE
+            time.sleep(self.latency)
+            with self.lock:
+                self.batch_calls += 1
+                unprocessed = requests[len(requests) // 2 :] if self.batch_calls % 4 == 0 else []
+                for request in requests[: len(requests) - len(unprocessed)]:
+                    key = request["DeleteRequest"]["Key"]
+                    if key["sk"] in self.fail_keys:
+                        unprocessed.append(request)
+                    else:
+                        self.items.pop((key["user_id"], key["sk"]), None)
+            return {"UnprocessedItems": {table_name: unprocessed} if unprocessed else {}}
+
+        def Table(self, name):
+            store = self
+
+            class FakeProfilesTable:
+                def delete_item(self, Key, ReturnValues):
+                    item = store.profiles.pop(Key["user_id"], None)
+                    return {"Attributes": item} if item else {}
+
+            class FakeTable:
+                def get_item(self, Key, ConsistentRead=False):
+                    item = store.items.get((Key["user_id"], Key["sk"]))
+                    return {"Item": dict(item)} if item else {}
+
+                def query(
+                    self, KeyConditionExpression, ExpressionAttributeValues, ProjectionExpression, Limit=None, **kw
+                ):
+                    if kw.get("IndexName") == PURGE_PENDING_INDEX:
+                        pending = ExpressionAttributeValues[":pending"]
+                        matches = [
+                            {field: item[field] for field in ProjectionExpression.split(", ") if field in item}
+                            for item in store.items.values()
+                            if item.get("purge_pending") == pending
+                        ]
+                        store.index_reads += len(matches)
+                        return {"Items": matches}
+                    uid, prefix = ExpressionAttributeValues[":uid"], ExpressionAttributeValues.get(":prefix", "")
+                    time.sleep(store.latency)
+                    with store.lock:
+                        keys = sorted(sk for user, sk in store.items if user == uid and sk.startswith(prefix))
+                    if "ExclusiveStartKey" in kw:
+                        keys = [sk for sk in keys if sk > kw["ExclusiveStartKey"]["sk"]]
+                    response = {"Items": [{"user_id": uid, "sk": sk} for sk in keys[:Limit]]}
+                    if len(keys) > Limit:
+                        response["LastEvaluatedKey"] = {"user_id": uid, "sk": keys[Limit - 1]}
+                    return response
+
+                def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, ConditionExpression=None, **kw):
+                    item = store.items.setdefault((Key["user_id"], Key["sk"]), dict(Key))
+                    if ConditionExpression == "deleted = :true":
+                        assert item["deleted"]
+                    elif ConditionExpression and item.get("phase") not in (None, "done"):
+                        error = {"Error": {"Code": "ConditionalCheckFailedException", "Message": "in progress"}}
+                        raise ClientError(error, "UpdateItem")
+                    assignments, _, removals = UpdateExpression.removeprefix("SET ").partition(" REMOVE ")
+                    for assignment in assignments.split(", "):
+                        field, placeholder = assignment.split(" = ")
+                        item[field] = ExpressionAttributeValues[placeholder]
+                    for field in filter(None, removals.split(", ")):
+                        item.pop(field, None)
+                    return {"Attributes": dict(item)}
+
+                def delete_item(self, Key, ConditionExpression, ExpressionAttributeValues):
+                    item = store.items[(Key["user_id"], Key["sk"])]
+                    assert item["deleted"]
+                    del store.items[(Key["user_id"], Key["sk"])]
+
+            return FakeProfilesTable() if name == PROFILES_TABLE else FakeTable()
+
+    class FakeS3:
+        """Bucket stand-in: paginated list_objects_v2 and DeleteObjects with per-call latency."""
+
+        def __init__(self, keys, latency=0.0):
+            self.keys = set(keys)
+            self.latency = latency
+            self.delete_calls = 0
+            self.lock = threading.Lock()
+
+        def list_objects_v2(self, Bucket, Prefix, MaxKeys, ContinuationToken=None):
+            time.sleep(self.latency)
+            with self.lock:
+                keys = sorted(key for key in self.keys if key.startswith(Prefix) and key > (ContinuationToken or ""))
+            response = {"Contents": [{"Key": key} for key in keys[:MaxKeys]], "IsTruncated": len(keys) > MaxKeys}
+            if response["IsTruncated"]:
+                response["NextContinuationToken"] = keys[MaxKeys - 1]
+            return response
+
+        def delete_objects(self, Bucket, Delete):
+            assert len(Delete["Objects"]) <= S3_DELETE_BATCH_SIZE and Delete["Quiet"]
+            time.sleep(self.latency)
+            with self.lock:
+                self.delete_calls += 1
+                for entry in Delete["Objects"]:
+                    self.keys.discard(entry["Key"])
+            return {}
+
+    from common import batch_write as batch_write_module
+
+    batch_write_module.BATCH_WRITE_BASE_DELAY = 0.001
+
+    def conversation(user_id, conversation_id, messages, deleted=True):
+        items = [
+            {
+                "user_id": user_id,
+                "sk": f"CONV#{conversation_id}",
+                "item_type": "METADATA",
+                "conversation_id": conversation_id,
+                "deleted": deleted,
+            }
+        ]
+        if deleted:
+            items[0]["purge_pending"] = PURGE_PENDING
+        items += [{"user_id": user_id, "sk": f"CONV#{conversation_id}#MSG#U{n:025d}"} for n in range(messages)]
+        items += [{"user_id": user_id, "sk": f"CONV#{conversation_id}#PAGE#U{n:025d}"} for n in range(3)]
+        return items
+
+    # Test 1: Full purge removes messages, pages and metadata, never the live neighbour
+    print("\n[Test 1] Purge a deleted conversation")
+    print("-" * 60)
+    store = FakeDynamoDB(conversation("user-1", "c1", 1200) + conversation("user-1", "c10", 5, deleted=False))
+    report = purge_conversation("user-1", "c1", dynamodb=store, limiter=RateLimiter(1e6))
+    print(report)
+    assert report["status"] == "done" and report["deleted"] == 1203
+    assert not any(sk.startswith("CONV#c1#") or sk == "CONV#c1" for _, sk in store.items)
+    assert len(store.items) == 9
+    assert purge_conversation("user-1", "c10", dynamodb=store)["status"] == "skipped"
+    assert purge_conversation("user-1", "c1", dynamodb=store)["status"] == "done"
+    print("Test 1 passed")
+
+    # Test 2: Deadline stops between pages; the next run resumes from the checkpoint
+    print("\n[Test 2] Resume from checkpoint")
+    print("-" * 60)
+    store = FakeDynamoDB(conversation("user-1", "c2", 1800))
+    short = Deadline.after(PURGE_TIME_RESERVE_SECONDS + 0.05)
+    first = purge_conversation("user-1", "c2", deadline=short, dynamodb=store, limiter=RateLimiter(4000, burst=25))
+    metadata = store.items[("user-1", "CONV#c2")]
+    print(f"First run: {first}, checkpoint {metadata.get('purge_checkpoint')}")
+    assert first["status"] == "partial" and 0 < first["deleted"] < 1803
+    assert metadata["purge_deleted"] == first["deleted"]
+    second = purge_conversation("user-1", "c2", dynamodb=store, limiter=RateLimiter(1e6))
+    assert second["status"] == "done" and second["deleted"] == 1803 and not store.items
+    print("Test 2 passed")
+
+    # Test 3: Keys that keep failing stop the purge without losing the checkpoint
+    print("\n[Test 3] Failed deletes")
+    print("-" * 60)
+    store = FakeDynamoDB(conversation("user-1", "c3", 700))
+    store.fail_keys = {f"CONV#c3#MSG#U{600:025d}"}
+    report = purge_conversation("user-1", "c3", dynamodb=store, limiter=RateLimiter(1e6))
+    print(report)
+    assert report["status"] == "failed" and report["failed"] == 1
+    assert store.items[("user-1", "CONV#c3")]["purge_checkpoint"] == f"CONV#c3#MSG#U{499:025d}"
+    store.fail_keys = set()
+    assert purge_conversation("user-1", "c3", dynamodb=store, limiter=RateLimiter(1e6))["status"] == "done"
+    print("Test 3 passed")
+
+    # Test 4: Sweep, rate limit and parallel throughput
+    print("\n[Test 4] Sweep throughput")
+    print("-" * 60)
+    items = []
+    for index in range(4):
+        items += conversation(f"user-{index}", f"s{index}", 2500)
+    store = FakeDynamoDB(items + conversation("user-9", "live", 10, deleted=False), latency=0.01)
+    PURGE_DELETES_PER_SECOND = 1e6
+    report = sweep_deleted_conversations(dynamodb=store)
+    print(f"{report} -> {report['deleted'] / report['seconds']:.0f} items/sec (10 ms per batch call)")
+    assert report["status"] == "done" and report["conversations"] == 4 and len(store.items) == 14
+    # Only the pending items were read, not the 10k+ messages around them
+    assert store.index_reads == 4
+    assert sweep_deleted_conversations(dynamodb=store)["conversations"] == 0 and store.index_reads == 4
+    limiter = RateLimiter(2000, burst=25)
+    start = time.perf_counter()
+    for _ in range(20):
+        limiter.acquire(25)
+    elapsed = time.perf_counter() - start
+    print(f"Rate limit 2000/s: 500 tokens in {elapsed:.2f}s")
+    assert 0.2 <= elapsed < 0.4
+    print("Test 4 passed")
+
+    # Test 5: Account purge removes profile, whole partition and charts; other users are untouched
+    print("\n[Test 5] Account purge throughput")
+    print("-" * 60)
+    ACCOUNT_PURGE_DELETES_PER_SECOND = 1e6
+    items = []
+    for index in range(8):
+        items += conversation("heavy", f"h{index}", 2500, deleted=index % 2 == 0)
+    items += conversation("other", "o1", 20, deleted=False)
+    store = FakeDynamoDB(items, latency=0.01, profiles=["heavy", "other"])
+    bucket = FakeS3([f"charts/heavy/{n}.svg" for n in range(2500)] + ["charts/other/1.svg"], latency=0.01)
+    state = request_account_purge("heavy", "admin-1", dynamodb=store)
+    assert state["phase"] == "profile" and state["enqueued"] is False
+    report = purge_account("heavy", dynamodb=store, s3=bucket)
+    print(f"{report} (10 ms per call)")
+    assert report["status"] == "done" and report["items_deleted"] == 8 * 2504 + 1
+    assert report["objects_deleted"] == 2500 and bucket.delete_calls == 3
+    assert not any(user == "heavy" for user, _ in store.items) and "heavy" not in store.profiles
+    assert "other" in store.profiles and bucket.keys == {"charts/other/1.svg"} and len(store.items) == 24 + 1
+    record = store.items[("PURGE#heavy", "ACCOUNT")]
+    assert record["phase"] == "done" and record["ttl_epoch"] > time.time() and "purge_checkpoint" not in record
+    assert "purge_pending" not in record
+    assert report["seconds"] < 5
+    print("Test 5 passed")
+
+    # Test 6: Deadline stops mid-partition; the state record carries the run over
+    print("\n[Test 6] Resume account purge")
+    print("-" * 60)
+    items = conversation("u6", "a", 3000, deleted=False) + conversation("u6", "b", 3000, deleted=False)
+    store = FakeDynamoDB(items, latency=0.01, profiles=["u6"])
+    bucket = FakeS3([f"charts/u6/{n}.svg" for n in range(10)])
+    request_account_purge("u6", "admin-1", dynamodb=store)
+    first = purge_account("u6", deadline=Deadline.after(PURGE_TIME_RESERVE_SECONDS + 0.1), dynamodb=store, s3=bucket)
+    record = store.items[("PURGE#u6", "ACCOUNT")]
+    print(f"First run: {first}, checkpoint {record.get('purge_checkpoint')}")
+    assert first["status"] == "partial" and first["phase"] == "conversations" and record["purge_checkpoint"]
+    assert record["purge_pending"] == PURGE_PENDING
+    assert record["items_deleted"] == first["items_deleted"] < 6009
+    assert request_account_purge("u6", "admin-2", dynamodb=store)["items_deleted"] == first["items_deleted"]
+    report = sweep_deleted_conversations(dynamodb=store, s3=bucket)
+    print(f"Sweep: {report}")
+    assert report["accounts"] == 1 and store.items[("PURGE#u6", "ACCOUNT")]["items_deleted"] == 6009
+    assert list(store.items) == [("PURGE#u6", "ACCOUNT")] and not bucket.keys
+    assert request_account_purge("u6", "admin-1", dynamodb=store)["phase"] == "profile"
+    print("Test 6 passed")
+
+    # Test 7: Failed deletes stop the purge in its phase without moving the checkpoint past them
+    print("\n[Test 7] Failed account deletes")
+    print("-" * 60)
+    store = FakeDynamoDB(conversation("u7", "a", 1600), profiles=["u7"])
+    store.fail_keys = {f"CONV#a#MSG#U{1200:025d}"}
+    request_account_purge("u7", "admin-1", dynamodb=store)
+    report = purge_account("u7", dynamodb=store, s3=FakeS3([]))
+    record = store.items[("PURGE#u7", "ACCOUNT")]
+    print(f"{report}, checkpoint {record['purge_checkpoint']}")
+    assert report["status"] == "failed" and report["failed"] == 1 and record["phase"] == "conversations"
+    assert record["purge_checkpoint"] < f"CONV#a#MSG#U{1200:025d}"
+    store.fail_keys = set()
+    assert purge_account("u7", dynamodb=store, s3=FakeS3([]))["status"] == "done"
+    assert purge_account("nobody", dynamodb=store, s3=FakeS3([]))["status"] == "skipped"
+    print("Test 7 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
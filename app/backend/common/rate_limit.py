@@ -0,0 +1,648 @@
+"""
+Token-bucket rate limiting shared across Lambda containers.
+Buckets live in DynamoDB as one timestamp each (GCRA); denials are answered from the container cache.
+Outbound quotas (the Astrologer API) are reserved in batches so most calls never leave the container.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from common.api_wrapper import ApiResponse
+from common.metrics import MetricUnit, emit_metric
+from common.request import Request
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+CONVERSATIONS_TABLE = os.environ.get("DYNAMODB_CONVERSATIONS_TABLE", "mira-conversations-dev")
+
+# Buckets are kept in their own partitions of the conversations table: {"user_id": "RATE#<key>", "sk": <name>}
+RATE_LIMIT_KEY_PREFIX = "RATE#"
+
+# Idle buckets are full again long before this and are left to DynamoDB TTL (ttl_epoch)
+RATE_LIMIT_ITEM_TTL_SECONDS = 24 * 60 * 60
+
+# Compare-and-set attempts per decision before giving up and allowing the request
+RATE_LIMIT_MAX_ATTEMPTS = 4
+
+# Tier for callers in none of the configured tier groups
+DEFAULT_TIER = "free"
+
+# Per-tier chat limits, keyed by Cognito group: sustained requests per minute and burst size
+CHAT_RATE_LIMITS = json.loads(
+    os.environ.get(
+        "CHAT_RATE_LIMITS",
+        '{"free": {"per_minute": 4, "burst": 8}, "premium": {"per_minute": 20, "burst": 30}}',
+    )
+)
+
+# Astrologer (RapidAPI) request quota shared by every container: sustained rate and burst
+ASTROLOGER_REQUESTS_PER_MINUTE = float(os.environ.get("ASTROLOGER_REQUESTS_PER_MINUTE", "60"))
+ASTROLOGER_REQUEST_BURST = int(os.environ.get("ASTROLOGER_REQUEST_BURST", "10"))
+
+# Most outbound tokens a container reserves per DynamoDB call; unused ones lapse after
+# OUTBOUND_RESERVATION_SECONDS so an idle container does not sit on shared quota
+OUTBOUND_RESERVATION_BATCH = int(os.environ.get("OUTBOUND_RESERVATION_BATCH", "5"))
+OUTBOUND_RESERVATION_SECONDS = 5.0
+
+# A limiter call sits in front of every chat request: a slow or unreachable table fails open
+# after at most two short attempts instead of holding the request for the SDK defaults (60 s)
+RATE_LIMIT_CONNECT_TIMEOUT_SECONDS = 0.5
+RATE_LIMIT_READ_TIMEOUT_SECONDS = 0.5
+RATE_LIMIT_CALL_ATTEMPTS = 2
+
+_dynamodb = None
+
+
+def _get_dynamodb():
+    """DynamoDB resource with short timeouts, created on first use."""
+    global _dynamodb
+    if _dynamodb is None:
+        _dynamodb = boto3.resource(
+            "dynamodb",
+            config=Config(
+                connect_timeout=RATE_LIMIT_CONNECT_TIMEOUT_SECONDS,
+                read_timeout=RATE_LIMIT_READ_TIMEOUT_SECONDS,
+                retries={"total_max_attempts": RATE_LIMIT_CALL_ATTEMPTS, "mode": "standard"},
+            ),
+        )
+    return _dynamodb
+
+
+class RateLimit:
+    """Sustained rate and burst size of one token bucket."""
+
+    def __init__(self, per_minute: float, burst: int):
+        """
+        Initialize limit.
+
+        Args:
+            per_minute: Tokens added per minute
+            burst: Bucket size (requests allowed back to back when full)
+        """
+        if per_minute <= 0 or burst < 1:
+            raise ValueError("per_minute must be positive and burst at least 1")
+        self.per_minute = per_minute
+        self.burst = int(burst)
+        # One token is worth this many milliseconds; a full bucket is burst tokens
+        self.interval_ms = 60000.0 / per_minute
+        self.capacity_ms = self.burst * self.interval_ms
+
+    def __repr__(self):
+        return f"RateLimit(per_minute={self.per_minute}, burst={self.burst})"
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call would have to wait longer than allowed for its rate limit."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} rate limit exhausted, retry after {retry_after:.2f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class RateLimitDecision:
+    """Outcome of one acquire()."""
+
+    def __init__(self, allowed: bool, retry_after: float = 0.0, remaining: int = 0, granted: int = 0):
+        self.allowed = allowed
+        self.retry_after = retry_after  # Seconds until the request would be allowed
+        self.remaining = remaining  # Whole tokens left after this decision
+        self.granted = granted  # Tokens taken (cost, or fewer for a partial acquire)
+
+    def __repr__(self):
+        return (
+            f"RateLimitDecision(allowed={self.allowed}, retry_after={self.retry_after:.2f}, "
+            f"remaining={self.remaining}, granted={self.granted})"
+        )
+
+
+class TokenBucketStore:
+    """
+    Token buckets in DynamoDB using the generic cell rate algorithm.
+
+    Each bucket is one item holding its theoretical arrival time (tat_ms):
+    the instant it would be full again. Taking n tokens moves it n intervals
+    ahead, and is allowed while it stays within capacity of now. Updates are
+    compare-and-set, so containers never oversubscribe a bucket; a lost race
+    returns the winner's value, which is retried without an extra read.
+
+    The container remembers the last arrival time it saw per bucket. Since
+    that time only ever moves forward, a request the cached value already
+    rejects is rejected locally, without a DynamoDB call. DynamoDB failures
+    fail open: a request is never refused because the limiter is down.
+    """
+
+    def __init__(self, table_name: str = CONVERSATIONS_TABLE, dynamodb=None, clock=time.time):
+        """
+        Initialize store.
+
+        Args:
+            table_name: Table holding bucket items (user_id + sk keys, ttl_epoch TTL)
+            dynamodb: DynamoDB resource (created on first use when omitted)
+            clock: Time source in epoch seconds
+        """
+        self.table_name = table_name
+        self._dynamodb = dynamodb
+        self._clock = clock
+        self._known_tat: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, name: str, limit: RateLimit, cost: int = 1, partial: bool = False) -> RateLimitDecision:
+        """
+        Take tokens from a bucket.
+
+        Args:
+            key: Bucket owner, e.g. a user_id
+            name: Bucket name, e.g. "chat"
+            limit: Rate and burst of the bucket
+            cost: Tokens wanted (at most limit.burst)
+            partial: Take as many tokens as are available, up to cost, instead of all or nothing
+
+        Returns:
+            RateLimitDecision (retry_after says when cost tokens, or one for partial, will be available)
+        """
+        bucket = (key, name)
+        for _ in range(RATE_LIMIT_MAX_ATTEMPTS):
+            now_ms = int(self._clock() * 1000)
+            with self._lock:
+                known = self._known_tat.get(bucket)
+            # Credit already spent beyond now; the stored value is never below the cached one
+            backlog_ms = max(0, known - now_ms) if known is not None else 0
+            available = int((limit.capacity_ms - backlog_ms) // limit.interval_ms)
+            granted = min(cost, available) if partial else (cost if available >= cost else 0)
+            if granted <= 0:
+                needed = 1 if partial else cost
+                retry_after = (backlog_ms + needed * limit.interval_ms - limit.capacity_ms) / 1000.0
+                return RateLimitDecision(False, retry_after=max(retry_after, 0.001), remaining=max(available, 0))
+
+            new_tat = now_ms + backlog_ms + int(math.ceil(granted * limit.interval_ms))
+            try:
+                written, stored = self._compare_and_set(bucket, known if backlog_ms else None, now_ms, new_tat)
+            except (ClientError, BotoCoreError) as e:
+                logger.warning(f"Rate limit check failed open for {name}/{key}: {e}")
+                emit_metric("RateLimiterError", bucket=name)
+                return RateLimitDecision(True, granted=cost)
+            with self._lock:
+                if stored:
+                    self._known_tat[bucket] = max(stored, self._known_tat.get(bucket, 0))
+                else:  # The item expired: the bucket is full
+                    self._known_tat.pop(bucket, None)
+            if written:
+                return RateLimitDecision(True, remaining=available - granted, granted=granted)
+            # Another container moved the bucket first: retry against its value
+
+        logger.warning(f"Rate limit check for {name}/{key} lost {RATE_LIMIT_MAX_ATTEMPTS} races, allowing")
+        return RateLimitDecision(True, granted=cost)
+
+    def block_until(self, key: str, name: str, limit: RateLimit, until: float) -> None:
+        """
+        Empty a bucket until an absolute time (e.g. an upstream Retry-After).
+
+        Moves the stored arrival time forward only, so concurrent blocks keep
+        the latest. Failures are logged; the local cache is updated regardless.
+        """
+        bucket = (key, name)
+        tat = int(until * 1000 + limit.capacity_ms - limit.interval_ms)
+        with self._lock:
+            self._known_tat[bucket] = max(tat, self._known_tat.get(bucket, 0))
+        try:
+            self._table().update_item(
+                Key={"user_id": f"{RATE_LIMIT_KEY_PREFIX}{key}", "sk": name},
+                UpdateExpression="SET tat_ms = :tat, ttl_epoch = :ttl",
+                ConditionExpression="attribute_not_exists(tat_ms) OR tat_ms < :tat",
+                ExpressionAttributeValues={":tat": tat, ":ttl": tat // 1000 + RATE_LIMIT_ITEM_TTL_SECONDS},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                logger.warning(f"Could not share rate limit block for {name}/{key}: {e}")
+        except BotoCoreError as e:
+            logger.warning(f"Could not share rate limit block for {name}/{key}: {e}")
+
+    def forget(self) -> None:
+        """Drop cached arrival times (tests, or after changing limits)."""
+        with self._lock:
+            self._known_tat.clear()
+
+    def _table(self):
+        if self._dynamodb is None:
+            self._dynamodb = _get_dynamodb()
+        return self._dynamodb.Table(self.table_name)
+
+    def _compare_and_set(
+        self, bucket: Tuple[str, str], expected: Optional[int], now_ms: int, new_tat: int
+    ) -> Tuple[bool, int]:
+        """
+        Write new_tat if the stored arrival time is still the one assumed.
+
+        expected None means "the bucket is full" (no item, or its time has
+        passed). Returns whether it was written and the stored arrival time
+        (new_tat, or the current value when the condition failed; 0 if the
+        item no longer exists).
+        """
+        key, name = bucket
+        if expected is None:
+            condition = "attribute_not_exists(tat_ms) OR tat_ms <= :now"
+            values = {":now": now_ms}
+        else:
+            condition = "tat_ms = :expected"
+            values = {":expected": expected}
+        try:
+            self._table().update_item(
+                Key={"user_id": f"{RATE_LIMIT_KEY_PREFIX}{key}", "sk": name},
+                UpdateExpression="SET tat_ms = :tat, ttl_epoch = :ttl",
+                ConditionExpression=condition,
+                ExpressionAttributeValues={
+                    ":tat": new_tat,
+                    ":ttl": new_tat // 1000 + RATE_LIMIT_ITEM_TTL_SECONDS,
+                    **values,
+                },
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            )
+            return True, new_tat
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return False, _stored_tat(e.response.get("Item"))
+
+
+def _stored_tat(item: Optional[Dict[str, Any]]) -> int:
+    """tat_ms from a ConditionalCheckFailed ALL_OLD item (low-level attribute format)."""
+    value = (item or {}).get("tat_ms", {})
+    if isinstance(value, dict):
+        value = value.get("N", 0)
+    return int(value)
+
+
+class OutboundRateLimiter:
+    """
+    Container-side gate for a quota shared by every container (e.g. the Astrologer API key).
+
+    Tokens are reserved from the shared bucket in batches and spent locally,
+    so most calls cost a lock and a counter. The batch adapts to demand: it
+    doubles (up to OUTBOUND_RESERVATION_BATCH) when a reservation is used up
+    and halves when one lapses with tokens left, so idle containers reserve
+    one token at a time.
+
+    When the budget is exhausted a caller waits (queues) if the wait fits
+    within its max_wait, and is shed with RateLimitExceeded otherwise. An
+    upstream Retry-After blocks the shared bucket for every container.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: RateLimit,
+        store: Optional[TokenBucketStore] = None,
+        max_batch: int = OUTBOUND_RESERVATION_BATCH,
+        reservation_seconds: float = OUTBOUND_RESERVATION_SECONDS,
+        clock=time.time,
+        sleep=time.sleep,
+    ):
+        """
+        Initialize limiter.
+
+        Args:
+            name: Shared bucket key, e.g. "astrologer"
+            limit: Quota across all containers
+            store: Bucket store (defaults to the container-wide one)
+            max_batch: Most tokens reserved per DynamoDB call
+            reservation_seconds: How long reserved tokens stay usable
+            clock: Time source in epoch seconds
+            sleep: Blocking sleep, used while queued
+        """
+        self.name = name
+        self.limit = limit
+        self._store = store
+        self.max_batch = max(1, min(max_batch, limit.burst))
+        self.reservation_seconds = reservation_seconds
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = 0
+        self._tokens_expire_at = 0.0
+        self._batch = 1
+        self._blocked_until = 0.0
+
+    @property
+    def store(self) -> TokenBucketStore:
+        return self._store or bucket_store
+
+    def acquire(self, max_wait: float = 0.0) -> float:
+        """
+        Take one token, waiting up to max_wait seconds for one.
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            RateLimitExceeded: If no token is available within max_wait
+        """
+        waited = 0.0
+        while True:
+            wait = self._take_local()
+            if wait is None:
+                decision = self.store.acquire(self.name, "OUTBOUND", self.limit, cost=self._batch, partial=True)
+                if decision.allowed:
+                    self._add_reservation(decision.granted)
+                    continue
+                wait = decision.retry_after
+            if wait == 0:
+                if waited:
+                    emit_metric("OutboundRateLimitQueued", waited, MetricUnit.Seconds, dependency=self.name)
+                return waited
+            if waited + wait > max_wait:
+                emit_metric("OutboundRateLimitShed", dependency=self.name)
+                raise RateLimitExceeded(self.name, wait)
+            self._sleep(wait)
+            waited += wait
+
+    def block_until(self, until: float) -> None:
+        """Stop calls from every container until an epoch time (upstream Retry-After)."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, until)
+            self._tokens = 0
+        self.store.block_until(self.name, "OUTBOUND", self.limit, until)
+
+    def _take_local(self) -> Optional[float]:
+        """0 if a reserved token was taken, seconds to wait if blocked, None to reserve more."""
+        with self._lock:
+            now = self._clock()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self._tokens and now >= self._tokens_expire_at:
+                # Reservation lapsed unused: ask for less next time
+                self._tokens = 0
+                self._batch = max(1, self._batch // 2)
+            if self._tokens:
+                self._tokens -= 1
+                if not self._tokens:
+                    # Reservation used up in time: ask for more next time
+                    self._batch = min(self.max_batch, self._batch * 2)
+                return 0
+            return None
+
+    def _add_reservation(self, granted: int) -> None:
+        with self._lock:
+            self._tokens += granted
+            self._tokens_expire_at = self._clock() + self.reservation_seconds
+
+
+def chat_limit_for(groups: Iterable[str]) -> Tuple[str, RateLimit]:
+    """
+    Chat tier and limit for a caller's Cognito groups.
+
+    A caller in several tier groups gets the most generous one; anyone else
+    gets DEFAULT_TIER.
+    """
+    tiers = [group for group in groups if group in CHAT_RATE_LIMITS] or [DEFAULT_TIER]
+    tier = max(tiers, key=lambda name: CHAT_RATE_LIMITS[name]["per_minute"])
+    return tier, RateLimit(**CHAT_RATE_LIMITS[tier])
+
+
+# Shared by every request in the container
+bucket_store = TokenBucketStore()
+astrologer_rate_limiter = OutboundRateLimiter(
+    "astrologer", RateLimit(per_minute=ASTROLOGER_REQUESTS_PER_MINUTE, burst=ASTROLOGER_REQUEST_BURST)
+)
+
+
+def enforce_chat_rate_limit(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Rate limit POST /chat per user, before any Bedrock or Astrologer work.
+
+    Args:
+        event: Raw API Gateway event
+
+    Returns:
+        A 429 API Gateway response with Retry-After, or None to proceed.
+        Unauthenticated requests proceed (the chat handler answers 401).
+    """
+    request = Request.of(event)
+    try:
+        user_id = request.user_id
+    except ValueError:
+        return None
+
+    tier, limit = chat_limit_for(request.groups)
+    decision = bucket_store.acquire(user_id, "chat", limit)
+    if decision.allowed:
+        return None
+
+    retry_after = max(1, math.ceil(decision.retry_after))
+    logger.info(f"Chat rate limit hit for user {user_id} (tier {tier}), retry after {retry_after}s")
+    emit_metric("ChatRateLimited", tier=tier)
+    return ApiResponse(
+        429,
+        {
+            "error": {
+                "code": "RATE_LIMITED",
+                "message": "Too many messages. Please wait a moment and try again.",
+                "details": {"retry_after": retry_after, "tier": tier},
+            }
+        },
+        headers={"Retry-After": str(retry_after)},
+    ).render()
+
+
+# Local testing
+if __name__ == "__main__":
+    print("Testing Rate Limiting\n")
+    print("=" * 60)
+
+    class FakeTable:
+        """update_item with the conditions TokenBucketStore uses; counts calls."""
+
+        def __init__(self):
+            self.items = {}
+            self.calls = 0
+            self.fail = None
+
+        def Table(self, name):
+            return self
+
+        def update_item(self, Key, UpdateExpression, ConditionExpression, ExpressionAttributeValues, **kwargs):
+            self.calls += 1
+            if self.fail:
+                raise self.fail
+            key = (Key["user_id"], Key["sk"])
+            current = self.items.get(key)
+            values = ExpressionAttributeValues
+            if ":expected" in values:
+                ok = current is not None and current["tat_ms"] == values[":expected"]
+            elif ":now" in values:
+                ok = current is None or current["tat_ms"] <= values[":now"]
+            else:  # block_until
+                ok = current is None or current["tat_ms"] < values[":tat"]
+            if not ok:
+                error = {"Error": {"Code": "ConditionalCheckFailedException"}}
+                if current is not None:
+                    error["Item"] = {"tat_ms": {"N": str(current["tat_ms"])}}
+                raise ClientError(error, "UpdateItem")
+            self.items[key] = {"tat_ms": values[":tat"], "ttl_epoch": values[":ttl"]}
+
+    now = [1700000000.0]
+    table = FakeTable()
+    store = TokenBucketStore(dynamodb=table, clock=lambda: now[0])
+    limit = RateLimit(per_minute=6, burst=3)  # A token every 10 s
+
+    # Test 1: Burst, then one token per interval
+    print("\n[Test 1] Burst and refill")
+    print("-" * 60)
+    decisions = [store.acquire("user-1", "chat", limit) for _ in range(4)]
+    print(decisions)
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert abs(decisions[-1].retry_after - 10) < 0.01 and decisions[2].remaining == 0
+    now[0] += 10
+    assert store.acquire("user-1", "chat", limit).allowed
+    assert not store.acquire("user-1", "chat", limit).allowed
+    now[0] += 60
+    assert store.acquire("user-1", "chat", limit).remaining == 2
+    print("Test 1 passed")
+
+    # Test 2: Denials come from the container cache
+    print("\n[Test 2] Local denials")
+    print("-" * 60)
+    for _ in range(2):
+        store.acquire("user-1", "chat", limit)
+    calls = table.calls
+    for _ in range(50):
+        assert not store.acquire("user-1", "chat", limit).allowed
+    print(f"DynamoDB calls for 50 rejected requests: {table.calls - calls}")
+    assert table.calls == calls
+    print("Test 2 passed")
+
+    # Test 3: Containers share a bucket without oversubscribing it
+    print("\n[Test 3] Two containers, one bucket")
+    print("-" * 60)
+    other = TokenBucketStore(dynamodb=table, clock=lambda: now[0])
+    allowed = 0
+    for index in range(10):
+        allowed += (store if index % 2 else other).acquire("user-2", "chat", limit).allowed
+    print(f"Allowed across containers: {allowed} of 10 (burst {limit.burst})")
+    assert allowed == limit.burst
+    print("Test 3 passed")
+
+    # Test 4: Tiers by Cognito group
+    print("\n[Test 4] Tier limits")
+    print("-" * 60)
+    assert chat_limit_for([])[0] == DEFAULT_TIER
+    assert chat_limit_for(["support"])[0] == DEFAULT_TIER
+    tier, premium = chat_limit_for(["free", "premium"])
+    assert tier == "premium" and premium.burst == CHAT_RATE_LIMITS["premium"]["burst"]
+    print(f"free: {chat_limit_for([])[1]}, premium: {premium}")
+    print("Test 4 passed")
+
+    # Test 5: Partial acquire (batch reservations) and fail-open
+    print("\n[Test 5] Partial acquire and fail-open")
+    print("-" * 60)
+    batch = store.acquire("service", "batch", RateLimit(per_minute=60, burst=10), cost=4, partial=True)
+    assert batch.granted == 4 and batch.remaining == 6
+    batch = store.acquire("service", "batch", RateLimit(per_minute=60, burst=10), cost=8, partial=True)
+    assert batch.granted == 6 and batch.remaining == 0
+    from botocore.exceptions import ConnectTimeoutError
+
+    for table.fail in (
+        ClientError({"Error": {"Code": "ProvisionedThroughputExceededException"}}, "UpdateItem"),
+        ConnectTimeoutError(endpoint_url="https://dynamodb.us-east-1.amazonaws.com"),
+    ):
+        assert store.acquire("user-3", "chat", limit).allowed
+        store.block_until("user-3", "chat", limit, now[0] + 30)
+        store.forget()
+    table.fail = None
+    print("Test 5 passed")
+
+    # Test 6: Router response
+    print("\n[Test 6] 429 with Retry-After")
+    print("-" * 60)
+    bucket_store = TokenBucketStore(dynamodb=table, clock=lambda: now[0])
+    event = {
+        "rawPath": "/chat",
+        "requestContext": {"http": {"method": "POST"}, "authorizer": {"jwt": {"claims": {"sub": "user-4"}}}},
+    }
+    free_burst = CHAT_RATE_LIMITS[DEFAULT_TIER]["burst"]
+    assert all(enforce_chat_rate_limit(event) is None for _ in range(free_burst))
+    response = enforce_chat_rate_limit(event)
+    print(f"{response['statusCode']} Retry-After: {response['headers']['Retry-After']} {response['body']}")
+    assert response["statusCode"] == 429 and int(response["headers"]["Retry-After"]) >= 1
+    assert json.loads(response["body"])["error"]["code"] == "RATE_LIMITED"
+    assert response["headers"]["Access-Control-Allow-Origin"] == "*"
+    assert enforce_chat_rate_limit({"rawPath": "/chat", "requestContext": {}}) is None
+    print("Test 6 passed")
+
+    # Test 7: Outbound reservations queue, shed and honor Retry-After across containers
+    print("\n[Test 7] Outbound limiter")
+    print("-" * 60)
+    slept = []
+
+    def fake_sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    outbound_limit = RateLimit(per_minute=60, burst=10)  # A token a second
+    limiters = [
+        OutboundRateLimiter(
+            "astro-test",
+            outbound_limit,
+            TokenBucketStore(dynamodb=table, clock=lambda: now[0]),
+            max_batch=4,
+            clock=lambda: now[0],
+            sleep=fake_sleep,
+        )
+        for _ in range(2)
+    ]
+    granted = 0
+    for index in range(20):
+        try:
+            granted += limiters[index % 2].acquire() == 0
+        except RateLimitExceeded as e:
+            shed = e
+    # Tokens reserved by one container are not spent by the other, but never exceed the shared burst
+    print(f"Granted without waiting: {granted} of 20 (burst {outbound_limit.burst}); last shed: {shed}")
+    assert 0 < granted <= outbound_limit.burst and 0 < shed.retry_after <= 1
+    assert limiters[1].acquire(max_wait=2) > 0 and slept
+    limiters[0].block_until(now[0] + 30)
+    try:
+        limiters[1].acquire(max_wait=5)
+    except RateLimitExceeded as e:
+        print(f"Blocked by the other container: {e}")
+        assert e.retry_after > 25
+    else:
+        raise AssertionError("Retry-After block ignored by the other container")
+    print("Test 7 passed")
+
+    # Test 8: Benchmark DynamoDB calls per outbound request
+    print("\n[Test 8] Benchmark")
+    print("-" * 60)
+    now[0] += 3600
+    bench_limit = RateLimit(per_minute=600, burst=50)
+    for max_batch in (1, OUTBOUND_RESERVATION_BATCH, 10):
+        bench = OutboundRateLimiter(
+            "astro-bench",
+            bench_limit,
+            TokenBucketStore(dynamodb=table, clock=lambda: now[0]),
+            max_batch=max_batch,
+            clock=lambda: now[0],
+            sleep=fake_sleep,
+        )
+        calls, requests_made = table.calls, 200
+        for _ in range(requests_made):
+            bench.acquire(max_wait=10)
+            now[0] += 0.1  # Steady 10 requests/s, within the quota
+        per_request = (table.calls - calls) / requests_made
+        print(f"  batch {max_batch:2}: {per_request:.3f} DynamoDB calls per request")
+        assert max_batch == 1 or per_request < 0.5
+        now[0] += 3600
+    print("Test 8 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
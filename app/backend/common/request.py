@@ -0,0 +1,248 @@
+"""
+Request object for API Gateway events.
+Normalizes HTTP API (v2) and REST API (v1) events; body and identity are parsed on first use and cached.
+"""
+
+import base64
+import binascii
+import json
+import logging
+from functools import cached_property
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
+from common.jwt_utils import event_claims
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Longest body excerpt quoted in an invalid-JSON error
+BODY_EXCERPT_CHARS = 200
+
+
+class Request:
+    """
+    API Gateway event passed to @api_handler handlers.
+
+    Nothing is parsed up front: a GET or DELETE never decodes a body, and the
+    JWT claims are walked once no matter how many helpers ask for the caller.
+
+    Usage:
+        @api_handler
+        def my_handler(event: Request, context):
+            title = event.body.get("title")
+            return {"user_id": event.user_id, "limit": event.query_params.get("limit")}
+    """
+
+    def __init__(self, raw_event: Dict[str, Any]):
+        """
+        Initialize request.
+
+        Args:
+            raw_event: API Gateway event, HTTP API (payload 2.0) or REST API (1.0)
+        """
+        self.raw_event = raw_event
+        # Set by set_etag; sent on a 200 response
+        self.etag: Optional[str] = None
+
+    @classmethod
+    def of(cls, event: Any) -> "Request":
+        """The event itself if it is already a Request, else a Request wrapping it."""
+        return event if isinstance(event, cls) else cls(event)
+
+    @property
+    def is_v2(self) -> bool:
+        """Whether this is an HTTP API (payload format 2.0) event."""
+        return self.raw_event.get("version") == "2.0" or "rawPath" in self.raw_event
+
+    @cached_property
+    def method(self) -> str:
+        """HTTP method, e.g. "GET" (empty for non-HTTP events)."""
+        http = (self.raw_event.get("requestContext") or {}).get("http") or {}
+        return (http.get("method") or self.raw_event.get("httpMethod") or "").upper()
+
+    @cached_property
+    def path(self) -> str:
+        """Request path as sent, including any stage prefix."""
+        return self.raw_event.get("rawPath") or self.raw_event.get("path") or ""
+
+    @cached_property
+    def headers(self) -> Dict[str, str]:
+        """Headers with lowercased names (HTTP API lowercases them, REST API does not)."""
+        return {name.lower(): value for name, value in (self.raw_event.get("headers") or {}).items()}
+
+    def header(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Header value by case-insensitive name."""
+        return self.headers.get(name.lower(), default)
+
+    @cached_property
+    def query_params(self) -> Dict[str, str]:
+        """Query string parameters (empty dict when there are none)."""
+        return self.raw_event.get("queryStringParameters") or {}
+
+    @cached_property
+    def raw_query(self) -> str:
+        """Query string as sent (HTTP API), or rebuilt in a stable order (REST API)."""
+        query = self.raw_event.get("rawQueryString")
+        if query is None:
+            query = urlencode(sorted(self.query_params.items()))
+        return query
+
+    @property
+    def path_params(self) -> Dict[str, str]:
+        """Path parameters; the router adds entries to the raw event, so this is not cached."""
+        return self.raw_event.get("pathParameters") or {}
+
+    @cached_property
+    def body_text(self) -> str:
+        """
+        Request body as text, base64-decoded when API Gateway encoded it.
+
+        Raises:
+            ValueError: If an encoded body is not valid base64 or UTF-8
+        """
+        body = self.raw_event.get("body") or ""
+        if self.raw_event.get("isBase64Encoded") and body:
+            try:
+                body = base64.b64decode(body, validate=True).decode("utf-8")
+            except (binascii.Error, UnicodeDecodeError):
+                raise ValueError("Request body is not valid base64-encoded UTF-8")
+        return body
+
+    @cached_property
+    def body(self) -> Any:
+        """
+        Parsed JSON body ({} when the body is empty).
+
+        Raises:
+            ValueError: If the body is not valid JSON
+        """
+        text = self.body_text
+        if not text.strip():
+            return {}
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            raise ValueError(f"Invalid JSON in request body: {text[:BODY_EXCERPT_CHARS]}")
+
+    @cached_property
+    def claims(self) -> Dict[str, Any]:
+        """
+        Caller's claims ({} for unauthenticated requests).
+
+        HTTP API JWT authorizers put them under authorizer.jwt.claims; REST API
+        Cognito authorizers under authorizer.claims. With AUTH_MODE=local the
+        bearer token is verified in process instead (see jwt_utils).
+        """
+        return event_claims(self.raw_event)
+
+    @cached_property
+    def user_id(self) -> str:
+        """
+        Caller's Cognito user ID (sub claim).
+
+        Raises:
+            ValueError: If the request carries no identity
+        """
+        user_id = self.claims.get("sub")
+        if not user_id:
+            logger.warning(f"No user identity in request to {self.path}")
+            raise ValueError("Unable to extract user identity from request")
+        return user_id
+
+    @property
+    def email(self) -> str:
+        """Caller's email claim, or empty string."""
+        return self.claims.get("email", "")
+
+    @cached_property
+    def groups(self) -> List[str]:
+        """Caller's Cognito groups."""
+        groups = self.claims.get("cognito:groups", [])
+        # HTTP API passes list claims as a string like "[admin support]"
+        if isinstance(groups, str):
+            groups = groups.strip("[]").replace(",", " ").split()
+        return list(groups)
+
+
+# Local testing
+if __name__ == "__main__":
+    print("Testing Request\n")
+    print("=" * 60)
+
+    claims = {"sub": "user-1", "email": "ada@example.com", "cognito:groups": "[support admin]"}
+    v2_event = {
+        "version": "2.0",
+        "rawPath": "/default/conversations",
+        "rawQueryString": "limit=5",
+        "headers": {"if-none-match": 'W/"abc"'},
+        "queryStringParameters": {"limit": "5"},
+        "requestContext": {"http": {"method": "POST"}, "authorizer": {"jwt": {"claims": claims}}},
+        "body": base64.b64encode(json.dumps({"title": "Mond ☽"}).encode("utf-8")).decode("ascii"),
+        "isBase64Encoded": True,
+    }
+    v1_event = {
+        "httpMethod": "get",
+        "path": "/profile",
+        "headers": {"If-None-Match": 'W/"abc"'},
+        "queryStringParameters": {"b": "2", "a": "1"},
+        "pathParameters": None,
+        "requestContext": {"authorizer": {"claims": {"sub": "user-2"}}},
+        "body": None,
+    }
+
+    # Test 1: HTTP API and REST API events normalize to the same interface
+    print("\n[Test 1] v2 and v1 normalization")
+    print("-" * 60)
+    v2, v1 = Request(v2_event), Request(v1_event)
+    assert (v2.method, v2.path, v2.raw_query, v2.is_v2) == ("POST", "/default/conversations", "limit=5", True)
+    assert (v1.method, v1.path, v1.raw_query, v1.is_v2) == ("GET", "/profile", "a=1&b=2", False)
+    assert v2.header("If-None-Match") == v1.header("if-none-match") == 'W/"abc"'
+    assert v2.body == {"title": "Mond ☽"} and v1.body == {} and v1.path_params == {}
+    assert (v2.user_id, v2.email, v2.groups) == ("user-1", "ada@example.com", ["support", "admin"])
+    assert (v1.user_id, v1.email, v1.groups) == ("user-2", "", [])
+    assert Request.of(v2) is v2
+    print(f"v2: {v2.method} {v2.path} body={v2.body} user={v2.user_id}")
+    print(f"v1: {v1.method} {v1.path} query={v1.raw_query} user={v1.user_id}")
+    print("Test 1 passed")
+
+    # Test 2: Lazy and memoized
+    print("\n[Test 2] Body parsed once, only when read")
+    print("-" * 60)
+    loads_calls = []
+    real_loads = json.loads
+
+    def counting_loads(text, *args, **kwargs):
+        loads_calls.append(text)
+        return real_loads(text, *args, **kwargs)
+
+    json.loads = counting_loads
+    try:
+        invalid = Request({"rawPath": "/conversations/c1", "body": "{invalid", "requestContext": {}})
+        assert invalid.path == "/conversations/c1" and not loads_calls
+        request = Request({"rawPath": "/chat", "body": '{"message": "hi"}'})
+        assert request.body["message"] == "hi" and request.body is request.body and len(loads_calls) == 1
+    finally:
+        json.loads = real_loads
+    print(f"json.loads calls: {len(loads_calls)}")
+    print("Test 2 passed")
+
+    # Test 3: Errors surface as ValueError (400 through api_handler)
+    print("\n[Test 3] Invalid body and missing identity")
+    print("-" * 60)
+    for event, attribute in (
+        ({"rawPath": "/chat", "body": "{invalid"}, "body"),
+        ({"rawPath": "/chat", "body": "%%%", "isBase64Encoded": True}, "body"),
+        ({"rawPath": "/chat", "requestContext": {"authorizer": {"jwt": {"claims": {}}}}}, "user_id"),
+        ({"rawPath": "/chat", "requestContext": {"authorizer": None}}, "user_id"),
+    ):
+        try:
+            getattr(Request(event), attribute)
+        except ValueError as e:
+            print(f"Correctly rejected: {e}")
+        else:
+            raise AssertionError(f"{attribute} accepted {event}")
+    print("Test 3 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
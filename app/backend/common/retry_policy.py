@@ -0,0 +1,398 @@
+"""
+Retry policy for outbound dependency calls.
+Combines hedged requests, full-jitter backoff and a per-container retry budget.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+
+from aws_lambda_powertools.metrics import MetricUnit
+
+from common.deadline import Deadline
+from common.metrics import emit_metric
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Shared worker pool for hedged attempts (persists across warm invocations)
+_hedge_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hedge")
+
+
+class RetryExhausted(Exception):
+    """Raised when a call keeps failing after all attempts or the retry budget runs out."""
+
+    def __init__(self, message: str, attempts: int, last_error: Exception):
+        self.message = message
+        self.attempts = attempts
+        self.last_error = last_error
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f"{self.message} | Attempts: {self.attempts} | Last error: {self.last_error}"
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent successful call latencies.
+    Used to derive the hedging threshold from observed percentiles.
+    """
+
+    def __init__(self, window_size: int = 200, min_samples: int = 10):
+        """
+        Initialize latency tracker.
+
+        Args:
+            window_size: Number of recent latencies to keep
+            min_samples: Samples required before percentiles are reported
+        """
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Record the latency of one successful call."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """
+        Return the given percentile of recorded latencies.
+
+        Args:
+            pct: Percentile between 0 and 100 (e.g., 90)
+
+        Returns:
+            Latency in seconds, or None if not enough samples yet
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class RetryBudget:
+    """
+    Token bucket that caps retries and hedges per container.
+
+    Every call deposits a fraction of a token, and the bucket also refills at
+    a fixed rate. Each retry or hedge withdraws one whole token, so during an
+    outage retries are limited to roughly `deposit_per_call` of traffic plus
+    the refill rate instead of multiplying load on the failing dependency.
+    """
+
+    def __init__(self, capacity: float = 10.0, refill_per_second: float = 0.2, deposit_per_call: float = 0.1):
+        """
+        Initialize retry budget.
+
+        Args:
+            capacity: Maximum tokens held by the bucket
+            refill_per_second: Tokens added per second regardless of traffic
+            deposit_per_call: Tokens added for every first attempt
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.deposit_per_call = deposit_per_call
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.refill_per_second)
+        self._last_refill = now
+
+    def record_call(self) -> None:
+        """Deposit tokens for a first attempt."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + self.deposit_per_call)
+
+    def try_acquire(self) -> bool:
+        """
+        Withdraw one token for a retry or hedge.
+
+        Returns:
+            True if a token was available, False if the budget is exhausted
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def available(self) -> float:
+        """Tokens currently available."""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class RetryPolicy:
+    """
+    Retry policy with hedging, full-jitter backoff and a shared retry budget.
+
+    Create one instance per dependency at module level so the latency window
+    and retry budget are shared by every invocation in the container.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 4.0,
+        hedge_percentile: float = 90,
+        hedge_min_delay: float = 0.5,
+        retryable: Optional[Callable[[Exception], bool]] = None,
+        budget: Optional[RetryBudget] = None,
+        latency_tracker: Optional[LatencyTracker] = None,
+    ):
+        """
+        Initialize retry policy.
+
+        Args:
+            name: Dependency name used as the metrics dimension
+            max_attempts: Maximum sequential attempts (including the first)
+            base_delay: Base backoff delay in seconds
+            max_delay: Upper bound of the backoff window in seconds
+            hedge_percentile: Latency percentile after which a hedge is fired
+            hedge_min_delay: Lower bound of the hedging threshold in seconds
+            retryable: Predicate deciding whether an exception is retryable (default: all)
+            budget: Retry budget (default: a new RetryBudget)
+            latency_tracker: Latency window (default: a new LatencyTracker)
+        """
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.retryable = retryable or (lambda e: True)
+        self.budget = budget or RetryBudget()
+        self.latency = latency_tracker or LatencyTracker()
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        Full-jitter backoff delay before the given retry.
+
+        Args:
+            attempt: Zero-based index of the failed attempt
+
+        Returns:
+            Delay in seconds, uniformly drawn from [0, min(max_delay, base_delay * 2^attempt)]
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2**attempt)))
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Delay after which a hedged attempt is fired.
+
+        Returns:
+            Observed latency percentile (at least hedge_min_delay), or None if
+            not enough latencies have been observed to hedge safely
+        """
+        observed = self.latency.percentile(self.hedge_percentile)
+        if observed is None:
+            return None
+        return max(self.hedge_min_delay, observed)
+
+    def call(self, fn: Callable[[], Any], deadline: Optional[Deadline] = None, min_attempt_seconds: float = 0.5) -> Any:
+        """
+        Call `fn` under this policy.
+
+        Args:
+            fn: Zero-argument callable performing one attempt
+            deadline: Optional request deadline; no retry is started that could not finish before it
+            min_attempt_seconds: Smallest time budget worth spending on one more attempt
+
+        Returns:
+            Result of the first successful attempt
+
+        Raises:
+            RetryExhausted: If all attempts failed, or the retry budget or deadline ran out
+            Exception: Non-retryable errors from `fn` are re-raised unchanged
+        """
+        self.budget.record_call()
+        last_error = None
+
+        for attempt in range(self.max_attempts):
+            if attempt > 0:
+                if not self.budget.try_acquire():
+                    logger.warning(f"[{self.name}] Retry budget exhausted after {attempt} attempt(s)")
+                    emit_metric("RetryOutcome", dependency=self.name, outcome="budget_exhausted")
+                    raise RetryExhausted("Retry budget exhausted", attempt, last_error)
+
+                delay = self.backoff_delay(attempt - 1)
+                if deadline is not None and deadline.remaining() < delay + min_attempt_seconds:
+                    logger.warning(f"[{self.name}] No time left for attempt {attempt + 1} before the request deadline")
+                    emit_metric("RetryOutcome", dependency=self.name, outcome="deadline")
+                    raise RetryExhausted("Request deadline leaves no room for retry", attempt, last_error)
+
+                logger.info(f"[{self.name}] Retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_attempts})")
+                emit_metric("RetryAttempt", dependency=self.name)
+                time.sleep(delay)
+
+            try:
+                result = self._call_hedged(fn)
+            except Exception as e:
+                if not self.retryable(e):
+                    emit_metric("RetryOutcome", dependency=self.name, outcome="non_retryable")
+                    raise
+                logger.warning(f"[{self.name}] Attempt {attempt + 1}/{self.max_attempts} failed: {e}")
+                last_error = e
+                continue
+
+            emit_metric("RetryOutcome", dependency=self.name, outcome="success" if attempt == 0 else "retry_success")
+            return result
+
+        emit_metric("RetryOutcome", dependency=self.name, outcome="exhausted")
+        raise RetryExhausted("All attempts failed", self.max_attempts, last_error)
+
+    def _timed(self, fn: Callable[[], Any]) -> Any:
+        """Run one attempt and record its latency on success."""
+        start = time.monotonic()
+        result = fn()
+        duration = time.monotonic() - start
+        self.latency.record(duration)
+        emit_metric("CallLatency", duration * 1000, MetricUnit.Milliseconds, dependency=self.name)
+        return result
+
+    def _call_hedged(self, fn: Callable[[], Any]) -> Any:
+        """
+        Run one attempt, firing a hedge if it outlives the hedging threshold.
+
+        The first attempt to succeed wins. The losing attempt cannot be
+        interrupted, so it finishes in the background and its result is dropped.
+        """
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(fn)
+
+        primary = _hedge_executor.submit(self._timed, fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        if not self.budget.try_acquire():
+            emit_metric("HedgeOutcome", dependency=self.name, outcome="budget_exhausted")
+            return primary.result()
+
+        logger.info(f"[{self.name}] Primary attempt exceeded p{self.hedge_percentile:g} ({delay:.2f}s), hedging")
+        emit_metric("HedgeOutcome", dependency=self.name, outcome="fired")
+        hedge = _hedge_executor.submit(self._timed, fn)
+
+        pending = {primary, hedge}
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    emit_metric(
+                        "HedgeOutcome", dependency=self.name, outcome="hedge_won" if future is hedge else "primary_won"
+                    )
+                    return future.result()
+                first_error = first_error or future.exception()
+
+        raise first_error
+
+
+# Local testing
+if __name__ == "__main__":
+    print("Testing Retry Policy\n")
+    print("=" * 60)
+
+    # Test 1: Full-jitter backoff stays inside its window
+    print("\n[Test 1] Full-jitter backoff bounds")
+    print("-" * 60)
+    policy = RetryPolicy("test", base_delay=0.5, max_delay=4.0)
+    for attempt in range(6):
+        delays = [policy.backoff_delay(attempt) for _ in range(200)]
+        cap = min(4.0, 0.5 * 2**attempt)
+        assert all(0 <= d <= cap for d in delays)
+        print(f"  attempt {attempt}: max {max(delays):.2f}s (cap {cap}s)")
+    print("Test 1 passed")
+
+    # Test 2: Retry then succeed
+    print("\n[Test 2] Retry until success")
+    print("-" * 60)
+    calls = {"n": 0}
+
+    def flaky():
+        calls["n"] += 1
+        if calls["n"] < 3:
+            raise ConnectionError("boom")
+        return "ok"
+
+    policy = RetryPolicy("test", base_delay=0.01, max_delay=0.02)
+    assert policy.call(flaky) == "ok"
+    assert calls["n"] == 3
+    print("Test 2 passed")
+
+    # Test 3: Non-retryable errors propagate immediately
+    print("\n[Test 3] Non-retryable error")
+    print("-" * 60)
+    calls["n"] = 0
+
+    def bad_input():
+        calls["n"] += 1
+        raise KeyError("missing")
+
+    policy = RetryPolicy("test", base_delay=0.01, retryable=lambda e: not isinstance(e, KeyError))
+    try:
+        policy.call(bad_input)
+        raise AssertionError("Should have raised KeyError")
+    except KeyError:
+        assert calls["n"] == 1
+    print("Test 3 passed")
+
+    # Test 4: Budget exhaustion stops retries
+    print("\n[Test 4] Retry budget exhaustion")
+    print("-" * 60)
+    budget = RetryBudget(capacity=1, refill_per_second=0, deposit_per_call=0)
+    policy = RetryPolicy("test", max_attempts=5, base_delay=0.01, budget=budget)
+    calls["n"] = 0
+
+    def always_fails():
+        calls["n"] += 1
+        raise TimeoutError("slow")
+
+    try:
+        policy.call(always_fails)
+        raise AssertionError("Should have raised RetryExhausted")
+    except RetryExhausted as e:
+        assert e.attempts == 2 and calls["n"] == 2
+        print(f"Correctly stopped: {e}")
+    print("Test 4 passed")
+
+    # Test 5: Hedge wins when the primary attempt is slow
+    print("\n[Test 5] Hedged request")
+    print("-" * 60)
+    policy = RetryPolicy("test", hedge_min_delay=0.05)
+    for _ in range(20):
+        policy.latency.record(0.05)
+    calls["n"] = 0
+
+    def slow_first():
+        calls["n"] += 1
+        time.sleep(1.0 if calls["n"] == 1 else 0.01)
+        return calls["n"]
+
+    start = time.monotonic()
+    winner = policy.call(slow_first)
+    elapsed = time.monotonic() - start
+    assert winner == 2 and elapsed < 0.5
+    print(f"Hedge returned in {elapsed:.2f}s")
+    print("Test 5 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
@@ -1,12 +1,15 @@
 """
 AWS Secrets Manager integration.
-Securely retrieves secrets for Lambda functions.
+Securely retrieves secrets for Lambda functions, cached per secret with TTL and background refresh.
 """
 
 import json
 import logging
 import os
-from typing import Dict, Any, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
 
 import boto3
 from botocore.exceptions import ClientError
@@ -14,15 +17,169 @@ from botocore.exceptions import ClientError
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Module-level cache for secrets (persists across Lambda invocations in same container)
-_secret_cache: Dict[str, Any] = {}
+ASTROLOGY_SECRET_NAME = os.environ.get("ASTROLOGY_SECRET_NAME", "/mira/astrology/api_key")
 
+# Seconds a fetched secret is served before a background refresh is started
+SECRET_TTL_SECONDS = int(os.environ.get("SECRET_TTL_SECONDS", "300"))
+# Seconds past its TTL a value may still be served while refreshes run (or fail)
+SECRET_MAX_STALE_SECONDS = int(os.environ.get("SECRET_MAX_STALE_SECONDS", "3600"))
+# A forced refresh (e.g. after a 401) within this many seconds of the last fetch reuses it
+SECRET_MIN_FORCED_REFRESH_INTERVAL = 10
+SECRET_REFRESH_WORKERS = 2
 
-def get_secret(secret_name: str, region: Optional[str] = None) -> Dict[str, Any]:
+
+class CachedSecret:
+    """A fetched secret value and when it was fetched."""
+
+    def __init__(self, value: Dict[str, Any], fetched_at: float, region: Optional[str]):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.region = region
+
+
+class SecretProvider:
+    """
+    Container-wide secret cache.
+
+    Each secret has its own TTL. A fresh value is a dictionary lookup; a value
+    past its TTL (but within SECRET_MAX_STALE_SECONDS) is still returned while
+    one background thread refetches it, so rotations are picked up without a
+    cold start and without putting Secrets Manager on the request path. Only a
+    missing or too-stale value is fetched inline.
     """
-    Retrieve secret from AWS Secrets Manager.
 
-    Implements caching to avoid repeated API calls within the same Lambda container.
+    def __init__(
+        self,
+        fetch: Optional[Callable[[str, Optional[str]], Dict[str, Any]]] = None,
+        default_ttl: float = SECRET_TTL_SECONDS,
+        max_stale: float = SECRET_MAX_STALE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize provider.
+
+        Args:
+            fetch: Loads one secret as a dict, given its name and region (defaults to Secrets Manager)
+            default_ttl: TTL for secrets registered without one
+            max_stale: Seconds past the TTL a value may still be served
+            clock: Monotonic time source in seconds
+        """
+        self._fetch = fetch or fetch_secret
+        self.default_ttl = default_ttl
+        self.max_stale = max_stale
+        self._clock = clock
+        self._ttls: Dict[str, float] = {}
+        self._entries: Dict[str, CachedSecret] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._refreshing: set = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def register(self, secret_name: str, ttl: Optional[float] = None) -> None:
+        """Configure a secret (and its TTL) for prefetch()."""
+        self._ttls[secret_name] = self.default_ttl if ttl is None else ttl
+
+    def get(self, secret_name: str, region: Optional[str] = None, force_refresh: bool = False) -> Dict[str, Any]:
+        """
+        Secret value, from cache when possible.
+
+        Args:
+            secret_name: Name or ARN of the secret
+            region: AWS region for the first fetch (defaults to AWS_REGION)
+            force_refresh: Refetch now, e.g. because the cached credential was rejected
+
+        Returns:
+            Secret value as dict
+
+        Raises:
+            ValueError: If the secret cannot be fetched and no usable value is cached
+        """
+        entry = self._entries.get(secret_name)
+        if entry is not None and not force_refresh:
+            age = self._clock() - entry.fetched_at
+            ttl = self._ttls.get(secret_name, self.default_ttl)
+            if age < ttl:
+                return entry.value
+            if age < ttl + self.max_stale:
+                self._refresh_in_background(secret_name)
+                return entry.value
+        return self._refresh(secret_name, region, forced=force_refresh)
+
+    def prefetch(self, secret_names: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+        """
+        Fetch secrets in parallel (all registered ones by default), e.g. during Lambda init.
+
+        Failures are logged, not raised; the secret is fetched again on first use.
+
+        Returns:
+            Whether each secret was loaded
+        """
+        names = list(self._ttls if secret_names is None else secret_names)
+        if not names:
+            return {}
+
+        def load(name: str) -> bool:
+            try:
+                self.get(name)
+                return True
+            except Exception as e:
+                logger.warning(f"Prefetch of secret {name} failed: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            return dict(zip(names, executor.map(load, names)))
+
+    def clear(self) -> None:
+        """Drop every cached value (registrations are kept)."""
+        self._entries.clear()
+
+    def _lock(self, secret_name: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(secret_name, threading.Lock())
+
+    def _refresh(self, secret_name: str, region: Optional[str] = None, forced: bool = False) -> Dict[str, Any]:
+        """Fetch inline; concurrent callers for the same secret share one fetch."""
+        started = self._clock()
+        with self._lock(secret_name):
+            entry = self._entries.get(secret_name)
+            # Another caller fetched while this one waited, or a forced refresh just ran
+            if entry is not None and (
+                entry.fetched_at >= started
+                or (forced and started - entry.fetched_at < SECRET_MIN_FORCED_REFRESH_INTERVAL)
+            ):
+                return entry.value
+            region = region or (entry.region if entry else None)
+            value = self._fetch(secret_name, region)
+            self._entries[secret_name] = CachedSecret(value, self._clock(), region)
+            return value
+
+    def _refresh_in_background(self, secret_name: str) -> None:
+        """Start one background refetch per stale secret; the stale value keeps being served meanwhile."""
+        with self._locks_guard:
+            if secret_name in self._refreshing:
+                return
+            self._refreshing.add(secret_name)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=SECRET_REFRESH_WORKERS, thread_name_prefix="secret-refresh"
+                )
+
+        def run():
+            try:
+                self._refresh(secret_name)
+                logger.info(f"Refreshed secret in background: {secret_name}")
+            except Exception as e:
+                logger.warning(f"Background refresh of secret {secret_name} failed: {e}")
+            finally:
+                with self._locks_guard:
+                    self._refreshing.discard(secret_name)
+
+        self._executor.submit(run)
+
+
+def fetch_secret(secret_name: str, region: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Retrieve a secret from AWS Secrets Manager (uncached).
 
     Args:
         secret_name: Name or ARN of the secret
@@ -32,18 +189,9 @@ def get_secret(secret_name: str, region: Optional[str] = None) -> Dict[str, Any]
         Secret value as dict (parsed from JSON)
 
     Raises:
-        ValueError: If secret not found or access denied
+        ValueError: If secret not found, access denied, or not JSON
         Exception: For other AWS errors
-
-    Example:
-        >>> secret = get_secret("/mira/astrology/api_key")
-        >>> api_key = secret['api_key']
     """
-    # Check cache first
-    if secret_name in _secret_cache:
-        logger.debug(f"Using cached secret: {secret_name}")
-        return _secret_cache[secret_name]
-
     # Get region from environment or parameter
     secret_region = region or os.getenv("AWS_REGION", "us-east-1")
 
@@ -60,9 +208,6 @@ def get_secret(secret_name: str, region: Optional[str] = None) -> Dict[str, Any]
         secret_string = response["SecretString"]
         secret_dict = json.loads(secret_string)
 
-        # Cache the result
-        _secret_cache[secret_name] = secret_dict
-
         logger.info(f"Successfully retrieved secret: {secret_name}")
         return secret_dict
 
@@ -94,13 +239,53 @@ def get_secret(secret_name: str, region: Optional[str] = None) -> Dict[str, Any]
         raise ValueError(error_msg)
 
 
-def get_astrology_api_key() -> str:
+# Shared by every caller in the container (persists across warm invocations)
+secret_provider = SecretProvider()
+secret_provider.register(ASTROLOGY_SECRET_NAME, ttl=int(os.environ.get("ASTROLOGY_SECRET_TTL_SECONDS", "900")))
+
+
+def get_secret(secret_name: str, region: Optional[str] = None, force_refresh: bool = False) -> Dict[str, Any]:
+    """
+    Retrieve secret from AWS Secrets Manager.
+
+    Served from the container-wide SecretProvider: values are refreshed in
+    the background once their TTL passes, so rotated secrets are picked up
+    without a cold start.
+
+    Args:
+        secret_name: Name or ARN of the secret
+        region: AWS region (defaults to AWS_REGION environment variable)
+        force_refresh: Bypass the cache, e.g. after the secret was rejected
+
+    Returns:
+        Secret value as dict (parsed from JSON)
+
+    Raises:
+        ValueError: If secret not found or access denied
+        Exception: For other AWS errors
+
+    Example:
+        >>> secret = get_secret("/mira/astrology/api_key")
+        >>> api_key = secret['api_key']
+    """
+    return secret_provider.get(secret_name, region=region, force_refresh=force_refresh)
+
+
+def prefetch_secrets() -> Dict[str, bool]:
+    """Load every configured secret in parallel; call during Lambda init."""
+    return secret_provider.prefetch()
+
+
+def get_astrology_api_key(force_refresh: bool = False) -> str:
     """
     Retrieve Astrologer API key from Secrets Manager.
 
     Convenience function for getting the Astrology API key.
     Uses caching to avoid repeated Secrets Manager calls.
 
+    Args:
+        force_refresh: Refetch the key, e.g. after the API answered 401
+
     Returns:
         Astrologer API key string
 
@@ -111,31 +296,22 @@ def get_astrology_api_key() -> str:
         >>> api_key = get_astrology_api_key()
         >>> # Use in API calls
     """
-    # Secret name from Terraform
-    secret_name = "/mira/astrology/api_key"
-
-    # Get secret
-    secret = get_secret(secret_name)
+    secret = get_secret(ASTROLOGY_SECRET_NAME, force_refresh=force_refresh)
 
     # Extract API key
-    if "api_key" not in secret:
-        raise ValueError(f"Secret {secret_name} missing 'api_key' field")
-
-    api_key = secret["api_key"]
-
-    # Log safely (don't expose key)
-    logger.info(f"Retrieved Astrology API key (length: {len(api_key)} chars)")
+    if not secret.get("api_key"):
+        raise ValueError(f"Secret {ASTROLOGY_SECRET_NAME} missing 'api_key' field")
 
-    return api_key
+    return secret["api_key"]
 
 
 def clear_secret_cache():
     """
     Clear the secret cache.
 
-    Useful for testing or if secrets are rotated.
+    Useful for testing; rotated secrets are picked up by TTL refresh.
     """
-    _secret_cache.clear()
+    secret_provider.clear()
     logger.info("Secret cache cleared")
 
 
@@ -272,6 +448,76 @@ if __name__ == "__main__":
 
     test_invalid_json()
 
+    # Provider tests use a fake fetch and clock
+    now = [1000.0]
+    fetches = []
+    versions = {"/mira/a": 1, "/mira/b": 1}
+
+    def fake_fetch(name, region=None):
+        fetches.append(name)
+        if versions.get(name) is None:
+            raise ValueError(f"Secret not found: {name}")
+        return {"api_key": f"{name}-v{versions[name]}"}
+
+    # Test 5: Per-secret TTL with stale-while-revalidate
+    print("\n[Test 5] TTL and background refresh")
+    print("-" * 60)
+
+    provider = SecretProvider(fetch=fake_fetch, default_ttl=300, max_stale=600, clock=lambda: now[0])
+    provider.register("/mira/a", ttl=60)
+    provider.register("/mira/b")
+    assert provider.get("/mira/a")["api_key"] == "/mira/a-v1" and fetches == ["/mira/a"]
+    versions["/mira/a"] = 2  # Rotated
+    now[0] += 59
+    assert provider.get("/mira/a")["api_key"] == "/mira/a-v1" and len(fetches) == 1
+    now[0] += 2  # Past the TTL: the stale value is served, the refresh runs off the request path
+    assert provider.get("/mira/a")["api_key"] == "/mira/a-v1"
+    for _ in range(200):
+        if provider.get("/mira/a")["api_key"] == "/mira/a-v2":
+            break
+        time.sleep(0.01)
+    assert provider.get("/mira/a")["api_key"] == "/mira/a-v2" and fetches.count("/mira/a") == 2
+    now[0] += 60 + 600  # Too stale to serve: fetched inline
+    versions["/mira/a"] = 3
+    assert provider.get("/mira/a")["api_key"] == "/mira/a-v3"
+    print(f"Fetches: {fetches}")
+    print("Test 5 passed")
+
+    # Test 6: Forced refresh after a rejected credential is rate limited
+    print("\n[Test 6] Forced refresh")
+    print("-" * 60)
+
+    fetches.clear()
+    versions["/mira/a"] = 4
+    assert provider.get("/mira/a", force_refresh=True)["api_key"] == "/mira/a-v3"  # Just fetched: reused
+    now[0] += SECRET_MIN_FORCED_REFRESH_INTERVAL
+    assert provider.get("/mira/a", force_refresh=True)["api_key"] == "/mira/a-v4"
+    for _ in range(5):
+        provider.get("/mira/a", force_refresh=True)
+    assert fetches == ["/mira/a"]
+    print("Six forced refreshes within the interval made one fetch")
+    print("Test 6 passed")
+
+    # Test 7: Parallel prefetch of configured secrets
+    print("\n[Test 7] Parallel prefetch")
+    print("-" * 60)
+
+    def slow_fetch(name, region=None):
+        time.sleep(0.2)
+        return fake_fetch(name, region)
+
+    slow = SecretProvider(fetch=slow_fetch, clock=lambda: now[0])
+    for name in ("/mira/a", "/mira/b", "/mira/missing"):
+        slow.register(name)
+    start = time.perf_counter()
+    loaded = slow.prefetch()
+    elapsed = time.perf_counter() - start
+    print(f"Prefetched {loaded} in {elapsed:.2f}s (sequential: ~0.6s)")
+    assert loaded == {"/mira/a": True, "/mira/b": True, "/mira/missing": False} and elapsed < 0.45
+    fetch_count = len(fetches)
+    assert slow.get("/mira/b")["api_key"] == "/mira/b-v1" and len(fetches) == fetch_count
+    print("Test 7 passed")
+
     print("\n" + "=" * 60)
     print("All mock tests passed!")
     print("\nTo test with real AWS Secrets Manager:")
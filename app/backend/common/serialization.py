@@ -0,0 +1,192 @@
+"""
+JSON serialization for API responses.
+Encodes DynamoDB values (Decimal, sets, binary) and datetimes natively, using orjson when it is installed.
+"""
+
+import base64
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict
+
+from boto3.dynamodb.types import Binary
+
+try:
+    import orjson
+except ImportError:  # Standard library only
+    orjson = None
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# "orjson" (default when installed) or "json"; lets a deployment pin the standard library encoder
+JSON_BACKEND = os.environ.get("JSON_BACKEND", "orjson" if orjson else "json")
+
+# Naive datetimes are UTC throughout the backend and are written with a "Z" suffix
+_ORJSON_OPTIONS = (orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def json_default(value: Any) -> Any:
+    """
+    Convert values the JSON encoders do not handle natively.
+
+    - Decimal (every DynamoDB number): int when integral, else float
+    - datetime/date: ISO 8601, naive datetimes as UTC with "Z"
+    - set (DynamoDB SS/NS): sorted list
+    - bytes and boto3 Binary: base64 string
+
+    Raises:
+        TypeError: For any other type, like json.dumps
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None or value.utcoffset() == timedelta(0):
+            return value.replace(tzinfo=None).isoformat() + "Z"
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    if isinstance(value, (bytes, bytearray, Binary)):
+        return base64.b64encode(bytes(getattr(value, "value", value))).decode("ascii")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps_stdlib(value: Any) -> str:
+    """Compact, UTF-8 friendly output matching the orjson backend."""
+    return json.dumps(value, default=json_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def _dumps_orjson(value: Any) -> str:
+    """orjson output; falls back to the standard library for values it rejects (e.g. ints beyond 64 bits)."""
+    try:
+        return orjson.dumps(value, default=json_default, option=_ORJSON_OPTIONS).decode("utf-8")
+    except orjson.JSONEncodeError:
+        return _dumps_stdlib(value)
+
+
+BACKENDS: Dict[str, Callable[[Any], str]] = {"json": _dumps_stdlib}
+if orjson:
+    BACKENDS["orjson"] = _dumps_orjson
+
+
+def to_json(value: Any) -> str:
+    """
+    Serialize a response body to a JSON string.
+
+    Args:
+        value: JSON-compatible data; DynamoDB items may be passed as read
+
+    Returns:
+        Compact JSON text (non-ASCII characters are not escaped)
+
+    Raises:
+        TypeError: If the value holds an unsupported type
+    """
+    return BACKENDS.get(JSON_BACKEND, _dumps_stdlib)(value)
+
+
+# Local testing
+if __name__ == "__main__":
+    import random
+    import time
+
+    print("Testing Serialization\n")
+    print("=" * 60)
+    print(f"Backends: {sorted(BACKENDS)} (active: {JSON_BACKEND})")
+
+    # Test 1: DynamoDB and datetime values
+    print("\n[Test 1] Native value handling")
+    print("-" * 60)
+    item = {
+        "message_count": Decimal("5"),
+        "birth_lat": Decimal("40.7128"),
+        "tags": {"b", "a"},
+        "chart": b"\x00\x01",
+        "at": datetime(2025, 11, 26, 12, 0, 0, 123456),
+        "aware": datetime(2025, 11, 26, 12, 0, tzinfo=timezone.utc),
+        "day": date(1990, 1, 15),
+        "title": "Mond im Skorpion ☽",
+        1: "non-string key",
+    }
+    expected = {
+        "message_count": 5,
+        "birth_lat": 40.7128,
+        "tags": ["a", "b"],
+        "chart": "AAE=",
+        "at": "2025-11-26T12:00:00.123456Z",
+        "aware": "2025-11-26T12:00:00Z",
+        "day": "1990-01-15",
+        "title": "Mond im Skorpion ☽",
+        "1": "non-string key",
+    }
+    for name, dumps in BACKENDS.items():
+        output = dumps(item)
+        print(f"{name:7}: {output}")
+        assert json.loads(output) == expected and isinstance(json.loads(output)["message_count"], int)
+        assert json.loads(dumps({"big": 2**70})) == {"big": 2**70}
+    try:
+        to_json({"bad": object()})
+    except TypeError as e:
+        print(f"Correctly rejected: {e}")
+    else:
+        raise AssertionError("Unsupported type accepted")
+    print("Test 1 passed")
+
+    # Test 2: Benchmark over response-shaped payloads (DynamoDB values left as read)
+    print("\n[Test 2] Benchmark")
+    print("-" * 60)
+    random.seed(3)
+    words = "your Sun in Leo Moon Scorpio rising Venus transit house chart energy balance growth the of to".split()
+
+    def text(count):
+        return " ".join(random.choice(words) for _ in range(count))
+
+    message_page = {
+        "conversation_id": "6b1d2e3f-0000-4000-8000-000000000000",
+        "messages": [
+            {
+                "message_id": f"U01JD8X3Q4W5E6R7T8Y9Z0A{index:03d}",
+                "timestamp": Decimal(1732622400 + index),
+                "created_at": "2025-11-26T12:00:00.000000Z",
+                "user_message": text(random.randint(5, 40)),
+                "ai_response": text(random.choice([150, 300, 600])),
+            }
+            for index in range(200)
+        ],
+        "has_more": True,
+    }
+    conversation_list = {
+        "conversations": [
+            {
+                "conversation_id": f"conv-{index}",
+                "title": text(5),
+                "message_count": Decimal(random.randint(1, 400)),
+                "created_at": "2025-11-26T12:00:00.000000Z",
+                "updated_at": "2025-11-27T12:00:00.000000Z",
+                "last_message_preview": text(15),
+            }
+            for index in range(100)
+        ],
+        "has_more": False,
+    }
+    timings = {}
+    for payload_name, payload in (("message page (200)", message_page), ("conversation list (100)", conversation_list)):
+        for name, dumps in BACKENDS.items():
+            runs = 50
+            start = time.perf_counter()
+            for _ in range(runs):
+                output = dumps(payload)
+            elapsed = (time.perf_counter() - start) / runs * 1000
+            timings[(payload_name, name)] = elapsed
+            print(f"  {payload_name:24} {name:7} {elapsed:7.3f} ms  ({len(output.encode()):>7} bytes)")
+        assert json.loads(BACKENDS["json"](payload)) == json.loads(to_json(payload))
+    if orjson:
+        assert timings[("message page (200)", "orjson")] < timings[("message page (200)", "json")]
+    print("Test 2 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
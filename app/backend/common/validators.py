@@ -3,11 +3,14 @@ User profile validation logic.
 Validates birth date, time, location, and country before storing in database.
 """
 
+import re
 from datetime import date, datetime
-from typing import Dict, Any
+from typing import Any, Callable, Dict
 
 from pydantic import BaseModel, Field, field_validator, ValidationError
 
+from common.countries import resolve_country
+
 
 class UserProfileInput(BaseModel):
     """
@@ -18,7 +21,7 @@ class UserProfileInput(BaseModel):
     - Birth date (valid format, not in future, reasonable range)
     - Birth time (valid 24-hour format)
     - Birth location (not empty, reasonable length)
-    - Birth country (not empty, reasonable length)
+    - Birth country (not empty, resolves to a known country)
     """
 
     first_name: str = Field(..., description="User's first name")
@@ -216,6 +219,7 @@ class UserProfileInput(BaseModel):
         Rules:
         - Cannot be empty or only whitespace
         - Must be between 2 and 100 characters
+        - Must resolve to a known country (name, common alias or ISO code)
 
         Args:
             v: Country string to validate
@@ -239,6 +243,10 @@ class UserProfileInput(BaseModel):
         if len(trimmed) > 100:
             raise ValueError("Country must be at most 100 characters")
 
+        # Resolve now so typos fail here instead of at chart generation
+        if resolve_country(trimmed) is None:
+            raise ValueError(f"Unknown country: {trimmed}")
+
         return trimmed
 
 
@@ -295,6 +303,90 @@ def validate_user_profile(data: Dict[str, Any]) -> Dict[str, Any]:
         raise ValueError(f"Validation failed for {field}: {msg}")
 
 
+# Fast-path checks for bulk validation. Each accepts a subset of what the
+# matching UserProfileInput validator accepts and returns the same value;
+# anything it rejects is re-validated by the model for the exact error.
+_NAME_PATTERN = re.compile(r"^[a-zA-Z\s\-']+$")
+_DATE_PATTERN = re.compile(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$")
+_TIME_PATTERN = re.compile(r"^(?:[01][0-9]|2[0-3]):[0-5][0-9]$")
+
+
+def _fast_name(v: str) -> str:
+    trimmed = v.strip()
+    if not trimmed or len(trimmed) > 50 or not _NAME_PATTERN.match(trimmed):
+        raise ValueError("invalid name")
+    return trimmed
+
+
+def _fast_birth_date(v: str) -> str:
+    if not _DATE_PATTERN.match(v) or not date(1900, 1, 1) <= date.fromisoformat(v) <= date.today():
+        raise ValueError("invalid birth date")
+    return v
+
+
+def _fast_birth_time(v: str) -> str:
+    if not _TIME_PATTERN.match(v):
+        raise ValueError("invalid birth time")
+    return v
+
+
+def _fast_birth_location(v: str) -> str:
+    trimmed = v.strip()
+    if not 2 <= len(trimmed) <= 100:
+        raise ValueError("invalid birth location")
+    return trimmed
+
+
+_FAST_CHECKS: Dict[str, Callable[[str], str]] = {
+    "first_name": _fast_name,
+    "last_name": _fast_name,
+    "birth_date": _fast_birth_date,
+    "birth_time": _fast_birth_time,
+    "birth_location": _fast_birth_location,
+}
+
+
+def compile_profile_validator() -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Build a fast validator equivalent to `validate_user_profile` for bulk imports.
+
+    Fields come from UserProfileInput. Each uses a precompiled fast-path check,
+    or the model's own field validator when it has none (e.g., the country).
+    A record failing the fast path is passed to `validate_user_profile`, so
+    accepted values and error messages match single-profile creation exactly.
+
+    Returns:
+        Function taking a raw record and returning the validated profile dict
+
+    Example:
+        >>> validate = compile_profile_validator()
+        >>> validate(record)["birth_country"]
+        'United States'
+    """
+    field_validators = {
+        decorator.info.fields[0]: decorator.func
+        for decorator in UserProfileInput.__pydantic_decorators__.field_validators.values()
+    }
+    checks = [
+        (field, _FAST_CHECKS.get(field) or field_validators.get(field) or str.strip)
+        for field in UserProfileInput.model_fields
+    ]
+
+    def validate(data: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            validated = {}
+            for field, check in checks:
+                value = data[field]
+                if type(value) is not str:
+                    raise TypeError(field)
+                validated[field] = check(value)
+            return validated
+        except (KeyError, TypeError, ValueError):
+            return validate_user_profile(data)
+
+    return validate
+
+
 # Local testing
 if __name__ == "__main__":
     print("Testing User Profile Validation\n")
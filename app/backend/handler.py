@@ -10,6 +10,9 @@ import re
 from api.health_handler import lambda_handler as health_handler
 from api.profile_handler import lambda_handler as profile_handler
 from api.chat_handler import lambda_handler as chat_handler
+from api.location_handler import suggest_locations
+from api.admin_handler import import_profiles_handler, purge_user_handler
+from api.purge_handler import lambda_handler as purge_handler
 from api.conversation_handler import (
     create_conversation,
     list_conversations,
@@ -17,6 +20,7 @@ from api.conversation_handler import (
     delete_conversation,
     update_conversation,
 )
+from common.rate_limit import enforce_chat_rate_limit
 
 # Setup logging
 logger = logging.getLogger()
@@ -31,12 +35,19 @@ def lambda_handler(event, context):
     - GET    /health                              -> Health check
     - POST   /profile                             -> Create user profile
     - GET    /profile                             -> Get user profile
-    - POST   /chat                                -> Send chat message
+    - POST   /chat                                -> Send chat message (rate limited per user, 429)
+    - GET    /locations/suggest?q=                -> Suggest birth locations
+    - POST   /admin/profiles/import               -> Bulk import profiles (admin group)
+    - DELETE /admin/users/{user_id}               -> Purge a user's data (admin group)
     - POST   /conversations                       -> Create conversation thread
     - GET    /conversations                       -> List all conversations
     - GET    /conversations/{id}/messages         -> Get conversation messages
     - DELETE /conversations/{id}                  -> Delete conversation
     - PATCH  /conversations/{id}                  -> Update conversation title
+
+    Non-HTTP events:
+    - source "mira.keep-warm"                     -> Warm the Bedrock connection
+    - source "mira.purge"                         -> Background purge task
     """
     # Handle warmup events from EventBridge keep-warm rule
     if event.get("source") == "mira.keep-warm":
@@ -75,6 +86,10 @@ def lambda_handler(event, context):
                 "body": json.dumps({"status": "warmed", "bedrock": "failed"}),
             }
 
+    # Background purge tasks (async self-invocations and the daily sweep)
+    if event.get("source") == "mira.purge":
+        return purge_handler(event, context)
+
     # Get path and HTTP method from event (HTTP API v2.0 format)
     raw_path = event.get("rawPath", "")
     http_method = event.get("requestContext", {}).get("http", {}).get("method", "GET")
@@ -102,6 +117,10 @@ def lambda_handler(event, context):
     elif raw_path == "/chat" or raw_path == "/default/chat":
         # Chat endpoint only accepts POST
         if http_method == "POST":
+            # Per-user rate limit, checked before any Bedrock or Astrologer work
+            limited = enforce_chat_rate_limit(event)
+            if limited:
+                return limited
             return chat_handler(event, context)
         else:
             return {
@@ -110,6 +129,45 @@ def lambda_handler(event, context):
                 "body": '{"error": "Method not allowed", "message": "Only POST is supported for /chat"}',
             }
 
+    elif raw_path == "/locations/suggest" or raw_path == "/default/locations/suggest":
+        # Location autocomplete only accepts GET
+        if http_method == "GET":
+            return suggest_locations(event, context)
+        else:
+            return {
+                "statusCode": 405,
+                "headers": {"Content-Type": "application/json", "Allow": "GET"},
+                "body": '{"error": "Method not allowed", "message": "Only GET is supported for /locations/suggest"}',
+            }
+
+    elif raw_path == "/admin/profiles/import" or raw_path == "/default/admin/profiles/import":
+        # Bulk profile import only accepts POST
+        if http_method == "POST":
+            return import_profiles_handler(event, context)
+        else:
+            return {
+                "statusCode": 405,
+                "headers": {"Content-Type": "application/json", "Allow": "POST"},
+                "body": '{"error": "Method not allowed", "message": "Only POST is supported for this route"}',
+            }
+
+    elif raw_path.startswith("/admin/users/") or raw_path.startswith("/default/admin/users/"):
+        match = re.match(r"/admin/users/([^/]+)$", raw_path.replace("/default", "", 1))
+        if not match:
+            return {
+                "statusCode": 404,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps({"error": "Invalid user path"}),
+            }
+        if http_method != "DELETE":
+            return {
+                "statusCode": 405,
+                "headers": {"Content-Type": "application/json", "Allow": "DELETE"},
+                "body": '{"error": "Method not allowed", "message": "Only DELETE is supported for this route"}',
+            }
+        event["pathParameters"] = {**(event.get("pathParameters") or {}), "user_id": match.group(1)}
+        return purge_user_handler(event, context)
+
     # Conversation management routes
     elif raw_path == "/conversations" or raw_path == "/default/conversations":
         if http_method == "POST":
@@ -192,3 +250,262 @@ def lambda_handler(event, context):
         "headers": {"Content-Type": "application/json"},
         "body": json.dumps({"error": "Not found", "path": raw_path, "method": http_method}),
     }
+
+
+# Local testing
+if __name__ == "__main__":
+    # Needs an AWS region for the boto3 clients created at import (e.g. AWS_DEFAULT_REGION=us-east-1)
+    print("Testing Route Wire Format\n")
+    print("=" * 60)
+
+    class MockContext:
+        aws_request_id = "test-routes"
+
+        def get_remaining_time_in_millis(self):
+            return 30000
+
+    def request(method, path, body=None, query="", headers=None, user_id=None):
+        event = {
+            "version": "2.0",
+            "rawPath": path,
+            "rawQueryString": query,
+            "headers": {"content-type": "application/json", **(headers or {})},
+            "requestContext": {"http": {"method": method}},
+        }
+        if user_id:
+            event["requestContext"]["authorizer"] = {"jwt": {"claims": {"sub": user_id}}}
+        if query:
+            event["queryStringParameters"] = dict(part.split("=", 1) for part in query.split("&"))
+        if body is not None:
+            event["body"] = json.dumps(body)
+        return lambda_handler(event, MockContext())
+
+    # Every route, unauthenticated (no DynamoDB or Bedrock calls), with its expected status
+    routes = [
+        ("GET", "/health", None, "", 200),
+        ("GET", "/default/health", None, "", 200),
+        ("GET", "/profile", None, "", 401),
+        ("POST", "/profile", {"birth_date": "1990-01-15"}, "", 401),
+        ("PUT", "/profile", None, "", 405),
+        ("POST", "/chat", {"message": "Hello"}, "", 401),
+        ("GET", "/chat", None, "", 405),
+        ("GET", "/locations/suggest", None, "q=Lon", (200, 503)),
+        ("POST", "/locations/suggest", None, "", 405),
+        ("POST", "/admin/profiles/import", {"records": []}, "", 403),
+        ("GET", "/admin/profiles/import", None, "", 405),
+        ("DELETE", "/admin/users/user-1", None, "", 403),
+        ("GET", "/admin/users/user-1", None, "", 405),
+        ("POST", "/conversations", {}, "", 400),
+        ("GET", "/conversations", None, "", 400),
+        ("PUT", "/conversations", None, "", 405),
+        ("GET", "/conversations/conv-1/messages", None, "", 400),
+        ("POST", "/conversations/conv-1/messages", None, "", 405),
+        ("DELETE", "/conversations/conv-1", None, "", 400),
+        ("PATCH", "/conversations/conv-1", {"title": "New"}, "", 400),
+        ("GET", "/conversations/conv-1", None, "", 404),
+        ("GET", "/conversations/conv-1/extra", None, "", 404),
+        ("GET", "/unknown", None, "", 404),
+    ]
+
+    # Test 1: Status is the handler's status, body is JSON encoded exactly once
+    print("\n[Test 1] Wire format for every route")
+    print("-" * 60)
+    for method, path, body, query, expected in routes:
+        response = request(method, path, body, query)
+        status = response["statusCode"]
+        print(f"{method:6} {path:32} -> {status}")
+        assert isinstance(status, int) and status in (expected if isinstance(expected, tuple) else (expected,))
+        assert response["headers"]["Content-Type"] == "application/json"
+        decoded = json.loads(response["body"])
+        assert isinstance(decoded, dict) and "statusCode" not in decoded and "body" not in decoded
+        assert ("error" in decoded) == (status >= 400)
+    print("Test 1 passed")
+
+    # Test 2: Authenticated success paths with stubbed storage, Bedrock and gazetteer
+    print("\n[Test 2] 200 responses through the ApiResponse and compression path")
+    print("-" * 60)
+    import base64
+    import gzip
+    from decimal import Decimal
+
+    import api.chat_handler as chat_module
+    import api.conversation_handler as conversation_module
+    import api.location_handler as location_module
+    import api.profile_handler as profile_module
+    import common.cursors as cursors_module
+    import common.rate_limit as rate_limit_module
+    from common.conversation_utils import CONVERSATIONS_VERSION_SK
+
+    profile_item = {
+        "user_id": "user-1",
+        "first_name": "Ada",
+        "last_name": "Lovelace",
+        "birth_date": "1990-01-15",
+        "birth_time": "14:30",
+        "birth_location": "New York, NY",
+        "birth_country": "United States",
+        "zodiac_sign": "Capricorn",
+        "created_at": Decimal(1700000000),
+        "updated_at": Decimal(1700000500),
+        "version": Decimal(3),
+    }
+    conversation_items = [
+        {
+            "user_id": "user-1",
+            "sk": f"CONV#conv-{index}",
+            "conversation_id": f"conv-{index}",
+            "title": f"Saturn return question {index}",
+            "message_count": Decimal(index + 1),
+            "created_at": "2025-01-01T00:00:00Z",
+            "updated_at": f"2025-01-{index + 1:02d}T00:00:00Z",
+            "active_updated_at": f"2025-01-{index + 1:02d}T00:00:00Z",
+            "last_message_preview": "What does my Saturn return mean for my career?",
+        }
+        for index in range(25)
+    ]
+
+    class StubTable:
+        """get_item/query/update_item over fixed items."""
+
+        def get_item(self, Key, **kwargs):
+            if Key.get("sk") == CONVERSATIONS_VERSION_SK:
+                return {"Item": {"version": Decimal(7)}}
+            return {"Item": dict(profile_item)} if Key["user_id"] == "user-1" else {}
+
+        def query(self, Limit, **kwargs):
+            return {"Items": conversation_items[::-1][:Limit]}
+
+        def update_item(self, **kwargs):  # Token bucket compare-and-set: always wins
+            return {}
+
+    class StubDynamoDB:
+        def Table(self, name):
+            return StubTable()
+
+    class StubBedrock:
+        def generate_response(self, user_profile, chart_data, user_question, deadline=None, **kwargs):
+            return {"response": f"As a {user_profile['zodiac_sign']}, " + "Saturn asks for patience. " * 60}
+
+    class StubGazetteer:
+        def suggest(self, query, country_code, limit):
+            city = {
+                "geoname_id": 2643743,
+                "name": "London",
+                "admin1_name": "England",
+                "admin1": "ENG",
+                "country_code": "GB",
+                "lat": 51.50853,
+                "lng": -0.12574,
+                "tz": "Europe/London",
+                "population": 8961989,
+            }
+            return [city][:limit]
+
+    profile_module.table = StubTable()
+    conversation_module.dynamodb = StubDynamoDB()
+    rate_limit_module.bucket_store = rate_limit_module.TokenBucketStore(dynamodb=StubDynamoDB())
+    chat_module.get_user_profile = lambda user_id, deadline=None: dict(profile_item)
+    chat_module.get_or_generate_chart = lambda user_id, profile, deadline=None: (
+        {"data": {}, "aspects": []},
+        None,
+        True,
+    )
+    chat_module.bedrock_client = StubBedrock()
+    chat_module.save_conversation = lambda **kwargs: kwargs["conversation_id"] or "conv-new"
+    location_module.get_gazetteer = lambda: StubGazetteer()
+    cursors_module.CURSOR_DEV_MODE = True  # next_token is signed with the development key
+
+    def decoded_body(response):
+        """JSON body, decompressing a gzip-encoded one."""
+        body = response["body"]
+        if response.get("isBase64Encoded"):
+            assert response["headers"]["Content-Encoding"] == "gzip"
+            body = gzip.decompress(base64.b64decode(body)).decode("utf-8")
+        else:
+            assert "Content-Encoding" not in response["headers"]
+        return json.loads(body)
+
+    gzip_accepted = {"accept-encoding": "gzip"}
+    # (method, path, body, query, headers, expect ETag, expect gzip, body check)
+    successes = [
+        (
+            "GET",
+            "/profile",
+            None,
+            "",
+            gzip_accepted,
+            True,
+            False,  # Below COMPRESSION_MIN_BYTES
+            lambda data: data["profile"]["zodiac_sign"] == "Capricorn" and data["profile"]["created_at"] == 1700000000,
+        ),
+        (
+            "POST",
+            "/chat",
+            {"message": "What about Saturn?", "conversation_id": "conv-3"},
+            "",
+            gzip_accepted,
+            False,
+            True,
+            lambda data: data["conversation_id"] == "conv-3" and data["message"].startswith("As a Capricorn"),
+        ),
+        (
+            "GET",
+            "/default/conversations",
+            None,
+            "limit=20",
+            gzip_accepted,
+            True,
+            True,
+            lambda data: [c["conversation_id"] for c in data["conversations"]][:2] == ["conv-24", "conv-23"]
+            and len(data["conversations"]) == 20
+            and data["has_more"]
+            and data["next_token"],
+        ),
+        (
+            "GET",
+            "/conversations",
+            None,
+            "limit=2",
+            {},
+            True,
+            False,  # No Accept-Encoding
+            lambda data: len(data["conversations"]) == 2 and data["conversations"][0]["message_count"] == 25,
+        ),
+        (
+            "GET",
+            "/locations/suggest",
+            None,
+            "q=Lon",
+            gzip_accepted,
+            False,
+            False,
+            lambda data: data["suggestions"][0]["label"] == "London, England, GB",
+        ),
+    ]
+    etags = {}
+    for method, path, body, query, headers, has_etag, compressed, check in successes:
+        response = request(method, path, body, query, headers, user_id="user-1")
+        response_headers = response["headers"]
+        print(f"{method:6} {path:32} -> {response['statusCode']} {response_headers.get('Content-Encoding', '')}")
+        assert response["statusCode"] == 200
+        assert response_headers["Content-Type"] == "application/json"
+        assert response_headers["Access-Control-Allow-Origin"] == "*"
+        assert response_headers["Vary"] == "Accept-Encoding"
+        assert ("ETag" in response_headers) == has_etag
+        assert bool(response.get("isBase64Encoded")) == compressed
+        data = decoded_body(response)
+        assert "error" not in data and check(data), data
+        if has_etag:
+            etags[(path, query)] = response_headers["ETag"]
+
+    # The ETag from a 200 makes the same request a 304 with no body; each page has its own
+    assert len(set(etags.values())) == len(etags)
+    for (path, query), etag in etags.items():
+        response = request("GET", path, query=query, headers={"if-none-match": etag}, user_id="user-1")
+        assert response["statusCode"] == 304 and response["body"] == ""
+        assert response["headers"]["ETag"] == etag
+        assert response["headers"]["Access-Control-Allow-Origin"] == "*"
+    print("Test 2 passed")
+
+    print("\n" + "=" * 60)
+    print("All tests passed!")
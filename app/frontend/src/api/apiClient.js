@@ -168,6 +168,29 @@ class ApiClient {
     },
   };
 
+  // Location autocomplete endpoints
+  locations = {
+    /**
+     * Suggest birth cities matching a typed prefix, most populous first
+     * GET /locations/suggest
+     * @param {string} query - Typed prefix (at least 2 letters)
+     * @param {string|null} country - Optional country name or code to filter by
+     * @returns {Promise<Array<{id: number, name: string, label: string, country_code: string, tz: string}>>}
+     */
+    suggest: async (query, country = null) => {
+      const params = new URLSearchParams({ q: query });
+      if (country) {
+        params.set('country', country);
+      }
+
+      const response = await this.request(`/locations/suggest?${params}`, {
+        method: 'GET',
+      });
+      const unwrapped = this._unwrapLambdaResponse(response);
+      return unwrapped.suggestions || [];
+    },
+  };
+
   // Conversation management endpoints
   conversations = {
     /**
@@ -201,10 +224,20 @@ class ApiClient {
      * Get messages for a specific conversation
      * GET /conversations/{id}/messages
      * @param {string} conversationId - The conversation ID
-     * @returns {Promise<{conversation_id: string, messages: Array, has_more: boolean}>}
+     * @param {{limit?: number, order?: 'asc'|'desc', before?: string, after?: string}} options -
+     *   order 'desc' returns the latest messages first; before/after are cursors from a previous page
+     * @returns {Promise<{conversation_id: string, messages: Array, before: string, after: string, has_more: boolean}>}
      */
-    getMessages: async (conversationId) => {
-      const response = await this.request(`/conversations/${conversationId}/messages`, {
+    getMessages: async (conversationId, { limit, order, before, after } = {}) => {
+      const params = new URLSearchParams();
+      Object.entries({ limit, order, before, after }).forEach(([key, value]) => {
+        if (value !== undefined && value !== null) {
+          params.set(key, value);
+        }
+      });
+      const query = params.toString() ? `?${params}` : '';
+
+      const response = await this.request(`/conversations/${conversationId}/messages${query}`, {
         method: 'GET',
       });
       return this._unwrapLambdaResponse(response);
@@ -7,6 +7,9 @@ import ChatArea from '../components/chat/ChatArea';
 import VisualizationArea from '../components/chat/VisualizationArea';
 import { motion } from 'framer-motion';
 
+// Messages loaded when a conversation is opened (latest first)
+const MESSAGE_PAGE_SIZE = 50;
+
 export default function Chat() {
   const [user, setUser] = useState(null);
   const [conversations, setConversations] = useState([]);
@@ -94,8 +97,12 @@ export default function Chat() {
    */
   const loadConversationMessages = useCallback(async (conversationId) => {
     try {
-      const result = await apiClient.conversations.getMessages(conversationId);
-      const msgs = result.messages || [];
+      // Latest page in one query, newest first; display oldest first
+      const result = await apiClient.conversations.getMessages(conversationId, {
+        order: 'desc',
+        limit: MESSAGE_PAGE_SIZE,
+      });
+      const msgs = (result.messages || []).slice().reverse();
       setMessages(msgs);
       
       // Set the latest chart URL if available
@@ -289,7 +296,12 @@ export default function Chat() {
       setMessages(prev => prev.filter(m => !m._pending));
       
       // Show error to user
-      alert('Failed to send message. Please try again.\n\nError: ' + (error.message || 'Unknown error'));
+      if (error.status === 429) {
+        const retryAfter = error.data?.error?.details?.retry_after;
+        alert(`You're sending messages too quickly. Please try again${retryAfter ? ` in ${retryAfter} seconds` : ' shortly'}.`);
+      } else {
+        alert('Failed to send message. Please try again.\n\nError: ' + (error.message || 'Unknown error'));
+      }
     } finally {
       setSendingMessage(false);
     }
@@ -162,6 +162,12 @@ output "cloudfront_url" {
   description = "Full CloudFront URL for accessing your application"
 }
 
+# Signs pagination cursors; shared by every mira-api container
+resource "random_password" "cursor_signing_key" {
+  length  = 48
+  special = false
+}
+
 module "api_lambda" {
   source = "./modules/lambda_api"
 
@@ -183,6 +189,15 @@ module "api_lambda" {
     ASTROLOGY_SECRET_NAME        = "/mira/astrology/api_key"
     S3_CHARTS_BUCKET             = module.s3_static.artifacts_bucket_name
     GEONAMES_USERNAME            = "DavieWu"
+    CHART_PROVIDER_ORDER         = "local_ephemeris,astrologer,stale_cache"
+    CURSOR_SIGNING_KEY           = random_password.cursor_signing_key.result
+    MESSAGE_STORAGE_FORMAT       = "item" # "page" packs chat turns into ~64 KB page items
+    ASTROLOGER_REQUESTS_PER_MINUTE = "60" # RapidAPI plan quota, shared by every container
+    ASTROLOGER_REQUEST_BURST       = "10"
+    CHAT_RATE_LIMITS = jsonencode({ # POST /chat token buckets per Cognito group
+      free    = { per_minute = 4, burst = 8 }
+      premium = { per_minute = 20, burst = 30 }
+    })
   }
 
   astrologer_api_secret_arn = module.secrets_astrologer.astrologer_api_secret_arn
@@ -231,6 +246,35 @@ resource "aws_lambda_permission" "api_keep_warm" {
   source_arn    = aws_cloudwatch_event_rule.api_keep_warm.arn
 }
 
+########################################
+# Daily sweep purging soft-deleted conversations
+########################################
+
+resource "aws_cloudwatch_event_rule" "api_purge_sweep" {
+  name                = "${var.name_prefix}-api-purge-sweep-${var.environment}"
+  description         = "Purge soft-deleted conversations whose immediate purge did not finish"
+  schedule_expression = "rate(1 day)"
+}
+
+resource "aws_cloudwatch_event_target" "api_purge_sweep" {
+  rule      = aws_cloudwatch_event_rule.api_purge_sweep.name
+  target_id = "mira-api-dev-purge-sweep"
+  arn       = module.api_lambda.function_arn
+
+  input = jsonencode({
+    "source" = "mira.purge"
+    "task"   = "sweep"
+  })
+}
+
+resource "aws_lambda_permission" "api_purge_sweep" {
+  statement_id  = "AllowEventBridgeInvokePurgeSweep"
+  action        = "lambda:InvokeFunction"
+  function_name = module.api_lambda.function_arn
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.api_purge_sweep.arn
+}
+
 
 resource "aws_cloudwatch_metric_alarm" "mira_api_errors" {
   alarm_name          = "mira-api-dev-errors"
@@ -101,6 +101,42 @@ resource "aws_apigatewayv2_route" "profile_post" {
   authorization_scopes = []
 }
 
+## Location autocomplete (protected)
+resource "aws_apigatewayv2_route" "locations_suggest" {
+  api_id    = aws_apigatewayv2_api.this.id
+  route_key = "GET /locations/suggest"
+
+  target = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+
+  authorizer_id        = aws_apigatewayv2_authorizer.jwt.id
+  authorization_type   = "JWT"
+  authorization_scopes = []
+}
+
+## Admin bulk profile import (protected; handler also requires the admin group)
+resource "aws_apigatewayv2_route" "admin_profiles_import" {
+  api_id    = aws_apigatewayv2_api.this.id
+  route_key = "POST /admin/profiles/import"
+
+  target = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+
+  authorizer_id        = aws_apigatewayv2_authorizer.jwt.id
+  authorization_type   = "JWT"
+  authorization_scopes = []
+}
+
+## Admin account purge (protected; handler also requires the admin group)
+resource "aws_apigatewayv2_route" "admin_users_delete" {
+  api_id    = aws_apigatewayv2_api.this.id
+  route_key = "DELETE /admin/users/{user_id}"
+
+  target = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+
+  authorizer_id        = aws_apigatewayv2_authorizer.jwt.id
+  authorization_type   = "JWT"
+  authorization_scopes = []
+}
+
 ## Conversation Management Routes (all protected with JWT)
 
 # POST /conversations - Create new conversation thread
@@ -24,6 +24,13 @@ resource "aws_cognito_user_pool" "this" {
   tags = var.tags
 }
 
+# Members may call admin endpoints (e.g., bulk profile import)
+resource "aws_cognito_user_group" "admin" {
+  name         = "admin"
+  user_pool_id = aws_cognito_user_pool.this.id
+  description  = "Mira administrators"
+}
+
 resource "aws_cognito_user_pool_client" "this" {
   name         = var.app_client_name
   user_pool_id = aws_cognito_user_pool.this.id
@@ -65,6 +65,47 @@ resource "aws_dynamodb_table" "conversations" {
     type = "S"
   }
 
+  attribute {
+    name = "active_updated_at"
+    type = "S"
+  }
+
+  attribute {
+    name = "purge_pending"
+    type = "S"
+  }
+
+  # Sparse list index: only live conversation metadata carries active_updated_at,
+  # so GET /conversations is one bounded query sorted by last update
+  global_secondary_index {
+    name            = "user-updated-index"
+    hash_key        = "user_id"
+    range_key       = "active_updated_at"
+    projection_type = "INCLUDE"
+    non_key_attributes = [
+      "conversation_id",
+      "title",
+      "message_count",
+      "created_at",
+      "updated_at",
+      "last_message_preview",
+    ]
+  }
+
+  # Sparse purge index: only deleted conversation metadata and unfinished account
+  # purges carry purge_pending, so the daily sweep queries its work instead of
+  # scanning every message in the table
+  global_secondary_index {
+    name            = "purge-pending-index"
+    hash_key        = "purge_pending"
+    projection_type = "INCLUDE"
+    non_key_attributes = [
+      "item_type",
+      "conversation_id",
+      "target_user_id",
+    ]
+  }
+
   # TTL attribute for auto-expiring conversation items
   ttl {
     attribute_name = "ttl_epoch"
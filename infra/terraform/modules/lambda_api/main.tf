@@ -97,7 +97,8 @@ data "aws_iam_policy_document" "dynamodb_userprofiles" {
       "dynamodb:PutItem",
       "dynamodb:UpdateItem",
       "dynamodb:GetItem",
-      "dynamodb:DeleteItem"
+      "dynamodb:DeleteItem",
+      "dynamodb:BatchWriteItem"
     ]
 
     resources = [
@@ -125,10 +126,12 @@ data "aws_iam_policy_document" "dynamodb_conversations" {
       "dynamodb:DeleteItem",
       "dynamodb:Query",
       "dynamodb:Scan",
+      "dynamodb:BatchWriteItem",
     ]
 
     resources = [
-      var.dynamodb_conversations_arn
+      var.dynamodb_conversations_arn,
+      "${var.dynamodb_conversations_arn}/index/*"
     ]
   }
 }
@@ -288,6 +291,28 @@ resource "aws_iam_role_policy" "xray_tracing" {
   policy = data.aws_iam_policy_document.xray_tracing.json
 }
 
+# ----- Self-invoke permissions (background purge continuations) -----
+
+data "aws_iam_policy_document" "self_invoke" {
+  statement {
+    effect = "Allow"
+
+    actions = [
+      "lambda:InvokeFunction",
+    ]
+
+    resources = [
+      "arn:aws:lambda:${data.aws_region.current.name}:${data.aws_caller_identity.current.account_id}:function:${var.function_name}"
+    ]
+  }
+}
+
+resource "aws_iam_role_policy" "self_invoke" {
+  name   = "${var.name_prefix}-${var.function_name}-self-invoke"
+  role   = aws_iam_role.lambda_role.id
+  policy = data.aws_iam_policy_document.self_invoke.json
+}
+
 # HTTP API Gateway (optional)
 # resource "aws_apigatewayv2_api" "http_api" {
 # count         = var.create_http_api ? 1 : 0